@@ -0,0 +1,372 @@
+""" Serviço HTTP das métricas do dashboard: os mesmos números das páginas, em JSON, sem o Streamlit.
+
+Servidor assíncrono (asyncio, HTTP/1.1 com keep-alive) na frente de utils/metrics.py. Os dados e as
+estruturas derivadas vêm do cache do processo (utils/loader.py) e as agregações rodam em threads,
+sem bloquear as conexões. O corpo de cada resposta fica no cache de resultados (utils/results_cache.py)
+por versão dos dados, rota e filtros.
+
+Cada resposta tem um ETag calculado a partir da versão dos dados, da rota e dos filtros; uma requisição
+com If-None-Match igual recebe 304 sem corpo (e sem nenhum cálculo). Quando o conjunto de dados muda
+(arquivo novo ou lote acrescentado), a versão e os ETags mudam.
+
+Uso:
+    python api.py
+    python api.py --port 8000 --data dataset/train.csv
+
+Rotas (GET ou HEAD):
+    /health                         versão e número de linhas dos dados
+    /metrics                        lista das métricas
+    /metrics/<nome>?date=2022-03-15&traffic=Jam,High
+        date: pedidos até a data (AAAA-MM-DD; padrão: todas as datas)
+        traffic: tipos de tráfego separados por vírgula (padrão: todos)
+        by (só em /metrics/ratings): traffic, weather ou courier
+        q, sort, order, page, page_size (só em /metrics/couriers): busca pelo ID do entregador, coluna da
+            ordenação (orders, rating_mean, time_p90...), asc ou desc, página e linhas por página
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from utils import loader
+from utils.cube import build_cube, filter_cube, update_cube
+from utils.filters import build_filter_index, filter_orders, update_filter_index
+from utils.leaderboard import PAGE_SIZE, build_courier_rollup, courier_summary, leaderboard_page, load_courier_rollup
+from utils.metrics import (dist_media, distance_by_city, festival_stats, orders_by_traffic, orders_by_traffic_city,
+                           orders_per_courier_week, orders_per_day, orders_per_week, rating_by, time_by_city,
+                           time_by_city_traffic, time_city_order)
+from utils.parallel import share_frame
+from utils.results_cache import cached, filter_key
+
+
+HOST='127.0.0.1'
+PORT=8000
+
+# Tipos de tráfego aceitos no filtro (os mesmos da barra lateral das páginas)
+TRAFFIC=['Jam','Medium','High','Low']
+
+# Colunas da métrica de avaliações: valor do parâmetro 'by' -> coluna do dataframe
+RATING_COLS={'traffic':'Road_traffic_density','weather':'Weatherconditions','courier':'Delivery_person_ID'}
+
+# Maior número de linhas por página do ranking dos entregadores
+MAX_PAGE_SIZE=1000
+
+# Limites da leitura das requisições
+MAX_LINE=8192
+MAX_HEADERS=100
+
+# Arquivos dos dados (alterados por configure)
+SOURCE={'path':loader.DATA_PATH,'snapshot_path':loader.SNAPSHOT_PATH,'batches_dir':loader.BATCHES_DIR}
+
+STATUS={200:'OK',304:'Not Modified',400:'Bad Request',404:'Not Found',405:'Method Not Allowed',500:'Internal Server Error'}
+
+logger=logging.getLogger('dashboard.api')
+
+
+# =====================================================
+# FUNÇÕES: métricas
+# =====================================================
+
+def _records(df):
+    """ Esta função converte um dataframe (ou Series) em uma lista JSON de registros, com as datas em ISO
+    (o índice, quando não é o padrão, vira uma coluna) """
+    if isinstance(df,pd.Series) or not isinstance(df.index,pd.RangeIndex):
+        df=df.reset_index()
+    return df.to_json(orient='records',date_format='iso',force_ascii=False)
+
+def _ratings(dados,params):
+    by=params.get('by','traffic')
+    if by not in RATING_COLS:
+        raise ValueError(f"by deve ser um de {sorted(RATING_COLS)}")
+    return _records(rating_by(dados['df'],RATING_COLS[by]))
+
+def _distance(dados,params):
+    df=dados['df']
+    media=float(dist_media(df,'False')) if len(df) else None
+    return '{"mean_km":%s,"by_city":%s}'%(json.dumps(media),_records(distance_by_city(df)))
+
+def _festival(dados,params):
+    return _records(festival_stats(dados['df']).rename_axis('Festival'))
+
+def _int_param(params,nome,padrao,minimo,maximo):
+    """ Esta função lê um parâmetro inteiro da URL, dentro dos limites (ValueError se for inválido) """
+    valor=params.get(nome)
+    if not valor:
+        return padrao
+    try:
+        valor=int(valor)
+    except ValueError:
+        raise ValueError(f'{nome} deve ser um número inteiro')
+    if not minimo<=valor<=maximo:
+        raise ValueError(f'{nome} deve estar entre {minimo} e {maximo}')
+    return valor
+
+def _couriers(dados,params):
+    ordem=params.get('order','desc')
+    if ordem not in ('asc','desc'):
+        raise ValueError('order deve ser asc ou desc')
+    page=_int_param(params,'page',1,1,10**9)
+    page_size=_int_param(params,'page_size',PAGE_SIZE,1,MAX_PAGE_SIZE)
+    df=dados['df']
+    # Sem filtros, o rollup da carga (atualizado a cada lote); com filtros, o rollup dos pedidos filtrados
+    if len(df)<dados['rows']:
+        rollup=cached('courier_rollup',dados['filtro'],lambda: build_courier_rollup(df))
+    else:
+        rollup=load_courier_rollup(**SOURCE)
+    resumo=cached('courier_summary',dados['filtro'],lambda: courier_summary(rollup))
+    pagina=leaderboard_page(rollup,resumo,params.get('q',''),params.get('sort','orders'),ordem=='desc',page,page_size)
+    return '{"total":%d,"page":%d,"pages":%d,"rows":%s}'%(pagina['total'],pagina['page'],pagina['pages'],_records(pagina['rows']))
+
+# Métricas: nome -> (função que recebe os dados filtrados e os parâmetros e retorna o JSON, descrição)
+METRICS={
+    'orders_per_day':(lambda d,p: _records(orders_per_day(d['df'],d['cube'])),'Pedidos por dia'),
+    'orders_per_week':(lambda d,p: _records(orders_per_week(d['df'],d['cube'])),'Pedidos por semana do ano'),
+    'orders_by_traffic':(lambda d,p: _records(orders_by_traffic(d['df'],d['cube'])),'Pedidos por tipo de tráfego'),
+    'orders_by_traffic_city':(lambda d,p: _records(orders_by_traffic_city(d['df'],d['cube'])),'Pedidos por cidade e tráfego'),
+    'orders_per_courier_week':(lambda d,p: _records(orders_per_courier_week(d['df'],d['cube'])),'Pedidos por entregador por semana'),
+    'ratings':(_ratings,'Média e desvio padrão das avaliações por tráfego, clima ou entregador (by)'),
+    'time_by_city':(lambda d,p: _records(time_by_city(d['df'])),'Tempo de entrega por cidade'),
+    'time_by_city_traffic':(lambda d,p: _records(time_by_city_traffic(d['df'])),'Tempo de entrega por cidade e tráfego'),
+    'time_by_city_order':(lambda d,p: _records(time_city_order(d['df'])),'Tempo de entrega por cidade e tipo de pedido'),
+    'couriers':(_couriers,'Ranking dos entregadores: busca (q), ordenação (sort, order) e paginação (page, page_size)'),
+    'festival':(_festival,'Tempo de entrega com e sem festival'),
+    'distance':(_distance,'Distância média e distância média por cidade'),
+}
+
+def configure(path=None,snapshot_path=None,batches_dir=None):
+    """ Esta função altera os arquivos dos dados servidos.
+
+    Input: caminho do CSV; caminho do snapshot; diretório dos lotes
+    Output: None
+    """
+    for nome,valor in (('path',path),('snapshot_path',snapshot_path),('batches_dir',batches_dir)):
+        if valor is not None:
+            SOURCE[nome]=valor
+
+def parse_filters(params):
+    """ Esta função lê os filtros da URL (date e traffic), como os da barra lateral.
+
+    Input: parâmetros da URL (nome -> valor)
+    Output: tupla (data limite, lista de tipos de tráfego)
+    """
+    data=params.get('date')
+    if data:
+        try:
+            data_limite=pd.Timestamp(data)
+        except ValueError:
+            raise ValueError(f'data inválida: {data}')
+    else:
+        data_limite=pd.Timestamp.max
+    trafego=params.get('traffic')
+    categorias=TRAFFIC if not trafego else [t.strip() for t in trafego.split(',') if t.strip()]
+    invalidos=sorted(set(categorias)-set(TRAFFIC))
+    if invalidos:
+        raise ValueError(f'tráfego inválido: {invalidos} (use {TRAFFIC})')
+    return data_limite,categorias
+
+def dataset_version():
+    """ Esta função retorna a versão do conjunto de dados servido (carregando-o na primeira chamada) """
+    return loader.load_info(**SOURCE)['version']
+
+def etag(version,nome,params):
+    """ Esta função calcula o ETag de uma resposta: versão dos dados, métrica e parâmetros normalizados.
+
+    Input: versão dos dados; nome da métrica; parâmetros da URL
+    Output: texto do ETag (entre aspas)
+    """
+    data_limite,categorias=parse_filters(params)
+    extras=sorted((k,v) for k,v in params.items() if k not in ('date','traffic'))
+    chave=repr((version,nome,data_limite.isoformat(),sorted(categorias),extras))
+    return '"%s"'%hashlib.sha1(chave.encode('utf-8')).hexdigest()[:24]
+
+def metric_body(nome,params):
+    """ Esta função calcula (ou busca no cache de resultados) o corpo JSON de uma métrica com os filtros.
+
+    Input: nome da métrica; parâmetros da URL
+    Output: tupla (corpo em bytes, versão dos dados)
+    """
+    data_limite,categorias=parse_filters(params)
+    df_total=loader.load_data(**SOURCE)
+    version=dataset_version()
+    filtro=filter_key(version,data_limite,categorias)
+    extras=tuple(sorted((k,v) for k,v in params.items() if k not in ('date','traffic')))
+
+    def calcular():
+        index=loader.load_derived('filter_index',build_filter_index,update=update_filter_index,**SOURCE)
+        cube=loader.load_derived('cube',build_cube,update=update_cube,**SOURCE)
+        loader.load_derived('shared_frame',share_frame,**SOURCE)
+        dados={'df':filter_orders(df_total,index,data_limite,categorias),
+               'cube':filter_cube(cube,data_limite,categorias),
+               'rows':len(df_total),
+               'filtro':filtro}
+        filtros={'date':None if data_limite==pd.Timestamp.max else data_limite.date().isoformat(),'traffic':sorted(categorias)}
+        corpo='{"metric":%s,"version":%s,"filters":%s,"data":%s}'%(
+            json.dumps(nome),json.dumps(version),json.dumps(filtros),METRICS[nome][0](dados,dict(extras)))
+        return corpo.encode('utf-8')
+    return cached('api_'+nome,(filtro,extras),calcular),version
+
+def health_body():
+    """ Esta função monta o corpo da rota /health """
+    info=loader.load_info(**SOURCE)
+    return json.dumps({'status':'ok','version':info['version'],'rows':info['rows'],'source':info.get('source')}).encode('utf-8')
+
+def index_body():
+    """ Esta função monta o corpo da rota /metrics (lista das métricas) """
+    return json.dumps({nome:descricao for nome,(_,descricao) in METRICS.items()},ensure_ascii=False).encode('utf-8')
+
+
+# =====================================================
+# FUNÇÕES: HTTP
+# =====================================================
+
+async def read_request(reader):
+    """ Esta função lê uma requisição HTTP/1.1 (linha inicial e cabeçalhos; o corpo é descartado).
+
+    Input: StreamReader da conexão
+    Output: tupla (método, alvo, versão, cabeçalhos em minúsculas) ou None se a conexão foi fechada
+            (ValueError se a requisição for inválida)
+    """
+    linha=await reader.readline()
+    if not linha:
+        return None
+    if len(linha)>MAX_LINE:
+        raise ValueError('linha inicial muito longa')
+    partes=linha.decode('latin-1').split()
+    if len(partes)!=3:
+        raise ValueError('linha inicial inválida')
+    cabecalhos={}
+    for _ in range(MAX_HEADERS+1):
+        linha=await reader.readline()
+        if linha in (b'\r\n',b'\n',b''):
+            break
+        nome,_,valor=linha.decode('latin-1').partition(':')
+        cabecalhos[nome.strip().lower()]=valor.strip()
+    else:
+        raise ValueError('cabeçalhos demais')
+    tamanho=int(cabecalhos.get('content-length','0') or 0)
+    if tamanho:
+        await reader.readexactly(tamanho)
+    return partes[0],partes[1],partes[2],cabecalhos
+
+def response(status,body=b'',headers=None,keep_alive=True,head=False):
+    """ Esta função monta os bytes de uma resposta HTTP/1.1.
+
+    Input: status; corpo; cabeçalhos extras; se a conexão continua aberta; se a requisição é HEAD (sem corpo)
+    Output: bytes
+    """
+    linhas=[f'HTTP/1.1 {status} {STATUS[status]}']
+    if status!=304:
+        linhas+=['Content-Type: application/json; charset=utf-8',f'Content-Length: {len(body)}']
+    linhas.append('Connection: '+('keep-alive' if keep_alive else 'close'))
+    linhas+=[f'{k}: {v}' for k,v in (headers or {}).items()]
+    cabecalho=('\r\n'.join(linhas)+'\r\n\r\n').encode('latin-1')
+    return cabecalho if head or status==304 else cabecalho+body
+
+def _error_body(mensagem):
+    return json.dumps({'error':mensagem},ensure_ascii=False).encode('utf-8')
+
+async def dispatch(method,target,cabecalhos):
+    """ Esta função responde uma requisição: rotas, ETag e If-None-Match.
+
+    Input: método; alvo (caminho e parâmetros); cabeçalhos
+    Output: tupla (status, corpo, cabeçalhos extras)
+    """
+    if method not in ('GET','HEAD'):
+        return 405,_error_body('use GET ou HEAD'),{'Allow':'GET, HEAD'}
+    url=urlsplit(target)
+    params={k:v[-1] for k,v in parse_qs(url.query).items()}
+    caminho=url.path.rstrip('/') or '/'
+    loop=asyncio.get_running_loop()
+    if caminho=='/health':
+        return 200,await loop.run_in_executor(None,health_body),{'Cache-Control':'no-store'}
+    if caminho in ('/','/metrics'):
+        return 200,index_body(),{}
+    if not caminho.startswith('/metrics/'):
+        return 404,_error_body(f'rota desconhecida: {caminho}'),{}
+
+    nome=caminho[len('/metrics/'):]
+    if nome not in METRICS:
+        return 404,_error_body(f'métrica desconhecida: {nome}'),{}
+    version=await loop.run_in_executor(None,dataset_version)
+    tag=etag(version,nome,params)
+    cache={'ETag':tag,'Cache-Control':'no-cache'}
+    pedidas=[t.strip() for t in cabecalhos.get('if-none-match','').split(',')]
+    if tag in pedidas or '*' in pedidas:
+        return 304,b'',cache
+    corpo,version_calculada=await loop.run_in_executor(None,metric_body,nome,params)
+    if version_calculada!=version:
+        # Os dados mudaram durante o cálculo: o ETag acompanha a versão usada no corpo
+        cache['ETag']=etag(version_calculada,nome,params)
+    return 200,corpo,cache
+
+async def handle(reader,writer):
+    """ Esta função atende uma conexão, com keep-alive, até o cliente fechá-la """
+    try:
+        while True:
+            try:
+                requisicao=await read_request(reader)
+            except ValueError as erro:
+                writer.write(response(400,_error_body(str(erro)),keep_alive=False))
+                break
+            except asyncio.IncompleteReadError:
+                break
+            if requisicao is None:
+                break
+            method,target,versao,cabecalhos=requisicao
+            conexao=cabecalhos.get('connection','').lower()
+            keep_alive=conexao=='keep-alive' if versao=='HTTP/1.0' else conexao!='close'
+            try:
+                status,corpo,extras=await dispatch(method,target,cabecalhos)
+            except ValueError as erro:
+                # Parâmetros inválidos (filtros, 'by')
+                status,corpo,extras=400,_error_body(str(erro)),{}
+            except Exception:
+                logger.exception('erro em %s %s',method,target)
+                status,corpo,extras=500,_error_body('erro interno'),{}
+            writer.write(response(status,corpo,extras,keep_alive,head=method=='HEAD'))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def serve(host=HOST,port=PORT,ready=None):
+    """ Esta função inicia o servidor e atende as conexões até ser cancelada.
+    Os dados são carregados antes de aceitar conexões.
+
+    Input: endereço; porta; evento (opcional) sinalizado quando o servidor está pronto
+    Output: None
+    """
+    loop=asyncio.get_running_loop()
+    await loop.run_in_executor(None,health_body)
+    servidor=await asyncio.start_server(handle,host,port,limit=MAX_LINE*2)
+    logger.info('servindo em http://%s:%s',host,port)
+    if ready is not None:
+        ready.set()
+    async with servidor:
+        await servidor.serve_forever()
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host',default=HOST)
+    parser.add_argument('--port',type=int,default=PORT)
+    parser.add_argument('--data',default=loader.DATA_PATH,help='CSV dos pedidos, ou diretório / padrão glob particionado (year=/month=/city=)')
+    parser.add_argument('--snapshot',default=loader.SNAPSHOT_PATH,help='snapshot colunar (utils/snapshot.py)')
+    parser.add_argument('--batches',default=loader.BATCHES_DIR,help='diretório dos lotes incrementais')
+    args=parser.parse_args()
+    logging.basicConfig(level=logging.INFO,format='%(asctime)s %(name)s %(message)s')
+    configure(args.data,args.snapshot,args.batches)
+    try:
+        asyncio.run(serve(args.host,args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,81 @@
+""" Benchmark da função clean_data: versão vetorizada (utils.cleaning) x versão anterior (laço por coluna).
+
+Uso:
+    python -m benchmarks.bench_clean_data
+    python -m benchmarks.bench_clean_data --rows 45000 1000000
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_raw
+from utils.cleaning import clean_data
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def clean_data_loop(df):
+    """ Versão anterior da função clean_data, mantida aqui apenas como referência para o benchmark.
+
+    Input: dataframe
+    Output: dataframe
+    """
+    cols=df.columns
+    for col in cols:
+        df=df.loc[df[col]!='NaN ']
+
+    df['ID']=df.loc[:,'ID'].str.strip()
+    df['Delivery_person_ID']=df.loc[:,'Delivery_person_ID'].str.strip()
+    df['Road_traffic_density']=df.loc[:,'Road_traffic_density'].str.strip()
+    df['Type_of_order']=df.loc[:,'Type_of_order'].str.strip()
+    df['Type_of_vehicle']=df.loc[:,'Type_of_vehicle'].str.strip()
+    df['Festival']=df.loc[:,'Festival'].str.strip()
+    df['City']=df.loc[:,'City'].str.strip()
+
+    df['Delivery_person_Age']=df['Delivery_person_Age'].astype(int)
+    df['Delivery_person_Ratings']=df['Delivery_person_Ratings'].astype(float)
+    df['Order_Date']=pd.to_datetime(df['Order_Date'],format='%d-%m-%Y')
+    df['multiple_deliveries']=df['multiple_deliveries'].astype(int)
+
+    df['Time_taken(min)']=df['Time_taken(min)'].apply(lambda x: x.split('(min) ')[1])
+    df['Time_taken(min)']=df['Time_taken(min)'].astype(int)
+
+    return df
+
+def best_of(func,df,repeat):
+    """ Esta função retorna o menor tempo de execução (em segundos) e o resultado da função.
+
+    Input: função; dataframe; número de repetições
+    Output: tupla (tempo, resultado)
+    """
+    melhor=None
+    for _ in range(repeat):
+        t0=time.perf_counter()
+        resultado=func(df)
+        tempo=time.perf_counter()-t0
+        melhor=tempo if melhor is None else min(melhor,tempo)
+    return melhor,resultado
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,nargs='+',default=[45_000,1_000_000,10_000_000])
+    parser.add_argument('--repeat',type=int,default=3)
+    args=parser.parse_args()
+
+    print(f"{'linhas':>12} {'anterior (s)':>14} {'vetorizada (s)':>16} {'speedup':>9}")
+    for n in args.rows:
+        df_raw=make_raw(n)
+        repeat=args.repeat if n<=1_000_000 else 1
+        t_loop,esperado=best_of(clean_data_loop,df_raw,repeat)
+        t_vec,obtido=best_of(clean_data,df_raw,repeat)
+        # A versão atual também reduz os tipos (category, int8/int16); os valores devem ser os mesmos
+        pd.testing.assert_frame_equal(obtido,esperado.astype(obtido.dtypes.to_dict()))
+        print(f'{n:>12,} {t_loop:>14.3f} {t_vec:>16.3f} {t_loop/t_vec:>8.1f}x')
+        del df_raw,esperado,obtido
+
+if __name__=='__main__':
+    main()
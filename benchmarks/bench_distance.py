@@ -0,0 +1,67 @@
+""" Benchmark e verificação do erro das distâncias vetorizadas (utils.geo) x geopy.distance.distance.
+
+Uso:
+    python -m benchmarks.bench_distance
+    python -m benchmarks.bench_distance --rows 45000 --sample 20000
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import time
+
+import numpy as np
+from geopy import Point
+from geopy.distance import distance
+
+from benchmarks.synthetic import make_raw
+from utils.cleaning import clean_data
+from utils.geo import DISTANCE_MODES, delivery_distance_km
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def distance_geopy(df):
+    """ Versão anterior do cálculo (uma chamada do geopy por linha), mantida como referência.
+
+    Input: dataframe
+    Output: array com as distâncias em km
+    """
+    return df.apply(lambda row: distance(Point(latitude=row['Restaurant_latitude'],longitude=row['Restaurant_longitude']),
+                                         Point(latitude=row['Delivery_location_latitude'],longitude=row['Delivery_location_longitude'])).km,
+                    axis=1).to_numpy()
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,default=45_000)
+    parser.add_argument('--sample',type=int,default=None,help='linhas usadas na comparação com o geopy (padrão: todas)')
+    args=parser.parse_args()
+
+    df=clean_data(make_raw(args.rows))
+    amostra=df if args.sample is None else df.sample(min(args.sample,len(df)),random_state=0)
+
+    t0=time.perf_counter()
+    esperado=distance_geopy(amostra)
+    t_geopy=time.perf_counter()-t0
+    print(f'{"geopy (por linha)":<20} {t_geopy:>9.3f} s  ({len(amostra):,} linhas)')
+
+    # Pares aleatórios em todo o globo, para medir o erro fora da faixa das entregas
+    rng=np.random.default_rng(0)
+    n=min(len(amostra),5_000)
+    lat1,lat2=rng.uniform(-89,89,(2,n))
+    lon1,lon2=rng.uniform(-180,180,(2,n))
+    globo=np.array([distance((a,b),(c,d)).km for a,b,c,d in zip(lat1,lon1,lat2,lon2)])
+
+    for mode,func in DISTANCE_MODES.items():
+        t0=time.perf_counter()
+        delivery_distance_km(df,mode=mode)
+        tempo=time.perf_counter()-t0
+        obtido=delivery_distance_km(amostra,mode=mode)
+        erro=np.abs(obtido-esperado)
+        erro_rel=erro/np.maximum(esperado,1e-9)
+        erro_globo=np.abs(func(lat1,lon1,lat2,lon2)-globo)/globo
+        print(f'{mode:<20} {tempo:>9.3f} s  ({len(df):,} linhas)  '
+              f'erro máx.: {erro.max()*1000:.4f} m, {erro_rel.max():.4%} (entregas); {erro_globo.max():.4%} (globo)')
+
+if __name__=='__main__':
+    main()
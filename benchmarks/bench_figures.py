@@ -0,0 +1,148 @@
+""" Benchmark das figuras de séries e agregações: plotly express (como as páginas montavam antes)
+contra a camada de utils/figures.py (reamostragem/LTTB acima do orçamento de pontos e valores compactos).
+
+Para cada figura mede o tempo de montagem, o tempo de serialização para JSON (o que o Streamlit faz
+em cada st.plotly_chart), o tamanho do JSON enviado ao navegador e o número de pontos, em um período
+curto (o do arquivo original) e em vários anos de histórico. O tempo de desenho no navegador cresce
+com o número de pontos e com o tamanho do JSON, que são as medidas comparadas aqui.
+Também confere que as figuras novas preservam o total de pedidos e os valores agregados.
+
+Uso:
+    python -m benchmarks.bench_figures
+    python -m benchmarks.bench_figures --rows 1000000 --years 1 5
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from benchmarks.bench_suite import prepare
+from benchmarks.pages import load_page
+from benchmarks.synthetic import make_raw
+from utils.cube import build_cube
+from utils.figures import payload_bytes
+from utils.parallel import group_stats
+
+
+# =====================================================
+# FUNÇÕES: figuras de referência (plotly express)
+# =====================================================
+
+def _week(df):
+    return df['Order_Date'].dt.strftime('%U').rename('week_of_year')
+
+def reference_figures(df):
+    """ Esta função monta as figuras como as páginas faziam com o plotly express.
+
+    Input: dataframe limpo
+    Output: dicionário nome -> função sem argumentos que retorna a figura
+    """
+    def order_day():
+        aux=df.loc[:,['ID','Order_Date']].groupby('Order_Date').count().reset_index()
+        return px.bar(aux,x='Order_Date',y='ID',title='Número de pedidos por dia')
+    def order_week():
+        aux=df['ID'].groupby(_week(df)).count().reset_index()
+        return px.bar(aux,x='week_of_year',y='ID',title='Número de pedidos por semana')
+    def order_traf_city():
+        aux=df.loc[:,['ID','Road_traffic_density','City']].groupby(['Road_traffic_density','City'],observed=True).count().sort_index().reset_index()
+        return px.scatter(aux,x='Road_traffic_density',y='City',color='ID',size='ID',title='Volume de pedidos por cidade e tráfego')
+    def time_city_traffic():
+        aux=group_stats(df,['City','Road_traffic_density'],'Time_taken(min)').loc[:,['mean']].reset_index()
+        aux.columns=['City','Road_traffic_density','mean_time']
+        return px.sunburst(aux,path=['City','Road_traffic_density'],values='mean_time',color='mean_time')
+    return {'order_day':order_day,'order_week':order_week,
+            'order_traf_city':order_traf_city,'time_city_traffic':time_city_traffic}
+
+def new_figures(df,cube,empresa,restaurantes):
+    """ Esta função monta as mesmas figuras com as funções atuais das páginas.
+
+    Input: dataframe limpo; cubo diário; módulos das páginas (benchmarks/pages.py)
+    Output: dicionário nome -> função sem argumentos que retorna a figura
+    """
+    return {'order_day':lambda: empresa.order_day(df,cube),
+            'order_week':lambda: empresa.order_week(df,cube),
+            'order_traf_city':lambda: empresa.order_traf_city(df,cube),
+            'time_city_traffic':lambda: restaurantes.time_city_traffic(df)}
+
+
+# =====================================================
+# FUNÇÕES: medidas
+# =====================================================
+
+def measure(build,repeat):
+    """ Esta função mede a montagem e a serialização de uma figura.
+
+    Input: função que monta a figura; repetições (vale o menor tempo)
+    Output: dicionário com 'build_ms', 'json_ms', 'kb', 'points' e a figura
+    """
+    montagem,serializacao=[],[]
+    for _ in range(repeat):
+        t0=time.perf_counter()
+        fig=build()
+        t1=time.perf_counter()
+        fig.to_json()
+        t2=time.perf_counter()
+        montagem.append(t1-t0)
+        serializacao.append(t2-t1)
+    pontos=sum(len(t.ids if t.type=='sunburst' else t.x) for t in fig.data)
+    return {'build_ms':min(montagem)*1000,'json_ms':min(serializacao)*1000,
+            'kb':payload_bytes(fig)/1024,'points':pontos,'fig':fig}
+
+def check(nome,antes,depois):
+    """ Esta função confere que a figura nova representa os mesmos dados da figura de referência.
+
+    Input: nome da figura; figuras de referência e nova
+    Output: lista de falhas
+    """
+    falhas=[]
+    if nome in ('order_day','order_week'):
+        total_antes=sum(np.sum(t.y) for t in antes.data)
+        total_depois=sum(np.sum(t.y) for t in depois.data)
+        if total_antes!=total_depois:
+            falhas.append(f'{nome}: total {total_depois} != {total_antes}')
+    if nome=='order_week' or (nome=='order_day' and len(antes.data[0].x)==len(depois.data[0].x)):
+        if not np.array_equal(np.asarray(antes.data[0].y),np.asarray(depois.data[0].y)):
+            falhas.append(f'{nome}: valores diferentes')
+    if nome=='order_traf_city':
+        if sorted(zip(antes.data[0].x,antes.data[0].y,antes.data[0].marker.size))!=sorted(zip(depois.data[0].x,depois.data[0].y,depois.data[0].marker.size)):
+            falhas.append(f'{nome}: bolhas diferentes')
+    if nome=='time_city_traffic':
+        ref=dict(zip(antes.data[0].ids,np.round(antes.data[0].values,3)))
+        novo=dict(zip(depois.data[0].ids,np.round(depois.data[0].values,3)))
+        if ref!=novo:
+            falhas.append(f'{nome}: valores do sunburst diferentes')
+    return falhas
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,default=200_000)
+    parser.add_argument('--years',type=float,nargs='+',default=[0,3],help='anos de histórico (0 = período do arquivo original)')
+    parser.add_argument('--repeat',type=int,default=3)
+    args=parser.parse_args()
+
+    empresa=load_page('1_visao_empresa.py')
+    restaurantes=load_page('3_visao_restaurantes.py')
+    falhas=[]
+    for anos in args.years:
+        fim='2022-04-06' if anos==0 else str((pd.Timestamp('2022-02-11')+pd.DateOffset(days=int(anos*365))).date())
+        df=prepare(make_raw(args.rows,end=fim))
+        cube=build_cube(df)
+        print(f"\n{args.rows:,} linhas, {df['Order_Date'].nunique():,} dias (2022-02-11 a {fim})")
+        print(f"{'figura':>18} {'':>7} {'montagem (ms)':>14} {'json (ms)':>10} {'JSON (KB)':>10} {'pontos':>7}")
+        referencia=reference_figures(df)
+        novas=new_figures(df,cube,empresa,restaurantes)
+        for nome in referencia:
+            antes=measure(referencia[nome],args.repeat)
+            depois=measure(novas[nome],args.repeat)
+            for rotulo,m in (('antes',antes),('depois',depois)):
+                print(f"{nome if rotulo=='antes' else '':>18} {rotulo:>7} {m['build_ms']:>14.1f} {m['json_ms']:>10.1f} {m['kb']:>10.1f} {m['points']:>7}")
+            falhas+=check(nome,antes['fig'],depois['fig'])
+    if falhas:
+        raise SystemExit('\n'.join(falhas))
+    print('\nFiguras conferidas: mesmos dados (ou mesmos totais, quando reamostradas)')
+
+if __name__=='__main__':
+    main()
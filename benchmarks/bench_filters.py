@@ -0,0 +1,73 @@
+""" Benchmark dos filtros da barra lateral: máscara booleana + cópia (versão anterior) x
+busca binária na data + bitmaps de tráfego (utils.filters).
+
+Uso:
+    python -m benchmarks.bench_filters
+    python -m benchmarks.bench_filters --rows 45000 1000000
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_raw
+from utils.cleaning import clean_data
+from utils.filters import build_filter_index, filter_orders, sort_by_date
+
+
+# Combinações (data limite, tráfegos selecionados) usadas no benchmark
+SCENARIOS=[(pd.Timestamp(2022,4,10),['Jam','Medium','High','Low']),
+           (pd.Timestamp(2022,3,15),['Jam','Medium','High','Low']),
+           (pd.Timestamp(2022,3,15),['Jam','High']),
+           (pd.Timestamp(2022,2,20),['Low'])]
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def filter_mask(df,data_limite,categorias):
+    """ Versão anterior dos filtros das páginas, mantida como referência.
+
+    Input: dataframe; data limite; tráfegos selecionados
+    Output: dataframe filtrado
+    """
+    linhas_selecionadas=df['Order_Date']<=data_limite
+    df=df.loc[linhas_selecionadas,:]
+    linhas_selecionadas=df['Road_traffic_density'].isin(categorias)
+    df=df.loc[linhas_selecionadas,:]
+    return df
+
+def mean_time(func,repeat):
+    """ Esta função retorna o tempo médio (em ms) de uma chamada da função.
+
+    Input: função sem argumentos; número de repetições
+    Output: tempo em ms
+    """
+    t0=time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter()-t0)/repeat*1000
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,nargs='+',default=[45_000,1_000_000,10_000_000])
+    parser.add_argument('--repeat',type=int,default=20)
+    args=parser.parse_args()
+
+    print(f"{'linhas':>12} {'data limite':>12} {'tráfego':>24} {'anterior (ms)':>14} {'índice (ms)':>12} {'speedup':>9}")
+    for n in args.rows:
+        df=sort_by_date(clean_data(make_raw(n)))
+        t0=time.perf_counter()
+        index=build_filter_index(df)
+        print(f'{n:>12,} índice construído em {(time.perf_counter()-t0)*1000:.1f} ms')
+        for data_limite,categorias in SCENARIOS:
+            pd.testing.assert_frame_equal(filter_orders(df,index,data_limite,categorias),filter_mask(df,data_limite,categorias))
+            t_mask=mean_time(lambda: filter_mask(df,data_limite,categorias),args.repeat)
+            t_index=mean_time(lambda: filter_orders(df,index,data_limite,categorias),args.repeat)
+            print(f"{n:>12,} {data_limite:%d-%m-%Y} {','.join(categorias):>24} {t_mask:>14.2f} {t_index:>12.2f} {t_mask/t_index:>8.1f}x")
+        del df,index
+
+if __name__=='__main__':
+    main()
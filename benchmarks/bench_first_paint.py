@@ -0,0 +1,125 @@
+""" Benchmark da abertura das páginas: tempo de importação, tempo até a primeira pintura e tempo até os dados
+(a carga do CSV contra o snapshot está em benchmarks/bench_startup.py).
+
+Cada página é medida em um interpretador novo (como o primeiro acesso depois de iniciar o servidor):
+    - importação: os imports da página (menos o Streamlit, que o servidor já carregou), e quais
+      bibliotecas pesadas ficaram carregadas depois deles
+    - primeira pintura: tempo até o primeiro elemento da página ser enviado ao navegador, ou seja, os
+      imports mais tudo o que a página executa antes do primeiro comando do Streamlit (barra lateral,
+      título); quando a carga dos dados vem antes da barra lateral, ela entra nesse tempo
+    - dados prontos: imports + carga dos dados e das estruturas derivadas da página, a partir de um CSV
+      sintético (benchmarks/synthetic.py)
+
+Com --root é possível medir outra cópia do repositório (por exemplo, um git worktree de um commit
+anterior) e comparar os números.
+
+Uso:
+    python -m benchmarks.bench_first_paint
+    python -m benchmarks.bench_first_paint --rows 200000 --repeat 5
+    python -m benchmarks.bench_first_paint --root /tmp/versao-anterior
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from benchmarks.synthetic import write_csv
+
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES=['1_visao_empresa.py','2_visao_entregadores.py','3_visao_restaurantes.py']
+
+# Bibliotecas cuja importação custa dezenas ou centenas de ms
+HEAVY_MODULES=['pandas','plotly.express','folium','streamlit_folium','pyarrow','geopy','regex','branca']
+
+# Script executado no interpretador novo: argv = raiz do repositório, caminho da página
+_PROBE='''
+import ast,json,sys,time
+t_inicio=time.perf_counter()
+raiz,caminho=sys.argv[1],sys.argv[2]
+sys.path.insert(0,raiz)
+arvore=ast.parse(open(caminho,encoding='utf-8').read())
+
+def streamlit(node):
+    if isinstance(node,ast.ImportFrom):
+        return (node.module or '').startswith('streamlit')
+    return any(a.name.startswith('streamlit') for a in node.names)
+
+def usa_st(node):
+    return any(isinstance(n,ast.Name) and n.id=='st' for n in ast.walk(node))
+
+def secao_carga(node):
+    if not isinstance(node,ast.With):
+        return False
+    chamada=node.items[0].context_expr
+    return (isinstance(chamada,ast.Call) and getattr(chamada.func,'attr','')=='section'
+            and chamada.args and getattr(chamada.args[0],'value',None)=='load_data')
+
+imports=[n for n in arvore.body if isinstance(n,(ast.Import,ast.ImportFrom)) and not streamlit(n)]
+ns={'__name__':'pagina'}
+t0=time.perf_counter()
+exec(compile(ast.Module(body=imports,type_ignores=[]),caminho,'exec'),ns)
+importacao=time.perf_counter()-t0
+pesados=[m for m in json.loads(sys.argv[3]) if m in sys.modules]
+
+# Carga: as atribuições do bloco "with profiling.section('load_data','load')" (load_data e load_derived)
+posicao_carga=next(i for i,n in enumerate(arvore.body) if secao_carga(n))
+carga=[n for n in arvore.body[posicao_carga].body if isinstance(n,ast.Assign)]
+t0=time.perf_counter()
+exec(compile(ast.Module(body=carga,type_ignores=[]),caminho,'exec'),ns)
+dados=time.perf_counter()-t0
+
+# Primeiro comando do Streamlit depois dos imports (fora st.set_page_config e do início da medição)
+primeiro=next(i for i,n in enumerate(arvore.body)
+              if not isinstance(n,(ast.Import,ast.ImportFrom,ast.FunctionDef)) and usa_st(n)
+              and 'set_page_config' not in ast.dump(n) and 'diagnostics_enabled' not in ast.dump(n)
+              and 'start_run' not in ast.dump(n))
+pintura=importacao+(dados if posicao_carga<primeiro else 0.0)
+print(json.dumps({'import_ms':importacao*1000,'first_paint_ms':pintura*1000,'data_ms':(importacao+dados)*1000,
+                  'heavy':pesados,'load_before_paint':posicao_carga<primeiro}))
+'''
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def probe(root,page,workdir):
+    """ Esta função mede uma página em um interpretador novo.
+
+    Input: raiz do repositório; nome do arquivo da página; diretório com dataset/train.csv
+    Output: dicionário com 'import_ms', 'first_paint_ms', 'data_ms', 'heavy' e 'load_before_paint'
+    """
+    caminho=os.path.join(root,'pages',page)
+    saida=subprocess.run([sys.executable,'-c',_PROBE,root,caminho,json.dumps(HEAVY_MODULES)],
+                         cwd=workdir,capture_output=True,text=True)
+    if saida.returncode!=0:
+        raise SystemExit(f'{page}: falha na medição\n{saida.stderr}')
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--root',default=ROOT,help='raiz do repositório medido')
+    parser.add_argument('--rows',type=int,default=45_593)
+    parser.add_argument('--repeat',type=int,default=3,help='medições por página (vale a mediana)')
+    args=parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir,'dataset'))
+        write_csv(os.path.join(workdir,'dataset','train.csv'),args.rows)
+        print(f'{args.root} - {args.rows:,} linhas, mediana de {args.repeat} interpretadores novos por página')
+        print(f"{'página':>26} {'importação (ms)':>16} {'1ª pintura (ms)':>16} {'dados (ms)':>11}  bibliotecas pesadas")
+        for page in PAGES:
+            medidas=[probe(args.root,page,workdir) for _ in range(args.repeat)]
+            mediana={k:float(np.median([m[k] for m in medidas])) for k in ('import_ms','first_paint_ms','data_ms')}
+            print(f"{page:>26} {mediana['import_ms']:>16.0f} {mediana['first_paint_ms']:>16.0f} {mediana['data_ms']:>11.0f}  "
+                  f"{', '.join(medidas[-1]['heavy'])}")
+
+if __name__=='__main__':
+    main()
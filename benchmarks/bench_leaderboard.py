@@ -0,0 +1,106 @@
+""" Benchmark do ranking dos entregadores: tabela completa recalculada a cada execução da página (versão anterior,
+groupby sobre todos os pedidos e todas as linhas enviadas ao st.dataframe) x rollup por entregador mantido
+na carga (utils/leaderboard.py), com a atualização por lote e as consultas paginadas.
+
+O número de entregadores cresce com as linhas (um entregador a cada 30 pedidos, ver benchmarks/synthetic.py):
+3 milhões de linhas têm cerca de 100 mil entregadores. As páginas do rollup são conferidas com uma
+ordenação completa do resumo e o rollup atualizado com um lote é conferido com o rollup montado do zero.
+
+Uso:
+    python -m benchmarks.bench_leaderboard
+    python -m benchmarks.bench_leaderboard --rows 45000 3000000 --batch 10000
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_raw
+from utils.cleaning import clean_data, concat_cleaned
+from utils.leaderboard import build_courier_rollup, courier_summary, leaderboard_page, search_couriers, update_courier_rollup
+from utils.parallel import group_stats
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def full_table(df):
+    """ Versão anterior da tabela 'Avaliação média por entregador', mantida como referência.
+
+    Input: dataframe
+    Output: dataframe com uma linha por entregador
+    """
+    avaliacao_media=(group_stats(df,'Delivery_person_ID','Delivery_person_Ratings')
+                     .loc[:,['mean']]
+                     .reset_index())
+    avaliacao_media.columns=['ID do entregador','Avaliação média do entregador']
+    return avaliacao_media
+
+def best_of(func,repeat):
+    """ Esta função retorna o menor tempo (em ms) entre as repetições e o último resultado.
+
+    Input: função sem argumentos; número de repetições
+    Output: tupla (tempo em ms, resultado)
+    """
+    tempos=[]
+    for _ in range(repeat):
+        t0=time.perf_counter()
+        resultado=func()
+        tempos.append(time.perf_counter()-t0)
+    return min(tempos)*1000,resultado
+
+def check_page(resumo,pagina,busca,coluna,decrescente,page,page_size):
+    """ Esta função confere uma página com a ordenação completa (estável) do resumo filtrado pela busca """
+    posicoes=search_couriers(resumo,busca)
+    valores=resumo[coluna].to_numpy(dtype='float64')[posicoes]
+    valores=np.where(np.isnan(valores),np.inf,-valores if decrescente else valores)
+    esperado=resumo['courier'].to_numpy()[posicoes[np.argsort(valores,kind='stable')]][(page-1)*page_size:page*page_size]
+    return np.array_equal(esperado,pagina['rows']['courier'].to_numpy())
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,nargs='+',default=[45_000,1_000_000,3_000_000])
+    parser.add_argument('--batch',type=int,default=10_000,help='linhas do lote da atualização incremental')
+    parser.add_argument('--page-size',type=int,default=50)
+    parser.add_argument('--repeat',type=int,default=3)
+    args=parser.parse_args()
+
+    falhas=0
+    for n in args.rows:
+        df=clean_data(make_raw(n))
+        lote=clean_data(make_raw(args.batch,seed=1))
+        print(f'\n{n:,} linhas ({len(df):,} após a limpeza)')
+
+        t_tabela,tabela=best_of(lambda: full_table(df),args.repeat)
+        t_build,rollup=best_of(lambda: build_courier_rollup(df),args.repeat)
+        t_update,atualizado=best_of(lambda: update_courier_rollup(rollup,lote),args.repeat)
+        t_resumo,resumo=best_of(lambda: courier_summary(rollup),args.repeat)
+        print(f'{len(rollup["couriers"]):,} entregadores')
+        print(f"{'etapa':>42} {'tempo (ms)':>11} {'linhas enviadas':>16}")
+        print(f"{'anterior: tabela completa (cada execução)':>42} {t_tabela:>11.1f} {len(tabela):>16,}")
+        print(f"{'rollup: montagem (uma vez na carga)':>42} {t_build:>11.1f} {'':>16}")
+        print(f"{f'rollup: atualização com {args.batch:,} linhas':>42} {t_update:>11.1f} {'':>16}")
+        print(f"{'rollup: resumo (uma vez por filtro)':>42} {t_resumo:>11.1f} {'':>16}")
+
+        completo=build_courier_rollup(concat_cleaned([df,lote]))
+        if not all(np.array_equal(completo[k],atualizado[k]) for k in ['orders','hist','vehicle_counts','city_counts']):
+            print('  ERRO: rollup atualizado diferente do rollup montado do zero')
+            falhas+=1
+
+        consultas=[('primeira página, mais pedidos','','orders',True,1),
+                   ('página 100, maior p90','','time_p90',True,100),
+                   ('última página, menor avaliação','','rating_mean',False,10**9),
+                   ("busca 'del02', menor tempo médio",'del02','time_mean',False,2)]
+        for nome,busca,coluna,decrescente,page in consultas:
+            t_pagina,pagina=best_of(lambda: leaderboard_page(rollup,resumo,busca,coluna,decrescente,page,args.page_size),args.repeat)
+            print(f"{'página: '+nome:>42} {t_pagina:>11.1f} {len(pagina['rows']):>16,}")
+            if not check_page(resumo,pagina,busca,coluna,decrescente,pagina['page'],args.page_size):
+                print(f'  ERRO: página diferente da ordenação completa ({nome})')
+                falhas+=1
+    if falhas:
+        raise SystemExit(f'{falhas} verificações falharam')
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,50 @@
+""" Relatório de memória do dataframe limpo: tipos anteriores (object/int64) x tipos atuais (category, int8/int16).
+
+Uso:
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --rows 1000000
+"""
+# Importando as bibliotecas necessárias
+import argparse
+
+import pandas as pd
+
+from benchmarks.bench_clean_data import clean_data_loop
+from benchmarks.synthetic import make_raw
+from utils.cleaning import clean_data
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def memory_report(before,after):
+    """ Esta função compara o uso de memória, coluna a coluna, de dois dataframes com as mesmas colunas.
+
+    Input: dataframe anterior; dataframe atual
+    Output: dataframe com o tipo e os MB de cada coluna nos dois dataframes
+    """
+    mb=2**20
+    report=pd.DataFrame({'tipo anterior':before.dtypes.astype(str),
+                         'MB anterior':before.memory_usage(deep=True,index=False)/mb,
+                         'tipo atual':after.dtypes.astype(str),
+                         'MB atual':after.memory_usage(deep=True,index=False)/mb})
+    report.loc['TOTAL',['MB anterior','MB atual']]=report[['MB anterior','MB atual']].sum()
+    report['redução']=1-report['MB atual']/report['MB anterior']
+    return report
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,default=1_000_000)
+    args=parser.parse_args()
+
+    df_raw=make_raw(args.rows)
+    report=memory_report(clean_data_loop(df_raw),clean_data(df_raw))
+    with pd.option_context('display.width',160,'display.max_columns',None,'display.float_format','{:,.2f}'.format):
+        print(report)
+    total=report.loc['TOTAL']
+    print(f"\n{args.rows:,} linhas: {total['MB anterior']:,.1f} MB -> {total['MB atual']:,.1f} MB "
+          f"({total['MB anterior']*2**20/args.rows:.0f} -> {total['MB atual']*2**20/args.rows:.0f} bytes por linha)")
+
+if __name__=='__main__':
+    main()
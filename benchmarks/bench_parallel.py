@@ -0,0 +1,138 @@
+""" Benchmark de escalabilidade do backend paralelo (utils.parallel): pandas groupby (versão anterior)
+x agregação das partições em 1 a N processos, com as colunas do dataframe registrado por share_frame
+copiadas uma vez para a memória compartilhada (a primeira chamada de cada coluna fica fora da medição).
+
+Antes da medição, os resultados são conferidos com o pandas em um dataframe com chaves nulas (descartadas,
+como em groupby com dropna=True), no próprio processo e no pool. Com mais de um processo, cada agregação
+(inclusive a semana do ano, uma chave calculada registrada em utils/metrics.py) precisa passar pelo pool.
+
+Escalabilidade de 1 a N núcleos: ainda não medida. Até agora o benchmark só rodou em uma máquina com 1 CPU,
+onde o pool só acrescenta custo (1M linhas: rating_by 14 ms em 1 processo x 27 ms em 2); nenhum ganho com
+mais processos foi demonstrado. A tabela de 1 a N precisa ser gerada em uma máquina com vários núcleos.
+
+Uso:
+    python -m benchmarks.bench_parallel
+    python -m benchmarks.bench_parallel --rows 1000000 10000000 --workers 1 2 4 8
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_raw
+from utils import parallel
+from utils.cleaning import clean_data
+from utils.metrics import week_of_year
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def pandas_tasks(df,semana):
+    """ Versão anterior das agregações das páginas (pandas groupby em um único processo), mantida como referência.
+
+    Input: dataframe; semana do ano de cada pedido
+    Output: dicionário agregação -> função sem argumentos
+    """
+    return {'rating_by':lambda: df.groupby('Road_traffic_density',observed=True)['Delivery_person_Ratings'].agg(['mean','std']),
+            'time_city_traffic':lambda: df.groupby(['City','Road_traffic_density'],observed=True)['Time_taken(min)'].agg(['mean','std']),
+            'avaliacao_media':lambda: df.groupby('Delivery_person_ID',observed=True)['Delivery_person_Ratings'].mean(),
+            'order_deliver_week':lambda: (df['ID'].groupby(semana).count(),df['Delivery_person_ID'].groupby(semana).nunique())}
+
+def parallel_tasks(df,workers):
+    """ As mesmas agregações pelo backend paralelo (a semana do ano pelo nome da chave registrada).
+
+    Input: dataframe; número de processos
+    Output: dicionário agregação -> função sem argumentos
+    """
+    return {'rating_by':lambda: parallel.group_stats(df,'Road_traffic_density','Delivery_person_Ratings',workers),
+            'time_city_traffic':lambda: parallel.group_stats(df,['City','Road_traffic_density'],'Time_taken(min)',workers),
+            'avaliacao_media':lambda: parallel.group_stats(df,'Delivery_person_ID','Delivery_person_Ratings',workers),
+            'order_deliver_week':lambda: (parallel.group_count(df,'week_of_year',workers),
+                                          parallel.group_nunique(df,'week_of_year','Delivery_person_ID',workers))}
+
+def null_keys_ok(df,workers):
+    """ Esta função confere group_stats e group_nunique com o pandas em uma cópia do dataframe com chaves
+    nulas (cidade, tráfego e tipo de pedido): registrado por share_frame (no próprio processo e no pool),
+    em uma cópia não registrada e em uma view com passo (df.iloc[::2], que não é um prefixo da base).
+
+    Input: dataframe; número de processos do pool
+    Output: True se todos os resultados são iguais
+    """
+    df=df.copy()
+    rng=np.random.default_rng(0)
+    for col in ['City','Road_traffic_density','Type_of_order']:
+        df.loc[rng.random(len(df))<0.05,col]=np.nan
+    parallel.share_frame(df)
+    ok=True
+    for by in ['City',['City','Road_traffic_density'],['Type_of_order','City'],'week_of_year']:
+        for w,dados in [(1,df),(workers,df),(workers,df.copy()),(workers,df.iloc[::2])]:
+            chave=week_of_year(dados) if by=='week_of_year' else by
+            esperado=dados.groupby(chave,observed=True)['Time_taken(min)'].agg(['count','mean','std']).sort_index()
+            distintos=dados.groupby(chave,observed=True)['Delivery_person_ID'].nunique().sort_index()
+            stats=parallel.group_stats(dados,by,'Time_taken(min)',w)
+            nunique=parallel.group_nunique(dados,by,'Delivery_person_ID',w)
+            ok=ok and (stats.index.equals(esperado.index) and nunique.index.equals(distintos.index)
+                       and np.array_equal(stats['count'].to_numpy(),esperado['count'].to_numpy())
+                       and np.allclose(stats[['mean','std']].to_numpy(),esperado[['mean','std']].to_numpy(),equal_nan=True)
+                       and np.array_equal(nunique.to_numpy(),distintos.to_numpy()))
+    return ok
+
+def best_of(func,repeat):
+    """ Esta função retorna o menor tempo (em ms) entre as repetições.
+
+    Input: função sem argumentos; número de repetições
+    Output: tempo em ms
+    """
+    tempos=[]
+    for _ in range(repeat):
+        t0=time.perf_counter()
+        func()
+        tempos.append(time.perf_counter()-t0)
+    return min(tempos)*1000
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,nargs='+',default=[1_000_000,10_000_000])
+    parser.add_argument('--workers',type=int,nargs='+',default=sorted({1,2,4,os.cpu_count() or 1}))
+    parser.add_argument('--repeat',type=int,default=3)
+    args=parser.parse_args()
+
+    print(f'CPUs disponíveis: {os.cpu_count()}')
+    parallel.configure(min_rows=0)
+    if not null_keys_ok(clean_data(make_raw(20_000)),max(max(args.workers),2)):
+        raise SystemExit('ERRO: agregações com chaves nulas diferentes do pandas')
+    print('chaves nulas e semana do ano: resultados iguais ao pandas (1 processo e pool)')
+    for n in args.rows:
+        df=clean_data(make_raw(n))
+        parallel.share_frame(df)
+        semana=df['Order_Date'].dt.strftime('%U').rename('week_of_year')
+        base=pandas_tasks(df,semana)
+        tempos={nome:{'pandas':best_of(func,args.repeat)} for nome,func in base.items()}
+        for w in args.workers:
+            tarefas=parallel_tasks(df,w)
+            for nome,func in tarefas.items():  # inicia o pool e copia as colunas antes de medir
+                antes=parallel.backend_info()['pool_calls']
+                func()
+                if w>1 and parallel.backend_info()['pool_calls']==antes:
+                    raise SystemExit(f'ERRO: {nome} com {w} processos não passou pelo pool')
+            for nome,func in tarefas.items():
+                tempos[nome][w]=best_of(func,args.repeat)
+
+        print(f'\n{n:,} linhas (ms; speedup em relação a 1 processo entre parênteses)')
+        print(f"{'agregação':>20} {'pandas':>9}"+''.join(f'{str(w)+" proc.":>18}' for w in args.workers))
+        for nome,t in tempos.items():
+            linha=f"{nome:>20} {t['pandas']:>9.1f}"
+            for w in args.workers:
+                linha+=f'{t[w]:>10.1f} ({t[args.workers[0]]/t[w]:>4.1f}x)'
+            print(linha)
+        del df,semana
+    parallel.release_shared()
+    parallel.shutdown()
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,113 @@
+""" Benchmark da leitura de um conjunto particionado (utils/partitions.py) x leitura de um único CSV com as mesmas linhas.
+
+Os mesmos dados sintéticos são gravados como um único CSV (benchmarks/synthetic.write_csv) e como um diretório
+particionado com um CSV por dia e cidade (year=/month=/city=, benchmarks/synthetic.write_partitioned).
+São medidos a leitura completa (com um processo e com o pool de processos) e as leituras com poda das partições
+por data limite e por cidade, que só abrem os arquivos necessários. O resultado da leitura completa é conferido
+com o do CSV único e o das leituras com poda com o CSV único filtrado.
+
+Uso:
+    python -m benchmarks.bench_partitions
+    python -m benchmarks.bench_partitions --rows 100000 1000000 --workers 4
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import write_csv, write_partitioned
+from utils import parallel
+from utils.filters import sort_by_date
+from utils.loader import read_csv_dataset
+from utils.partitions import discover_partitions, prune_partitions, read_partitioned
+
+
+# Filtros das leituras com poda
+DATE_CUTOFF='2022-02-28'
+CITIES=['Urban']
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def best_of(func,repeat):
+    """ Esta função retorna o menor tempo (em s) entre as repetições e o último resultado.
+
+    Input: função sem argumentos; número de repetições
+    Output: tupla (tempo em s, resultado)
+    """
+    tempos=[]
+    for _ in range(repeat):
+        t0=time.perf_counter()
+        resultado=func()
+        tempos.append(time.perf_counter()-t0)
+    return min(tempos),resultado
+
+def same_rows(a,b):
+    """ Esta função indica se dois dataframes limpos têm as mesmas linhas (a ordem dentro de cada dia pode mudar) """
+    ordenar=lambda df: df.sort_values('ID').reset_index(drop=True)
+    try:
+        pd.testing.assert_frame_equal(ordenar(a),ordenar(b),check_categorical=False)
+        return True
+    except AssertionError:
+        return False
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,nargs='+',default=[100_000,1_000_000])
+    parser.add_argument('--workers',type=int,default=os.cpu_count() or 1)
+    parser.add_argument('--repeat',type=int,default=3)
+    args=parser.parse_args()
+
+    falhas=0
+    print(f'{os.cpu_count()} CPUs; pool com {args.workers} processos')
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.rows:
+            csv=os.path.join(tmp,f'train_{n}.csv')
+            pasta=os.path.join(tmp,f'orders_{n}')
+            write_csv(csv,n)
+            n_arquivos=write_partitioned(pasta,n)
+            partes=discover_partitions(pasta)
+            mb_total=sum(p['size'] for p in partes)/2**20
+
+            def csv_unico():
+                df,_=read_csv_dataset(csv)
+                return sort_by_date(df)
+
+            t_csv,df_csv=best_of(csv_unico,args.repeat)
+            leituras=[('partições, 1 processo',None,None,1),
+                      (f'partições, {args.workers} processos',None,None,args.workers),
+                      (f'poda: até {DATE_CUTOFF}',DATE_CUTOFF,None,args.workers),
+                      (f'poda: cidade {CITIES[0]}',None,CITIES,args.workers),
+                      ('poda: data e cidade',DATE_CUTOFF,CITIES,args.workers)]
+
+            print(f'\n{n:,} linhas: 1 CSV de {os.path.getsize(csv)/2**20:.1f} MB x {n_arquivos} arquivos ({mb_total:.1f} MB)')
+            print(f"{'leitura':>28} {'arquivos':>9} {'tempo (s)':>10} {'MB/s':>8} {'linhas/s':>11} {'speedup':>8}")
+            print(f"{'CSV único':>28} {1:>9} {t_csv:>10.3f} {os.path.getsize(csv)/2**20/t_csv:>8.1f} "
+                  f"{len(df_csv)/t_csv:>11,.0f} {1:>7.2f}x")
+            for nome,data,cidades,workers in leituras:
+                if workers>1:
+                    # O pool é criado antes da medição (custo único do processo)
+                    parallel.map_tasks(abs,[(1,),(2,)],workers)
+                t,(df,info)=best_of(lambda: read_partitioned(pasta,data,cidades,workers),args.repeat)
+                mb=sum(p['size'] for p in prune_partitions(partes,data,cidades))/2**20
+                print(f"{nome:>28} {info['files_read']:>9} {t:>10.3f} {mb/t:>8.1f} {len(df)/t:>11,.0f} {t_csv/t:>7.2f}x")
+
+                esperado=df_csv
+                if data is not None:
+                    esperado=esperado[esperado['Order_Date']<=pd.Timestamp(data)]
+                if cidades is not None:
+                    esperado=esperado[esperado['City'].isin(cidades)]
+                if not same_rows(df,esperado):
+                    print(f'  ERRO: linhas diferentes do CSV único ({nome})')
+                    falhas+=1
+    parallel.shutdown()
+    if falhas:
+        raise SystemExit(f'{falhas} verificações falharam')
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,91 @@
+""" Benchmark do motor de percentis e SLA (utils.percentiles) contra o pandas groupby (versão anterior).
+Para cada combinação de dimensões, compara os quantis e o percentual acima do limite de SLA com o
+cálculo sobre as linhas (os resultados devem ser iguais) e mede o tempo dos dois caminhos.
+
+Uso:
+    python -m benchmarks.bench_percentiles
+    python -m benchmarks.bench_percentiles --rows 1000000 10000000
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_raw
+from utils.cleaning import clean_data
+from utils.percentiles import SLA_MINUTES, SLA_QUANTILES, build_time_histograms, filter_histograms, sla_breakdown
+
+
+# Combinações de dimensões consultadas
+GROUPINGS=[[],
+           ['City'],
+           ['City','Road_traffic_density'],
+           ['City','Type_of_order'],
+           ['Festival','City','Road_traffic_density','Type_of_vehicle']]
+
+# Filtro da barra lateral usado nas consultas: (data limite, tráfegos selecionados)
+SCENARIO=(pd.Timestamp(2022,3,15),['Jam','High','Medium'])
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def pandas_breakdown(df,by,limite=SLA_MINUTES,qs=SLA_QUANTILES):
+    """ Versão sobre as linhas (pandas groupby), mantida como referência.
+
+    Input: dataframe filtrado; lista de dimensões; limite em minutos; lista de quantis
+    Output: dataframe com as colunas 'orders', 'p50', 'p90'... e 'pct_over'
+    """
+    tempo=df['Time_taken(min)']
+    if not by:
+        quadro=pd.DataFrame([[len(tempo)]+list(tempo.quantile(qs))+[100*(tempo>limite).mean()]])
+    else:
+        grupos=tempo.groupby([df[b] for b in by],observed=True)
+        quadro=pd.concat([grupos.count(),grupos.quantile(qs).unstack(),100*(tempo>limite).groupby([df[b] for b in by],observed=True).mean()],axis=1)
+        quadro=quadro.sort_index()
+    quadro.columns=['orders']+[f'p{q*100:g}' for q in qs]+['pct_over']
+    return quadro
+
+def best_of(func,repeat):
+    """ Esta função executa a função várias vezes e retorna o resultado e o menor tempo (em ms) """
+    tempos=[]
+    for _ in range(repeat):
+        t0=time.perf_counter()
+        resultado=func()
+        tempos.append(time.perf_counter()-t0)
+    return resultado,min(tempos)*1000
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,nargs='+',default=[45_000,1_000_000])
+    parser.add_argument('--repeat',type=int,default=3)
+    args=parser.parse_args()
+
+    data_limite,categorias=SCENARIO
+    falhas=0
+    for n in args.rows:
+        df=clean_data(make_raw(n))
+        t0=time.perf_counter()
+        histograms=build_time_histograms(df)
+        t_build=time.perf_counter()-t0
+        print(f"\n{n:,} linhas: {len(histograms['cells']):,} células x {histograms['counts'].shape[1]} minutos, "
+              f"montagem {t_build*1000:.0f} ms ({histograms['counts'].nbytes/2**20:.1f} MB)")
+        print(f"{'dimensões':>52} {'pandas (ms)':>12} {'histogramas (ms)':>17} {'iguais':>7}")
+        for by in GROUPINGS:
+            esperado,t_pandas=best_of(lambda: pandas_breakdown(df.loc[(df['Order_Date']<=data_limite)
+                                                                      &df['Road_traffic_density'].isin(categorias)],by),args.repeat)
+            obtido,t_hist=best_of(lambda: sla_breakdown(filter_histograms(histograms,data_limite,categorias),by),args.repeat)
+            iguais=(esperado.shape==obtido.shape
+                    and np.allclose(esperado.to_numpy(dtype='float64'),obtido.to_numpy(dtype='float64'),rtol=1e-12,atol=1e-9,equal_nan=True)
+                    and (not by or esperado.index.equals(obtido.index)))
+            falhas+=not iguais
+            print(f"{','.join(by) or 'total':>52} {t_pandas:>12.1f} {t_hist:>17.1f} {'sim' if iguais else 'NÃO':>7}")
+        del df
+    if falhas:
+        raise SystemExit(f'{falhas} consultas com resultados diferentes')
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,173 @@
+""" Validação dos limites de erro e benchmark dos sketches (utils.sketches) contra o cálculo exato.
+- HyperLogLog: entregadores únicos (total, por semana e por cidade), com e sem os filtros da barra lateral
+- KLL: erro de posição (rank) dos quantis do tempo de entrega e das coordenadas, no total e por cidade,
+  e em valores contínuos aleatórios combinados a partir de muitos sketches pequenos (o pior caso da combinação)
+Também mede o tempo de montagem dos sketches, o tempo das consultas e a memória ocupada.
+
+Uso:
+    python -m benchmarks.bench_sketches
+    python -m benchmarks.bench_sketches --rows 1000000
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_raw
+from utils.cleaning import clean_data
+from utils.sketches import (KLL_K, QUANTILE_COLS, build_sketches, filter_sketches, hll_estimate, hll_registers,
+                            kll_from_values, kll_merge, kll_quantiles, sketch_nunique, sketch_quantiles)
+
+
+# Filtros usados na validação: (data limite, tráfegos selecionados)
+SCENARIOS=[(pd.Timestamp(2022,4,10),['Jam','Medium','High','Low']),
+           (pd.Timestamp(2022,3,15),['Jam','High'])]
+
+# Quantis verificados
+QUANTILES=[0.01,0.1,0.25,0.5,0.75,0.9,0.95,0.99]
+
+# Limites de erro documentados em utils/sketches.py
+# HyperLogLog: 3 erros padrão (1,04/sqrt(4096)); KLL: erro de posição para k=200
+HLL_TOLERANCE=3*1.04/np.sqrt(4096)
+KLL_TOLERANCE=0.017
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def rank_error(valores,estimativa,q):
+    """ Esta função retorna o erro de posição do quantil estimado: a distância entre q e o intervalo de
+    posições que o valor estimado ocupa nos dados ordenados (zero se o valor for um quantil q exato).
+
+    Input: array ordenado com os valores; valor estimado; quantil
+    Output: erro de posição (fração do número de valores)
+    """
+    n=len(valores)
+    abaixo=np.searchsorted(valores,estimativa,side='left')/n
+    ate=np.searchsorted(valores,estimativa,side='right')/n
+    return max(0.0,abaixo-q,q-ate)
+
+def check_hll(df,sketches,semana):
+    """ Esta função compara os entregadores únicos estimados com os exatos (total, por semana e por cidade).
+
+    Input: dataframe filtrado; sketches filtrados; semana do ano de cada pedido
+    Output: dicionário consulta -> maior erro relativo
+    """
+    erros={}
+    exato=df['Delivery_person_ID'].nunique()
+    erros['total']=abs(sketch_nunique(sketches)-exato)/exato
+    exato=df['Delivery_person_ID'].groupby(semana).nunique()
+    obtido=sketch_nunique(sketches,sketches['cells']['Order_Date'].dt.strftime('%U').rename('week_of_year'))
+    erros['por semana']=float((obtido.sort_index()-exato).abs().div(exato).max())
+    exato=df.groupby('City',observed=True)['Delivery_person_ID'].nunique().sort_index()
+    obtido=sketch_nunique(sketches,'City')
+    erros['por cidade']=float((obtido-exato.reindex(obtido.index)).abs().div(exato.reindex(obtido.index)).max())
+    return erros
+
+def check_kll(df,sketches):
+    """ Esta função calcula o maior erro de posição dos quantis estimados de cada coluna (total e por cidade).
+
+    Input: dataframe filtrado; sketches filtrados
+    Output: dicionário coluna -> maior erro de posição
+    """
+    erros={}
+    for nome,col in QUANTILE_COLS.items():
+        erro=0.0
+        obtido=sketch_quantiles(sketches,nome,QUANTILES)
+        valores=np.sort(df[col].to_numpy(dtype='float64'))
+        erro=max(rank_error(valores,v,q) for v,q in zip(obtido,QUANTILES))
+        por_cidade=sketch_quantiles(sketches,nome,QUANTILES,'City')
+        for cidade,linha in por_cidade.iterrows():
+            valores=np.sort(df.loc[df['City']==cidade,col].to_numpy(dtype='float64'))
+            erro=max(erro,max(rank_error(valores,v,q) for v,q in zip(linha.to_numpy(),QUANTILES)))
+        erros[nome]=erro
+    return erros
+
+def check_kll_continuous(n,partes,seed=0):
+    """ Esta função verifica o KLL em valores contínuos (sem empates), montados em vários sketches e combinados.
+
+    Input: número de valores; número de sketches combinados; semente
+    Output: maior erro de posição
+    """
+    rng=np.random.default_rng(seed)
+    valores=np.concatenate([rng.normal(size=n//2),rng.exponential(size=n-n//2)])
+    rng.shuffle(valores)
+    sketch=kll_merge(kll_from_values(p) for p in np.array_split(valores,partes))
+    obtido=kll_quantiles(sketch,QUANTILES)
+    valores=np.sort(valores)
+    return max(rank_error(valores,v,q) for v,q in zip(obtido,QUANTILES))
+
+def check_hll_continuous(n,seed=0):
+    """ Esta função verifica o HyperLogLog em n valores distintos (acima da faixa da contagem linear).
+
+    Input: número de valores distintos; semente
+    Output: erro relativo
+    """
+    valores=np.random.default_rng(seed).permutation(n).astype(str)
+    return abs(hll_estimate(hll_registers(np.zeros(n,dtype='int64'),valores,1)[0])-n)/n
+
+def sketches_size(sketches):
+    """ Memória ocupada pelos sketches, em MB """
+    kll=sum(8*sum(len(n) for n in s['levels']) for lista in sketches['kll'].values() for s in lista)
+    return (sketches['hll'].nbytes+kll)/2**20
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,default=200_000)
+    parser.add_argument('--repeat',type=int,default=3)
+    args=parser.parse_args()
+
+    df=clean_data(make_raw(args.rows))
+    t0=time.perf_counter()
+    sketches=build_sketches(df)
+    t_build=time.perf_counter()-t0
+    print(f"{args.rows:,} linhas: {len(sketches['cells']):,} células, sketches montados em {t_build:.2f} s "
+          f"({sketches_size(sketches):.1f} MB; k={KLL_K})")
+
+    falhas=0
+    def report(nome,erro,tolerancia):
+        nonlocal falhas
+        ok=erro<=tolerancia
+        falhas+=not ok
+        print(f"{nome:>28} {tolerancia:>10.4f} {erro:>12.4f} {'' if ok else 'FALHOU'}")
+
+    for data_limite,categorias in SCENARIOS:
+        linhas=(df['Order_Date']<=data_limite)&df['Road_traffic_density'].isin(categorias)
+        filtrado=df.loc[linhas]
+        parcial=filter_sketches(sketches,data_limite,categorias)
+        print(f"\nFiltro: até {data_limite:%d-%m-%Y}, tráfego {','.join(categorias)}")
+        print(f"{'consulta':>28} {'tolerância':>10} {'maior erro':>12}")
+        for nome,erro in check_hll(filtrado,parcial,filtrado['Order_Date'].dt.strftime('%U').rename('week_of_year')).items():
+            report('entregadores '+nome,erro,HLL_TOLERANCE)
+        for nome,erro in check_kll(filtrado,parcial).items():
+            report('quantis '+QUANTILE_COLS[nome],erro,KLL_TOLERANCE)
+
+        t_exato,t_sketch=[],[]
+        for _ in range(args.repeat):
+            t0=time.perf_counter()
+            filtrado=df.loc[(df['Order_Date']<=data_limite)&df['Road_traffic_density'].isin(categorias)]
+            filtrado['Delivery_person_ID'].nunique()
+            filtrado.groupby('City',observed=True)['Time_taken(min)'].quantile(QUANTILES)
+            t_exato.append(time.perf_counter()-t0)
+            t0=time.perf_counter()
+            parcial=filter_sketches(sketches,data_limite,categorias)
+            sketch_nunique(parcial)
+            sketch_quantiles(parcial,'time',QUANTILES,'City')
+            t_sketch.append(time.perf_counter()-t0)
+        print(f'Consulta (entregadores únicos + percentis por cidade): exato {min(t_exato)*1000:.1f} ms, '
+              f'sketches {min(t_sketch)*1000:.1f} ms')
+
+    print('\nValores contínuos')
+    print(f"{'consulta':>28} {'tolerância':>10} {'maior erro':>12}")
+    report('KLL 1M valores, 1000 partes',check_kll_continuous(1_000_000,1000),KLL_TOLERANCE)
+    report('KLL 1M valores, 1 parte',check_kll_continuous(1_000_000,1),KLL_TOLERANCE)
+    report('HLL 100 mil distintos',check_hll_continuous(100_000),HLL_TOLERANCE)
+    report('HLL 1M distintos',check_hll_continuous(1_000_000),HLL_TOLERANCE)
+    if falhas:
+        raise SystemExit(f'{falhas} consultas fora da tolerância')
+
+if __name__=='__main__':
+    main()
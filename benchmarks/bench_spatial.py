@@ -0,0 +1,102 @@
+""" Benchmark das consultas espaciais: varredura de todas as linhas x índice de grade (utils.spatial).
+Consultas por retângulo, por raio e dos k restaurantes mais próximos, com pontos distribuídos
+como no benchmark sintético (latitudes e longitudes da Índia).
+
+Uso:
+    python -m benchmarks.bench_spatial
+    python -m benchmarks.bench_spatial --points 1000000 --queries 50
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import time
+
+import numpy as np
+
+from utils.geo import haversine_km
+from utils.spatial import bbox_query, build_grid, nearest, radius_query
+
+
+# Tamanhos das consultas: lado do retângulo em graus e raio em km
+BBOX_SIDES=[0.1,1.0]
+RADII_KM=[5,50]
+K_NEAREST=10
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def make_points(n,seed=0):
+    """ Esta função gera n pontos na mesma região do benchmark sintético (benchmarks/synthetic.py).
+
+    Input: número de pontos; semente
+    Output: tupla (latitudes, longitudes)
+    """
+    rng=np.random.default_rng(seed)
+    return rng.uniform(9.0,31.0,n),rng.uniform(72.0,88.5,n)
+
+def scan_bbox(lat,lon,lat_min,lat_max,lon_min,lon_max):
+    """ Consulta por retângulo varrendo todas as linhas (referência) """
+    return np.flatnonzero((lat>=lat_min)&(lat<=lat_max)&(lon>=lon_min)&(lon<=lon_max))
+
+def scan_radius(lat,lon,c_lat,c_lon,radius_km):
+    """ Consulta por raio calculando a distância de todas as linhas (referência) """
+    return np.flatnonzero(haversine_km(c_lat,c_lon,lat,lon)<=radius_km)
+
+def scan_nearest(lat,lon,c_lat,c_lon,k):
+    """ k pontos mais próximos calculando a distância de todas as linhas (referência) """
+    distancias=haversine_km(c_lat,c_lon,lat,lon)
+    return np.sort(np.partition(distancias,k-1)[:k])
+
+def mean_time(func,args_list):
+    """ Esta função retorna o tempo médio (em ms) de uma chamada da função sobre a lista de argumentos.
+
+    Input: função; lista de tuplas de argumentos
+    Output: tempo em ms
+    """
+    t0=time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter()-t0)/len(args_list)*1000
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points',type=int,nargs='+',default=[1_000_000,10_000_000])
+    parser.add_argument('--queries',type=int,default=20)
+    args=parser.parse_args()
+
+    rng=np.random.default_rng(1)
+    centros=list(zip(rng.uniform(10.0,30.0,args.queries),rng.uniform(73.0,87.5,args.queries)))
+
+    print(f"{'pontos':>12} {'consulta':>22} {'varredura (ms)':>15} {'índice (ms)':>12} {'speedup':>9}")
+    for n in args.points:
+        lat,lon=make_points(n)
+        t0=time.perf_counter()
+        grid=build_grid(lat,lon)
+        print(f'{n:>12,} índice construído em {(time.perf_counter()-t0)*1000:.0f} ms')
+
+        casos=[]
+        for lado in BBOX_SIDES:
+            consultas=[(c[0]-lado/2,c[0]+lado/2,c[1]-lado/2,c[1]+lado/2) for c in centros]
+            casos.append((f'retângulo {lado}°',
+                          lambda *q: scan_bbox(lat,lon,*q),lambda *q: bbox_query(grid,*q),consultas))
+        for raio in RADII_KM:
+            consultas=[(c[0],c[1],raio) for c in centros]
+            casos.append((f'raio {raio} km',
+                          lambda *q: scan_radius(lat,lon,*q),lambda *q: radius_query(grid,*q)[0],consultas))
+        consultas=[(c[0],c[1],K_NEAREST) for c in centros]
+        casos.append((f'{K_NEAREST} mais próximos',
+                      lambda *q: scan_nearest(lat,lon,*q),
+                      lambda *q: nearest(grid,*q)['distance_km'].to_numpy(),consultas))
+
+        for nome,varredura,indice,consultas in casos:
+            for q in consultas[:3]:
+                esperado,obtido=varredura(*q),indice(*q)
+                assert len(esperado)==len(obtido) and np.allclose(esperado,obtido),nome
+            t_scan=mean_time(varredura,consultas)
+            t_index=mean_time(indice,consultas)
+            print(f'{n:>12,} {nome:>22} {t_scan:>15.2f} {t_index:>12.3f} {t_scan/t_index:>8.0f}x')
+        del lat,lon,grid
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,50 @@
+""" Benchmark do tempo de carga na inicialização: CSV (leitura + clean_data) x snapshot colunar com memory mapping.
+
+Uso:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --rows 45000 1000000
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+
+from benchmarks.synthetic import write_csv
+from utils.filters import sort_by_date
+from utils.loader import read_csv_dataset, read_snapshot_dataset
+from utils.snapshot import convert
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,nargs='+',default=[45_000,1_000_000,10_000_000])
+    args=parser.parse_args()
+
+    print(f"{'linhas':>12} {'csv (s)':>9} {'snapshot (s)':>13} {'speedup':>9} {'csv (MB)':>10} {'snapshot (MB)':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.rows:
+            csv_path=os.path.join(tmp,f'train_{n}.csv')
+            snapshot_path=os.path.join(tmp,f'train_{n}.feather')
+            write_csv(csv_path,n)
+            convert(csv_path,snapshot_path)
+
+            df_csv,t_csv=read_csv_dataset(csv_path)
+            df_snap,t_snap=read_snapshot_dataset(snapshot_path)
+            # O snapshot é gravado já ordenado por data, como o loader deixa o CSV depois da leitura
+            pd.testing.assert_frame_equal(df_snap,sort_by_date(df_csv))
+
+            total_csv=t_csv['read_s']+t_csv['clean_s']+t_csv['distance_s']
+            total_snap=t_snap['read_s']+t_snap['clean_s']+t_snap['distance_s']
+            print(f'{n:>12,} {total_csv:>9.3f} {total_snap:>13.3f} {total_csv/total_snap:>8.1f}x '
+                  f'{os.path.getsize(csv_path)/2**20:>10.1f} {os.path.getsize(snapshot_path)/2**20:>14.1f}')
+            os.remove(csv_path)
+            os.remove(snapshot_path)
+
+if __name__=='__main__':
+    main()
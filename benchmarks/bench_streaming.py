@@ -0,0 +1,194 @@
+""" Validação e benchmark do modo em streaming (utils.streaming) contra o caminho em memória.
+Cada métrica das páginas é calculada pelos dois caminhos, com e sem os filtros da barra lateral,
+e comparada com a tolerância documentada em utils/streaming.py. Também mede o tempo e o pico
+de memória (tracemalloc) dos dois caminhos.
+
+Uso:
+    python -m benchmarks.bench_streaming
+    python -m benchmarks.bench_streaming --rows 1000000 --chunksize 100000
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_csv
+from utils.cleaning import clean_data
+from utils.clusters import median_locations
+from utils.filters import build_filter_index, filter_orders, sort_by_date
+from utils.geo import delivery_distance_km
+from utils.ranking import courier_means, top_k_by_group
+from utils.streaming import COORD_BIN, filter_partials, stream_partials, streaming_metrics
+
+
+# Filtros usados na validação: (data limite, tráfegos selecionados)
+SCENARIOS=[(pd.Timestamp(2022,4,10),['Jam','Medium','High','Low']),
+           (pd.Timestamp(2022,3,15),['Jam','High'])]
+
+# Tolerância de cada métrica: (tipo, valor)
+# 'exact' = igual; 'rel' = erro relativo; 'abs' = erro absoluto
+TOLERANCES={'order_day':('exact',0),
+            'order_traffic':('exact',0),
+            'order_traf_city':('exact',0),
+            'order_week':('exact',0),
+            'couriers_week':('rel',0.05),
+            'central_spot':('abs',COORD_BIN/2),
+            'age_min':('exact',0),
+            'age_max':('exact',0),
+            'vehicle_min':('exact',0),
+            'vehicle_max':('exact',0),
+            'rating_courier':('rel',1e-9),
+            'rating_traffic':('rel',1e-9),
+            'rating_weather':('rel',1e-9),
+            'top_fast':('exact',0),
+            'top_slow':('exact',0),
+            'top_fast_courier':('rel',1e-9),
+            'top_slow_courier':('rel',1e-9),
+            'couriers_unique':('rel',0.05),
+            'distance_mean':('rel',1e-9),
+            'time_festival':('rel',1e-9),
+            'distance_city':('rel',1e-9),
+            'time_city':('rel',1e-9),
+            'time_city_order':('rel',1e-9),
+            'time_city_traffic':('rel',1e-9)}
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def _stats(df,by,col):
+    """ Contagem, média e desvio padrão de uma coluna por grupo (caminho em memória) """
+    return df.groupby(by,observed=True)[col].agg(['count','mean','std']).sort_index()
+
+def memory_metrics(df,k=10):
+    """ Esta função calcula as métricas das páginas sobre o dataframe em memória, como as páginas fazem.
+
+    Input: dataframe limpo e filtrado; número de entregadores por cidade nos rankings
+    Output: dicionário métrica -> Series, dataframe ou número (mesmas chaves de streaming_metrics)
+    """
+    semana=df['Order_Date'].dt.strftime('%U').rename('week_of_year')
+    cols=['City','Time_taken(min)','Delivery_person_ID']
+    metricas={'order_day':df.groupby('Order_Date')['ID'].count(),
+              'order_traffic':df.groupby('Road_traffic_density',observed=True)['ID'].count().sort_index(),
+              'order_traf_city':df.groupby(['Road_traffic_density','City'],observed=True)['ID'].count().sort_index(),
+              'order_week':df['ID'].groupby(semana).count(),
+              'couriers_week':df['Delivery_person_ID'].groupby(semana).nunique(),
+              'central_spot':median_locations(df),
+              'age_min':df['Delivery_person_Age'].min(),
+              'age_max':df['Delivery_person_Age'].max(),
+              'vehicle_min':df['Vehicle_condition'].min(),
+              'vehicle_max':df['Vehicle_condition'].max(),
+              'rating_courier':df.groupby('Delivery_person_ID',observed=True)['Delivery_person_Ratings'].mean().sort_index(),
+              'rating_traffic':_stats(df,'Road_traffic_density','Delivery_person_Ratings'),
+              'rating_weather':_stats(df,'Weatherconditions','Delivery_person_Ratings'),
+              'couriers_unique':df['Delivery_person_ID'].nunique(),
+              'distance_mean':df['distance_km'].mean(),
+              'time_festival':_stats(df,'Festival','Time_taken(min)'),
+              'distance_city':_stats(df,'City','distance_km'),
+              'time_city':_stats(df,'City','Time_taken(min)'),
+              'time_city_order':_stats(df,['City','Type_of_order'],'Time_taken(min)'),
+              'time_city_traffic':_stats(df,['City','Road_traffic_density'],'Time_taken(min)')}
+    metricas['top_fast'],metricas['top_slow']=top_k_by_group(df,'City','Time_taken(min)',k=k,cols=cols)
+    metricas['top_fast_courier'],metricas['top_slow_courier']=top_k_by_group(courier_means(df),'City','Time_taken(min)',k=k,cols=cols)
+    return metricas
+
+def _plain(valor):
+    """ Esta função converte o resultado em um dataframe com colunas comuns (sem categorias nem índice) """
+    df=pd.DataFrame(valor).reset_index()
+    for col in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col]):
+            df[col]=df[col].astype(str)
+    return df
+
+def max_error(esperado,obtido,tipo):
+    """ Esta função retorna o maior erro entre os dois resultados (None se as chaves ou o formato forem diferentes).
+
+    Input: resultado em memória; resultado em streaming; 'exact', 'rel' ou 'abs'
+    Output: maior erro
+    """
+    if np.isscalar(esperado) or isinstance(esperado,np.generic):
+        esperado,obtido=pd.Series([esperado]),pd.Series([obtido])
+    esperado,obtido=_plain(esperado),_plain(obtido)
+    if esperado.shape!=obtido.shape:
+        return None
+    erro=0.0
+    for col_e,col_o in zip(esperado.columns,obtido.columns):
+        e,o=esperado[col_e],obtido[col_o]
+        if not pd.api.types.is_numeric_dtype(e):
+            if not (e.to_numpy()==o.to_numpy()).all():
+                return None
+            continue
+        e,o=e.to_numpy(dtype='float64'),o.to_numpy(dtype='float64')
+        if not np.array_equal(np.isnan(e),np.isnan(o)):
+            return None
+        e,o=e[~np.isnan(e)],o[~np.isnan(o)]
+        diferenca=np.abs(e-o)
+        if tipo=='rel':
+            diferenca=diferenca/np.maximum(np.abs(e),1e-12)
+        erro=max(erro,float(diferenca.max()) if len(diferenca) else 0.0)
+    return erro
+
+def measure(func):
+    """ Esta função executa a função medindo o tempo e o pico de memória alocada.
+
+    Input: função sem argumentos
+    Output: tupla (resultado, tempo em s, pico de memória em MB)
+    """
+    tracemalloc.start()
+    t0=time.perf_counter()
+    resultado=func()
+    tempo=time.perf_counter()-t0
+    pico=tracemalloc.get_traced_memory()[1]/2**20
+    tracemalloc.stop()
+    return resultado,tempo,pico
+
+def load_in_memory(path):
+    """ Carga em memória, como em utils/loader.py """
+    df=clean_data(pd.read_csv(path))
+    df['distance_km']=delivery_distance_km(df)
+    return sort_by_date(df)
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,default=200_000)
+    parser.add_argument('--chunksize',type=int,default=50_000)
+    parser.add_argument('--k',type=int,default=10)
+    args=parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path=os.path.join(tmp,'train.csv')
+        write_csv(path,args.rows)
+        df,t_mem,pico_mem=measure(lambda: load_in_memory(path))
+        parciais,t_stream,pico_stream=measure(lambda: stream_partials(path,args.chunksize))
+
+    print(f'{args.rows:,} linhas, blocos de {args.chunksize:,}')
+    print(f"{'caminho':>12} {'tempo (s)':>10} {'pico (MB)':>10}")
+    print(f"{'memória':>12} {t_mem:>10.2f} {pico_mem:>10.1f}")
+    print(f"{'streaming':>12} {t_stream:>10.2f} {pico_stream:>10.1f}")
+    tamanhos={nome:len(parciais[nome]) for nome in ['cells','couriers','coords','top']}
+    tamanhos['hll']=len(parciais['hll']['keys'])
+    print('Grupos nos agregados: '+', '.join(f'{nome}={n:,}' for nome,n in tamanhos.items()))
+
+    index=build_filter_index(df)
+    falhas=0
+    for data_limite,categorias in SCENARIOS:
+        print(f"\nFiltro: até {data_limite:%d-%m-%Y}, tráfego {','.join(categorias)}")
+        esperado=memory_metrics(filter_orders(df,index,data_limite,categorias),args.k)
+        obtido=streaming_metrics(filter_partials(parciais,data_limite,categorias),args.k)
+        print(f"{'métrica':>20} {'tolerância':>14} {'maior erro':>12}")
+        for nome,(tipo,tolerancia) in TOLERANCES.items():
+            erro=max_error(esperado[nome],obtido[nome],tipo)
+            ok=erro is not None and erro<=tolerancia
+            falhas+=not ok
+            print(f"{nome:>20} {tipo+' '+format(tolerancia,'g'):>14} {'-' if erro is None else format(erro,'.2e'):>12} {'' if ok else 'FALHOU'}")
+    if falhas:
+        raise SystemExit(f'{falhas} métricas fora da tolerância')
+
+if __name__=='__main__':
+    main()
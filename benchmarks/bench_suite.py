@@ -0,0 +1,260 @@
+""" Suíte de benchmarks das funções do dashboard, sem o Streamlit.
+
+Gera dados sintéticos (benchmarks/synthetic.py) em cada escala, mede o tempo (melhor de N execuções)
+e o pico de memória alocada (tracemalloc, em uma execução separada) da limpeza, das estruturas
+derivadas e de todas as funções que montam os gráficos e tabelas das páginas (carregadas com
+benchmarks/pages.py), e compara com a linha de base gravada em benchmarks/baseline.json.
+Uma função é marcada como regressão quando o tempo ou o pico de memória passa da linha de base
+pela tolerância (e por uma diferença mínima absoluta, para ignorar ruído); nesse caso o programa
+termina com código de saída 1.
+
+Uso:
+    python -m benchmarks.bench_suite
+    python -m benchmarks.bench_suite --rows 45000 1000000 --repeat 5
+    python -m benchmarks.bench_suite --rows 45000 --save-baseline
+    python -m benchmarks.bench_suite --only top_ten rating_by --no-memory
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.pages import load_page
+from benchmarks.synthetic import make_raw
+from utils.cleaning import clean_data
+from utils.clusters import cluster_map, render_map
+from utils.cube import build_cube
+from utils.filters import build_filter_index, sort_by_date
+from utils.geo import delivery_distance_km
+from utils.leaderboard import build_courier_rollup, courier_summary, leaderboard_page
+from utils.percentiles import build_time_histograms, sla_breakdown
+from utils.sketches import build_sketches
+from utils.spatial import build_spatial_index, nearest, radius_query
+from utils.windows import build_window_index, compare_windows
+
+
+BASELINE_PATH=os.path.join(os.path.dirname(os.path.abspath(__file__)),'baseline.json')
+
+# Tolerâncias de regressão: fração acima da linha de base e diferença mínima absoluta
+TIME_TOLERANCE=0.25
+MIN_DELTA_MS=5.0
+MEMORY_TOLERANCE=0.10
+MIN_DELTA_MB=1.0
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def prepare(raw):
+    """ Esta função prepara o dataframe como utils/loader.py faz na carga (limpeza, distância e ordenação por data).
+
+    Input: dataframe cru
+    Output: dataframe limpo
+    """
+    df=clean_data(raw)
+    df['distance_km']=delivery_distance_km(df)
+    return sort_by_date(df)
+
+def dashboard_tasks(raw,df):
+    """ Esta função monta a lista de funções medidas: a carga, as estruturas derivadas e as funções
+    das páginas (pelo caminho das linhas e, quando a página usa, pelo cubo diário).
+
+    Input: dataframe cru; dataframe limpo
+    Output: dicionário nome -> função sem argumentos
+    """
+    empresa=load_page('1_visao_empresa.py')
+    entregadores=load_page('2_visao_entregadores.py')
+    restaurantes=load_page('3_visao_restaurantes.py')
+
+    cube=build_cube(df)
+    spatial_index=build_spatial_index(df)
+    histograms=build_time_histograms(df)
+    rollup=build_courier_rollup(df)
+    resumo=courier_summary(rollup)
+    window_index=build_window_index(df)
+    comparacao=compare_windows(window_index,'2022-03-30','2022-04-06','semana')
+    centro=(float(df['Restaurant_latitude'].median()),float(df['Restaurant_longitude'].median()))
+
+    def region():
+        posicoes,_=radius_query(spatial_index['restaurant'],*centro,25)
+        vizinhos=nearest(spatial_index['restaurant'],*centro,5)
+        return render_map(empresa.region_map(df.iloc[posicoes],centro,25,vizinhos))
+
+    tarefas={'clean_data':lambda: clean_data(raw),
+             'delivery_distance_km':lambda: delivery_distance_km(df),
+             'build_filter_index':lambda: build_filter_index(df),
+             'build_cube':lambda: build_cube(df),
+             'build_spatial_index':lambda: build_spatial_index(df),
+             'build_time_histograms':lambda: build_time_histograms(df),
+             'build_sketches':lambda: build_sketches(df),
+             'build_courier_rollup':lambda: build_courier_rollup(df),
+             'build_window_index':lambda: build_window_index(df)}
+    # Visão Empresa
+    for nome in ['order_day','order_traffic','order_traf_city','order_week','order_deliver_week']:
+        func=getattr(empresa,nome)
+        tarefas[nome]=lambda func=func: func(df)
+        tarefas[nome+'[cube]']=lambda func=func: func(df,cube)
+    tarefas['compare_windows']=lambda: compare_windows(window_index,'2022-03-30','2022-04-06','semana')
+    tarefas['order_day_compare']=lambda: empresa.order_day_compare(window_index,comparacao)
+    tarefas['central_spot']=lambda: render_map(empresa.central_spot(df))
+    tarefas['cluster_map']=lambda: render_map(cluster_map(df))
+    tarefas['region_map']=region
+    # Visão Entregadores
+    for col in ['Road_traffic_density','Weatherconditions','Delivery_person_ID']:
+        tarefas[f'rating_by[{col}]']=lambda col=col: entregadores.rating_by(df,col)
+    tarefas['top_ten']=lambda: entregadores.top_ten(df,'ambos')
+    tarefas['top_ten[entregador]']=lambda: entregadores.top_ten(df,'ambos',rank_by='entregador')
+    tarefas['top_ten[rollup]']=lambda: entregadores.top_ten(df,'ambos',rank_by='entregador',rollup=rollup)
+    tarefas['courier_summary']=lambda: courier_summary(rollup)
+    tarefas['leaderboard_page']=lambda: leaderboard_page(rollup,resumo,'del0','time_p90',True,3)
+    # Visão Restaurantes
+    tarefas['dist_media']=lambda: restaurantes.dist_media(df,'False')
+    tarefas['distance_city']=lambda: restaurantes.distance_city(df)
+    tarefas['festival_stats']=lambda: restaurantes.festival_stats(df)
+    tarefas['mean_time_city']=lambda: restaurantes.mean_time_city(df)
+    tarefas['mean_time_city_compare']=lambda: restaurantes.mean_time_city_compare(comparacao)
+    tarefas['time_city_order']=lambda: restaurantes.time_city_order(df)
+    tarefas['time_city_traffic']=lambda: restaurantes.time_city_traffic(df)
+    tarefas['time_percentiles']=lambda: restaurantes.time_percentiles(df,None,histograms)
+    tarefas['sla_charts']=lambda: restaurantes.sla_charts(sla_breakdown(histograms,['City','Road_traffic_density']),
+                                                          ['City','Road_traffic_density'],30)
+    return tarefas
+
+def best_of(func,repeat):
+    """ Esta função retorna o menor tempo (em ms) entre as repetições.
+
+    Input: função sem argumentos; número de repetições
+    Output: tempo em ms
+    """
+    tempos=[]
+    for _ in range(repeat):
+        t0=time.perf_counter()
+        func()
+        tempos.append(time.perf_counter()-t0)
+    return min(tempos)*1000
+
+def peak_memory(func):
+    """ Esta função retorna o pico de memória alocada (em MB) durante uma execução.
+
+    Input: função sem argumentos
+    Output: pico em MB
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]/2**20
+    finally:
+        tracemalloc.stop()
+
+def environment():
+    """ Esta função descreve o ambiente da execução (gravado junto com a linha de base) """
+    return {'python':platform.python_version(),'pandas':pd.__version__,'numpy':np.__version__,
+            'machine':platform.machine(),'cpus':os.cpu_count()}
+
+def run(rows,repeat,memory=True,only=None):
+    """ Esta função executa a suíte em cada escala.
+
+    Input: lista com os números de linhas; repetições; se mede a memória; prefixos das funções (None = todas)
+    Output: dicionário linhas -> função -> {'ms', 'peak_mb'}
+    """
+    resultados={}
+    for n in rows:
+        raw=make_raw(n)
+        df=prepare(raw)
+        tarefas=dashboard_tasks(raw,df)
+        if only:
+            tarefas={nome:func for nome,func in tarefas.items() if any(nome.startswith(o) for o in only)}
+        print(f'\n{n:,} linhas ({len(df):,} após a limpeza)')
+        print(f"{'função':>40} {'tempo (ms)':>11} {'pico (MB)':>10}")
+        resultados[str(n)]={}
+        for nome,func in tarefas.items():
+            medida={'ms':round(best_of(func,repeat),2)}
+            if memory:
+                medida['peak_mb']=round(peak_memory(func),2)
+            resultados[str(n)][nome]=medida
+            print(f"{nome:>40} {medida['ms']:>11.1f} {medida.get('peak_mb',float('nan')):>10.1f}")
+        del raw,df,tarefas
+    return resultados
+
+def compare(resultados,baseline,time_tol=TIME_TOLERANCE,memory_tol=MEMORY_TOLERANCE):
+    """ Esta função compara os resultados com a linha de base.
+
+    Input: resultados de run; linha de base; tolerâncias de tempo e de memória
+    Output: lista de regressões (linhas, função, medida, linha de base, atual)
+    """
+    regressoes=[]
+    for n,funcoes in resultados.items():
+        for nome,medida in funcoes.items():
+            base=baseline.get('results',{}).get(n,{}).get(nome)
+            if base is None:
+                continue
+            if medida['ms']>base['ms']*(1+time_tol) and medida['ms']-base['ms']>MIN_DELTA_MS:
+                regressoes.append((n,nome,'ms',base['ms'],medida['ms']))
+            if ('peak_mb' in medida and 'peak_mb' in base
+                    and medida['peak_mb']>base['peak_mb']*(1+memory_tol) and medida['peak_mb']-base['peak_mb']>MIN_DELTA_MB):
+                regressoes.append((n,nome,'peak_mb',base['peak_mb'],medida['peak_mb']))
+    return regressoes
+
+def save_baseline(resultados,path=BASELINE_PATH):
+    """ Esta função grava os resultados como linha de base (mantendo as escalas que não foram executadas).
+
+    Input: resultados de run; caminho do arquivo
+    Output: None
+    """
+    baseline={'results':{}}
+    if os.path.exists(path):
+        with open(path) as f:
+            baseline=json.load(f)
+    baseline['environment']=environment()
+    baseline['results'].update(resultados)
+    with open(path,'w') as f:
+        json.dump(baseline,f,indent=1,sort_keys=True)
+        f.write('\n')
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,nargs='+',default=[45_000,1_000_000,10_000_000])
+    parser.add_argument('--repeat',type=int,default=3)
+    parser.add_argument('--only',nargs='+',help='mede só as funções com esses prefixos')
+    parser.add_argument('--no-memory',action='store_true',help='não mede o pico de memória')
+    parser.add_argument('--baseline',default=BASELINE_PATH)
+    parser.add_argument('--save-baseline',action='store_true',help='grava os resultados como linha de base')
+    parser.add_argument('--time-tolerance',type=float,default=TIME_TOLERANCE)
+    parser.add_argument('--memory-tolerance',type=float,default=MEMORY_TOLERANCE)
+    parser.add_argument('--json',help='grava os resultados neste arquivo')
+    args=parser.parse_args()
+
+    resultados=run(args.rows,args.repeat,memory=not args.no_memory,only=args.only)
+    if args.json:
+        with open(args.json,'w') as f:
+            json.dump({'environment':environment(),'results':resultados},f,indent=1,sort_keys=True)
+    if args.save_baseline:
+        save_baseline(resultados,args.baseline)
+        print(f'\nLinha de base gravada em {args.baseline}')
+        return
+    if not os.path.exists(args.baseline):
+        print(f'\nSem linha de base em {args.baseline} (use --save-baseline)')
+        return
+
+    with open(args.baseline) as f:
+        baseline=json.load(f)
+    if baseline.get('environment')!=environment():
+        print(f"\nAviso: linha de base gravada em outro ambiente {baseline.get('environment')}")
+    regressoes=compare(resultados,baseline,args.time_tolerance,args.memory_tolerance)
+    if not regressoes:
+        print('\nNenhuma regressão em relação à linha de base')
+        return
+    print(f"\n{'linhas':>10} {'função':>40} {'medida':>8} {'base':>10} {'atual':>10}")
+    for n,nome,medida,base,atual in regressoes:
+        print(f'{n:>10} {nome:>40} {medida:>8} {base:>10.1f} {atual:>10.1f}')
+    raise SystemExit(f'{len(regressoes)} regressões em relação à linha de base')
+
+if __name__=='__main__':
+    main()
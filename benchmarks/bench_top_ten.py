@@ -0,0 +1,71 @@
+""" Benchmark do top 10 por cidade: ordenação completa + groupby head/tail (versão anterior, chamada
+duas vezes) x seleção parcial por cidade com os dois extremos em uma única passada (utils.ranking).
+
+Uso:
+    python -m benchmarks.bench_top_ten
+    python -m benchmarks.bench_top_ten --rows 45000 1000000 --k 10
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_raw
+from utils.cleaning import clean_data
+from utils.ranking import top_k_by_group
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def top_ten_sort(df,arg,k=10):
+    """ Versão anterior da função top_ten, mantida como referência.
+
+    Input: dataframe; 'maior' ou 'menor'; k
+    Output: dataframe com o top k
+    """
+    aux1=df.sort_values(['Time_taken(min)','City'],ascending = True).reset_index()
+    cols=['City','Time_taken(min)','Delivery_person_ID']
+    if arg == 'maior':
+        aux2=aux1.loc[:,cols].groupby(['City']).head(k).reset_index(drop=True)
+    else:
+        aux2=aux1.loc[:,cols].groupby(['City']).tail(k).reset_index(drop=True)
+    return aux2
+
+def best_of(func,repeat):
+    """ Esta função retorna o menor tempo (em ms) entre as repetições.
+
+    Input: função sem argumentos; número de repetições
+    Output: tempo em ms
+    """
+    tempos=[]
+    for _ in range(repeat):
+        t0=time.perf_counter()
+        func()
+        tempos.append(time.perf_counter()-t0)
+    return min(tempos)*1000
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,nargs='+',default=[45_000,1_000_000,10_000_000])
+    parser.add_argument('--k',type=int,default=10)
+    parser.add_argument('--repeat',type=int,default=5)
+    args=parser.parse_args()
+
+    cols=['City','Time_taken(min)','Delivery_person_ID']
+    print(f"{'linhas':>12} {'anterior x2 (ms)':>17} {'seleção parcial (ms)':>21} {'speedup':>9}")
+    for n in args.rows:
+        df=clean_data(make_raw(n))
+        veloz,lento=top_k_by_group(df,'City','Time_taken(min)',k=args.k,cols=cols)
+        pd.testing.assert_frame_equal(veloz,top_ten_sort(df,'maior',args.k))
+        pd.testing.assert_frame_equal(lento,top_ten_sort(df,'menor',args.k))
+
+        t_sort=best_of(lambda: (top_ten_sort(df,'maior',args.k),top_ten_sort(df,'menor',args.k)),args.repeat)
+        t_topk=best_of(lambda: top_k_by_group(df,'City','Time_taken(min)',k=args.k,cols=cols),args.repeat)
+        print(f'{n:>12,} {t_sort:>17.1f} {t_topk:>21.1f} {t_sort/t_topk:>8.1f}x')
+        del df
+
+if __name__=='__main__':
+    main()
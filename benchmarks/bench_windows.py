@@ -0,0 +1,106 @@
+""" Benchmark do modo de comparação de períodos: métricas de duas janelas calculadas sobre as linhas (máscara por
+data e tráfego, groupby por cidade e nunique dos entregadores a cada interação) x somas acumuladas diárias e
+tabela esparsa de bitsets dos entregadores (utils/windows.py), montadas uma vez na carga.
+
+As consultas com as somas acumuladas custam o mesmo para qualquer tamanho de janela. Os resultados das duas
+formas são conferidos (pedidos, entregadores únicos, médias e desvios por cidade), também sem a tabela de
+bitsets (contagem dos entregadores pelas linhas do período).
+
+Uso:
+    python -m benchmarks.bench_windows
+    python -m benchmarks.bench_windows --rows 100000 3000000 --windows 7 28
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_suite import prepare
+from benchmarks.synthetic import make_raw
+from utils.filters import build_filter_index
+from utils.windows import build_window_index, compare_windows, previous_window
+
+
+# Data final das janelas e tipos de tráfego selecionados
+WINDOW_END='2022-04-06'
+TRAFFIC=['Jam','High','Low']
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def best_of(func,repeat):
+    """ Esta função retorna o menor tempo (em ms) entre as repetições e o último resultado.
+
+    Input: função sem argumentos; número de repetições
+    Output: tupla (tempo em ms, resultado)
+    """
+    tempos=[]
+    for _ in range(repeat):
+        t0=time.perf_counter()
+        resultado=func()
+        tempos.append(time.perf_counter()-t0)
+    return min(tempos)*1000,resultado
+
+def rows_window(df,inicio,fim,categorias):
+    """ Referência: métricas de uma janela calculadas sobre as linhas.
+
+    Input: dataframe; data inicial e data final; tipos de tráfego selecionados
+    Output: dicionário com 'orders', 'couriers' e 'by_city' (média e desvio do tempo por cidade)
+    """
+    linhas=((df['Order_Date']>=pd.Timestamp(inicio))&(df['Order_Date']<=pd.Timestamp(fim))
+            &df['Road_traffic_density'].isin(categorias))
+    janela=df.loc[linhas]
+    por_cidade=janela.groupby('City',observed=True)['Time_taken(min)'].agg(['mean','std']).sort_index()
+    return {'orders':len(janela),'couriers':janela['Delivery_person_ID'].nunique(),'by_city':por_cidade}
+
+def rows_compare(df,inicio,fim,modo,categorias):
+    """ Referência: a janela e a janela de comparação calculadas sobre as linhas """
+    return rows_window(df,inicio,fim,categorias),rows_window(df,*previous_window(inicio,fim,modo),categorias)
+
+def same_window(esperado,stats):
+    """ Esta função confere as métricas de uma janela das somas acumuladas com as calculadas nas linhas """
+    por_cidade=stats['by_city'].loc[stats['by_city']['orders']>0]
+    return (esperado['orders']==stats['orders']
+            and esperado['couriers']==stats['couriers']
+            and np.allclose(esperado['by_city']['mean'].to_numpy(),por_cidade['time_mean'].to_numpy())
+            and np.allclose(esperado['by_city']['std'].to_numpy(),por_cidade['time_std'].to_numpy(),equal_nan=True))
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows',type=int,nargs='+',default=[100_000,1_000_000,3_000_000])
+    parser.add_argument('--windows',type=int,nargs='+',default=[7,28],help='tamanhos das janelas (dias)')
+    parser.add_argument('--repeat',type=int,default=3)
+    args=parser.parse_args()
+
+    falhas=0
+    for n in args.rows:
+        df=prepare(make_raw(n))
+        filter_index=build_filter_index(df)
+        t_build,index=best_of(lambda: build_window_index(df),1)
+        sem_bitsets=dict(index,couriers=None)
+        mb_prefix=sum(P.nbytes for P in index['prefix'].values())/2**20
+        mb_bitsets=sum(nivel.nbytes for nivel in index['couriers'])/2**20 if index['couriers'] is not None else 0.0
+        print(f"\n{n:,} linhas, {index['days']} dias, {df['Delivery_person_ID'].nunique():,} entregadores")
+        print(f'índice das janelas: {t_build:.1f} ms (uma vez na carga); somas {mb_prefix:.2f} MB, bitsets {mb_bitsets:.1f} MB')
+        print(f"{'janela':>24} {'linhas (ms)':>12} {'somas (ms)':>11} {'sem bitsets (ms)':>17} {'speedup':>8}")
+        for dias in args.windows:
+            fim=pd.Timestamp(WINDOW_END)
+            inicio=fim-pd.Timedelta(days=dias-1)
+            for modo in ['periodo','semana']:
+                t_linhas,(atual,anterior)=best_of(lambda: rows_compare(df,inicio,fim,modo,TRAFFIC),args.repeat)
+                t_somas,comparacao=best_of(lambda: compare_windows(index,inicio,fim,modo,TRAFFIC),args.repeat)
+                t_sem,sem=best_of(lambda: compare_windows(sem_bitsets,inicio,fim,modo,TRAFFIC,df,filter_index),args.repeat)
+                print(f"{f'{dias} dias x {modo}':>24} {t_linhas:>12.1f} {t_somas:>11.2f} {t_sem:>17.1f} {t_linhas/t_somas:>7.0f}x")
+                if not all(same_window(esperado,c[chave]) for c in [comparacao,sem]
+                           for esperado,chave in [(atual,'current'),(anterior,'previous')]):
+                    print(f'  ERRO: métricas diferentes das calculadas nas linhas ({dias} dias, {modo})')
+                    falhas+=1
+    if falhas:
+        raise SystemExit(f'{falhas} verificações falharam')
+
+if __name__=='__main__':
+    main()
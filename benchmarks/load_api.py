@@ -0,0 +1,201 @@
+""" Teste de carga do serviço HTTP das métricas (api.py): requisições por segundo e latências.
+
+Sem --url, gera um CSV sintético (benchmarks/synthetic.py), inicia o serviço em um processo separado
+e o encerra ao final. Cada conexão do cliente (asyncio, keep-alive) percorre uma mistura de métricas
+e filtros (data limite e tipos de tráfego) durante o tempo indicado, em três cenários:
+    - frio: cada combinação calculada pela primeira vez (sem cache de resultados)
+    - cache: as mesmas combinações, com os corpos já no cache de resultados do serviço
+    - condicional: o cliente envia If-None-Match com o ETag recebido e o serviço responde 304
+
+Uso:
+    python -m benchmarks.load_api
+    python -m benchmarks.load_api --rows 200000 --connections 32 --duration 10
+    python -m benchmarks.load_api --url http://127.0.0.1:8000
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_csv
+
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Métricas e filtros usados nas requisições
+METRICS=['orders_per_day','orders_per_week','orders_by_traffic','orders_by_traffic_city','orders_per_courier_week',
+         'ratings','ratings?by=weather','time_by_city','time_by_city_traffic','time_by_city_order','festival','distance']
+TRAFFIC_FILTERS=['','Jam','Low,Medium','Jam,High,Medium,Low']
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def request_paths(n_dates=8,seed=0):
+    """ Esta função monta a lista de caminhos das requisições: métricas x datas limite x filtros de tráfego.
+
+    Input: número de datas limite; semente da ordem
+    Output: lista de caminhos, em ordem aleatória
+    """
+    datas=pd.date_range('2022-02-11','2022-04-06',periods=n_dates).strftime('%Y-%m-%d')
+    caminhos=[]
+    for metrica in METRICS:
+        separador='&' if '?' in metrica else '?'
+        for data in datas:
+            for trafego in TRAFFIC_FILTERS:
+                caminho=f'/metrics/{metrica}{separador}date={data}'
+                caminhos.append(caminho+(f'&traffic={trafego}' if trafego else ''))
+    np.random.default_rng(seed).shuffle(caminhos)
+    return caminhos
+
+async def _fetch(reader,writer,host,caminho,etag=None):
+    """ Esta função envia uma requisição GET na conexão aberta e lê a resposta inteira.
+
+    Input: StreamReader e StreamWriter da conexão; host; caminho; ETag conhecido (opcional)
+    Output: tupla (status, ETag da resposta, tamanho do corpo)
+    """
+    linhas=[f'GET {caminho} HTTP/1.1',f'Host: {host}']
+    if etag:
+        linhas.append(f'If-None-Match: {etag}')
+    writer.write(('\r\n'.join(linhas)+'\r\n\r\n').encode('latin-1'))
+    await writer.drain()
+    status=int((await reader.readline()).split()[1])
+    cabecalhos={}
+    while True:
+        linha=await reader.readline()
+        if linha in (b'\r\n',b''):
+            break
+        nome,_,valor=linha.decode('latin-1').partition(':')
+        cabecalhos[nome.strip().lower()]=valor.strip()
+    tamanho=int(cabecalhos.get('content-length','0'))
+    if tamanho and status!=304:
+        await reader.readexactly(tamanho)
+    return status,cabecalhos.get('etag'),tamanho
+
+async def _client(host,port,caminhos,inicio,duracao,etags,resultados,uma_vez):
+    """ Uma conexão keep-alive que percorre os caminhos (a partir de 'inicio') até o fim do tempo """
+    reader,writer=await asyncio.open_connection(host,port)
+    fim=time.perf_counter()+duracao
+    i=inicio
+    try:
+        while time.perf_counter()<fim:
+            if uma_vez and i-inicio>=len(caminhos):
+                break
+            caminho=caminhos[i%len(caminhos)]
+            i+=1
+            t0=time.perf_counter()
+            status,etag,tamanho=await _fetch(reader,writer,host,caminho,etags.get(caminho) if etags is not None else None)
+            resultados.append((time.perf_counter()-t0,status,tamanho))
+            if etags is not None and etag:
+                etags[caminho]=etag
+    finally:
+        writer.close()
+
+async def run_scenario(host,port,caminhos,connections,duracao,etags=None,uma_vez=False):
+    """ Esta função executa um cenário de carga com várias conexões simultâneas.
+
+    Input: host; porta; caminhos; número de conexões; duração em segundos; ETags conhecidos
+           (None = sem requisições condicionais); se cada caminho é pedido uma única vez
+    Output: dicionário com requisições, req/s, latências (ms), status e bytes recebidos
+    """
+    resultados=[]
+    if uma_vez:
+        # Cada conexão fica com uma fatia dos caminhos
+        fatias=[caminhos[i::connections] for i in range(connections)]
+        tarefas=[_client(host,port,f,0,duracao,etags,resultados,True) for f in fatias if f]
+    else:
+        passo=max(len(caminhos)//connections,1)
+        tarefas=[_client(host,port,caminhos,i*passo,duracao,etags,resultados,False) for i in range(connections)]
+    t0=time.perf_counter()
+    await asyncio.gather(*tarefas)
+    decorrido=time.perf_counter()-t0
+    latencias=np.array([r[0] for r in resultados])*1000
+    return {'requests':len(resultados),
+            'rps':len(resultados)/decorrido if decorrido else 0.0,
+            'p50_ms':float(np.percentile(latencias,50)) if len(latencias) else np.nan,
+            'p90_ms':float(np.percentile(latencias,90)) if len(latencias) else np.nan,
+            'p99_ms':float(np.percentile(latencias,99)) if len(latencias) else np.nan,
+            'status':dict(Counter(r[1] for r in resultados)),
+            'mb':sum(r[2] for r in resultados if r[1]==200)/2**20}
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1',0))
+        return s.getsockname()[1]
+
+def start_service(rows,workdir):
+    """ Esta função gera os dados sintéticos e inicia o serviço em outro processo, esperando ele ficar pronto.
+
+    Input: número de linhas; diretório temporário
+    Output: tupla (processo, URL do serviço)
+    """
+    csv=os.path.join(workdir,'train.csv')
+    write_csv(csv,rows)
+    porta=_free_port()
+    processo=subprocess.Popen([sys.executable,os.path.join(ROOT,'api.py'),'--port',str(porta),'--data',csv,
+                               '--snapshot',os.path.join(workdir,'train.feather'),'--batches',os.path.join(workdir,'batches')],
+                              cwd=ROOT,stdout=subprocess.DEVNULL,stderr=subprocess.PIPE)
+    url=f'http://127.0.0.1:{porta}'
+    limite=time.time()+600
+    while time.time()<limite:
+        if processo.poll() is not None:
+            raise SystemExit('o serviço terminou antes de ficar pronto:\n'+processo.stderr.read().decode())
+        try:
+            urllib.request.urlopen(url+'/health',timeout=5).read()
+            return processo,url
+        except OSError:
+            time.sleep(0.5)
+    processo.kill()
+    raise SystemExit('o serviço não ficou pronto a tempo')
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url',help='serviço já em execução (padrão: inicia um com dados sintéticos)')
+    parser.add_argument('--rows',type=int,default=100_000)
+    parser.add_argument('--connections',type=int,default=16)
+    parser.add_argument('--duration',type=float,default=5.0,help='segundos dos cenários cache e condicional')
+    args=parser.parse_args()
+
+    processo=None
+    with tempfile.TemporaryDirectory() as workdir:
+        url=args.url
+        if url is None:
+            print(f'Gerando {args.rows:,} linhas e iniciando o serviço...')
+            processo,url=start_service(args.rows,workdir)
+        try:
+            partes=urlsplit(url)
+            host,porta=partes.hostname,partes.port or 80
+            caminhos=request_paths()
+            etags={}
+            cenarios=[('frio',lambda: run_scenario(host,porta,caminhos,args.connections,3600,etags,uma_vez=True)),
+                      ('cache',lambda: run_scenario(host,porta,caminhos,args.connections,args.duration)),
+                      ('condicional',lambda: run_scenario(host,porta,caminhos,args.connections,args.duration,etags))]
+            print(f'\n{url} - {len(caminhos)} combinações de métrica e filtros, {args.connections} conexões')
+            print(f"{'cenário':>12} {'requisições':>12} {'req/s':>9} {'p50 (ms)':>9} {'p90 (ms)':>9} {'p99 (ms)':>9} {'MB':>7}  status")
+            falhas=0
+            for nome,cenario in cenarios:
+                r=asyncio.run(cenario())
+                print(f"{nome:>12} {r['requests']:>12} {r['rps']:>9.0f} {r['p50_ms']:>9.1f} {r['p90_ms']:>9.1f} "
+                      f"{r['p99_ms']:>9.1f} {r['mb']:>7.1f}  {r['status']}")
+                falhas+=sum(n for s,n in r['status'].items() if s not in (200,304))
+        finally:
+            if processo is not None:
+                processo.terminate()
+                processo.wait()
+    if falhas:
+        raise SystemExit(f'{falhas} respostas com erro')
+
+if __name__=='__main__':
+    main()
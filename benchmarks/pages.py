@@ -0,0 +1,51 @@
+""" Carregamento das funções das páginas sem o Streamlit (para os benchmarks).
+
+As páginas executam o layout do Streamlit no nível do módulo, então não podem ser importadas
+diretamente. load_page lê o arquivo da página e executa só os imports (exceto os do Streamlit),
+as constantes e as definições de funções: as funções que montam os gráficos e tabelas ficam
+disponíveis sem abrir o app.
+"""
+# Importando as bibliotecas necessárias
+import ast
+import os
+import types
+
+
+PAGES_DIR=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'pages')
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def _is_streamlit(node):
+    """ Esta função indica se o import é do Streamlit (ou de um componente do Streamlit) """
+    if isinstance(node,ast.ImportFrom):
+        return (node.module or '').startswith('streamlit')
+    return any(alias.name.startswith('streamlit') for alias in node.names)
+
+def _keep(node):
+    """ Esta função indica se o comando do nível do módulo deve ser executado: imports (menos os do
+    Streamlit), definições de funções e constantes (nomes em maiúsculas) """
+    if isinstance(node,(ast.Import,ast.ImportFrom)):
+        return not _is_streamlit(node)
+    if isinstance(node,ast.FunctionDef):
+        return True
+    if isinstance(node,ast.Assign):
+        return all(isinstance(alvo,ast.Name) and alvo.id.isupper() for alvo in node.targets)
+    return False
+
+def load_page(name):
+    """ Esta função carrega as funções de uma página sem executar o layout do Streamlit.
+
+    Input: nome do arquivo da página (por exemplo '1_visao_empresa.py') ou caminho completo
+    Output: módulo com as funções e constantes da página
+    """
+    path=name if os.path.isabs(name) else os.path.join(PAGES_DIR,name)
+    with open(path,encoding='utf-8') as f:
+        arvore=ast.parse(f.read(),filename=path)
+    arvore.body=[node for node in arvore.body if _keep(node)]
+    modulo=types.ModuleType(os.path.splitext(os.path.basename(path))[0])
+    modulo.__file__=path
+    exec(compile(arvore,path,'exec'),modulo.__dict__)
+    return modulo
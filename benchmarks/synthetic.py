@@ -0,0 +1,172 @@
+""" Gerador de dados sintéticos no formato do 'dataset/train.csv', em qualquer escala.
+
+Uso:
+    python -m benchmarks.synthetic dataset/train.csv --rows 1000000
+    python -m benchmarks.synthetic dataset/orders --rows 1000000 --partitioned
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# =====================================================
+# Valores usados na geração dos dados
+# =====================================================
+CITIES=['Urban ','Metropolitian ','Semi-Urban ']
+TRAFFIC=['Low ','Medium ','High ','Jam ']
+WEATHER=['conditions Sunny','conditions Stormy','conditions Sandstorms',
+         'conditions Cloudy','conditions Fog','conditions Windy','conditions NaN']
+ORDERS=['Snack ','Meal ','Drinks ','Buffet ']
+VEHICLES=['motorcycle ','scooter ','electric_scooter ','bicycle ']
+FESTIVAL=['No ','Yes ']
+
+# Proporções aproximadas do arquivo original (na ordem das listas acima)
+CITY_SHARE=[0.22,0.75,0.03]
+TRAFFIC_SHARE=[0.34,0.24,0.10,0.32]
+VEHICLE_SHARE=[0.58,0.33,0.08,0.01]
+
+# Centros de distribuição: prefixo do ID do entregador -> (latitude, longitude) do centro da cidade
+HUBS={'INDO':(22.72,75.86),'BANG':(12.97,77.59),'COIMB':(11.00,76.96),'CHEN':(13.08,80.27),
+      'HYD':(17.39,78.49),'RANCHI':(23.35,85.33),'MYS':(12.30,76.64),'DEH':(30.32,78.03),
+      'KOC':(9.93,76.27),'PUNE':(18.52,73.86),'LUDH':(30.90,75.85),'KNP':(26.45,80.33),
+      'MUM':(19.08,72.88),'KOL':(22.57,88.36),'JAP':(26.91,75.79),'SUR':(21.17,72.83),
+      'GOA':(15.49,73.83),'AURG':(19.88,75.34),'AGR':(27.18,78.01),'VAD':(22.31,73.18),
+      'ALH':(25.44,81.85),'BHP':(23.26,77.41)}
+
+# Tempo médio de entrega (min) por tipo de tráfego, na ordem de TRAFFIC ('NaN ' usa a média geral)
+TRAFFIC_MINUTES=[21,27,27,31]
+
+# Fração dos pedidos com as coordenadas do restaurante zeradas, como no arquivo original
+ZERO_COORDS_FRAC=0.01
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def _with_nulls(rng,values,frac):
+    """ Esta função substitui uma fração dos valores por 'NaN ', como no arquivo original.
+
+    Input: gerador aleatório; array de valores; fração de nulos
+    Output: array de objetos
+    """
+    values=values.astype(object)
+    values[rng.random(len(values))<frac]='NaN '
+    return values
+
+def make_raw(n_rows,seed=0,null_frac=0.02,start='2022-02-11',end='2022-04-06'):
+    """ Esta função gera um dataframe sintético com o mesmo esquema e as mesmas
+    peculiaridades de texto do 'dataset/train.csv' (como ele é lido pelo pd.read_csv):
+    valores nulos escritos como 'NaN ', espaços no final dos textos e o tempo como '(min) NN'.
+    Cada entregador trabalha para um restaurante fixo de um dos centros de HUBS (o ID segue o formato
+    original, por exemplo 'INDORES13DEL02 '); os restaurantes ficam em torno do centro da cidade e os
+    locais de entrega a alguns quilômetros do restaurante. As proporções de cidade, tráfego e veículo
+    seguem as do arquivo original, e o tempo de entrega depende do tráfego, do festival, do estado do
+    veículo e do número de entregas múltiplas.
+
+    Input: número de linhas; semente; fração de nulos por coluna; primeira e última datas dos pedidos
+    Output: dataframe "cru", pronto para a função clean_data
+    """
+    rng=np.random.default_rng(seed)
+    n=n_rows
+
+    # Frota: 3 entregadores por restaurante; restaurantes distribuídos entre os centros
+    n_couriers=max(n//30,10)
+    n_restaurants=(n_couriers+2)//3
+    prefixos=np.array(list(HUBS),dtype=object)
+    centros=np.array(list(HUBS.values()))
+    hub=np.arange(n_restaurants)%len(HUBS)
+    rest_lat=np.round(centros[hub,0]+rng.normal(0,0.05,n_restaurants),6)
+    rest_lon=np.round(centros[hub,1]+rng.normal(0,0.05,n_restaurants),6)
+    courier_ids=np.array(['%sRES%02dDEL%02d '%(prefixos[i//3%len(HUBS)],i//3//len(HUBS)+1,i%3+1)
+                          for i in range(n_couriers)],dtype=object)
+
+    courier=rng.integers(0,n_couriers,n)
+    restaurante=courier//3
+    restaurant_lat=rest_lat[restaurante]
+    restaurant_lon=rest_lon[restaurante]
+    zeradas=rng.random(n)<ZERO_COORDS_FRAC
+    restaurant_lat[zeradas]=0.0
+    restaurant_lon[zeradas]=0.0
+    delivery_lat=np.round(restaurant_lat+rng.uniform(0.01,0.13,n)*rng.choice([-1,1],n),6)
+    delivery_lon=np.round(restaurant_lon+rng.uniform(0.01,0.13,n)*rng.choice([-1,1],n),6)
+
+    dates=pd.date_range(start,end).strftime('%d-%m-%Y').to_numpy(dtype=object)
+
+    trafego=rng.choice(len(TRAFFIC),n,p=TRAFFIC_SHARE)
+    festival=(rng.random(n)<0.02).astype(int)
+    condicao=rng.integers(0,4,n)
+    multiplas=rng.choice(4,n,p=[0.31,0.62,0.05,0.02])
+    minutos=(np.array(TRAFFIC_MINUTES)[trafego]+15*festival+4*(condicao==0)+3*multiplas
+             +rng.normal(0,6,n))
+    minutos=np.clip(np.round(minutos),10,54).astype(int)
+
+    df=pd.DataFrame({
+        'ID':np.char.add(np.char.mod('0x%x',np.arange(n)),' ').astype(object),
+        'Delivery_person_ID':courier_ids[courier],
+        'Delivery_person_Age':_with_nulls(rng,rng.integers(20,40,n).astype(str),null_frac),
+        'Delivery_person_Ratings':_with_nulls(rng,np.clip(np.round(rng.normal(4.63,0.33,n),1),2.5,5.0).astype(str),null_frac),
+        'Restaurant_latitude':restaurant_lat,
+        'Restaurant_longitude':restaurant_lon,
+        'Delivery_location_latitude':delivery_lat,
+        'Delivery_location_longitude':delivery_lon,
+        'Order_Date':dates[rng.integers(0,len(dates),n)],
+        'Time_Orderd':_with_nulls(rng,np.array(['11:30:00','19:45:00','21:10:00'])[rng.integers(0,3,n)],null_frac),
+        'Time_Order_picked':np.array(['11:45:00','19:55:00','21:25:00'],dtype=object)[rng.integers(0,3,n)],
+        'Weatherconditions':np.array(WEATHER,dtype=object)[rng.integers(0,len(WEATHER),n)],
+        'Road_traffic_density':_with_nulls(rng,np.array(TRAFFIC)[trafego],null_frac),
+        'Vehicle_condition':condicao,
+        'Type_of_order':np.array(ORDERS,dtype=object)[rng.integers(0,len(ORDERS),n)],
+        'Type_of_vehicle':np.array(VEHICLES,dtype=object)[rng.choice(len(VEHICLES),n,p=VEHICLE_SHARE)],
+        'multiple_deliveries':_with_nulls(rng,multiplas.astype(str),null_frac),
+        'Festival':_with_nulls(rng,np.array(FESTIVAL)[festival],null_frac/4),
+        'City':_with_nulls(rng,np.array(CITIES)[rng.choice(len(CITIES),n,p=CITY_SHARE)],null_frac),
+        'Time_taken(min)':np.char.add('(min) ',minutos.astype(str)).astype(object)})
+    return df
+
+def write_csv(path,n_rows,seed=0):
+    """ Esta função grava um arquivo sintético no formato do 'dataset/train.csv'.
+
+    Input: caminho do arquivo; número de linhas; semente
+    Output: None
+    """
+    make_raw(n_rows,seed=seed).to_csv(path,index=False)
+
+def write_partitioned(root,n_rows,seed=0):
+    """ Esta função grava os mesmos dados de write_csv como um conjunto particionado no formato Hive
+    (ver utils/partitions.py): um CSV por dia em root/year=AAAA/month=MM/city=<cidade>/.
+    As linhas sem cidade ficam na partição dos nulos (__HIVE_DEFAULT_PARTITION__).
+
+    Input: diretório raiz; número de linhas; semente
+    Output: número de arquivos gravados
+    """
+    raw=make_raw(n_rows,seed=seed)
+    datas=pd.to_datetime(raw['Order_Date'],format='%d-%m-%Y')
+    cidades=raw['City'].str.strip().replace('NaN','__HIVE_DEFAULT_PARTITION__')
+    n_arquivos=0
+    for (data,cidade),linhas in raw.groupby([datas,cidades],sort=True).groups.items():
+        pasta=os.path.join(root,f'year={data.year}',f'month={data.month:02d}',f'city={cidade}')
+        os.makedirs(pasta,exist_ok=True)
+        raw.loc[linhas].to_csv(os.path.join(pasta,f'part-{data:%Y-%m-%d}.csv'),index=False)
+        n_arquivos+=1
+    return n_arquivos
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--rows',type=int,default=45_593)
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--partitioned',action='store_true',help='grava um diretório particionado (year=/month=/city=)')
+    args=parser.parse_args()
+    if args.partitioned:
+        n_arquivos=write_partitioned(args.path,args.rows,args.seed)
+        print(f'{args.rows:,} linhas gravadas em {n_arquivos} arquivos em {args.path}')
+        return
+    write_csv(args.path,args.rows,args.seed)
+    print(f'{args.rows:,} linhas gravadas em {args.path}')
+
+if __name__=='__main__':
+    main()
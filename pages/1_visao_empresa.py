@@ -1,11 +1,22 @@
 # Importando as bibliotecas necessárias
-import pandas as pd
 import numpy as np
-import plotly.express as px
-import regex as re
-import folium
+import pandas as pd
 import streamlit as st
-from streamlit_folium import folium_static
+import streamlit.components.v1 as components
+
+from utils import profiling
+from utils.clusters import cluster_map, median_locations, render_map
+from utils.cube import build_cube, filter_cube, update_cube
+from utils.figures import POINT_BUDGET, bar_figure, bubble_figure, comparison_figure, line_figure, resample_to_budget
+from utils.filters import build_filter_index, filter_orders, filter_positions, update_filter_index
+from utils.loader import load_data, load_derived, load_info, wait_for_data
+from utils.parallel import share_frame
+from utils.metrics import (orders_by_traffic, orders_by_traffic_city, orders_per_courier_week, orders_per_day,
+                           orders_per_week)
+from utils.results_cache import cached, filter_key
+from utils.sketches import approx_median_locations, build_sketches, filter_sketches
+from utils.spatial import build_spatial_index, nearest, radius_query
+from utils.windows import COMPARISONS, build_window_index, compare_windows, format_delta, window_daily
 
 
 st.set_page_config(
@@ -21,156 +32,150 @@ st.set_page_config(
 
 
 
-def clean_data(df):
-    
-    """ Esta função tem a responsabilidade de limpar o dataframe
-    Os tipos de limpeza que ela faz:
-    1. Exclui as linhas com valores nulos
-    2. Exclui os espaços vazios do conjunto de dados, exemplo: 'CARRO ' -> 'CARRO'
-    3. Converte os tipos das colunas para os formatos corretos
-    4. Limpa e converte a coluna 'Time_taken(min)
-    
-    Input: dataframe
-    Output: dataframe
-    """
-    
-    # Excluindo as linhas que possuem valor nulo:
-    cols=df.columns
-    for col in cols:
-        df=df.loc[df[col]!='NaN ']
-
-    # Excluindo os espaços vazios do meu conjunto de dados:
-    df['ID']=df.loc[:,'ID'].str.strip()
-    df['Delivery_person_ID']=df.loc[:,'Delivery_person_ID'].str.strip()
-    df['Road_traffic_density']=df.loc[:,'Road_traffic_density'].str.strip()
-    df['Type_of_order']=df.loc[:,'Type_of_order'].str.strip()
-    df['Type_of_vehicle']=df.loc[:,'Type_of_vehicle'].str.strip()
-    df['Festival']=df.loc[:,'Festival'].str.strip()
-    df['City']=df.loc[:,'City'].str.strip()
-
-    # Convertendo as colunas para os seus formatos corretos
-    df['Delivery_person_Age']=df['Delivery_person_Age'].astype(int)
-    df['Delivery_person_Ratings']=df['Delivery_person_Ratings'].astype(float)
-    df['Order_Date']=pd.to_datetime(df['Order_Date'],format='%d-%m-%Y')
-    df['multiple_deliveries']=df['multiple_deliveries'].astype(int)
-
-    # Limpando e convertendo a coluna 'Time_taken(min)'
-    df['Time_taken(min)']=df['Time_taken(min)'].apply(lambda x: x.split('(min) ')[1])
-    df['Time_taken(min)']=df['Time_taken(min)'].astype(int)
-
-    return df
-
-def order_day(df):
+def order_day(df,cube=None):
     """" Esta função cria um gráfico de barras para representar a quantidade de pedidos por dia.
     - O eixo x corresponde ao dia
     - e o eixo y ao número de pedidos naquele dia
+    Quando o cubo diário (já filtrado) é informado, a contagem é feita sobre as suas células.
+    Se o período tiver mais dias que o orçamento de pontos (utils.figures.POINT_BUDGET), os pedidos são
+    somados por semana, mês... (o título indica o período usado).
     
-    Input: dataframe
+    Input: dataframe; cubo diário filtrado (opcional)
     Output: gráfico em barras (graph)
     """
     
-    cols=['ID','Order_Date']
-    order_per_day=df.loc[:,cols].groupby('Order_Date').count().reset_index()
-    graph=px.bar(order_per_day, x='Order_Date',y='ID',title='Número de pedidos por dia')
+    order_per_day,periodo=resample_to_budget(orders_per_day(df,cube))
+    graph=bar_figure(order_per_day.index,order_per_day.to_numpy(),f'Número de pedidos por {periodo}','Order_Date','ID')
     return graph
 
-def order_traffic(df):
+def order_day_compare(window_index,comparacao,categorias=None):
+    """ Esta função cria um gráfico de barras agrupadas com a quantidade de pedidos por dia da janela escolhida
+    e do período de comparação, alinhados pela posição do dia na janela.
+    - O eixo x corresponde ao dia da janela atual (o hover das barras anteriores mostra a data correspondente)
+    - e o eixo y ao número de pedidos naquele dia
+    Os pedidos de cada dia vêm das somas acumuladas (ver utils/windows.py). Se a janela tiver mais dias que
+    o orçamento de pontos, os dias são somados em blocos de mesmo tamanho nas duas janelas.
+
+    Input: índice das janelas; comparação (compare_windows); tipos de tráfego selecionados
+    Output: gráfico de barras agrupadas
+    """
+    atual=comparacao['current']
+    anterior=comparacao['previous']
+    pedidos=window_daily(window_index,atual['start'],atual['end'],categorias)
+    pedidos_anteriores=window_daily(window_index,anterior['start'],anterior['end'],categorias)
+    passo=max(-(-len(pedidos)//POINT_BUDGET),1)
+    bloco=np.arange(len(pedidos))//passo
+    datas=pedidos.index[::passo]
+    graph=comparison_figure(datas,
+                            pedidos.groupby(bloco).sum().to_numpy(),
+                            pedidos_anteriores.groupby(bloco).sum().to_numpy(),
+                            'Número de pedidos por dia' if passo==1 else f'Número de pedidos a cada {passo} dias',
+                            'Order_Date','ID',
+                            x_anterior=pedidos_anteriores.index[::passo])
+    return graph
+
+def order_traffic(df,cube=None):
     """ Esta função retorna um gráfico de barras representando a quantidade de pedidos por tipo de tráfego.
     - o eixo x corresponde ao tipo de tráfego
     - o eixo y corresponde ao número de pedidos em cada tipo
-    Input: dataframe
+    Quando o cubo diário (já filtrado) é informado, a contagem é feita sobre as suas células.
+    
+    Input: dataframe; cubo diário filtrado (opcional)
     Output: gráfico em barras
     """
-    cols=['ID', 'Road_traffic_density']
-    order_traffic=df.loc[:,cols].groupby('Road_traffic_density').count().reset_index()
-    graph=px.bar(order_traffic,x='Road_traffic_density',y='ID',title='Pedidos por tráfego')
+    order_traffic=orders_by_traffic(df,cube)
+    graph=bar_figure(order_traffic.index,order_traffic.to_numpy(),'Pedidos por tráfego','Road_traffic_density','ID')
     return graph
             
-def order_traf_city(df):
+def order_traf_city(df,cube=None):
     """ Esta função retorna um gráfico de bolhas para representar o volume de pedidos em cada cidade por cada tipo de tráfego.
     - o eixo x corresponde ao tipo de tráfego
     - o eixo y corresponde à cidade
     - a cor e o tamanho da bolha são dependentes do número de pedidos
+    Quando o cubo diário (já filtrado) é informado, a contagem é feita sobre as suas células.
     
-    Input: dataframe
+    Input: dataframe; cubo diário filtrado (opcional)
     Output: gráfico de bolhas
     """
-    cols=['ID','Road_traffic_density','City']
-    pedidos_traf_city=df.loc[:,cols].groupby(['Road_traffic_density','City']).count().reset_index()
-    graph=px.scatter(pedidos_traf_city,
-                    x='Road_traffic_density',
-                    y='City',
-                    color='ID',
-                    size='ID',
-                    title='Volume de pedidos por cidade e tráfego')
+    pedidos_traf_city=orders_by_traffic_city(df,cube)
+    graph=bubble_figure(pedidos_traf_city['Road_traffic_density'],
+                        pedidos_traf_city['City'],
+                        pedidos_traf_city['ID'],
+                        'Volume de pedidos por cidade e tráfego',
+                        'Road_traffic_density','City','ID')
     return graph
 
-def order_week(df):
+def order_week(df,cube=None):
     """ Esta função retorna um gráfico de barras para representar o número de pedidos por semana
     - o eixo x corresponde ao número da semana
     - o eixo y corresponde ao número de pedidos daquela semana
-    A função ainda adiciona uma coluna extra ao dataframe contendo o número da semana.
+    O número da semana é calculado pela função week_of_year (utils/metrics.py).
+    Quando o cubo diário (já filtrado) é informado, a contagem é feita sobre as suas células.
     
-    Input: dataframe
+    Input: dataframe; cubo diário filtrado (opcional)
     Output: gráfico de barras
     """
-    df['week_of_year']=df.loc[:,'Order_Date'].dt.strftime('%U')
-    cols=['week_of_year','ID']
-    order_per_week=df.loc[:,cols].groupby('week_of_year').count().reset_index()
-    graph=px.bar(order_per_week,x='week_of_year',y='ID',title='Número de pedidos por semana')
+    order_per_week=orders_per_week(df,cube)
+    graph=bar_figure(order_per_week.index,order_per_week.to_numpy(),'Número de pedidos por semana','week_of_year','ID')
     return graph
 
-def order_deliver_week(df):
+def order_deliver_week(df,cube=None,sketches=None):
     """ Esta função retorna um gráfico de linhas que representa o número de pedidos por entregador por semana.
     - o eixo x corresponde à semana do ano
     - o eixo y corresponde ao número de entregas feita por entregador na semana correspondente
+    Quando o cubo diário (já filtrado) é informado, as contagens são feitas sobre as suas células; se o cubo
+    não tiver os bitsets de entregadores (muitos entregadores), os entregadores únicos são contados nas linhas,
+    com as partições agregadas em paralelo (ver utils/parallel.py).
+    No modo aproximado (sketches filtrados informados) os entregadores únicos são estimados pelo HyperLogLog.
         
-    Input: dataframe
+    Input: dataframe; cubo diário filtrado (opcional); sketches filtrados (opcional)
     Output: gráfico de linhas
     """
     
-    pedidos1=df.loc[:,['ID','week_of_year']].groupby(['week_of_year']).count().reset_index()
-    pedidos2=df.loc[:,['week_of_year','Delivery_person_ID']].groupby('week_of_year').nunique().reset_index()
-    pedidos=pd.merge(pedidos1,pedidos2,how='inner')
-    pedidos['order_delivery']=pedidos['ID']/pedidos['Delivery_person_ID']
-    graph=px.line(pedidos,x='week_of_year',y='order_delivery',title='Pedidos por entregador por semana')
+    pedidos=orders_per_courier_week(df,cube,sketches)
+    graph=line_figure(pedidos['week_of_year'],pedidos['order_delivery'],'Pedidos por entregador por semana',
+                      'week_of_year','order_delivery')
     return graph
         
-def central_spot(df):
+def central_spot(df,sketches=None):
     """ Esta função retorna um mapa da localização central dos pedidos feitos em cada cidade por cada tipo de tráfego.
-    A função agrupa o dataframe por cidade e tipo de tráfego e faz a mediana da latitude e da longitude dos restaurantes em cada condição. Esses dados são plotados e é criado um mapa com os pontos.
-    Input: dataframe
+    A função agrupa o dataframe por cidade e tipo de tráfego e faz a mediana da latitude e da longitude dos restaurantes em cada condição (uma única agregação). Esses dados são plotados e é criado um mapa com os pontos.
+    No modo aproximado (sketches filtrados informados) as medianas vêm da combinação dos sketches KLL das células.
+    Input: dataframe; sketches filtrados (opcional)
     Output: mapa
     """
-    df_aux1=(df
-             .loc[:,['Restaurant_latitude','City','Road_traffic_density']]
-             .groupby(['City','Road_traffic_density'])
-             .median()
-             .reset_index()) 
-    df_aux2=(df
-             .loc[:,['Restaurant_longitude','City','Road_traffic_density']]
-             .groupby(['City','Road_traffic_density'])
-             .median()
-             .reset_index())
-    df_aux=pd.merge(df_aux1,df_aux2,how='inner')
+    import folium
+    df_aux=median_locations(df) if sketches is None else approx_median_locations(sketches)
     map=folium.Map()
-    for i in range(len(df_aux)):
-             folium.Marker(
-                 [df_aux.loc[i,'Restaurant_latitude'],df_aux.loc[i,'Restaurant_longitude']],
-                 popup=df_aux.loc[i,['City','Road_traffic_density']]).add_to(map)
+    for linha in df_aux.itertuples(index=False):
+        folium.Marker(
+            [linha.Restaurant_latitude,linha.Restaurant_longitude],
+            popup=f'{linha.City} - {linha.Road_traffic_density}').add_to(map)
     return map
-             
-# -------------------------------------- Inicio da Estratura Logica do codigo --------------------------------------
 
-# =====================================================
-# Carregando o arquivo
-# =====================================================
-df_raw=pd.read_csv("dataset/train.csv")
+def region_map(df,centro,raio_km,vizinhos):
+    """ Esta função retorna o mapa do filtro por região: os pedidos da região (pontos agrupados), o círculo da consulta e os restaurantes mais próximos do centro.
+    Input: dataframe da região; centro (latitude, longitude); raio em km; restaurantes mais próximos (utils.spatial.nearest)
+    Output: mapa
+    """
+    import folium
+    map=cluster_map(df)
+    folium.Circle(list(centro),radius=raio_km*1000,color='green',fill=False).add_to(map)
+    for linha in vizinhos.itertuples(index=False):
+        folium.Marker(
+            [linha.lat,linha.lon],
+            icon=folium.Icon(color='green',icon='cutlery'),
+            popup=f'{linha.distance_km:.2f} km - {linha.orders} pedidos').add_to(map)
+    map.fit_bounds([[centro[0]-raio_km/111,centro[1]-raio_km/111],[centro[0]+raio_km/111,centro[1]+raio_km/111]])
+    return map
+
+# -------------------------------------- Inicio da Estratura Logica do codigo --------------------------------------
 
 # =====================================================
-# Limpando os dados
+# Medição das etapas desta execução (painel de diagnóstico escondido: ?diagnostics=1)
 # =====================================================
-df=clean_data(df_raw)
+diagnostico=profiling.diagnostics_enabled(st.experimental_get_query_params())
+profiling.start_run('Visão Empresa',profile=diagnostico and profiling.take_profile_request(st.session_state))
 
 
 # VISÃO EMPRESA
@@ -187,50 +192,183 @@ data_slider=st.sidebar.slider(
     max_value=pd.datetime(2022,4,6),
     value=pd.datetime(2022,4,10),
     format='DD-MM-YYYY')
-linhas_selecionadas=df['Order_Date']<=data_slider
-df=df.loc[linhas_selecionadas,:]
 
 st.sidebar.markdown('---')
 traffic_selected=st.sidebar.multiselect(
     'Selecione os tipos de trânsito desejados:',
     ['Jam','Medium','High','Low'],
     default=['Jam','Medium','High','Low'])
-linhas_selecionadas=df['Road_traffic_density'].isin(traffic_selected)
-df=df.loc[linhas_selecionadas,:]
 
 st.sidebar.markdown('---')
+calculo=st.sidebar.radio(
+    'Modo de cálculo:',
+    ['Exato','Aproximado'],
+    help='Aproximado: entregadores únicos e medianas estimados pelos sketches pré-calculados por dia (ver utils/sketches.py)')
+
+st.sidebar.markdown('---')
+comparar=st.sidebar.checkbox(
+    'Comparar períodos',
+    help='Compara uma janela de datas com o período anterior nas métricas e no gráfico de pedidos por dia da Visão Gerencial; os demais gráficos seguem a data limite')
+if comparar:
+    janela=st.sidebar.slider(
+        'Janela:',
+        min_value=pd.datetime(2022,2,11),
+        max_value=pd.datetime(2022,4,6),
+        value=(pd.datetime(2022,3,30),pd.datetime(2022,4,6)),
+        format='DD-MM-YYYY')
+    modo_comparacao=st.sidebar.selectbox('Comparar com:',list(COMPARISONS),format_func=COMPARISONS.get)
+st.sidebar.markdown('---')
 st.sidebar.text('Powered by Camila Duarte',)
 
+# =====================================================
+# Carregando e limpando os dados (cache compartilhado, em segundo plano)
+# =====================================================
+# A barra lateral e o título já aparecem enquanto a carga acontece em uma thread, com uma barra de progresso
+st.header('Visão Empresa')
+progresso=st.empty()
+with profiling.section('load_data','load'):
+    # O índice das janelas só é montado quando o modo de comparação é usado
+    wait_for_data([('filter_index',build_filter_index),('cube',build_cube),('spatial_index',build_spatial_index)]
+                  +([('window_index',build_window_index)] if comparar else []),
+                  lambda fracao,etapa: progresso.progress(fracao,text=f'Carregando os dados: {etapa}'))
+    df_total=load_data()
+    filter_index=load_derived('filter_index',build_filter_index,update=update_filter_index)
+    # Colunas das agregações em paralelo na memória compartilhada, uma vez por versão (utils/parallel.py)
+    load_derived('shared_frame',share_frame)
+    cube=load_derived('cube',build_cube,update=update_cube)
+    spatial_index=load_derived('spatial_index',build_spatial_index)
+    window_index=load_derived('window_index',build_window_index) if comparar else None
+progresso.empty()
+
+with profiling.section('filter_orders','filter'):
+    # Filtro por data (busca binária) e por tráfego (bitmaps pré-calculados)
+    df=filter_orders(df_total,filter_index,data_slider,traffic_selected)
+    # Chave do cache de resultados: versão dos dados + estado dos filtros
+    filtro=filter_key(load_info()['version'],data_slider,traffic_selected)
+    # Os gráficos de contagem são respondidos pelo cubo diário, com os mesmos filtros
+    cube=filter_cube(cube,data_slider,traffic_selected)
+    # Modo aproximado: sketches por dia, tráfego e cidade, combinados na consulta
+    sketches=None
+    if calculo=='Aproximado':
+        sketches=filter_sketches(load_derived('sketches',build_sketches),data_slider,traffic_selected)
+    # Modo de comparação: as duas janelas saem das somas acumuladas, com custo constante por janela
+    comparacao=None
+    if comparar:
+        comparacao=compare_windows(window_index,janela[0],janela[1],modo_comparacao,traffic_selected,df_total,filter_index)
+
 # =====================================================
 # Layout Streamlit
 # =====================================================
 
-st.header('Visão Empresa')
-tab1,tab2,tab3=st.tabs(['Visão Gerencial','Visão Tática','Visão Geográfica'])
+# As abas são escolhidas por um seletor (e não por st.tabs, que executa o conteúdo de todas as abas
+# em cada interação): só a aba visível é calculada, e os resultados ficam no cache de resultados
+aba=st.radio('Aba:',['Visão Gerencial','Visão Tática','Visão Geográfica'],
+             horizontal=True,key='empresa_aba',label_visibility='collapsed')
 
-with tab1:
+if aba=='Visão Gerencial':
+    if comparacao is not None:
+        with st.container():
+            resumo=comparacao['summary']
+            anterior=comparacao['previous']
+            st.markdown(f"Janela de {janela[0]:%d-%m-%Y} a {janela[1]:%d-%m-%Y} x "
+                        f"{anterior['start']:%d-%m-%Y} a {anterior['end']:%d-%m-%Y}")
+            col1,col2,col3,col4=st.columns(4)
+            col1.metric('Pedidos',f"{resumo.loc['orders','current']:,.0f}",
+                        delta=format_delta(resumo.loc['orders','delta'],resumo.loc['orders','delta_pct'],0))
+            if pd.isna(resumo.loc['couriers','current']):
+                col2.metric('Entregadores ativos','-')
+                col3.metric('Pedidos por entregador','-')
+            else:
+                col2.metric('Entregadores ativos',f"{resumo.loc['couriers','current']:,.0f}",
+                            delta=format_delta(resumo.loc['couriers','delta'],resumo.loc['couriers','delta_pct'],0))
+                col3.metric('Pedidos por entregador',f"{resumo.loc['orders_per_courier','current']:.2f}",
+                            delta=format_delta(resumo.loc['orders_per_courier','delta']))
+            col4.metric('Tempo médio de entrega (min)',f"{resumo.loc['time_mean','current']:.2f}",
+                        delta=format_delta(resumo.loc['time_mean','delta']),delta_color='inverse')
     with st.container():     
-        graph=order_day(df)
-        st.plotly_chart(graph,use_container_width=True)
+        if comparacao is None:
+            graph=profiling.timed('order_day','figure',lambda: cached('order_day',filtro,lambda: order_day(df,cube)))
+        else:
+            graph=profiling.timed('order_day_compare','figure',
+                                  lambda: cached('order_day_compare',filtro+(janela,modo_comparacao),
+                                                 lambda: order_day_compare(window_index,comparacao,traffic_selected)))
+        with profiling.section('order_day','render'):
+            st.plotly_chart(graph,use_container_width=True)
         col1,col2=st.columns(2)
         with col1:
-            graph=order_traffic(df)
-            st.plotly_chart(graph,use_container_width=True)
+            graph=profiling.timed('order_traffic','figure',lambda: cached('order_traffic',filtro,lambda: order_traffic(df,cube)))
+            with profiling.section('order_traffic','render'):
+                st.plotly_chart(graph,use_container_width=True)
         with col2:
-            graph=order_traf_city(df)
-            st.plotly_chart(graph,use_container_width=True)
+            graph=profiling.timed('order_traf_city','figure',lambda: cached('order_traf_city',filtro,lambda: order_traf_city(df,cube)))
+            with profiling.section('order_traf_city','render'):
+                st.plotly_chart(graph,use_container_width=True)
             
-with tab2:
+elif aba=='Visão Tática':
     with st.container():
-        graph=order_week(df)
-        st.plotly_chart(graph,use_container_width=True)
+        graph=profiling.timed('order_week','figure',lambda: cached('order_week',filtro,lambda: order_week(df,cube)))
+        with profiling.section('order_week','render'):
+            st.plotly_chart(graph,use_container_width=True)
         
-        graph=order_deliver_week(df)
-        st.plotly_chart(graph,use_container_width=True)
+        graph=profiling.timed('order_deliver_week','figure',
+                              lambda: cached('order_deliver_week',filtro+(calculo,),lambda: order_deliver_week(df,cube,sketches)))
+        with profiling.section('order_deliver_week','render'):
+            st.plotly_chart(graph,use_container_width=True)
 
-with tab3:
+else:
     with st.container():
-        st.markdown('### Localização central dos pedidos por tráfego')        
-        fig=central_spot(df)
-        folium_static(fig)
-    
+        modo=st.radio('Mapa:',['Localização central','Todos os pedidos','Filtro por região'],horizontal=True)
+        if modo=='Localização central':
+            st.markdown('### Localização central dos pedidos por tráfego')
+            html=profiling.timed('central_spot','figure',
+                                 lambda: cached('central_spot',filtro+(calculo,),lambda: render_map(central_spot(df,sketches))))
+            with profiling.section('central_spot','render'):
+                components.html(html,height=510)
+        elif modo=='Todos os pedidos':
+            st.markdown('### Restaurantes e locais de entrega (pontos agrupados)')
+            html=profiling.timed('cluster_map','figure',lambda: cached('cluster_map',filtro,lambda: render_map(cluster_map(df))))
+            with profiling.section('cluster_map','render'):
+                components.html(html,height=510)
+        else:
+            st.markdown('### Pedidos por região (clique no mapa para escolher o centro)')
+            col1,col2,col3=st.columns(3)
+            with col1:
+                camada=st.radio('Coordenadas:',['Restaurantes','Locais de entrega'],horizontal=True)
+            with col2:
+                raio_km=st.slider('Raio (km):',min_value=1,max_value=200,value=25)
+            with col3:
+                k=st.number_input('Restaurantes mais próximos:',min_value=1,max_value=50,value=5)
+            centro=st.session_state.get('geo_centro',
+                                        (float(df_total['Restaurant_latitude'].median()),float(df_total['Restaurant_longitude'].median())))
+
+            # Consultas no índice espacial: só as células em volta do centro são verificadas
+            with profiling.section('radius_query','filter'):
+                posicoes,_=radius_query(spatial_index['restaurant' if camada=='Restaurantes' else 'delivery'],*centro,raio_km)
+                df_regiao=filter_orders(df_total,filter_index,data_slider,traffic_selected,posicoes=posicoes)
+                # Os pedidos de cada restaurante são contados com os mesmos filtros das métricas da região
+                vizinhos=nearest(spatial_index['restaurant'],*centro,k,
+                                 filtro=lambda p: filter_positions(filter_index,data_slider,traffic_selected,p))
+
+            col1,col2,col3=st.columns(3)
+            col1.metric('Pedidos na região',len(df_regiao))
+            col2.metric('Tempo médio (min)',f"{df_regiao['Time_taken(min)'].mean():.2f}" if len(df_regiao) else '-')
+            col3.metric('Distância média (km)',f"{df_regiao['distance_km'].mean():.2f}" if len(df_regiao) else '-')
+
+            mapa=profiling.timed('region_map','figure',lambda: region_map(df_regiao,centro,raio_km,vizinhos))
+            with profiling.section('region_map','render'):
+                from streamlit_folium import st_folium
+                saida=st_folium(mapa,height=500,width=700)
+            if saida and saida.get('last_clicked'):
+                clique=(saida['last_clicked']['lat'],saida['last_clicked']['lng'])
+                if clique!=centro:
+                    st.session_state['geo_centro']=clique
+                    st.experimental_rerun()
+            st.markdown('#### Restaurantes mais próximos do centro')
+            st.dataframe(vizinhos,use_container_width=True)
+
+# =====================================================
+# Fim da execução: etapas medidas e painel de diagnóstico
+# =====================================================
+run=profiling.finish_run()
+if diagnostico:
+    profiling.sidebar_panel(st.sidebar,'Visão Empresa',run)
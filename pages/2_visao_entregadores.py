@@ -1,11 +1,16 @@
 # Importando as bibliotecas necessárias
 import pandas as pd
-import numpy as np
-import plotly.express as px
-import regex as re
-import folium
 import streamlit as st
-from streamlit_folium import folium_static
+
+from utils import profiling
+from utils.filters import build_filter_index, filter_orders, update_filter_index
+from utils.leaderboard import (COLUMN_LABELS, PAGE_SIZE, SORT_COLS, build_courier_rollup, courier_city_means, courier_summary,
+                               leaderboard_page, update_courier_rollup)
+from utils.loader import load_data, load_derived, load_info, wait_for_data
+from utils.parallel import share_frame
+from utils.metrics import rating_by
+from utils.ranking import courier_means, top_k_by_group
+from utils.results_cache import cached, filter_key
 
 
 st.set_page_config(
@@ -19,87 +24,35 @@ st.set_page_config(
 # FUNÇÕES
 # =====================================================
 
-def clean_data(df):
-    
-    """ Esta função tem a responsabilidade de limpar o dataframe
-    Os tipos de limpeza que ela faz:
-    1. Exclui as linhas com valores nulos
-    2. Exclui os espaços vazios do conjunto de dados, exemplo: 'CARRO ' -> 'CARRO'
-    3. Converte os tipos das colunas para os formatos corretos
-    4. Limpa e converte a coluna 'Time_taken(min)
-    
-    Input: dataframe
-    Output: dataframe
-    """
-    
-    # Excluindo as linhas que possuem valor nulo:
-    cols=df.columns
-    for col in cols:
-        df=df.loc[df[col]!='NaN ']
-
-    # Excluindo os espaços vazios do meu conjunto de dados:
-    df['ID']=df.loc[:,'ID'].str.strip()
-    df['Delivery_person_ID']=df.loc[:,'Delivery_person_ID'].str.strip()
-    df['Road_traffic_density']=df.loc[:,'Road_traffic_density'].str.strip()
-    df['Type_of_order']=df.loc[:,'Type_of_order'].str.strip()
-    df['Type_of_vehicle']=df.loc[:,'Type_of_vehicle'].str.strip()
-    df['Festival']=df.loc[:,'Festival'].str.strip()
-    df['City']=df.loc[:,'City'].str.strip()
-
-    # Convertendo as colunas para os seus formatos corretos
-    df['Delivery_person_Age']=df['Delivery_person_Age'].astype(int)
-    df['Delivery_person_Ratings']=df['Delivery_person_Ratings'].astype(float)
-    df['Order_Date']=pd.to_datetime(df['Order_Date'],format='%d-%m-%Y')
-    df['multiple_deliveries']=df['multiple_deliveries'].astype(int)
-
-    # Limpando e convertendo a coluna 'Time_taken(min)'
-    df['Time_taken(min)']=df['Time_taken(min)'].apply(lambda x: x.split('(min) ')[1])
-    df['Time_taken(min)']=df['Time_taken(min)'].astype(int)
-
-    return df
-
-
-def rating_by (df,col):
-    """ Esta função tem como objetivo retornar a média e o desvio padrão das avaliações agrupadas por outro parâmetro (a ser escolhido pelo usuário).
-    Portanto:
-                
-    Input: dataframe; coluna a ser agrupada
-    Output: dataframe com média e desvio padrão
-    """
-    cols=['Delivery_person_Ratings',col]
-    rating=(df
-            .loc[:,cols]
-            .groupby(col)
-            .agg({'Delivery_person_Ratings':['mean','std']})
-            .reset_index())
-    rating.columns=[col,'Média da avaliação','Desvio Padrão da avaliação']
-    return rating
-
-def top_ten(df,arg):
-    """ Essa função tem como objetivo retornar os 10 entregadores mais rápidos ou mais lentos.
-    Input: dataframe; arg = 'maior' para mais rápido ou 'menor' para mais lento
-    Output: dataframe com o top 10
+def top_ten(df,arg,k=10,rank_by='pedido',rollup=None):
+    """ Essa função tem como objetivo retornar os 10 entregadores mais rápidos ou mais lentos de cada cidade.
+    Os dois extremos são calculados em uma única passada, com seleção parcial por cidade (ver utils/ranking.py).
+    No ranking por entregador, os tempos médios vêm do rollup por entregador quando ele é informado (ver utils/leaderboard.py).
+    Input: dataframe; arg = 'maior' para mais rápido, 'menor' para mais lento ou 'ambos' para os dois;
+           k = número de entregadores por cidade; rank_by = 'pedido' (tempo de cada pedido) ou 'entregador' (tempo médio do entregador);
+           rollup = rollup por entregador dos mesmos pedidos (opcional)
+    Output: dataframe com o top 10 (ou tupla (mais rápidos, mais lentos) quando arg = 'ambos')
     """
-    aux1=df.sort_values(['Time_taken(min)','City'],ascending = True).reset_index()
     cols=['City','Time_taken(min)','Delivery_person_ID']
-    if arg == 'maior':
-        aux2=aux1.loc[:,cols].groupby(['City']).head(10).reset_index(drop=True)
+    if rank_by == 'pedido':
+        aux=df
     else:
-        aux2=aux1.loc[:,cols].groupby(['City']).tail(10).reset_index(drop=True)
-    return aux2
+        aux=courier_means(df) if rollup is None else courier_city_means(rollup)
+    veloz,lento=top_k_by_group(aux,'City','Time_taken(min)',k=k,cols=cols)
+    if arg == 'maior':
+        return veloz
+    elif arg == 'menor':
+        return lento
+    return veloz,lento
 
 
 # -------------------------------------- Inicio da Estratura Logica do codigo --------------------------------------
 
 # =====================================================
-# Carregando o arquivo
+# Medição das etapas desta execução (painel de diagnóstico escondido: ?diagnostics=1)
 # =====================================================
-df_raw=pd.read_csv("dataset/train.csv")
-
-# =====================================================
-# Limpando os dados
-# =====================================================
-df=clean_data(df_raw)
+diagnostico=profiling.diagnostics_enabled(st.experimental_get_query_params())
+profiling.start_run('Visão Entregadores',profile=diagnostico and profiling.take_profile_request(st.session_state))
 
 
 # VISÃO ENTREGADORES
@@ -116,42 +69,64 @@ data_slider=st.sidebar.slider(
     max_value=pd.datetime(2022,4,6),
     value=pd.datetime(2022,4,10),
     format='DD-MM-YYYY')
-linhas_selecionadas=df['Order_Date']<=data_slider
-df=df.loc[linhas_selecionadas,:]
 
 st.sidebar.markdown('---')
 traffic_selected=st.sidebar.multiselect(
     'Selecione os tipos de trânsito desejados:',
     ['Jam','Medium','High','Low'],
     default=['Jam','Medium','High','Low'])
-linhas_selecionadas=df['Road_traffic_density'].isin(traffic_selected)
-df=df.loc[linhas_selecionadas,:]
-
 st.sidebar.markdown('---')
 st.sidebar.text('Powered by Camila Duarte',)
 
+# =====================================================
+# Carregando e limpando os dados (cache compartilhado, em segundo plano)
+# =====================================================
+# A barra lateral e o título já aparecem enquanto a carga acontece em uma thread, com uma barra de progresso
+st.header('Visão Entregadores')
+progresso=st.empty()
+with profiling.section('load_data','load'):
+    wait_for_data([('filter_index',build_filter_index),('courier_rollup',build_courier_rollup)],
+                  lambda fracao,etapa: progresso.progress(fracao,text=f'Carregando os dados: {etapa}'))
+    df=load_data()
+    filter_index=load_derived('filter_index',build_filter_index,update=update_filter_index)
+    # Colunas das agregações em paralelo na memória compartilhada, uma vez por versão (utils/parallel.py)
+    load_derived('shared_frame',share_frame)
+    # Rollup por entregador de todos os pedidos, atualizado a cada lote ingerido (utils/leaderboard.py)
+    courier_rollup=load_derived('courier_rollup',build_courier_rollup,update=update_courier_rollup)
+progresso.empty()
+
+with profiling.section('filter_orders','filter'):
+    # Filtro por data (busca binária) e por tráfego (bitmaps pré-calculados)
+    df=filter_orders(df,filter_index,data_slider,traffic_selected)
+    # Chave do cache de resultados: versão dos dados + estado dos filtros
+    filtro=filter_key(load_info()['version'],data_slider,traffic_selected)
+
+with profiling.section('courier_rollup','aggregation'):
+    # Sem filtros, o rollup da carga é usado direto; com filtros, o rollup dos pedidos filtrados fica no cache
+    if len(df)<len(load_data()):
+        courier_rollup=cached('courier_rollup',filtro,lambda: build_courier_rollup(df))
+    courier_resumo=cached('courier_summary',filtro,lambda: courier_summary(courier_rollup))
+
 # =====================================================
 # Layout Streamlit
 # =====================================================
 
-#st.markdown(#"""---""")
-st.header('Visão Entregadores')
 tab1,tab2,tab3=st.tabs(['Visão Gerencial','_','_'])
 
 with tab1:
     with st.container():
         st.markdown('## Métricas gerais')
         col1,col2,col3,col4=st.columns(4)
-        with col1:
+        with col1, profiling.section('maior_idade','aggregation'):
             maior_idade=df.loc[:,'Delivery_person_Age'].max()
             col1.metric('Maior idade',maior_idade)            
-        with col2:
+        with col2, profiling.section('menor_idade','aggregation'):
             menor_idade=df.loc[:,'Delivery_person_Age'].min()
             col2.metric('Menor idade',menor_idade)
-        with col3:
+        with col3, profiling.section('melhor_condicao','aggregation'):
             melhor_condicao=df.loc[:,'Vehicle_condition'].max()
             col3.metric('Melhor condição',melhor_condicao)            
-        with col4:
+        with col4, profiling.section('pior_condicao','aggregation'):
             pior_condicao=df.loc[:,'Vehicle_condition'].min()
             col4.metric('Pior condição',pior_condicao)   
             
@@ -159,33 +134,67 @@ with tab1:
         st.markdown('## Avaliações')
         col1,col2=st.columns(2)
         with col1:
-            st.markdown('#### Avaliação média por entregador')
-            avaliacao_media=(df
-                             .loc[:,['Delivery_person_ID','Delivery_person_Ratings']]
-                             .groupby('Delivery_person_ID')
-                             .mean()
-                             .reset_index())
-            avaliacao_media.columns=['ID do entregador','Avaliação média do entregador']
-            st.dataframe(avaliacao_media)
-        with col2:
             st.markdown('#### Avaliação média por tráfego')
-            rating_traf=rating_by(df,'Road_traffic_density')
-            st.dataframe(rating_traf)
-            
+            rating_traf=profiling.timed('rating_by_traffic','aggregation',
+                                        lambda: cached('rating_by',(filtro,'Road_traffic_density'),lambda: rating_by(df,'Road_traffic_density')))
+            with profiling.section('rating_by_traffic','render'):
+                st.dataframe(rating_traf)
+        with col2:
             st.markdown('#### Avaliação média por condição climática') 
-            rating_cond=rating_by(df,'Weatherconditions')
-            st.dataframe(rating_cond)
-                        
+            rating_cond=profiling.timed('rating_by_weather','aggregation',
+                                        lambda: cached('rating_by',(filtro,'Weatherconditions'),lambda: rating_by(df,'Weatherconditions')))
+            with profiling.section('rating_by_weather','render'):
+                st.dataframe(rating_cond)
+
+    with st.container():
+        st.markdown('## Ranking dos entregadores')
+        # Busca, ordenação e paginação feitas no servidor: só a página pedida vai para o navegador
+        volta_inicio=lambda: st.session_state.update(ranking_pagina=1)
+        col1,col2,col3,col4=st.columns([3,2,2,1])
+        with col1:
+            busca=st.text_input('Buscar pelo ID do entregador:',key='ranking_busca',on_change=volta_inicio)
+        with col2:
+            ordenar_por=st.selectbox('Ordenar por:',SORT_COLS,format_func=lambda x: COLUMN_LABELS[x],key='ranking_ordem',on_change=volta_inicio)
+        with col3:
+            decrescente=st.radio('Ordem:',[True,False],format_func=lambda x: 'Decrescente' if x else 'Crescente',
+                                 horizontal=True,key='ranking_decrescente',on_change=volta_inicio)
+        with col4:
+            tamanho=st.selectbox('Linhas:',[25,PAGE_SIZE,100],index=1,key='ranking_tamanho',on_change=volta_inicio)
+        pagina=st.session_state.get('ranking_pagina',1)
+        ranking=profiling.timed('leaderboard','aggregation',
+                                lambda: leaderboard_page(courier_rollup,courier_resumo,busca,ordenar_por,decrescente,pagina,tamanho))
+        # Uma busca com menos resultados pode deixar a página guardada além da última
+        st.session_state['ranking_pagina']=ranking['page']
+        with profiling.section('leaderboard','render'):
+            st.dataframe(ranking['rows'].rename(columns=COLUMN_LABELS),use_container_width=True,hide_index=True)
+            col1,col2=st.columns([1,4])
+            with col1:
+                st.number_input('Página:',min_value=1,max_value=ranking['pages'],key='ranking_pagina')
+            with col2:
+                st.caption(f"{ranking['total']:,} entregadores encontrados · página {ranking['page']} de {ranking['pages']}")
+
     with st.container():
         st.markdown('## Velocidade de entrega')
         col1,col2=st.columns(2)
         with col1:
-            st.markdown('#### Top 10 entregadores mais rápidos')                 
-            veloz=top_ten(df,'maior')
-            st.dataframe(veloz)
+            k=st.slider('Entregadores por cidade:',min_value=1,max_value=50,value=10)
         with col2:
-            st.markdown('#### Top 10 entregadores mais lentos')
-            lento=top_ten(df,'menor')
+            rank_by=st.radio('Ranking por:',['pedido','entregador'],
+                             format_func=lambda x: 'Tempo do pedido' if x == 'pedido' else 'Tempo médio do entregador',
+                             horizontal=True)
+        veloz,lento=profiling.timed('top_ten','aggregation',
+                                    lambda: cached('top_ten',(filtro,k,rank_by),lambda: top_ten(df,'ambos',k=k,rank_by=rank_by,rollup=courier_rollup)))
+        col1,col2=st.columns(2)
+        with col1, profiling.section('top_ten','render'):
+            st.markdown(f'#### Top {k} entregadores mais rápidos')                 
+            st.dataframe(veloz)
+        with col2, profiling.section('top_ten','render'):
+            st.markdown(f'#### Top {k} entregadores mais lentos')
             st.dataframe(lento)
-            
-        
\ No newline at end of file
+
+# =====================================================
+# Fim da execução: etapas medidas e painel de diagnóstico
+# =====================================================
+run=profiling.finish_run()
+if diagnostico:
+    profiling.sidebar_panel(st.sidebar,'Visão Entregadores',run)
@@ -1,11 +1,18 @@
 # Importando as bibliotecas necessárias
 import pandas as pd
-import numpy as np
-import plotly.express as px
 import streamlit as st
 import plotly.graph_objects as go
-from geopy.distance import distance
-from geopy import Point
+
+from utils import profiling
+from utils.figures import comparison_figure, sunburst_figure
+from utils.filters import build_filter_index, filter_orders, update_filter_index
+from utils.loader import load_data, load_derived, load_info, wait_for_data
+from utils.parallel import share_frame
+from utils.metrics import dist_media, distance_by_city, festival_stats, time_by_city, time_by_city_traffic, time_city_order
+from utils.percentiles import SLA_DIMS, SLA_MINUTES, build_time_histograms, filter_histograms, sla_breakdown, time_quantiles
+from utils.results_cache import cached, filter_key
+from utils.sketches import build_sketches, filter_sketches, sketch_nunique, sketch_quantiles
+from utils.windows import COMPARISONS, build_window_index, compare_windows, format_delta
 
 
 st.set_page_config(
@@ -19,98 +26,16 @@ st.set_page_config(
 # FUNÇÕES
 # =====================================================
 
-def clean_data(df):
-    
-    """ Esta função tem a responsabilidade de limpar o dataframe
-    Os tipos de limpeza que ela faz:
-    1. Exclui as linhas com valores nulos
-    2. Exclui os espaços vazios do conjunto de dados, exemplo: 'CARRO ' -> 'CARRO'
-    3. Converte os tipos das colunas para os formatos corretos
-    4. Limpa e converte a coluna 'Time_taken(min)
-    
-    Input: dataframe
-    Output: dataframe
-    """
-    
-    # Excluindo as linhas que possuem valor nulo:
-    cols=df.columns
-    for col in cols:
-        df=df.loc[df[col]!='NaN ']
-
-    # Excluindo os espaços vazios do meu conjunto de dados:
-    df['ID']=df.loc[:,'ID'].str.strip()
-    df['Delivery_person_ID']=df.loc[:,'Delivery_person_ID'].str.strip()
-    df['Road_traffic_density']=df.loc[:,'Road_traffic_density'].str.strip()
-    df['Type_of_order']=df.loc[:,'Type_of_order'].str.strip()
-    df['Type_of_vehicle']=df.loc[:,'Type_of_vehicle'].str.strip()
-    df['Festival']=df.loc[:,'Festival'].str.strip()
-    df['City']=df.loc[:,'City'].str.strip()
-
-    # Convertendo as colunas para os seus formatos corretos
-    df['Delivery_person_Age']=df['Delivery_person_Age'].astype(int)
-    df['Delivery_person_Ratings']=df['Delivery_person_Ratings'].astype(float)
-    df['Order_Date']=pd.to_datetime(df['Order_Date'],format='%d-%m-%Y')
-    df['multiple_deliveries']=df['multiple_deliveries'].astype(int)
-
-    # Limpando e convertendo a coluna 'Time_taken(min)'
-    df['Time_taken(min)']=df['Time_taken(min)'].apply(lambda x: x.split('(min) ')[1])
-    df['Time_taken(min)']=df['Time_taken(min)'].astype(int)
-
-    return df
-
-def dist_media(df,arg):
-    """
-    Esta função calcula a distância entre os restaurantes e os locais de entrega.
-    Esta função pode retornar 2 valores diferentes:
-        Input:
-            - df: dataframe
-            - arg: 'True' = retorna o valor do dataframe auxiliar; 'False' = retorna a distância média entre os pontos.
-        Output:
-            - aux: dataframe auxiliar contendo as colunas de distância para cada ponto
-            - dist_media: distância média entre os pontos em km     
-    Esta função calcula a distância média de cada entrega levando em consideração os pontos de latitude e longitude de cada restaurante e cada local de entrega. 
-    Esta função também cria uma coluna de pontos usando as latitudes e longitudes dos Restaurantes e outra para os locais de entrega. 
-    A partir desses pontos criados, a função calcula a distância entre os dois pontos (restaurantes e locais de entrega). 
-    Ao final, a função retorna um valor médio de todas as distâncias ou o dataframe auxiliar.             
-    """
-    aux=df.loc[:,['ID',
-                  'City',
-                  'Restaurant_latitude',
-                  'Restaurant_longitude',
-                  'Delivery_location_latitude',
-                  'Delivery_location_longitude']]
-    #Pontos geográficos dos restaurantes
-    aux['restaurant_location']=(aux.apply(lambda row:
-                                          Point(latitude=row['Restaurant_latitude'],
-                                                longitude=row['Restaurant_longitude']),
-                                          axis=1))      
-    #Pontos geográficos dos locais de entrega
-    aux['delivery_location']=(aux.apply(lambda row: 
-                                        Point(latitude=row['Delivery_location_latitude'],
-                                              longitude=row['Delivery_location_longitude']),
-                                        axis=1))
-    #Cálculo da distância em km entre os pontos
-    aux['distance_km']=aux.apply(lambda row: distance(row['restaurant_location'], row['delivery_location']).km, axis=1)
-    
-    if arg == 'False':
-        #Cálculo da média das distâncias com arredondamento de 2 casas decimais
-        dist_media=np.round(aux['distance_km'].mean(),2)
-        return dist_media
-    else:
-        return aux
-           
 def distance_city(df):
     """ 
     Esta função cria um gráfico de pizza com uma parte destacada para representar a distância média por cidade.
     As cores representam as cidades e a porção da pizza representa os valores das distâncias em porcentagem, ou seja, quanto cada cidade influencia na média.
-    Esta função utiliza a função dist_media para criar o dataframe aux.
+    As distâncias médias vêm da função distance_by_city (utils/metrics.py).
     
     Input: dataframe
     Output: gráfico de pizza com destaque
     """
-    cols=['distance_km','City']
-    aux=dist_media(df,'True')
-    aux2=aux.loc[:,cols].groupby(['City']).mean().reset_index()
+    aux2=distance_by_city(df)
     graph=go.Figure(data=[go.Pie(labels=aux2['City'],values=aux2['distance_km'],pull=[0,0.1,0])])
     return graph
     
@@ -126,12 +51,23 @@ def mean_time_city(df):
         - graph: gráfico de barras com barra de erro
                 
     """
-    cols = ['City','Time_taken(min)']
-    time_city=df.loc[:,cols].groupby('City').agg({'Time_taken(min)':['mean','std']}).reset_index()
-    time_city.columns=['City','mean_time','std_time']
+    import plotly.express as px
+    time_city=time_by_city(df)
     graph=px.bar(time_city,x='City',y='mean_time',error_y='std_time',color='City')
     return graph
                 
+def mean_time_city_compare(comparacao):
+    """ Esta função cria um gráfico de barras agrupadas com o tempo médio de entrega por cidade na janela
+    escolhida e no período de comparação (ver utils/windows.py).
+
+    Input: comparação (compare_windows)
+    Output: gráfico de barras agrupadas
+    """
+    por_cidade=comparacao['by_city']
+    graph=comparison_figure(por_cidade.index,por_cidade['time_mean'].to_numpy(),por_cidade['time_mean_prev'].to_numpy(),
+                            'Tempo médio de entrega por cidade','City','mean_time')
+    return graph
+
 def time_city_traffic (df):
     """
     Esta função cria um gráfico de Sunburst para representar o tempo médio de entrega para cada cidade e cada tipo de tráfego.
@@ -142,25 +78,57 @@ def time_city_traffic (df):
     Output:
         - graph: gráfico de sunburst
     """
-    time_city_traf=(df.loc[:,['City','Time_taken(min)','Road_traffic_density']]
-                    .groupby(['City','Road_traffic_density'])
-                    .agg({'Time_taken(min)':['mean','std']})
-                    .reset_index())
-    time_city_traf.columns=['City','Road_traffic_density','mean_time','std_time']
-    graph=px.sunburst(time_city_traf,path=['City','Road_traffic_density'],values='mean_time',color='mean_time')
+    time_city_traf=time_by_city_traffic(df)
+    graph=sunburst_figure(time_city_traf['City'],time_city_traf['Road_traffic_density'],time_city_traf['mean_time'],
+                          value_title='mean_time')
     return graph
+
+def time_percentiles(df,sketches=None,histograms=None):
+    """ Esta função retorna a mediana e os percentis 90 e 95 do tempo de entrega por cidade.
+    No modo aproximado (sketches filtrados informados) os percentis vêm da combinação dos sketches KLL
+    das células de cada cidade (ver utils/sketches.py); no modo exato, dos histogramas dos minutos
+    de entrega (ver utils/percentiles.py), quando informados.
+    Input: dataframe; sketches filtrados (opcional); histogramas filtrados (opcional)
+    Output: dataframe com a cidade e os percentis
+    """
+    quantis=[0.5,0.9,0.95]
+    if sketches is not None:
+        percentis=sketch_quantiles(sketches,'time',quantis,'City')
+    elif histograms is not None:
+        percentis=time_quantiles(histograms,['City'],quantis)
+    else:
+        percentis=df.groupby('City',observed=True)['Time_taken(min)'].quantile(quantis).unstack()
+    percentis.columns=['p50','p90','p95']
+    return percentis.reset_index()
+
+def sla_charts(quadro,dims,limite):
+    """ Esta função cria os gráficos do quadro de SLA:
+    - barras agrupadas com os percentis do tempo de entrega de cada grupo
+    - barras com o percentual de pedidos acima do limite de SLA em cada grupo
+    Os grupos são as combinações das dimensões escolhidas (ver utils.percentiles.sla_breakdown).
+    
+    Input: quadro de SLA; dimensões escolhidas; limite em minutos
+    Output: tupla (gráfico dos percentis, gráfico do percentual acima do limite)
+    """
+    import plotly.express as px
+    aux=quadro.reset_index()
+    aux['grupo']=aux[dims].astype(str).agg(' - '.join,axis=1) if dims else 'Total'
+    percentis=[c for c in quadro.columns if c.startswith('p') and c!='pct_over']
+    graph1=px.bar(aux,x='grupo',y=percentis,barmode='group',
+                  labels={'value':'Tempo de entrega (min)','variable':'Percentil','grupo':''},
+                  title='Percentis do tempo de entrega')
+    graph2=px.bar(aux,x='grupo',y='pct_over',color='pct_over',
+                  labels={'pct_over':'% acima do limite','grupo':''},
+                  title=f'Pedidos acima de {limite} minutos (%)')
+    return graph1,graph2
             
 # -------------------------------------- Inicio da Estrutura Logica do codigo --------------------------------------
 
 # =====================================================
-# Carregando o arquivo
+# Medição das etapas desta execução (painel de diagnóstico escondido: ?diagnostics=1)
 # =====================================================
-df_raw=pd.read_csv("dataset/train.csv")
-
-# =====================================================
-# Limpando os dados
-# =====================================================
-df=clean_data(df_raw)
+diagnostico=profiling.diagnostics_enabled(st.experimental_get_query_params())
+profiling.start_run('Visão Restaurantes',profile=diagnostico and profiling.take_profile_request(st.session_state))
 
 
 # VISÃO RESTAURANTES
@@ -177,78 +145,196 @@ data_slider=st.sidebar.slider(
     max_value=pd.datetime(2022,4,6),
     value=pd.datetime(2022,4,10),
     format='DD-MM-YYYY')
-linhas_selecionadas=df['Order_Date']<=data_slider
-df=df.loc[linhas_selecionadas,:]
 
 st.sidebar.markdown('---')
 traffic_selected=st.sidebar.multiselect(
     'Selecione os tipos de trânsito desejados:',
     ['Jam','Medium','High','Low'],
     default=['Jam','Medium','High','Low'])
-linhas_selecionadas=df['Road_traffic_density'].isin(traffic_selected)
-df=df.loc[linhas_selecionadas,:]
 
 st.sidebar.markdown('---')
+calculo=st.sidebar.radio(
+    'Modo de cálculo:',
+    ['Exato','Aproximado'],
+    help='Aproximado: entregadores únicos e percentis estimados pelos sketches pré-calculados por dia (ver utils/sketches.py)')
+
+st.sidebar.markdown('---')
+comparar=st.sidebar.checkbox(
+    'Comparar períodos',
+    help='Compara uma janela de datas com o período anterior nas métricas da Visão Gerencial e no tempo médio por cidade; os demais gráficos seguem a data limite')
+if comparar:
+    janela=st.sidebar.slider(
+        'Janela:',
+        min_value=pd.datetime(2022,2,11),
+        max_value=pd.datetime(2022,4,6),
+        value=(pd.datetime(2022,3,30),pd.datetime(2022,4,6)),
+        format='DD-MM-YYYY')
+    modo_comparacao=st.sidebar.selectbox('Comparar com:',list(COMPARISONS),format_func=COMPARISONS.get)
+st.sidebar.markdown('---')
 st.sidebar.text('Powered by Camila Duarte',)
 
+# =====================================================
+# Carregando e limpando os dados (cache compartilhado, em segundo plano)
+# =====================================================
+# A barra lateral e o título já aparecem enquanto a carga acontece em uma thread, com uma barra de progresso
+st.header('Visão Restaurantes')
+progresso=st.empty()
+with profiling.section('load_data','load'):
+    # O índice das janelas só é montado quando o modo de comparação é usado
+    wait_for_data([('filter_index',build_filter_index),('time_histograms',build_time_histograms)]
+                  +([('window_index',build_window_index)] if comparar else []),
+                  lambda fracao,etapa: progresso.progress(fracao,text=f'Carregando os dados: {etapa}'))
+    df=load_data()
+    filter_index=load_derived('filter_index',build_filter_index,update=update_filter_index)
+    # Colunas das agregações em paralelo na memória compartilhada, uma vez por versão (utils/parallel.py)
+    load_derived('shared_frame',share_frame)
+    time_histograms=load_derived('time_histograms',build_time_histograms)
+    # Modo de comparação: as duas janelas saem das somas acumuladas, com custo constante por janela
+    comparacao=None
+    if comparar:
+        comparacao=compare_windows(load_derived('window_index',build_window_index),janela[0],janela[1],modo_comparacao,
+                                   traffic_selected,df,filter_index)
+progresso.empty()
+
+with profiling.section('filter_orders','filter'):
+    # Filtro por data (busca binária) e por tráfego (bitmaps pré-calculados)
+    df=filter_orders(df,filter_index,data_slider,traffic_selected)
+    # Chave do cache de resultados: versão dos dados + estado dos filtros
+    filtro=filter_key(load_info()['version'],data_slider,traffic_selected)
+    # Percentis e SLA: histogramas dos minutos de entrega por célula, com os mesmos filtros
+    time_histograms=filter_histograms(time_histograms,data_slider,traffic_selected)
+    # Modo aproximado: sketches por dia, tráfego e cidade, combinados na consulta
+    sketches=None
+    if calculo=='Aproximado':
+        sketches=filter_sketches(load_derived('sketches',build_sketches),data_slider,traffic_selected)
+
 # =====================================================
 # Layout Streamlit
 # =====================================================
 
-#st.markdown(#"""---""")
-st.header('Visão Restaurantes')
-tab1,tab2,tab3=st.tabs(['Visão Gerencial','_','_'])
+# As abas são escolhidas por um seletor (e não por st.tabs, que executa o conteúdo de todas as abas
+# em cada interação): só a aba visível é calculada, e os resultados ficam no cache de resultados
+aba=st.radio('Aba:',['Visão Gerencial','Tempo de entrega','Visão SLA'],
+             horizontal=True,key='restaurantes_aba',label_visibility='collapsed')
 
-with tab1:
+if aba=='Visão Gerencial' and comparacao is not None:
     with st.container():
+        # As mesmas métricas calculadas na janela, com a diferença para o período de comparação
+        resumo=comparacao['summary']
+        festival=comparacao['by_festival']
+        anterior=comparacao['previous']
+        st.markdown(f"Janela de {janela[0]:%d-%m-%Y} a {janela[1]:%d-%m-%Y} x "
+                    f"{anterior['start']:%d-%m-%Y} a {anterior['end']:%d-%m-%Y}")
         col1,col2,col3,col4,col5,col6=st.columns(6)
-        with col1:
-            entregador_unico=df['Delivery_person_ID'].nunique()
+        col1.metric('Entregadores únicos','-' if pd.isna(resumo.loc['couriers','current']) else f"{resumo.loc['couriers','current']:.0f}",
+                    delta=format_delta(resumo.loc['couriers','delta'],resumo.loc['couriers','delta_pct'],0))
+        col2.metric('Distância média',f"{resumo.loc['distance_mean','current']:.2f}",
+                    delta=format_delta(resumo.loc['distance_mean','delta']),delta_color='off')
+        for col,rotulo,valor,medida in [(col3,'Tempo médio de entrega com Festival','Yes','time_mean'),
+                                        (col4,'Desvio padrão com Festival','Yes','time_std'),
+                                        (col5,'Tempo médio de entrega sem Festival','No','time_mean'),
+                                        (col6,'Desvio padrão do tempo de entrega sem Festival','No','time_std')]:
+            if valor in festival.index:
+                col.metric(rotulo,f"{festival.loc[valor,medida]:.2f}",
+                           delta=format_delta(festival.loc[valor,f'{medida}_delta']),delta_color='inverse')
+            else:
+                col.metric(rotulo,'-')
+
+    st.markdown("""---""")
+    with st.container():
+        st.markdown('Distância média por cidade')
+        fig=profiling.timed('distance_city','figure',lambda: cached('distance_city',filtro,lambda: distance_city(df)))
+        with profiling.section('distance_city','render'):
+            st.plotly_chart(fig,use_container_width=True)
+
+elif aba=='Visão Gerencial':
+    with st.container():
+        col1,col2,col3,col4,col5,col6=st.columns(6)
+        with col1, profiling.section('entregadores_unicos','aggregation'):
+            if sketches is None:
+                entregador_unico=cached('entregadores_unicos',filtro,lambda: df['Delivery_person_ID'].nunique())
+            else:
+                entregador_unico=sketch_nunique(sketches)
             col1.metric('Entregadores únicos',entregador_unico)
-        with col2:
-            distancia=dist_media(df,'False')
+        with col2, profiling.section('dist_media','aggregation'):
+            distancia=cached('dist_media',(filtro,'False'),lambda: dist_media(df,'False'))
             col2.metric('Distância média',distancia)
-        with col3:
-            festival=df.loc[df['Festival']=='Yes']
-            tempo_c_festival=np.round(festival['Time_taken(min)'].mean(),2)
-            col3.metric('Tempo médio de entrega com Festival',tempo_c_festival)
-        with col4:
-            festival=df.loc[df['Festival']=='Yes']
-            std_c_festival=np.round(festival['Time_taken(min)'].std(),2)
-            col4.metric('Desvio padrão com Festival',std_c_festival)
-        with col5:
-            festival=df.loc[df['Festival']=='No']
-            tempo_s_festival=np.round(festival['Time_taken(min)'].mean(),2)
-            col5.metric('Tempo médio de entrega sem Festival',tempo_s_festival)
-        with col6:
-            festival=df.loc[df['Festival']=='No']
-            std_s_festival=np.round(festival['Time_taken(min)'].std(),2)
-            col6.metric('Desvio padrão do tempo de entrega sem Festival',std_s_festival)
+        # As quatro métricas de festival saem de uma única agregação
+        festival=profiling.timed('festival_stats','aggregation',lambda: cached('festival_stats',filtro,lambda: festival_stats(df)))
+        col3.metric('Tempo médio de entrega com Festival',festival.loc['Yes','mean'])
+        col4.metric('Desvio padrão com Festival',festival.loc['Yes','std'])
+        col5.metric('Tempo médio de entrega sem Festival',festival.loc['No','mean'])
+        col6.metric('Desvio padrão do tempo de entrega sem Festival',festival.loc['No','std'])
     
     st.markdown("""---""")
     with st.container():
         st.markdown('Distância média por cidade')
-        fig=distance_city(df)
-        st.plotly_chart(fig,use_container_width=True)
-    
-    st.markdown("""---""")
+        fig=profiling.timed('distance_city','figure',lambda: cached('distance_city',filtro,lambda: distance_city(df)))
+        with profiling.section('distance_city','render'):
+            st.plotly_chart(fig,use_container_width=True)
+
+elif aba=='Tempo de entrega':
     with st.container():
         col1,col2=st.columns(2)
         with col1:
             st.markdown('Tempo médio de entrega por cidade')
-            fig=mean_time_city(df)
-            st.plotly_chart(fig,use_container_width=True)
+            if comparacao is None:
+                fig=profiling.timed('mean_time_city','figure',lambda: cached('mean_time_city',filtro,lambda: mean_time_city(df)))
+            else:
+                # Janela x período de comparação: métricas por cidade com a diferença e barras agrupadas
+                por_cidade=comparacao['by_city']
+                colunas=st.columns(max(len(por_cidade),1))
+                for col,(cidade,linha) in zip(colunas,por_cidade.iterrows()):
+                    col.metric(str(cidade),'-' if pd.isna(linha['time_mean']) else f"{linha['time_mean']:.2f}",
+                               delta=format_delta(linha['time_mean_delta']),delta_color='inverse')
+                fig=profiling.timed('mean_time_city_compare','figure',lambda: mean_time_city_compare(comparacao))
+            with profiling.section('mean_time_city','render'):
+                st.plotly_chart(fig,use_container_width=True)
         with col2:
             st.markdown('Tempo médio de entrega por tipo de pedido')
-            time_city_order=(df.loc[:,['City','Time_taken(min)','Type_of_order']]
-                             .groupby(['City','Type_of_order'])
-                             .agg({'Time_taken(min)':['mean','std']}))
-            time_city_order.columns=['mean_time','std_time']
+            tabela=profiling.timed('time_city_order','aggregation',
+                                   lambda: cached('time_city_order',filtro,lambda: time_city_order(df)))
             
-            st.dataframe(time_city_order.reset_index())
+            with profiling.section('time_city_order','render'):
+                st.dataframe(tabela)
+    
+    st.markdown("""---""")
+    with st.container():
+        st.markdown('Percentis do tempo de entrega por cidade')
+        percentis=profiling.timed('time_percentiles','aggregation',
+                                  lambda: cached('time_percentiles',filtro+(calculo,),lambda: time_percentiles(df,sketches,time_histograms)))
+        with profiling.section('time_percentiles','render'):
+            st.dataframe(percentis)
     
     st.markdown("""---""")
     with st.container():
         st.markdown('Tempo médio por cidade e por tráfego')
-        fig=time_city_traffic(df)
-        st.plotly_chart(fig,use_container_width=True,theme=None)
\ No newline at end of file
+        fig=profiling.timed('time_city_traffic','figure',lambda: cached('time_city_traffic',filtro,lambda: time_city_traffic(df)))
+        with profiling.section('time_city_traffic','render'):
+            st.plotly_chart(fig,use_container_width=True,theme=None)
+
+else:
+    with st.container():
+        col1,col2=st.columns(2)
+        with col1:
+            dims=st.multiselect('Agrupar por:',SLA_DIMS,default=['City','Road_traffic_density'])
+        with col2:
+            limite=st.slider('Limite de SLA (minutos):',min_value=10,max_value=60,value=SLA_MINUTES)
+        quadro=profiling.timed('sla_breakdown','aggregation',
+                               lambda: cached('sla_breakdown',filtro+(tuple(dims),limite),lambda: sla_breakdown(time_histograms,dims,limite)))
+        fig1,fig2=profiling.timed('sla_charts','figure',lambda: sla_charts(quadro,dims,limite))
+        with profiling.section('sla_charts','render'):
+            st.plotly_chart(fig1,use_container_width=True)
+            st.plotly_chart(fig2,use_container_width=True)
+    
+    st.markdown("""---""")
+    with st.container():
+        st.markdown('Quadro de SLA')
+        st.dataframe(quadro.reset_index())
+
+# =====================================================
+# Fim da execução: etapas medidas e painel de diagnóstico
+# =====================================================
+run=profiling.finish_run()
+if diagnostico:
+    profiling.sidebar_panel(st.sidebar,'Visão Restaurantes',run)
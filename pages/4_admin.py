@@ -0,0 +1,80 @@
+# Importando as bibliotecas necessárias
+import pandas as pd
+import streamlit as st
+
+from utils import results_cache
+from utils.ingest import ingest_batch, load_aggregates, moments_summary
+from utils.loader import load_info
+
+
+st.set_page_config(
+    page_title='Admin',
+    page_icon="🛠",
+	layout='wide'
+)
+
+
+# -------------------------------------- Inicio da Estrutura Logica do codigo --------------------------------------
+
+# ADMIN
+
+# =====================================================
+# Barra lateral
+# =====================================================
+st.sidebar.markdown('# Cury Company')
+st.sidebar.markdown('### Fastest Delivery in Town',)
+st.sidebar.markdown('---')
+orcamento_mb=st.sidebar.number_input(
+    'Orçamento do cache de resultados (MB):',
+    min_value=1,
+    value=int(results_cache.cache_stats()['max_bytes']/2**20))
+if st.sidebar.button('Aplicar orçamento'):
+    results_cache.configure(orcamento_mb*2**20)
+if st.sidebar.button('Limpar cache de resultados'):
+    results_cache.clear()
+
+st.sidebar.markdown('---')
+st.sidebar.text('Powered by Camila Duarte',)
+
+# =====================================================
+# Layout Streamlit
+# =====================================================
+
+st.header('Admin')
+
+with st.container():
+    st.markdown('## Cache de resultados')
+    stats=results_cache.cache_stats()
+    col1,col2,col3,col4,col5=st.columns(5)
+    col1.metric('Acertos',stats['hits'])
+    col2.metric('Faltas',stats['misses'])
+    col3.metric('Taxa de acerto',f"{stats['hit_rate']:.1%}")
+    col4.metric('Remoções (LRU)',stats['evictions'])
+    col5.metric('Memória usada',f"{stats['bytes']/2**20:.1f} / {stats['max_bytes']/2**20:.0f} MB")
+
+    st.markdown('#### Entradas (da usada há mais tempo para a mais recente)')
+    st.dataframe(results_cache.cache_entries(),use_container_width=True)
+
+st.markdown("""---""")
+with st.container():
+    st.markdown('## Carga dos dados')
+    st.dataframe(pd.Series(load_info(),name='valor').astype(str))
+
+st.markdown("""---""")
+with st.container():
+    st.markdown('## Ingestão de novos pedidos')
+    lote=st.file_uploader('Lote de pedidos (CSV no formato de dataset/train.csv)',type='csv')
+    if lote is not None and st.button('Ingerir lote'):
+        resultado=ingest_batch(lote)
+        st.success(f"{resultado['rows']} pedidos ingeridos "
+                   f"({resultado['duplicates']} duplicados e {resultado['dropped']} inválidos descartados) "
+                   f"em {resultado['clean_s']+resultado['append_s']:.2f}s")
+
+    agregados=load_aggregates()
+    col1,col2=st.columns(2)
+    with col1:
+        st.markdown('#### Pedidos por dia')
+        st.bar_chart(agregados['daily_counts'])
+    with col2:
+        st.markdown('#### Tempo de entrega por cidade')
+        st.dataframe(moments_summary(agregados['city_time']))
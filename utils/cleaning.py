@@ -0,0 +1,145 @@
+# Importando as bibliotecas necessárias
+import numpy as np
+import pandas as pd
+
+
+# Valor usado no arquivo original para representar dados faltantes
+NULL_VALUE='NaN '
+
+# Colunas de texto que possuem espaços vazios no final
+STRIP_COLS=['ID',
+            'Delivery_person_ID',
+            'Road_traffic_density',
+            'Type_of_order',
+            'Type_of_vehicle',
+            'Festival',
+            'City']
+
+# Colunas com um valor diferente por linha: não compensa converter pelos valores únicos
+HIGH_CARDINALITY_COLS=['ID']
+
+# Colunas de texto com poucos valores distintos, guardadas como 'category'
+CATEGORY_COLS=['Delivery_person_ID',
+               'Road_traffic_density',
+               'Type_of_order',
+               'Type_of_vehicle',
+               'Festival',
+               'City',
+               'Weatherconditions',
+               'Time_Orderd',
+               'Time_Order_picked']
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def _by_unique(values,convert,as_category=False):
+    """ Esta função aplica uma conversão apenas nos valores únicos de uma coluna e depois
+    expande o resultado para todas as linhas.
+    As colunas do conjunto de dados têm poucos valores distintos (cidades, tráfego, idades,
+    datas, tempos...), então o custo da conversão passa a ser O(valores únicos) e não O(linhas).
+
+    Input: array da coluna; função que recebe e retorna uma Series; se o resultado deve ser 'category'
+    Output: array convertido (ou Categorical)
+    """
+    codes,uniques=pd.factorize(values)
+    if len(codes) and codes.min()<0:
+        # Os nulos recebem o código -1, que aponta para o último valor adicionado aqui
+        uniques=np.append(uniques.astype(object),np.nan)
+    convertido=convert(pd.Series(uniques,dtype=object))
+    if as_category:
+        # Valores que ficam iguais após a conversão ('Jam' e 'Jam ') viram uma única categoria
+        return pd.Categorical(convertido).take(codes)
+    return convertido.to_numpy()[codes]
+
+def _narrow_int(s,dtype):
+    """ Converte para um tipo inteiro menor, verificando se os valores cabem nele """
+    s=s.astype('int64')
+    limites=np.iinfo(dtype)
+    if len(s) and (s.min()<limites.min or s.max()>limites.max):
+        raise ValueError(f'valores fora do intervalo do tipo {dtype}: [{s.min()}, {s.max()}]')
+    return s.astype(dtype)
+
+def _time_taken(s):
+    """ Limpa e converte os valores '(min) 24' -> 24 """
+    return _narrow_int(s.str.split('(min) ',regex=False).str[1],'int16')
+
+def _order_date(s):
+    """ Converte os valores '19-03-2022' para datas """
+    return pd.to_datetime(s,format='%d-%m-%Y')
+
+# Conversões de tipo aplicadas após a limpeza: coluna -> função
+CONVERTERS={'Delivery_person_Age':lambda s: _narrow_int(s,'int8'),
+            'Delivery_person_Ratings':lambda s: s.astype('float64'),
+            'Order_Date':_order_date,
+            'Vehicle_condition':lambda s: _narrow_int(s,'int8'),
+            'multiple_deliveries':lambda s: _narrow_int(s,'int8'),
+            'Time_taken(min)':_time_taken}
+
+def clean_data(df):
+
+    """ Esta função tem a responsabilidade de limpar o dataframe
+    Os tipos de limpeza que ela faz:
+    1. Exclui as linhas com valores nulos
+    2. Exclui os espaços vazios do conjunto de dados, exemplo: 'CARRO ' -> 'CARRO'
+    3. Converte os tipos das colunas para os formatos corretos
+    4. Limpa e converte a coluna 'Time_taken(min)
+    5. Guarda as colunas de texto com poucos valores como 'category' e os inteiros em tipos menores (int8/int16)
+
+    A limpeza é feita em uma única passada: uma máscara de nulos combinada para todas as
+    colunas, um único filtro por coluna e as conversões feitas sobre os valores únicos.
+    O dataframe de entrada não é alterado.
+
+    Input: dataframe
+    Output: dataframe
+    """
+
+    # Máscara única com as linhas que não possuem valor nulo:
+    linhas_validas=np.ones(len(df),dtype=bool)
+    for col in df.columns:
+        values=df[col].to_numpy()
+        if values.dtype==object:
+            linhas_validas&=(values!=NULL_VALUE)
+
+    # Filtrando, excluindo os espaços vazios e convertendo cada coluna uma única vez:
+    colunas={}
+    for col in df.columns:
+        values=df[col].to_numpy()[linhas_validas]
+        if col in HIGH_CARDINALITY_COLS:
+            values=pd.Series(values,dtype=object).str.strip().to_numpy()
+        elif col in STRIP_COLS:
+            values=_by_unique(values,lambda s: s.str.strip(),as_category=col in CATEGORY_COLS)
+        elif col in CATEGORY_COLS:
+            values=_by_unique(values,lambda s: s,as_category=True)
+        if col in CONVERTERS and values.dtype==object:
+            values=_by_unique(values,CONVERTERS[col])
+        elif col in CONVERTERS:
+            values=CONVERTERS[col](pd.Series(values)).to_numpy()
+        colunas[col]=values
+
+    return pd.DataFrame(colunas,index=df.index[linhas_validas])
+
+def concat_cleaned(frames):
+    """ Esta função concatena dataframes já limpos mantendo as colunas 'category'.
+    O pd.concat converte para texto as colunas com categorias diferentes, então as categorias
+    são unidas (em ordem alfabética) antes; um dataframe cujas categorias já são as da união não é recodificado.
+
+    Input: lista de dataframes limpos
+    Output: dataframe concatenado
+    """
+    frames=[df for df in frames if df is not None]
+    if len(frames)==1:
+        return frames[0]
+    frames=list(frames)
+    for col in frames[0].columns:
+        if not isinstance(frames[0][col].dtype,pd.CategoricalDtype):
+            continue
+        categorias=frames[0][col].cat.categories
+        for df in frames[1:]:
+            categorias=categorias.union(df[col].astype('category').cat.categories)
+        tipo=pd.CategoricalDtype(categorias.sort_values())
+        for i,df in enumerate(frames):
+            if df[col].dtype!=tipo:
+                frames[i]=df.assign(**{col:df[col].astype(tipo)})
+    return pd.concat(frames)
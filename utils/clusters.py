@@ -0,0 +1,118 @@
+# Importando as bibliotecas necessárias
+import numpy as np
+import pandas as pd
+
+from utils.geo import DELIVERY_COLS, RESTAURANT_COLS
+
+
+# Número máximo de marcadores por camada do mapa: acima disso os pontos são agrupados em células maiores
+MAX_MARKERS=1_000
+
+# Camadas do mapa com todos os pedidos: nome -> (colunas de coordenadas, cor)
+POINT_LAYERS={'Restaurantes':(RESTAURANT_COLS,'red'),
+              'Locais de entrega':(DELIVERY_COLS,'blue')}
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def grid_clusters(lat,lon,cell_deg):
+    """ Esta função agrupa os pontos em uma grade regular de células de cell_deg graus.
+    Cada célula vira um único ponto: o centroide dos seus pontos, com o número de pontos.
+
+    Input: arrays de latitude e longitude (em graus); tamanho da célula em graus
+    Output: dataframe com as colunas 'lat', 'lon' e 'n', uma linha por célula ocupada
+    """
+    lat=np.asarray(lat,dtype='float64')
+    lon=np.asarray(lon,dtype='float64')
+    linha=np.floor((lat+90)/cell_deg).astype('int64')
+    coluna=np.floor((lon+180)/cell_deg).astype('int64')
+    chave=linha*(int(360/cell_deg)+1)+coluna
+    _,cell=np.unique(chave,return_inverse=True)
+    n=np.bincount(cell)
+    return pd.DataFrame({'lat':np.bincount(cell,weights=lat)/n,
+                         'lon':np.bincount(cell,weights=lon)/n,
+                         'n':n})
+
+def adaptive_clusters(lat,lon,max_markers=MAX_MARKERS):
+    """ Esta função escolhe o tamanho da célula da grade para que o número de grupos caiba em max_markers.
+    A célula começa com a área dos pontos dividida por max_markers e dobra de tamanho (como os níveis
+    de uma quadtree) até o número de células ocupadas caber no limite.
+    Pontos com coordenadas inválidas (0, 0) são descartados.
+
+    Input: arrays de latitude e longitude (em graus); número máximo de grupos
+    Output: dataframe com as colunas 'lat', 'lon' e 'n' (grid_clusters)
+    """
+    lat=np.asarray(lat,dtype='float64')
+    lon=np.asarray(lon,dtype='float64')
+    validos=np.isfinite(lat)&np.isfinite(lon)&~((lat==0)&(lon==0))
+    lat,lon=lat[validos],lon[validos]
+    if len(lat)==0:
+        return pd.DataFrame({'lat':[],'lon':[],'n':[]})
+
+    area=max(np.ptp(lat),1e-6)*max(np.ptp(lon),1e-6)
+    cell_deg=np.sqrt(area/max_markers)
+    grupos=grid_clusters(lat,lon,cell_deg)
+    while len(grupos)>max_markers:
+        cell_deg*=2
+        grupos=grid_clusters(lat,lon,cell_deg)
+    return grupos
+
+def median_locations(df,by=None):
+    """ Esta função calcula, em uma única agregação, a mediana da latitude e da longitude dos restaurantes por grupo.
+
+    Input: dataframe; colunas dos grupos (padrão: cidade e tipo de tráfego)
+    Output: dataframe com as colunas dos grupos e as medianas das coordenadas
+    """
+    by=['City','Road_traffic_density'] if by is None else by
+    return (df
+            .loc[:,by+RESTAURANT_COLS]
+            .groupby(by,observed=True)
+            .median()
+            .sort_index()
+            .reset_index())
+
+def cluster_map(df,max_markers=MAX_MARKERS):
+    """ Esta função cria o mapa com todos os pedidos: uma camada com os restaurantes e outra com os locais de entrega.
+    Os pontos são agrupados no servidor (adaptive_clusters), então o navegador recebe no máximo
+    max_markers marcadores por camada, qualquer que seja o número de pedidos. O tamanho de cada
+    marcador cresce com o número de pedidos do grupo.
+
+    Input: dataframe; número máximo de marcadores por camada
+    Output: mapa
+    """
+    # O folium só é importado quando um mapa é montado (a importação leva quase 1 s)
+    import folium
+    map=folium.Map(tiles='cartodbpositron')
+    limites=[]
+    for nome,(cols,cor) in POINT_LAYERS.items():
+        grupos=adaptive_clusters(df[cols[0]].to_numpy(),df[cols[1]].to_numpy(),max_markers)
+        camada=folium.FeatureGroup(name=f'{nome} ({len(grupos)} grupos)')
+        raios=3+2*np.log2(grupos['n'].to_numpy())
+        for lat,lon,n,raio in zip(grupos['lat'],grupos['lon'],grupos['n'],raios):
+            folium.CircleMarker([lat,lon],
+                                radius=float(raio),
+                                color=cor,
+                                fill=True,
+                                fill_opacity=0.5,
+                                weight=1,
+                                tooltip=f'{nome}: {int(n)} pedidos').add_to(camada)
+        camada.add_to(map)
+        if len(grupos):
+            limites+=[[grupos['lat'].min(),grupos['lon'].min()],[grupos['lat'].max(),grupos['lon'].max()]]
+    folium.LayerControl().add_to(map)
+    if limites:
+        limites=np.array(limites)
+        map.fit_bounds([limites.min(axis=0).tolist(),limites.max(axis=0).tolist()])
+    return map
+
+def render_map(map):
+    """ Esta função gera o HTML do mapa uma única vez, para que ele possa ficar no cache de resultados
+    e ser enviado ao navegador sem ser renderizado de novo a cada execução da página.
+
+    Input: mapa
+    Output: HTML (string)
+    """
+    import folium
+    return folium.Figure().add_child(map).render()
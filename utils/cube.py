@@ -0,0 +1,210 @@
+# Importando as bibliotecas necessárias
+import numpy as np
+import pandas as pd
+
+from utils.cleaning import concat_cleaned
+
+
+# Dimensões do cubo: uma célula por combinação observada desses valores
+CUBE_DIMS=['Order_Date',
+           'City',
+           'Road_traffic_density',
+           'Type_of_order',
+           'Type_of_vehicle',
+           'Festival']
+
+# Medidas acumuladas em cada célula: nome -> coluna do dataframe
+CUBE_MEASURES={'time':'Time_taken(min)',
+               'rating':'Delivery_person_Ratings'}
+
+# Acima desse número de entregadores os bitsets de entregadores únicos deixam de ser montados
+# (o cubo passa a responder as contagens de entregadores únicos pelas linhas originais)
+MAX_COURIERS=5_000
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def courier_bitsets(cell,codes,n_cells,n_couriers):
+    """ Esta função monta, para cada célula, um bitset com os entregadores que aparecem nela.
+    Como cada bit aparece no máximo uma vez por palavra depois do np.unique, o OU dos bits
+    é igual à soma, que é calculada com np.add.reduceat.
+
+    Input: célula de cada linha; código do entregador de cada linha; número de células; número de entregadores
+    Output: array uint64 (n_cells x palavras)
+    """
+    n_words=max((n_couriers+63)//64,1)
+    pares=np.unique(cell.astype('int64')*n_couriers+codes)
+    pares_cell,pares_code=np.divmod(pares,n_couriers)
+    posicao=pares_cell*n_words+pares_code//64
+    bits=np.left_shift(np.uint64(1),(pares_code%64).astype('uint64'))
+
+    bitsets=np.zeros(n_cells*n_words,dtype='uint64')
+    if len(pares):
+        inicio=np.flatnonzero(np.r_[True,posicao[1:]!=posicao[:-1]])
+        bitsets[posicao[inicio]]=np.add.reduceat(bits,inicio)
+    return bitsets.reshape(n_cells,n_words)
+
+def build_cube(df,max_couriers=MAX_COURIERS):
+    """ Esta função monta o cubo diário (data x cidade x tráfego x tipo de pedido x veículo x festival).
+    Cada célula guarda o número de pedidos ('n'), a soma e a soma dos quadrados do tempo de entrega
+    e da avaliação, e um bitset com os entregadores da célula (entregadores únicos exatos).
+    As células são numeradas por uma chave inteira (códigos das dimensões em base mista) e as
+    medidas são somadas com np.bincount.
+
+    Input: dataframe limpo; número máximo de entregadores para os bitsets
+    Output: dicionário com as células ('cells'), os bitsets ('couriers') e as categorias dos entregadores
+    """
+    niveis=[]
+    chave=np.zeros(len(df),dtype='int64')
+    for col in CUBE_DIMS:
+        codes,uniques=pd.factorize(df[col],sort=True)
+        if len(codes) and codes.min()<0:
+            raise ValueError(f'a coluna {col} possui valores nulos')
+        chave=chave*max(len(uniques),1)+codes
+        niveis.append(uniques)
+    chaves,cell=np.unique(chave,return_inverse=True)
+
+    # Decodificando a chave de cada célula nos valores das dimensões
+    colunas={}
+    resto=chaves
+    for col,uniques in zip(reversed(CUBE_DIMS),reversed(niveis)):
+        resto,codes=np.divmod(resto,max(len(uniques),1))
+        colunas[col]=uniques.take(codes)
+    cells=pd.DataFrame({col:colunas[col] for col in CUBE_DIMS})
+
+    cells['n']=np.bincount(cell,minlength=len(chaves))
+    for nome,col in CUBE_MEASURES.items():
+        valores=df[col].to_numpy(dtype='float64')
+        cells[f'{nome}_sum']=np.bincount(cell,weights=valores,minlength=len(chaves))
+        cells[f'{nome}_sumsq']=np.bincount(cell,weights=valores**2,minlength=len(chaves))
+
+    entregadores=df['Delivery_person_ID'].astype('category')
+    categorias=entregadores.cat.categories
+    couriers=None
+    if len(categorias)<=max_couriers:
+        couriers=courier_bitsets(cell,
+                                 entregadores.cat.codes.to_numpy().astype('int64'),
+                                 len(cells),
+                                 len(categorias))
+    return {'cells':cells,'couriers':couriers,'courier_categories':categorias}
+
+def _bitset_pairs(couriers):
+    """ Esta função retorna os pares (célula, código do entregador) dos bits ligados dos bitsets
+    (o inverso de courier_bitsets). Só as palavras não nulas são expandidas.
+
+    Input: array uint64 (células x palavras)
+    Output: tupla (célula de cada par, código do entregador de cada par)
+    """
+    celulas,palavras=np.nonzero(couriers)
+    bits=np.unpackbits(couriers[celulas,palavras].view('uint8').reshape(-1,8),axis=1,bitorder='little')
+    linhas,posicao=np.nonzero(bits)
+    return celulas[linhas],palavras[linhas]*64+posicao
+
+def update_cube(cube,batch,max_couriers=MAX_COURIERS):
+    """ Esta função atualiza o cubo (build_cube) com um lote limpo, sem voltar às linhas do histórico:
+    o cubo do lote é montado sozinho e as células dos dois são somadas por combinação das dimensões.
+    Os bitsets das células antigas são copiados e os do lote entram com um OU; só quando o lote traz
+    entregadores novos (os códigos mudam de posição) os bits antigos são recodificados, com custo
+    proporcional ao número de bits ligados.
+
+    Input: cubo; lote limpo; número máximo de entregadores para os bitsets
+    Output: cubo atualizado (o mesmo de build_cube sobre o histórico com o lote)
+    """
+    if len(batch)==0:
+        return cube
+    parte=build_cube(batch,max_couriers=np.inf)
+    # Células dos dois cubos numeradas pela mesma chave de build_cube (a ordem das células é preservada)
+    todas=concat_cleaned([cube['cells'],parte['cells']]).reset_index(drop=True)
+    chave=np.zeros(len(todas),dtype='int64')
+    for col in CUBE_DIMS:
+        codes,uniques=pd.factorize(todas[col],sort=True)
+        chave=chave*max(len(uniques),1)+codes
+    _,primeira,grupo=np.unique(chave,return_index=True,return_inverse=True)
+    cells=todas.loc[primeira,CUBE_DIMS].reset_index(drop=True)
+    for col in todas.columns.drop(CUBE_DIMS):
+        soma=np.bincount(grupo,weights=todas[col].to_numpy(dtype='float64'),minlength=len(cells))
+        cells[col]=soma.astype(todas[col].dtype)
+
+    categorias=cube['courier_categories'].union(parte['courier_categories'])
+    couriers=None
+    if cube['couriers'] is not None and len(categorias)<=max_couriers:
+        n_antigas=len(cube['cells'])
+        celulas,codes=_bitset_pairs(parte['couriers'])
+        celulas=grupo[n_antigas+celulas]
+        codes=categorias.get_indexer(parte['courier_categories'][codes])
+        if categorias.equals(cube['courier_categories']):
+            couriers=np.zeros((len(cells),cube['couriers'].shape[1]),dtype='uint64')
+            couriers[grupo[:n_antigas]]=cube['couriers']
+            np.bitwise_or.at(couriers,(celulas,codes//64),np.left_shift(np.uint64(1),(codes%64).astype('uint64')))
+        else:
+            antigas,codes_antigos=_bitset_pairs(cube['couriers'])
+            couriers=courier_bitsets(np.concatenate([grupo[antigas],celulas]),
+                                     np.concatenate([categorias.get_indexer(cube['courier_categories'][codes_antigos]),codes]),
+                                     len(cells),
+                                     len(categorias))
+    return {'cells':cells,'couriers':couriers,'courier_categories':categorias}
+
+def filter_cube(cube,data_limite,categorias=None,col='Road_traffic_density'):
+    """ Esta função aplica os filtros da barra lateral sobre as células do cubo.
+    O custo depende do número de células (dias x combinações), e não do número de pedidos.
+
+    Input: cubo; data limite; categorias selecionadas (None = todas); coluna das categorias
+    Output: cubo filtrado (mesmo formato de build_cube)
+    """
+    cells=cube['cells']
+    linhas=(cells['Order_Date']<=pd.Timestamp(data_limite)).to_numpy()
+    if categorias is not None:
+        linhas&=cells[col].isin(categorias).to_numpy()
+    couriers=cube['couriers']
+    return {'cells':cells.loc[linhas].reset_index(drop=True),
+            'couriers':None if couriers is None else couriers[linhas],
+            'courier_categories':cube['courier_categories']}
+
+def cube_count(cube,by):
+    """ Esta função retorna o número de pedidos agrupado pelas dimensões escolhidas.
+    'by' também pode conter Series (por exemplo, a semana de cada célula).
+
+    Input: cubo (filtrado); lista de dimensões
+    Output: Series com o número de pedidos
+    """
+    return cube['cells'].groupby(by,observed=True)['n'].sum().sort_index()
+
+def cube_stats(cube,by,measure):
+    """ Esta função retorna a média e o desvio padrão (amostral, como no pandas) de uma medida
+    agrupada pelas dimensões escolhidas, a partir das somas e somas dos quadrados.
+
+    Input: cubo (filtrado); lista de dimensões; 'time' ou 'rating'
+    Output: dataframe com as colunas 'count', 'mean' e 'std'
+    """
+    somas=(cube['cells']
+           .groupby(by,observed=True)[['n',f'{measure}_sum',f'{measure}_sumsq']]
+           .sum()
+           .sort_index())
+    n=somas['n']
+    media=somas[f'{measure}_sum']/n
+    variancia=(somas[f'{measure}_sumsq']-n*media**2)/(n-1)
+    return pd.DataFrame({'count':n,
+                         'mean':media,
+                         'std':np.sqrt(variancia.clip(lower=0)).where(n>1)})
+
+def cube_nunique_couriers(cube,by):
+    """ Esta função retorna o número exato de entregadores únicos agrupado pelas dimensões escolhidas,
+    fazendo o OU dos bitsets das células de cada grupo.
+
+    Input: cubo (filtrado); lista de dimensões (ou Series)
+    Output: Series com o número de entregadores únicos, ou None se o cubo não tiver os bitsets
+    """
+    couriers=cube['couriers']
+    if couriers is None:
+        return None
+    by=by if isinstance(by,list) else [by]
+    grupos=cube['cells'].groupby(by,observed=True).indices
+    resultado={}
+    for chave,linhas in grupos.items():
+        bits=np.bitwise_or.reduce(couriers[linhas],axis=0)
+        resultado[chave]=int(np.unpackbits(bits.view('uint8')).sum())
+    resultado=pd.Series(resultado,dtype='int64')
+    resultado.index.names=[b if isinstance(b,str) else b.name for b in by]
+    return resultado.sort_index()
@@ -0,0 +1,215 @@
+# Importando as bibliotecas necessárias
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+
+# Número máximo de pontos (barras ou vértices da linha) por série enviada ao navegador
+POINT_BUDGET=400
+
+# Períodos usados para reamostrar as séries diárias que passam do orçamento, do menor para o maior:
+# regra do pandas -> nome do período no título do gráfico
+RESAMPLE_RULES={'D':'dia','W-SUN':'semana','MS':'mês','QS':'trimestre','AS':'ano'}
+
+# Casas decimais dos valores reais enviados ao navegador
+FLOAT_DECIMALS=3
+
+# Tamanho máximo das bolhas (em px), como o size_max padrão do plotly express
+SIZE_MAX=20
+
+
+# =====================================================
+# FUNÇÕES: redução do número de pontos
+# =====================================================
+
+def resample_to_budget(serie,budget=POINT_BUDGET,how='sum'):
+    """ Esta função reamostra uma série diária para o menor período (dia, semana, mês...) em que ela cabe no orçamento de pontos.
+    As semanas começam no domingo, como a semana do ano '%U' usada nas páginas; cada período é rotulado pela sua data inicial.
+
+    Input: Series indexada por data; número máximo de pontos; agregação dos valores de cada período ('sum', 'mean'...)
+    Output: tupla (Series reamostrada, nome do período)
+    """
+    serie=serie.sort_index()
+    serie.index=pd.DatetimeIndex(serie.index)
+    for regra,periodo in RESAMPLE_RULES.items():
+        if regra=='D':
+            if len(serie)<=budget:
+                return serie,periodo
+            continue
+        reamostrada=serie.resample(regra,label='left',closed='left').agg(how)
+        if len(reamostrada)<=budget:
+            return reamostrada,periodo
+    return reamostrada,periodo
+
+def lttb(x,y,n_out):
+    """ Esta função escolhe os pontos de uma linha pelo algoritmo Largest-Triangle-Three-Buckets: o primeiro e o
+    último pontos são mantidos e, em cada um dos n_out-2 intervalos do meio, fica o ponto que forma o maior
+    triângulo com o ponto escolhido no intervalo anterior e a média do intervalo seguinte (preserva picos e vales).
+
+    Input: arrays x (numérico e crescente) e y; número de pontos desejado
+    Output: array com as posições dos pontos escolhidos, em ordem crescente
+    """
+    x=np.asarray(x,dtype='float64')
+    y=np.asarray(y,dtype='float64')
+    n=len(x)
+    if n_out>=n or n_out<3:
+        return np.arange(n)
+    limites=np.linspace(1,n-1,n_out-1).astype('int64')
+    escolhidos=np.empty(n_out,dtype='int64')
+    escolhidos[0]=0
+    escolhidos[-1]=n-1
+    anterior=0
+    for i in range(n_out-2):
+        ini,fim=limites[i],limites[i+1]
+        prox_ini,prox_fim=fim,(limites[i+2] if i+2<len(limites) else n)
+        media_x=x[prox_ini:prox_fim].mean()
+        media_y=y[prox_ini:prox_fim].mean()
+        area=np.abs((x[anterior]-media_x)*(y[ini:fim]-y[anterior])
+                    -(x[anterior]-x[ini:fim])*(media_y-y[anterior]))
+        anterior=ini+int(np.argmax(area))
+        escolhidos[i+1]=anterior
+    return escolhidos
+
+def downsample_line(x,y,budget=POINT_BUDGET):
+    """ Esta função reduz uma linha ao orçamento de pontos com o LTTB (sem alteração se ela já couber).
+    Eixos x de datas ou de categorias ordenadas usam a posição como coordenada.
+
+    Input: valores de x e de y; número máximo de pontos
+    Output: tupla (x, y) reduzidos
+    """
+    x=np.asarray(x)
+    y=np.asarray(y)
+    if len(x)<=budget:
+        return x,y
+    coordenada=x.astype('datetime64[ns]').astype('int64') if x.dtype.kind=='M' else (x if x.dtype.kind in 'iuf' else np.arange(len(x)))
+    posicoes=lttb(coordenada,y,budget)
+    return x[posicoes],y[posicoes]
+
+
+# =====================================================
+# FUNÇÕES: codificação compacta dos valores
+# =====================================================
+
+def compact_values(values,decimals=FLOAT_DECIMALS):
+    """ Esta função converte os valores de um eixo para a forma mais curta no JSON da figura:
+    inteiros em int32, reais arredondados, datas sem horário como 'AAAA-MM-DD' e textos como array de objetos.
+
+    Input: valores (array, Series ou índice); casas decimais dos reais
+    Output: array numpy
+    """
+    valores=np.asarray(values)
+    if valores.dtype.kind=='M':
+        datas=valores.astype('datetime64[s]')
+        meia_noite=(datas.astype('int64')%86400==0).all()
+        return np.datetime_as_string(datas,unit='D' if meia_noite else 's').astype(object)
+    if valores.dtype.kind=='b':
+        return valores
+    if valores.dtype.kind in 'iu':
+        if len(valores) and np.abs(valores).max()<2**31:
+            return valores.astype('int32')
+        return valores
+    if valores.dtype.kind=='f':
+        return np.round(valores,decimals)
+    return valores.astype(str).astype(object)
+
+def payload_bytes(fig):
+    """ Esta função retorna o tamanho do JSON da figura enviado ao navegador, em bytes """
+    return len(fig.to_json().encode('utf-8'))
+
+
+# =====================================================
+# FUNÇÕES: figuras
+# =====================================================
+
+def _layout(fig,title,x_title,y_title):
+    """ Aplica o título e os títulos dos eixos, como o plotly express faz """
+    fig.update_layout(title=title,xaxis_title=x_title,yaxis_title=y_title,legend_tracegroupgap=0)
+    return fig
+
+def bar_figure(x,y,title,x_title=None,y_title=None):
+    """ Esta função monta um gráfico de barras com os valores compactos, sem passar pelo plotly express.
+
+    Input: valores de x e de y; título; títulos dos eixos
+    Output: figura
+    """
+    traco=go.Bar(x=compact_values(x),y=compact_values(y),
+                 hovertemplate=f'{x_title}=%{{x}}<br>{y_title}=%{{y}}<extra></extra>')
+    return _layout(go.Figure(traco),title,x_title,y_title)
+
+def line_figure(x,y,title,x_title=None,y_title=None,budget=POINT_BUDGET):
+    """ Esta função monta um gráfico de linhas com os valores compactos, reduzido ao orçamento de pontos pelo LTTB.
+
+    Input: valores de x e de y; título; títulos dos eixos; número máximo de pontos
+    Output: figura
+    """
+    x,y=downsample_line(x,y,budget)
+    traco=go.Scatter(x=compact_values(x),y=compact_values(y),mode='lines',
+                     hovertemplate=f'{x_title}=%{{x}}<br>{y_title}=%{{y}}<extra></extra>')
+    return _layout(go.Figure(traco),title,x_title,y_title)
+
+def bubble_figure(x,y,value,title,x_title=None,y_title=None,value_title=None):
+    """ Esta função monta um gráfico de bolhas em que a cor e a área da bolha dependem do valor
+    (como px.scatter com color e size na mesma coluna).
+
+    Input: valores de x, de y e da bolha; título; títulos dos eixos e da escala de cor
+    Output: figura
+    """
+    value=compact_values(value)
+    maior=float(np.max(value)) if len(value) else 1.0
+    traco=go.Scatter(x=compact_values(x),y=compact_values(y),mode='markers',
+                     marker={'color':value,'size':value,'sizemode':'area','sizeref':2*maior/SIZE_MAX**2,
+                             'coloraxis':'coloraxis'},
+                     hovertemplate=f'{x_title}=%{{x}}<br>{y_title}=%{{y}}<br>{value_title}=%{{marker.size}}<extra></extra>')
+    fig=_layout(go.Figure(traco),title,x_title,y_title)
+    fig.update_layout(coloraxis={'colorbar':{'title':{'text':value_title}}})
+    return fig
+
+def sunburst_figure(parents,children,value,title=None,value_title=None):
+    """ Esta função monta um gráfico de sunburst de dois níveis em que o tamanho e a cor dependem do valor
+    (como px.sunburst com values e color na mesma coluna): o valor de cada nó interno é a soma dos seus
+    filhos e a sua cor é a média dos filhos ponderada pelo valor.
+
+    Input: rótulos do nível interno e do nível externo de cada folha; valor de cada folha; título; título da escala de cor
+    Output: figura
+    """
+    folhas=pd.DataFrame({'parent':np.asarray(parents).astype(str),
+                         'label':np.asarray(children).astype(str),
+                         'value':np.asarray(value,dtype='float64')})
+    folhas['ids']=folhas['parent']+'/'+folhas['label']
+    folhas['peso']=folhas['value']**2
+    internos=folhas.groupby('parent',sort=True)[['value','peso']].sum()
+    internos['color']=internos['peso']/internos['value']
+    ids=np.concatenate([folhas['ids'].to_numpy(),internos.index.to_numpy()]).astype(object)
+    traco=go.Sunburst(ids=ids,
+                      labels=np.concatenate([folhas['label'].to_numpy(),internos.index.to_numpy()]).astype(object),
+                      parents=np.concatenate([folhas['parent'].to_numpy(),np.full(len(internos),'')]).astype(object),
+                      values=compact_values(np.concatenate([folhas['value'].to_numpy(),internos['value'].to_numpy()])),
+                      branchvalues='total',
+                      marker={'colors':compact_values(np.concatenate([folhas['value'].to_numpy(),internos['color'].to_numpy()])),
+                              'coloraxis':'coloraxis'},
+                      hovertemplate=f'%{{id}}<br>{value_title}=%{{value}}<extra></extra>')
+    fig=go.Figure(traco)
+    fig.update_layout(title=title,coloraxis={'colorbar':{'title':{'text':value_title}}},legend_tracegroupgap=0)
+    return fig
+
+def comparison_figure(x,atual,anterior,title,x_title=None,y_title=None,x_anterior=None,nomes=('Período atual','Período anterior')):
+    """ Esta função monta um gráfico de barras agrupadas com os valores de duas janelas (ver utils/windows.py).
+    Quando os rótulos da janela anterior são informados (por exemplo, as datas correspondentes),
+    eles aparecem no hover das barras da janela anterior.
+
+    Input: valores de x; valores da janela atual e da anterior; título; títulos dos eixos;
+           rótulos de x da janela anterior (opcional); nomes das duas séries
+    Output: figura
+    """
+    x=compact_values(x)
+    tracos=[go.Bar(x=x,y=compact_values(atual),name=nomes[0],
+                   hovertemplate=f'{x_title}=%{{x}}<br>{y_title}=%{{y}}<extra>{nomes[0]}</extra>')]
+    if x_anterior is None:
+        tracos.append(go.Bar(x=x,y=compact_values(anterior),name=nomes[1],
+                             hovertemplate=f'{x_title}=%{{x}}<br>{y_title}=%{{y}}<extra>{nomes[1]}</extra>'))
+    else:
+        tracos.append(go.Bar(x=x,y=compact_values(anterior),name=nomes[1],customdata=compact_values(x_anterior),
+                             hovertemplate=f'{x_title}=%{{customdata}}<br>{y_title}=%{{y}}<extra>{nomes[1]}</extra>'))
+    fig=_layout(go.Figure(tracos),title,x_title,y_title)
+    fig.update_layout(barmode='group')
+    return fig
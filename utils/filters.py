@@ -0,0 +1,153 @@
+# Importando as bibliotecas necessárias
+import numpy as np
+import pandas as pd
+
+
+# Colunas com bitmaps pré-calculados (uma máscara de linhas por categoria)
+BITMAP_COLS=['Road_traffic_density']
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def sort_by_date(df):
+    """ Esta função ordena o dataframe pela coluna 'Order_Date' (ordenação estável), condição
+    para que o filtro de datas seja uma busca binária.
+
+    Input: dataframe
+    Output: dataframe ordenado (o próprio dataframe, se ele já estiver ordenado)
+    """
+    if df['Order_Date'].is_monotonic_increasing:
+        return df
+    return df.sort_values('Order_Date',kind='mergesort')
+
+def build_filter_index(df):
+    """ Esta função monta o índice usado pelos filtros da barra lateral. O dataframe deve estar
+    ordenado por 'Order_Date' (ver sort_by_date).
+    - dates / ends: datas distintas e, para cada uma, a posição logo após a sua última linha
+    - bitmaps: para cada coluna em BITMAP_COLS, uma máscara booleana de linhas por categoria
+
+    Input: dataframe ordenado por data
+    Output: dicionário com o índice
+    """
+    datas=df['Order_Date'].to_numpy()
+    if len(datas) and not (datas[1:]>=datas[:-1]).all():
+        raise ValueError("o dataframe deve estar ordenado por 'Order_Date'")
+    dates,starts=np.unique(datas,return_index=True)
+    ends=np.append(starts[1:],len(datas))
+    return {'dates':dates,'ends':ends,'rows':len(df),'bitmaps':_bitmaps(df)}
+
+def _bitmaps(df):
+    """ Esta função monta, para cada coluna em BITMAP_COLS, uma máscara booleana de linhas por categoria """
+    bitmaps={}
+    for col in BITMAP_COLS:
+        valores=df[col]
+        if isinstance(valores.dtype,pd.CategoricalDtype):
+            codes=valores.cat.codes.to_numpy()
+            bitmaps[col]={cat:codes==i for i,cat in enumerate(valores.cat.categories)}
+        else:
+            valores=valores.to_numpy()
+            bitmaps[col]={cat:valores==cat for cat in pd.unique(valores)}
+    return bitmaps
+
+def update_filter_index(index,batch):
+    """ Esta função atualiza o índice dos filtros (build_filter_index) com um lote limpo acrescentado ao
+    final do dataframe (ver utils.loader.append_sorted): as datas e posições do lote são deslocadas pelo
+    número de linhas do histórico e as máscaras do lote são concatenadas às antigas (cópia de um byte por
+    linha e categoria, sem recalcular as comparações do histórico).
+    Se o lote tem datas anteriores à última data do índice, as linhas são intercaladas, as posições
+    mudam e o índice precisa ser reconstruído: nesse caso a função retorna None.
+
+    Input: índice; lote limpo
+    Output: índice atualizado, ou None
+    """
+    batch=sort_by_date(batch)
+    if len(batch)==0:
+        return index
+    n=index['rows']
+    datas=batch['Order_Date'].to_numpy()
+    if n and datas[0]<index['dates'][-1]:
+        return None
+    dates,starts=np.unique(datas,return_index=True)
+    ends=np.append(starts[1:],len(datas))+n
+    if n and dates[0]==index['dates'][-1]:
+        # A última data do histórico continua no lote: ela termina no fim das suas linhas no lote
+        dates=np.concatenate([index['dates'],dates[1:]])
+        ends=np.concatenate([index['ends'][:-1],ends])
+    else:
+        dates=np.concatenate([index['dates'],dates])
+        ends=np.concatenate([index['ends'],ends])
+
+    bitmaps={}
+    novos=_bitmaps(batch)
+    for col in BITMAP_COLS:
+        antigos=index['bitmaps'][col]
+        bitmaps[col]={cat:np.concatenate([antigos.get(cat,np.zeros(n,dtype=bool)),
+                                          novos[col].get(cat,np.zeros(len(batch),dtype=bool))])
+                      for cat in list(antigos)+[c for c in novos[col] if c not in antigos]}
+    return {'dates':dates,'ends':ends,'rows':n+len(batch),'bitmaps':bitmaps}
+
+def date_offset(index,data_limite):
+    """ Esta função retorna, por busca binária, quantas linhas têm 'Order_Date' <= data_limite.
+
+    Input: índice (build_filter_index); data limite
+    Output: número de linhas
+    """
+    pos=np.searchsorted(index['dates'],np.datetime64(pd.Timestamp(data_limite)),side='right')
+    return int(index['ends'][pos-1]) if pos>0 else 0
+
+def filter_positions(index,data_limite,categorias=None,posicoes=None,col='Road_traffic_density'):
+    """ Esta função aplica os filtros da barra lateral a um conjunto de posições (iloc) do dataframe, por
+    exemplo as de uma consulta espacial (utils.spatial): só as posições informadas são verificadas.
+
+    Input: índice (build_filter_index); data limite; categorias selecionadas (None = todas);
+           posições (iloc); coluna das categorias
+    Output: array com as posições mantidas, na ordem original
+    """
+    posicoes=np.asarray(posicoes)
+    posicoes=posicoes[posicoes<date_offset(index,data_limite)]
+    if categorias is not None:
+        bitmaps=index['bitmaps'][col]
+        linhas=np.zeros(len(posicoes),dtype=bool)
+        for cat in categorias:
+            if cat in bitmaps:
+                linhas|=bitmaps[cat][posicoes]
+        posicoes=posicoes[linhas]
+    return posicoes
+
+def filter_orders(df,index,data_limite,categorias=None,col='Road_traffic_density',posicoes=None):
+    """ Esta função aplica os filtros da barra lateral: pedidos até a data limite e, opcionalmente,
+    apenas as categorias selecionadas (por padrão, os tipos de tráfego) e as linhas de uma consulta
+    espacial (utils.spatial).
+    O filtro de data é uma fatia das primeiras linhas (uma view, sem cópia). O filtro de categorias
+    usa os bitmaps pré-calculados e só copia as linhas quando alguma categoria fica de fora.
+    Atenção: o resultado pode compartilhar memória com o dataframe original; não altere-o in-place.
+
+    Input:
+        - df: dataframe ordenado por data
+        - index: índice do dataframe (build_filter_index)
+        - data_limite: data máxima dos pedidos
+        - categorias: lista com as categorias selecionadas (None = todas)
+        - col: coluna das categorias
+        - posicoes: posições (iloc, ordenadas) das linhas de uma consulta espacial (None = todas)
+    Output:
+        - dataframe filtrado
+    """
+    if posicoes is not None:
+        # Com uma consulta espacial, só as posições selecionadas são verificadas
+        return df.iloc[filter_positions(index,data_limite,categorias,posicoes,col)]
+
+    fim=date_offset(index,data_limite)
+    df=df.iloc[:fim]
+    if categorias is None:
+        return df
+
+    bitmaps=index['bitmaps'][col]
+    if set(bitmaps).issubset(categorias):
+        return df
+    linhas=np.zeros(fim,dtype=bool)
+    for cat in categorias:
+        if cat in bitmaps:
+            linhas|=bitmaps[cat][:fim]
+    return df.iloc[np.flatnonzero(linhas)]
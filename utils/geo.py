@@ -0,0 +1,101 @@
+# Importando as bibliotecas necessárias
+import numpy as np
+
+
+# Raio médio da Terra (IUGG), em km
+EARTH_RADIUS_KM=6371.0088
+
+# Elipsoide WGS-84, o mesmo usado por padrão pelo geopy
+WGS84_A=6378.137
+WGS84_F=1/298.257223563
+WGS84_B=WGS84_A*(1-WGS84_F)
+
+# Colunas de coordenadas do conjunto de dados
+RESTAURANT_COLS=['Restaurant_latitude','Restaurant_longitude']
+DELIVERY_COLS=['Delivery_location_latitude','Delivery_location_longitude']
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def haversine_km(lat1,lon1,lat2,lon2):
+    """ Esta função calcula a distância de grande círculo (Terra esférica) entre dois conjuntos de pontos, de forma vetorizada.
+    Erro em relação à distância geodésica do geopy (elipsoide WGS-84): no máximo ~0,56% da distância
+    (ou seja, menos de 60 m para uma entrega de 10 km). Veja benchmarks/bench_distance.py.
+
+    Input: arrays de latitude e longitude (em graus) dos pontos de origem e de destino
+    Output: array com as distâncias em km
+    """
+    lat1,lon1,lat2,lon2=(np.radians(np.asarray(x,dtype='float64')) for x in (lat1,lon1,lat2,lon2))
+    h=(np.sin((lat2-lat1)/2)**2
+       +np.cos(lat1)*np.cos(lat2)*np.sin((lon2-lon1)/2)**2)
+    return 2*EARTH_RADIUS_KM*np.arcsin(np.sqrt(np.clip(h,0,1)))
+
+def geodesic_km(lat1,lon1,lat2,lon2,tol=1e-12,max_iter=200):
+    """ Esta função calcula a distância no elipsoide WGS-84 entre dois conjuntos de pontos, pela
+    fórmula inversa de Vincenty, iterando todas as linhas ao mesmo tempo com NumPy.
+    Erro em relação ao geopy.distance.distance (Karney, WGS-84): abaixo de 1 mm. Veja benchmarks/bench_distance.py.
+    Para os poucos pares quase antipodais em que a iteração não converge, a distância
+    de haversine é usada no lugar.
+
+    Input: arrays de latitude e longitude (em graus) dos pontos de origem e de destino
+    Output: array com as distâncias em km
+    """
+    lat1,lon1,lat2,lon2=(np.asarray(x,dtype='float64') for x in (lat1,lon1,lat2,lon2))
+    f=WGS84_F
+    L=np.radians(lon2-lon1)
+    U1=np.arctan((1-f)*np.tan(np.radians(lat1)))
+    U2=np.arctan((1-f)*np.tan(np.radians(lat2)))
+    sinU1,cosU1=np.sin(U1),np.cos(U1)
+    sinU2,cosU2=np.sin(U2),np.cos(U2)
+
+    lam=L
+    convergiu=np.zeros(L.shape,dtype=bool)
+    with np.errstate(invalid='ignore',divide='ignore'):
+        for _ in range(max_iter):
+            sin_lam,cos_lam=np.sin(lam),np.cos(lam)
+            sin_sigma=np.sqrt((cosU2*sin_lam)**2+(cosU1*sinU2-sinU1*cosU2*cos_lam)**2)
+            cos_sigma=sinU1*sinU2+cosU1*cosU2*cos_lam
+            sigma=np.arctan2(sin_sigma,cos_sigma)
+            # Pontos coincidentes têm sin_sigma = 0
+            sin_alpha=np.where(sin_sigma==0,0.0,cosU1*cosU2*sin_lam/sin_sigma)
+            cos2_alpha=1-sin_alpha**2
+            # Linhas sobre o equador têm cos2_alpha = 0
+            cos_2sigma_m=np.where(cos2_alpha==0,0.0,cos_sigma-2*sinU1*sinU2/cos2_alpha)
+            C=f/16*cos2_alpha*(4+f*(4-3*cos2_alpha))
+            lam_anterior=lam
+            lam=L+(1-C)*f*sin_alpha*(sigma+C*sin_sigma*(cos_2sigma_m+C*cos_sigma*(-1+2*cos_2sigma_m**2)))
+            convergiu=~(np.abs(lam-lam_anterior)>tol)
+            if convergiu.all():
+                break
+
+        u2=cos2_alpha*(WGS84_A**2-WGS84_B**2)/WGS84_B**2
+        A=1+u2/16384*(4096+u2*(-768+u2*(320-175*u2)))
+        B=u2/1024*(256+u2*(-128+u2*(74-47*u2)))
+        delta_sigma=B*sin_sigma*(cos_2sigma_m+B/4*(cos_sigma*(-1+2*cos_2sigma_m**2)
+                                                   -B/6*cos_2sigma_m*(-3+4*sin_sigma**2)*(-3+4*cos_2sigma_m**2)))
+        dist=WGS84_B*A*(sigma-delta_sigma)
+
+    if not convergiu.all():
+        dist=np.where(convergiu,dist,haversine_km(lat1,lon1,lat2,lon2))
+    return dist
+
+# Modos disponíveis para o cálculo das distâncias
+DISTANCE_MODES={'haversine':haversine_km,
+                'geodesic':geodesic_km}
+
+def delivery_distance_km(df,mode='geodesic'):
+    """ Esta função calcula a distância entre o restaurante e o local de entrega de cada pedido.
+
+    Input:
+        - df: dataframe com as colunas de latitude e longitude
+        - mode: 'geodesic' (elipsoide WGS-84, mesmo resultado do geopy) ou 'haversine' (esfera, mais rápido)
+    Output:
+        - array com as distâncias em km
+    """
+    func=DISTANCE_MODES[mode]
+    return func(df[RESTAURANT_COLS[0]].to_numpy(),
+                df[RESTAURANT_COLS[1]].to_numpy(),
+                df[DELIVERY_COLS[0]].to_numpy(),
+                df[DELIVERY_COLS[1]].to_numpy())
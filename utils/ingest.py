@@ -0,0 +1,177 @@
+""" Ingestão incremental de novos lotes de pedidos.
+
+Cada lote (um CSV no mesmo formato de dataset/train.csv) é deduplicado pelo 'ID', limpo
+sozinho e gravado como um arquivo colunar em dataset/batches/. O conjunto de dados em memória
+(utils/loader.py) recebe só as novas linhas, e os agregados (pedidos por dia, somas das
+avaliações por entregador e momentos do tempo de entrega por cidade) são atualizados só com o lote.
+
+Uso:
+    python -m utils.ingest novos_pedidos.csv [--batches-dir dataset/batches]
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils import loader
+from utils.cleaning import clean_data
+from utils.filters import sort_by_date
+from utils.geo import delivery_distance_km
+from utils.snapshot import write_snapshot
+
+
+# Ingestões simultâneas (duas sessões enviando lotes) são feitas uma de cada vez
+_ingest_lock=threading.Lock()
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def _moments(df,group_col,value_col):
+    """ Esta função calcula, por grupo, o número de linhas, a soma e a soma dos quadrados de uma coluna.
+
+    Input: dataframe; coluna do grupo; coluna de valores
+    Output: dataframe com as colunas 'n', 'sum' e 'sumsq' indexado pelo grupo
+    """
+    valores=df[value_col].astype('float64')
+    momentos=(pd.DataFrame({'g':df[group_col].astype(object),'sum':valores,'sumsq':valores**2})
+              .groupby('g')
+              .agg(n=('sum','size'),sum=('sum','sum'),sumsq=('sumsq','sum')))
+    momentos.index.name=group_col
+    return momentos
+
+def _merge_moments(a,b):
+    """ Esta função soma os momentos de dois dataframes (_moments), unindo os grupos """
+    return a.add(b,fill_value=0).astype({'n':'int64'}).sort_index()
+
+def build_aggregates(df):
+    """ Esta função monta os agregados mantidos de forma incremental:
+    - ids: conjunto dos 'ID' já carregados (deduplicação dos lotes)
+    - daily_counts: número de pedidos por dia
+    - courier_ratings: número, soma e soma dos quadrados das avaliações por entregador
+    - city_time: número, soma e soma dos quadrados do tempo de entrega por cidade
+
+    Input: dataframe limpo
+    Output: dicionário com os agregados
+    """
+    return {'ids':set(df['ID']),
+            'daily_counts':df['Order_Date'].value_counts().sort_index().astype('int64'),
+            'courier_ratings':_moments(df,'Delivery_person_ID','Delivery_person_Ratings'),
+            'city_time':_moments(df,'City','Time_taken(min)')}
+
+def update_aggregates(agg,batch):
+    """ Esta função atualiza os agregados (build_aggregates) com um lote limpo.
+    O custo depende do tamanho do lote e do número de grupos, e não do histórico.
+
+    Input: agregados; lote limpo
+    Output: agregados atualizados
+    """
+    agg['ids'].update(batch['ID'])
+    diarios=batch['Order_Date'].value_counts()
+    agg['daily_counts']=agg['daily_counts'].add(diarios,fill_value=0).astype('int64').sort_index()
+    agg['courier_ratings']=_merge_moments(agg['courier_ratings'],_moments(batch,'Delivery_person_ID','Delivery_person_Ratings'))
+    agg['city_time']=_merge_moments(agg['city_time'],_moments(batch,'City','Time_taken(min)'))
+    return agg
+
+def moments_summary(momentos):
+    """ Esta função converte os momentos (n, soma, soma dos quadrados) em média e desvio padrão amostral.
+
+    Input: dataframe com as colunas 'n', 'sum' e 'sumsq'
+    Output: dataframe com as colunas 'count', 'mean' e 'std'
+    """
+    n=momentos['n']
+    media=momentos['sum']/n
+    variancia=(momentos['sumsq']-n*media**2)/(n-1)
+    return pd.DataFrame({'count':n,
+                         'mean':media,
+                         'std':np.sqrt(variancia.clip(lower=0)).where(n>1)})
+
+def load_aggregates(path=loader.DATA_PATH,snapshot_path=loader.SNAPSHOT_PATH,batches_dir=loader.BATCHES_DIR):
+    """ Esta função retorna os agregados do conjunto de dados, montados uma única vez por versão
+    e atualizados a cada lote ingerido (ver utils.loader.load_derived).
+    Atenção: os agregados são compartilhados e devem ser tratados como somente leitura.
+
+    Input: caminhos do CSV, do snapshot e dos lotes
+    Output: dicionário com os agregados (build_aggregates)
+    """
+    return loader.load_derived('aggregates',build_aggregates,update=update_aggregates,
+                               path=path,snapshot_path=snapshot_path,batches_dir=batches_dir)
+
+def ingest_batch(source,path=loader.DATA_PATH,snapshot_path=loader.SNAPSHOT_PATH,batches_dir=loader.BATCHES_DIR):
+    """ Esta função ingere um novo lote de pedidos:
+    1. lê o CSV do lote e descarta os 'ID' repetidos no lote ou já existentes no conjunto de dados;
+    2. limpa só o lote (clean_data) e calcula a coluna 'distance_km';
+    3. grava o lote em batches_dir (gravação atômica: arquivo temporário + os.replace);
+    4. acrescenta o lote ao conjunto de dados em memória e atualiza os agregados (utils.loader.apply_batch).
+
+    Input:
+        - source: caminho (ou arquivo aberto) do CSV do lote
+        - path, snapshot_path, batches_dir: caminhos do CSV, do snapshot e dos lotes
+    Output:
+        - dicionário com o número de linhas lidas, duplicadas, descartadas na limpeza e ingeridas,
+          o arquivo gravado e os tempos em segundos
+    """
+    with _ingest_lock:
+        t0=time.perf_counter()
+        df=loader.load_data(path,snapshot_path,batches_dir)
+        agg=load_aggregates(path,snapshot_path,batches_dir)
+        t1=time.perf_counter()
+
+        df_raw=pd.read_csv(source)
+        ids=df_raw['ID'].astype(str).str.strip()
+        # Consulta ao conjunto linha a linha: ids.isin(set) converteria o conjunto inteiro (todo o histórico)
+        # em lista e montaria uma tabela hash a cada lote; assim o custo depende só do tamanho do lote
+        existentes=agg['ids']
+        novos=~ids.duplicated()&~np.fromiter((i in existentes for i in ids),dtype=bool,count=len(ids))
+        batch=clean_data(df_raw.loc[novos.to_numpy()])
+        batch['distance_km']=delivery_distance_km(batch,mode=loader.DISTANCE_MODE)
+        batch=sort_by_date(batch)
+        # Índice contínuo ao do conjunto de dados, para que os rótulos das linhas não se repitam
+        inicio=int(df.index.max())+1 if len(df) else 0
+        batch.index=pd.RangeIndex(inicio,inicio+len(batch))
+        t2=time.perf_counter()
+
+        arquivo=None
+        if len(batch):
+            os.makedirs(batches_dir,exist_ok=True)
+            arquivo=os.path.join(batches_dir,f'part-{time.time_ns()}.feather')
+            temporario=arquivo+'.tmp'
+            # O lock do cache fica preso da gravação à atualização: uma carga de outra sessão entre as duas
+            # leria o lote do disco e o apply_batch o acrescentaria de novo
+            with loader.cache_lock():
+                write_snapshot(batch,temporario)
+                os.replace(temporario,arquivo)
+                loader.apply_batch(batch,path,snapshot_path,batches_dir,arquivo=os.path.basename(arquivo))
+        t3=time.perf_counter()
+
+    return {'rows_raw':len(df_raw),
+            'duplicates':int((~novos).sum()),
+            'dropped':int(novos.sum())-len(batch),
+            'rows':len(batch),
+            'file':arquivo,
+            'load_s':t1-t0,
+            'clean_s':t2-t1,
+            'append_s':t3-t2}
+
+def main():
+    parser=argparse.ArgumentParser(description='Ingere um novo lote de pedidos (CSV no formato de dataset/train.csv).')
+    parser.add_argument('batch',help='CSV do lote')
+    parser.add_argument('--csv',default=loader.DATA_PATH)
+    parser.add_argument('--snapshot',default=loader.SNAPSHOT_PATH)
+    parser.add_argument('--batches-dir',default=loader.BATCHES_DIR)
+    args=parser.parse_args()
+
+    stats=ingest_batch(args.batch,args.csv,args.snapshot,args.batches_dir)
+    print(f"{stats['rows_raw']} linhas lidas, {stats['duplicates']} duplicadas, "
+          f"{stats['dropped']} descartadas na limpeza, {stats['rows']} ingeridas")
+    if stats['file']:
+        print(f"lote gravado em {stats['file']} ({stats['clean_s']:.3f}s de limpeza, {stats['append_s']:.3f}s de gravação)")
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,273 @@
+""" Ranking dos entregadores: um resumo por entregador (rollup) mantido na carga dos dados e atualizado
+a cada lote ingerido, e as consultas paginadas sobre ele.
+
+O rollup guarda, para cada entregador, o número de pedidos, a soma e a soma dos quadrados das avaliações,
+a soma e o histograma dos minutos de entrega (os percentis saem exatos do histograma, ver utils/percentiles.py)
+e as contagens por veículo e por cidade. Ele é montado em uma passada (np.bincount sobre os códigos das
+categorias) e um lote só custa o tamanho do lote mais o número de entregadores.
+
+As consultas (busca pelo ID, ordenação e paginação) são feitas no servidor: a ordenação usa seleção parcial
+até a última linha da página pedida (utils.ranking.smallest_k_positions) e só as linhas da página são
+formatadas, então a tabela continua leve com 100 mil entregadores ou mais.
+"""
+# Importando as bibliotecas necessárias
+import numpy as np
+import pandas as pd
+
+from utils import loader
+from utils.percentiles import TIME_COL, histogram_quantiles
+from utils.ranking import smallest_k_positions
+
+
+# Colunas do rollup
+COURIER_COL='Delivery_person_ID'
+RATING_COL='Delivery_person_Ratings'
+VEHICLE_COL='Type_of_vehicle'
+CITY_COL='City'
+
+# Percentis do tempo de entrega no resumo por entregador
+LEADERBOARD_QUANTILES=[0.5,0.9]
+
+# Colunas do resumo (courier_summary) que podem ser usadas na ordenação
+SORT_COLS=['orders','rating_mean','rating_std','time_mean','time_p50','time_p90','courier']
+
+# Tamanho padrão da página
+PAGE_SIZE=50
+
+# Nomes das colunas das páginas do ranking na tela
+COLUMN_LABELS={'rank':'Posição',
+               'courier':'ID do entregador',
+               'orders':'Pedidos',
+               'rating_mean':'Avaliação média',
+               'rating_std':'Desvio padrão da avaliação',
+               'time_mean':'Tempo médio (min)',
+               'time_p50':'Tempo p50 (min)',
+               'time_p90':'Tempo p90 (min)',
+               'vehicles':'Veículos',
+               'cities':'Cidades'}
+
+
+# =====================================================
+# FUNÇÕES: rollup por entregador
+# =====================================================
+
+def _observed_codes(values):
+    """ Esta função retorna os códigos das linhas numerados só entre os valores presentes, em ordem crescente
+    (para 'category', a ordem das categorias, que a limpeza deixa em ordem alfabética).
+
+    Input: Series
+    Output: tupla (array de códigos, Index com os valores presentes)
+    """
+    if isinstance(values.dtype,pd.CategoricalDtype):
+        codes=values.cat.codes.to_numpy().astype('int64')
+        presentes=np.flatnonzero(np.bincount(codes,minlength=len(values.cat.categories)))
+        novos=np.full(len(values.cat.categories),-1,dtype='int64')
+        novos[presentes]=np.arange(len(presentes))
+        return novos[codes],pd.Index(values.cat.categories[presentes].astype(object))
+    codes,uniques=pd.factorize(values,sort=True)
+    return codes.astype('int64'),pd.Index(uniques.astype(object))
+
+def build_courier_rollup(df):
+    """ Esta função monta o rollup por entregador em uma única passada sobre os pedidos.
+
+    Input: dataframe limpo (inteiro ou filtrado)
+    Output: dicionário com:
+        - couriers: Index com os IDs dos entregadores (ordem crescente)
+        - orders, rating_sum, rating_sumsq, time_sum: arrays por entregador
+        - hist: histograma dos minutos de entrega (entregadores x minutos) e offset: menor minuto
+        - vehicles / cities: Index com os veículos e as cidades
+        - vehicle_counts: pedidos por entregador e veículo; city_counts e city_time: pedidos e
+          soma dos minutos por entregador e cidade
+    """
+    c,couriers=_observed_codes(df[COURIER_COL])
+    v,vehicles=_observed_codes(df[VEHICLE_COL])
+    g,cities=_observed_codes(df[CITY_COL])
+    n=len(couriers)
+    avaliacoes=df[RATING_COL].to_numpy(dtype='float64')
+    minutos=df[TIME_COL].to_numpy().astype('int64')
+
+    offset=int(minutos.min()) if len(minutos) else 0
+    largura=int(minutos.max())-offset+1 if len(minutos) else 1
+    hist=np.bincount(c*largura+(minutos-offset),minlength=n*largura).reshape(n,largura)
+    return {'couriers':couriers,
+            'orders':np.bincount(c,minlength=n).astype('int64'),
+            'rating_sum':np.bincount(c,weights=avaliacoes,minlength=n),
+            'rating_sumsq':np.bincount(c,weights=avaliacoes**2,minlength=n),
+            'time_sum':np.bincount(c,weights=minutos,minlength=n),
+            'hist':hist.astype('int32'),
+            'offset':offset,
+            'vehicles':vehicles,
+            'vehicle_counts':np.bincount(c*len(vehicles)+v,minlength=n*len(vehicles)).reshape(n,len(vehicles)),
+            'cities':cities,
+            'city_counts':np.bincount(c*len(cities)+g,minlength=n*len(cities)).reshape(n,len(cities)),
+            'city_time':np.bincount(c*len(cities)+g,weights=minutos,minlength=n*len(cities)).reshape(n,len(cities))}
+
+def _place(values,linhas,n_linhas,colunas=None,n_colunas=None):
+    """ Esta função copia um array (1 ou 2 dimensões) para as posições indicadas de um array de zeros maior """
+    if values.ndim==1:
+        novo=np.zeros(n_linhas,dtype=values.dtype)
+        novo[linhas]=values
+    else:
+        novo=np.zeros((n_linhas,n_colunas),dtype=values.dtype)
+        novo[np.ix_(linhas,colunas)]=values
+    return novo
+
+def merge_courier_rollups(a,b):
+    """ Esta função soma dois rollups (build_courier_rollup), unindo os entregadores, os veículos,
+    as cidades e as faixas de minutos. Os arrays de entrada não são alterados.
+
+    Input: dois rollups
+    Output: rollup com a soma
+    """
+    couriers=a['couriers'].union(b['couriers'])
+    vehicles=a['vehicles'].union(b['vehicles'])
+    cities=a['cities'].union(b['cities'])
+    n=len(couriers)
+    offset=min(a['offset'],b['offset'])
+    largura=max(a['offset']+a['hist'].shape[1],b['offset']+b['hist'].shape[1])-offset
+
+    rollup={'couriers':couriers,'offset':offset,'vehicles':vehicles,'cities':cities}
+    partes=[]
+    for r in (a,b):
+        linhas=couriers.get_indexer(r['couriers'])
+        minutos=np.arange(r['hist'].shape[1])+r['offset']-offset
+        partes.append({'orders':_place(r['orders'],linhas,n),
+                       'rating_sum':_place(r['rating_sum'],linhas,n),
+                       'rating_sumsq':_place(r['rating_sumsq'],linhas,n),
+                       'time_sum':_place(r['time_sum'],linhas,n),
+                       'hist':_place(r['hist'],linhas,n,minutos,largura),
+                       'vehicle_counts':_place(r['vehicle_counts'],linhas,n,vehicles.get_indexer(r['vehicles']),len(vehicles)),
+                       'city_counts':_place(r['city_counts'],linhas,n,cities.get_indexer(r['cities']),len(cities)),
+                       'city_time':_place(r['city_time'],linhas,n,cities.get_indexer(r['cities']),len(cities))})
+    for nome in partes[0]:
+        rollup[nome]=partes[0][nome]+partes[1][nome]
+    return rollup
+
+def update_courier_rollup(rollup,batch):
+    """ Esta função atualiza o rollup com um lote limpo (ver utils.loader.apply_batch).
+    O custo depende do tamanho do lote e do número de entregadores, e não do histórico.
+
+    Input: rollup; lote limpo
+    Output: rollup atualizado
+    """
+    if not len(batch):
+        return rollup
+    return merge_courier_rollups(rollup,build_courier_rollup(batch))
+
+def load_courier_rollup(path=loader.DATA_PATH,snapshot_path=loader.SNAPSHOT_PATH,batches_dir=loader.BATCHES_DIR):
+    """ Esta função retorna o rollup de todos os pedidos, montado uma única vez por versão dos dados
+    e atualizado a cada lote ingerido (ver utils.loader.load_derived).
+    Atenção: o rollup é compartilhado e deve ser tratado como somente leitura.
+
+    Input: caminhos do CSV, do snapshot e dos lotes
+    Output: rollup (build_courier_rollup)
+    """
+    return loader.load_derived('courier_rollup',build_courier_rollup,update=update_courier_rollup,
+                               path=path,snapshot_path=snapshot_path,batches_dir=batches_dir)
+
+
+# =====================================================
+# FUNÇÕES: consultas
+# =====================================================
+
+def courier_summary(rollup,qs=LEADERBOARD_QUANTILES):
+    """ Esta função converte o rollup em um resumo numérico com uma linha por entregador, usado
+    nas buscas e ordenações (as colunas de texto ficam para as linhas de cada página, ver leaderboard_page).
+
+    Input: rollup; lista de quantis do tempo de entrega
+    Output: dataframe com as colunas 'courier', 'orders', 'rating_mean', 'rating_std', 'time_mean',
+            'time_p50', 'time_p90'... e 'search' (ID em minúsculas)
+    """
+    n=rollup['orders']
+    with np.errstate(divide='ignore',invalid='ignore'):
+        media=rollup['rating_sum']/n
+        variancia=np.where(n>1,(rollup['rating_sumsq']-n*media**2)/(n-1),np.nan)
+        tempo=rollup['time_sum']/n
+    resumo=pd.DataFrame({'courier':rollup['couriers'].to_numpy(),
+                         'orders':n,
+                         'rating_mean':media,
+                         'rating_std':np.sqrt(np.clip(variancia,0,None)),
+                         'time_mean':tempo})
+    quantis=histogram_quantiles(rollup['hist'],qs,rollup['offset'])
+    for j,q in enumerate(qs):
+        resumo[f'time_p{q*100:g}']=quantis[:,j]
+    resumo['search']=resumo['courier'].str.lower()
+    return resumo
+
+def _mix(counts,nomes):
+    """ Esta função formata as contagens de uma linha como texto com os percentuais, do maior para o menor
+    (por exemplo, 'motorcycle 60% · scooter 40%') """
+    total=counts.sum()
+    ordem=np.argsort(-counts,kind='stable')
+    return ' · '.join(f'{nomes[i]} {100*counts[i]/total:.0f}%' for i in ordem if counts[i])
+
+def search_couriers(summary,texto):
+    """ Esta função retorna as posições (no resumo) dos entregadores cujo ID contém o texto, sem
+    diferenciar maiúsculas e minúsculas.
+
+    Input: resumo (courier_summary); texto da busca (vazio = todos)
+    Output: array de posições, em ordem crescente
+    """
+    texto=(texto or '').strip().lower()
+    if not texto:
+        return np.arange(len(summary))
+    # O operador 'in' sobre os textos já em minúsculas é mais rápido que Series.str.contains
+    ids=summary['search'].to_numpy()
+    return np.flatnonzero(np.fromiter((texto in i for i in ids),dtype=bool,count=len(ids)))
+
+def leaderboard_page(rollup,summary,search='',sort_by='orders',descending=True,page=1,page_size=PAGE_SIZE):
+    """ Esta função monta uma página do ranking dos entregadores: busca pelo ID, ordenação por uma coluna
+    do resumo e paginação. Só as linhas até o fim da página são ordenadas (seleção parcial); os valores
+    faltantes (desvio padrão de quem tem um pedido) ficam no fim e os empates seguem a ordem dos IDs.
+
+    Input:
+        - rollup: rollup (build_courier_rollup)
+        - summary: resumo do mesmo rollup (courier_summary)
+        - search: texto buscado no ID do entregador
+        - sort_by: coluna da ordenação (SORT_COLS)
+        - descending: True para a ordem decrescente
+        - page: número da página (começando em 1; é limitado ao número de páginas)
+        - page_size: linhas por página
+    Output:
+        - dicionário com as linhas da página ('rows'), o número de entregadores encontrados ('total'),
+          a página ('page') e o número de páginas ('pages')
+    """
+    if sort_by not in SORT_COLS:
+        raise ValueError(f'a ordenação deve ser uma de {SORT_COLS}')
+    if page_size<1:
+        raise ValueError('page_size deve ser maior que zero')
+    posicoes=search_couriers(summary,search)
+    total=len(posicoes)
+    paginas=max(-(-total//page_size),1)
+    page=min(max(int(page),1),paginas)
+    inicio,fim=(page-1)*page_size,min(page*page_size,total)
+
+    if sort_by=='courier':
+        # Os IDs já estão em ordem crescente no rollup
+        selecionadas=posicoes[::-1] if descending else posicoes
+        selecionadas=selecionadas[inicio:fim]
+    else:
+        valores=summary[sort_by].to_numpy(dtype='float64')[posicoes]
+        valores=-valores if descending else valores
+        valores=np.where(np.isnan(valores),np.inf,valores)
+        selecionadas=posicoes[smallest_k_positions(valores,fim)[inicio:]]
+
+    linhas=summary.iloc[selecionadas].drop(columns='search').reset_index(drop=True)
+    linhas.insert(0,'rank',np.arange(inicio+1,inicio+len(linhas)+1))
+    linhas['vehicles']=[_mix(rollup['vehicle_counts'][i],rollup['vehicles']) for i in selecionadas]
+    linhas['cities']=[_mix(rollup['city_counts'][i],rollup['cities']) for i in selecionadas]
+    return {'rows':linhas,'total':total,'page':page,'pages':paginas}
+
+def courier_city_means(rollup,value_col=TIME_COL):
+    """ Esta função retorna o tempo médio de cada entregador em cada cidade a partir do rollup, no mesmo
+    formato de utils.ranking.courier_means (ranking por entregador sem percorrer os pedidos).
+
+    Input: rollup; nome da coluna de valores no resultado
+    Output: dataframe com as colunas ('City', value_col, 'Delivery_person_ID'), ordenado por cidade e entregador
+    """
+    contagens=rollup['city_counts'].T
+    linhas=np.flatnonzero(contagens.ravel())
+    cidade,entregador=np.divmod(linhas,contagens.shape[1])
+    return pd.DataFrame({CITY_COL:pd.Categorical.from_codes(cidade,rollup['cities']),
+                         value_col:rollup['city_time'].T.ravel()[linhas]/contagens.ravel()[linhas],
+                         COURIER_COL:rollup['couriers'].to_numpy()[entregador]})
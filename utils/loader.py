@@ -0,0 +1,410 @@
+# Importando as bibliotecas necessárias
+import hashlib
+import os
+import threading
+import time
+
+import pandas as pd
+
+from utils.cleaning import clean_data, concat_cleaned
+from utils.filters import sort_by_date
+from utils.geo import delivery_distance_km
+from utils.partitions import discover_partitions, is_partitioned, partitions_version, read_partitioned
+from utils.profiling import bind_run, current_run, record
+from utils.snapshot import read_snapshot
+
+
+# Arquivo dos pedidos, ou um diretório / padrão glob de arquivos particionados (ver utils/partitions.py)
+DATA_PATH=os.environ.get('DASHBOARD_DATA','dataset/train.csv')
+SNAPSHOT_PATH='dataset/train.feather'
+BATCHES_DIR='dataset/batches'
+
+# Modo do cálculo da coluna 'distance_km': 'geodesic' ou 'haversine' (ver utils/geo.py)
+DISTANCE_MODE='geodesic'
+
+# Cache do processo: é compartilhado por todas as sessões e páginas do Streamlit,
+# já que os módulos importados ficam em memória entre as execuções dos scripts.
+_cache={}
+_hash_memo={}
+_lock=threading.RLock()
+
+# Cargas em segundo plano em andamento: (arquivo, estruturas derivadas) -> progresso da carga
+_jobs={}
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def file_hash(path,chunk_size=1<<20):
+    """ Esta função calcula o hash md5 do conteúdo de um arquivo, lendo-o em blocos.
+
+    Input: caminho do arquivo; tamanho do bloco em bytes
+    Output: hash em hexadecimal (string)
+    """
+    md5=hashlib.md5()
+    with open(path,'rb') as f:
+        for bloco in iter(lambda: f.read(chunk_size),b''):
+            md5.update(bloco)
+    return md5.hexdigest()
+
+def dataset_version(path=DATA_PATH):
+    """ Esta função retorna a versão do arquivo de dados: (mtime, hash do conteúdo).
+    O hash só é recalculado quando o mtime ou o tamanho do arquivo mudam, então a
+    verificação feita a cada execução da página custa apenas um os.stat.
+
+    Input: caminho do arquivo
+    Output: tupla (mtime em ns, hash md5)
+    """
+    stat=os.stat(path)
+    chave=(os.path.abspath(path),stat.st_mtime_ns,stat.st_size)
+    digest=_hash_memo.get(chave)
+    if digest is None:
+        digest=file_hash(path)
+        _hash_memo.clear()
+        _hash_memo[chave]=digest
+    return stat.st_mtime_ns,digest
+
+def read_csv_dataset(path):
+    """ Esta função lê e limpa o arquivo CSV, medindo o tempo de cada etapa.
+    Também calcula uma única vez a coluna 'distance_km' (distância entre restaurante e local de entrega).
+
+    Input: caminho do arquivo
+    Output: tupla (dataframe limpo, dicionário com os tempos em segundos)
+    """
+    t0=time.perf_counter()
+    df_raw=pd.read_csv(path)
+    t1=time.perf_counter()
+    df=clean_data(df_raw)
+    t2=time.perf_counter()
+    df['distance_km']=delivery_distance_km(df,mode=DISTANCE_MODE)
+    t3=time.perf_counter()
+    return df,{'rows_raw':len(df_raw),'read_s':t1-t0,'clean_s':t2-t1,'distance_s':t3-t2}
+
+def read_snapshot_dataset(path):
+    """ Esta função lê o snapshot colunar (já limpo) com memory mapping, medindo o tempo.
+
+    Input: caminho do snapshot
+    Output: tupla (dataframe limpo, dicionário com os tempos em segundos)
+    """
+    t0=time.perf_counter()
+    df=read_snapshot(path)
+    t1=time.perf_counter()
+    if 'distance_km' not in df.columns:
+        df['distance_km']=delivery_distance_km(df,mode=DISTANCE_MODE)
+    t2=time.perf_counter()
+    return df,{'rows_raw':len(df),'read_s':t1-t0,'clean_s':0.0,'distance_s':t2-t1}
+
+def resolve_source(path,snapshot_path):
+    """ Esta função escolhe o arquivo a ser carregado: o snapshot, quando ele existe e não é
+    mais antigo que o CSV; caso contrário, o próprio CSV. Um diretório ou padrão glob é lido
+    como um conjunto particionado (o snapshot não é usado).
+
+    Input: caminho do CSV (ou do conjunto particionado); caminho do snapshot (ou None)
+    Output: tupla (caminho, 'snapshot', 'csv' ou 'partitioned')
+    """
+    if is_partitioned(path):
+        return path,'partitioned'
+    if snapshot_path and os.path.exists(snapshot_path):
+        if not os.path.exists(path) or os.stat(snapshot_path).st_mtime_ns>=os.stat(path).st_mtime_ns:
+            return snapshot_path,'snapshot'
+    return path,'csv'
+
+def batches_version(batches_dir):
+    """ Esta função retorna a versão dos lotes incrementais (ver utils/ingest.py): nome, mtime e
+    tamanho de cada arquivo. Os lotes nunca são alterados depois de gravados.
+
+    Input: diretório dos lotes
+    Output: tupla ordenada com (nome, mtime em ns, tamanho) de cada lote
+    """
+    if not batches_dir or not os.path.isdir(batches_dir):
+        return ()
+    lotes=[]
+    for nome in sorted(os.listdir(batches_dir)):
+        if nome.endswith('.feather'):
+            stat=os.stat(os.path.join(batches_dir,nome))
+            lotes.append((nome,stat.st_mtime_ns,stat.st_size))
+    return tuple(lotes)
+
+def combined_version(digest,lotes):
+    """ Esta função combina o hash do arquivo principal com a lista de lotes em uma única versão.
+
+    Input: hash do arquivo principal; versão dos lotes (batches_version)
+    Output: versão (string)
+    """
+    if not lotes:
+        return digest
+    md5=hashlib.md5(digest.encode())
+    for nome,_,tamanho in lotes:
+        md5.update(f'|{nome}:{tamanho}'.encode())
+    return md5.hexdigest()
+
+def append_sorted(df,batch):
+    """ Esta função acrescenta um lote já limpo ao dataframe, mantendo a ordenação por data.
+    Quando o lote só tem datas a partir da última data do dataframe, basta concatenar.
+
+    Input: dataframe ordenado por data; lote limpo
+    Output: dataframe ordenado por data
+    """
+    batch=sort_by_date(batch)
+    novo=concat_cleaned([df,batch])
+    if len(df) and len(batch) and batch['Order_Date'].iloc[0]<df['Order_Date'].iloc[-1]:
+        # Duas sequências ordenadas: a ordenação estável (timsort) as intercala em tempo linear
+        novo=sort_by_date(novo)
+    return novo
+
+def _load(path,kind,version,batches_dir):
+    """ Esta função carrega o arquivo escolhido e os lotes incrementais, ordena os pedidos por data
+    e monta o dicionário com as informações da carga.
+
+    Input: caminho do arquivo; 'snapshot' ou 'csv'; versão do arquivo; diretório dos lotes
+    Output: tupla (dataframe limpo, dicionário com as informações da carga)
+    """
+    if kind=='snapshot':
+        df,tempos=read_snapshot_dataset(path)
+    elif kind=='partitioned':
+        # Arquivos lidos e limpos em paralelo; 'distance_km' já vem calculada em cada arquivo.
+        # Sem poda: o dataframe é compartilhado por todas as sessões e os filtros da barra lateral
+        # (que mudam a cada interação) são aplicados em memória (utils/filters.py)
+        df,tempos=read_partitioned(path,distance_mode=DISTANCE_MODE)
+    else:
+        df,tempos=read_csv_dataset(path)
+    t0=time.perf_counter()
+    lotes=batches_version(batches_dir)
+    if lotes:
+        df=concat_cleaned([df]+[read_snapshot(os.path.join(batches_dir,nome)) for nome,_,_ in lotes])
+    tempos['batches_s']=time.perf_counter()-t0
+    t0=time.perf_counter()
+    df=sort_by_date(df)
+    tempos['sort_s']=time.perf_counter()-t0
+    # Etapas da carga no run em andamento (utils/profiling.py), quando a carga acontece nesta execução
+    leitura={'snapshot':'read_snapshot','partitioned':'read_partitions'}.get(kind,'read_csv')
+    for nome,etapa,chave in [(leitura,'read','read_s'),
+                             ('clean_data','clean','clean_s'),
+                             ('delivery_distance_km','clean','distance_s'),
+                             ('batches','read','batches_s'),
+                             ('sort_by_date','clean','sort_s')]:
+        record(nome,etapa,tempos[chave])
+
+    info={'path':path,
+          'source':kind,
+          'mtime_ns':version[0],
+          'version':combined_version(version[1],lotes),
+          'batches':len(lotes),
+          'rows':len(df),
+          'loaded_at':time.time()}
+    info.update(tempos)
+    return df,info
+
+def _source_key(path,snapshot_path,batches_dir):
+    """ Esta função retorna o arquivo a ser carregado e a chave da sua versão (arquivo, versão, lotes).
+
+    Input: caminho do CSV; caminho do snapshot; diretório dos lotes
+    Output: tupla (caminho, 'snapshot' ou 'csv', chave da versão)
+    """
+    source,kind=resolve_source(path,snapshot_path)
+    if kind=='partitioned':
+        return source,kind,(source,partitions_version(discover_partitions(source),source),batches_version(batches_dir))
+    return source,kind,(source,dataset_version(source),batches_version(batches_dir))
+
+def _get(path,snapshot_path,batches_dir=BATCHES_DIR):
+    """ Esta função retorna a entrada do cache para o arquivo, recarregando-o caso a versão tenha mudado.
+
+    Input: caminho do CSV; caminho do snapshot; diretório dos lotes
+    Output: dicionário com o dataframe limpo ('df'), as informações da carga ('info') e as estruturas derivadas ('derived')
+    """
+    source,kind,chave_versao=_source_key(path,snapshot_path,batches_dir)
+    chave=os.path.abspath(path)
+    entrada=_cache.get(chave)
+    if entrada is not None and entrada['key']==chave_versao:
+        return entrada
+    with _lock:
+        # Outra sessão pode ter carregado o arquivo enquanto esperávamos o lock
+        entrada=_cache.get(chave)
+        if entrada is None or entrada['key']!=chave_versao:
+            df,info=_load(source,kind,chave_versao[1],batches_dir)
+            entrada={'key':chave_versao,'df':df,'info':info,'derived':{},'updaters':{}}
+            _cache[chave]=entrada
+    return entrada
+
+def load_data(path=DATA_PATH,snapshot_path=SNAPSHOT_PATH,batches_dir=BATCHES_DIR):
+    """ Esta função carrega e limpa o conjunto de dados uma única vez por processo.
+    Quando existe um snapshot colunar atualizado (python -m utils.snapshot), ele é lido com
+    memory mapping no lugar do CSV. Os lotes incrementais (utils/ingest.py) são acrescentados
+    e os pedidos ficam ordenados por 'Order_Date'.
+    O resultado é compartilhado entre todas as sessões e páginas e só é recarregado
+    quando o mtime ou o hash do arquivo mudam.
+    Atenção: o dataframe é compartilhado e deve ser tratado como somente leitura,
+    assim como o resultado dos filtros da barra lateral (utils.filters.filter_orders).
+
+    Input: caminho do CSV; caminho do snapshot; diretório dos lotes
+    Output: dataframe limpo
+    """
+    return _get(path,snapshot_path,batches_dir)['df']
+
+def load_derived(name,build,update=None,path=DATA_PATH,snapshot_path=SNAPSHOT_PATH,batches_dir=BATCHES_DIR):
+    """ Esta função retorna uma estrutura derivada do conjunto de dados (índices, agregados...),
+    construída uma única vez por versão do arquivo e compartilhada como o próprio dataframe.
+    O tempo de construção fica registrado em load_info(), na chave '<name>_s'.
+    Quando um lote é acrescentado (apply_batch), as estruturas com função de atualização são
+    atualizadas só com o lote; as demais são descartadas e reconstruídas no próximo acesso.
+
+    Input:
+        - name: nome da estrutura
+        - build: função que recebe o dataframe limpo e constrói a estrutura
+        - update: função (opcional) que recebe a estrutura e um lote limpo e retorna a estrutura atualizada
+        - path, snapshot_path, batches_dir: caminhos do CSV, do snapshot e dos lotes
+    Output:
+        - estrutura derivada
+    """
+    entrada=_get(path,snapshot_path,batches_dir)
+    derivados=entrada['derived']
+    if name not in derivados:
+        with _lock:
+            if name not in derivados:
+                t0=time.perf_counter()
+                derivados[name]=build(entrada['df'])
+                entrada['info'][f'{name}_s']=time.perf_counter()-t0
+    if update is not None:
+        entrada['updaters'][name]=update
+    return derivados[name]
+
+def cache_lock():
+    """ Esta função retorna o lock (reentrante) do cache do processo. Quem grava um lote em batches_dir
+    deve segurá-lo da gravação até o apply_batch, para que nenhuma carga leia o lote do disco no meio.
+
+    Input: None
+    Output: lock
+    """
+    return _lock
+
+def apply_batch(batch,path=DATA_PATH,snapshot_path=SNAPSHOT_PATH,batches_dir=BATCHES_DIR,arquivo=None):
+    """ Esta função acrescenta ao cache do processo um lote limpo que acabou de ser gravado em batches_dir,
+    sem reler o histórico: o dataframe recebe as novas linhas e as estruturas derivadas com função de
+    atualização são atualizadas apenas com o lote (a função pode retornar None quando não consegue,
+    e a estrutura é reconstruída no próximo acesso).
+    Se o conjunto de dados ainda não foi carregado neste processo, se o arquivo principal mudou, se o
+    lote já foi lido do disco por uma carga mais recente ou se há outros lotes novos no disco (gravados
+    por outro processo), nada é feito: a próxima carga lê os lotes do disco.
+
+    Custo: a concatenação do lote copia o dataframe (uma cópia de memória, O(histórico), sem reler nem
+    limpar as linhas antigas) e as máscaras do índice dos filtros; as estruturas sem função de atualização
+    (índice espacial, sketches, histogramas, janelas) são reconstruídas sobre todo o histórico no próximo
+    acesso. Um lote gravado por outro processo (python -m utils.ingest) muda a versão dos lotes e faz
+    este processo recarregar tudo.
+
+    Input: lote limpo; caminhos do CSV, do snapshot e dos lotes; nome do arquivo do lote em batches_dir
+           (None = o único lote novo no disco)
+    Output: True se o cache foi atualizado
+    """
+    chave=os.path.abspath(path)
+    with _lock:
+        entrada=_cache.get(chave)
+        if entrada is None:
+            return False
+        source,kind,chave_versao=_source_key(path,snapshot_path,batches_dir)
+        if entrada['key'][:2]!=chave_versao[:2]:
+            return False
+        carregados={nome for nome,_,_ in entrada['key'][2]}
+        novos={nome for nome,_,_ in chave_versao[2]}-carregados
+        if arquivo is None and len(novos)==1:
+            arquivo=next(iter(novos))
+        # O lote já está no dataframe (carga feita depois da gravação) ou há lotes de outro processo
+        if arquivo in carregados or novos!={arquivo}:
+            return False
+
+        t0=time.perf_counter()
+        entrada['df']=append_sorted(entrada['df'],batch)
+        derivados={}
+        for nome,valor in entrada['derived'].items():
+            if nome in entrada['updaters']:
+                atualizado=entrada['updaters'][nome](valor,batch)
+                if atualizado is not None:
+                    derivados[nome]=atualizado
+        entrada['derived']=derivados
+        entrada['key']=chave_versao
+
+        info=entrada['info']
+        info['version']=combined_version(chave_versao[1][1],chave_versao[2])
+        info['batches']=len(chave_versao[2])
+        info['rows']=len(entrada['df'])
+        info['last_batch_rows']=len(batch)
+        info['last_batch_s']=time.perf_counter()-t0
+    return True
+
+def load_info(path=DATA_PATH,snapshot_path=SNAPSHOT_PATH,batches_dir=BATCHES_DIR):
+    """ Esta função retorna as informações da última carga do arquivo: origem ('snapshot' ou 'csv'),
+    versão, número de linhas e os tempos de leitura (read_s), de limpeza (clean_s) e das
+    estruturas derivadas em segundos.
+
+    Input: caminho do CSV; caminho do snapshot; diretório dos lotes
+    Output: dicionário
+    """
+    return dict(_get(path,snapshot_path,batches_dir)['info'])
+
+def _is_ready(path,snapshot_path,batches_dir,names):
+    """ Esta função indica se os dados da versão atual e as estruturas derivadas indicadas já estão no cache """
+    entrada=_cache.get(os.path.abspath(path))
+    if entrada is None:
+        # Primeira carga do processo: a versão (hash do arquivo) é calculada na própria carga, em segundo plano
+        return False
+    _,_,chave_versao=_source_key(path,snapshot_path,batches_dir)
+    return entrada['key']==chave_versao and all(n in entrada['derived'] for n in names)
+
+def start_loading(derived=(),path=DATA_PATH,snapshot_path=SNAPSHOT_PATH,batches_dir=BATCHES_DIR):
+    """ Esta função inicia, em uma thread, a carga dos dados e das estruturas derivadas que ainda não
+    estão no cache. Se a mesma carga já está em andamento (outra sessão), ela é reaproveitada.
+    As etapas medidas pela carga são registradas no run da página que a iniciou (utils/profiling.py).
+
+    Input: lista de tuplas (nome, função de construção) das estruturas derivadas; caminhos do CSV, do snapshot e dos lotes
+    Output: dicionário com o progresso: 'stage' (etapa atual), 'done', 'total', 'error' e 'thread' (None se já estava tudo pronto)
+    """
+    nomes=tuple(nome for nome,_ in derived)
+    total=1+len(nomes)
+    if _is_ready(path,snapshot_path,batches_dir,nomes):
+        return {'stage':'pronto','done':total,'total':total,'error':None,'thread':None}
+    chave=(os.path.abspath(path),nomes)
+    with _lock:
+        job=_jobs.get(chave)
+        if job is not None and job['thread'].is_alive():
+            return job
+        job={'stage':'lendo e limpando os dados','done':0,'total':total,'error':None,'thread':None}
+        run=current_run()
+
+        def carregar():
+            bind_run(run)
+            try:
+                load_data(path,snapshot_path,batches_dir)
+                for nome,build in derived:
+                    job['done']+=1
+                    job['stage']=f'montando {nome}'
+                    load_derived(nome,build,path=path,snapshot_path=snapshot_path,batches_dir=batches_dir)
+                job['done']=total
+                job['stage']='pronto'
+            except Exception as erro:
+                job['error']=erro
+            finally:
+                bind_run(None)
+
+        job['thread']=threading.Thread(target=carregar,name='dashboard-load',daemon=True)
+        _jobs[chave]=job
+        job['thread'].start()
+    return job
+
+def wait_for_data(derived=(),on_progress=None,interval=0.1,path=DATA_PATH,snapshot_path=SNAPSHOT_PATH,batches_dir=BATCHES_DIR):
+    """ Esta função carrega os dados e as estruturas derivadas em segundo plano (start_loading) e espera
+    o fim da carga, chamando on_progress(fração, etapa) a cada intervalo (por exemplo, para atualizar uma
+    barra de progresso enquanto a página já mostra a barra lateral). Depois dela, load_data e load_derived
+    retornam imediatamente.
+
+    Input: lista de tuplas (nome, função de construção); função de progresso (opcional); intervalo em segundos;
+           caminhos do CSV, do snapshot e dos lotes
+    Output: None (o erro da carga, se houver, é relançado)
+    """
+    job=start_loading(derived,path,snapshot_path,batches_dir)
+    while job['thread'] is not None and job['thread'].is_alive():
+        if on_progress is not None:
+            on_progress(job['done']/job['total'],job['stage'])
+        job['thread'].join(interval)
+    if job['error'] is not None:
+        raise job['error']
@@ -0,0 +1,218 @@
+""" Métricas do dashboard, sem o Streamlit: as agregações das páginas (pedidos por dia e por semana,
+pedidos por entregador, avaliações, tempos de entrega e distâncias).
+
+As páginas montam os gráficos e tabelas a partir destas funções, e o serviço HTTP (api.py)
+devolve os mesmos números em JSON. Todas recebem o dataframe já filtrado (utils.filters.filter_orders)
+e, quando indicado, o cubo diário ou os sketches com os mesmos filtros.
+"""
+# Importando as bibliotecas necessárias
+import numpy as np
+import pandas as pd
+
+from utils.cube import cube_count, cube_nunique_couriers
+from utils.geo import delivery_distance_km
+from utils.parallel import group_count, group_nunique, group_stats, register_key
+from utils.sketches import sketch_count, sketch_nunique
+
+
+# Rótulos das semanas do ano ('%U')
+WEEK_LABELS=np.array(['%02d'%i for i in range(54)],dtype=object)
+
+
+# =====================================================
+# FUNÇÕES: pedidos (Visão Empresa)
+# =====================================================
+
+def week_of_year(df):
+    """ Esta função retorna o número da semana do ano de cada pedido, sem alterar o dataframe
+    (que pode ser uma view do conjunto de dados compartilhado).
+    A semana é a do formato '%U' (semanas começando no domingo, '00' a '53'), calculada pelo dia do ano
+    e pelo dia da semana, sem formatar cada data como texto.
+
+    Input: dataframe
+    Output: Series 'week_of_year'
+    """
+    datas=df['Order_Date'].dt
+    semana=(datas.dayofyear.to_numpy()+6-(datas.dayofweek.to_numpy()+1)%7)//7
+    return pd.Series(WEEK_LABELS[semana],index=df.index,name='week_of_year')
+
+# A semana do ano como chave das agregações em paralelo: calculada uma vez na base compartilhada
+register_key('week_of_year',week_of_year)
+
+def orders_per_day(df,cube=None):
+    """ Esta função conta os pedidos de cada dia.
+
+    Input: dataframe; cubo diário filtrado (opcional)
+    Output: Series 'ID' indexada por 'Order_Date'
+    """
+    if cube is not None:
+        return cube_count(cube,'Order_Date').rename('ID')
+    return df.groupby('Order_Date')['ID'].count()
+
+def orders_by_traffic(df,cube=None):
+    """ Esta função conta os pedidos de cada tipo de tráfego.
+
+    Input: dataframe; cubo diário filtrado (opcional)
+    Output: Series 'ID' indexada por 'Road_traffic_density'
+    """
+    if cube is not None:
+        return cube_count(cube,'Road_traffic_density').rename('ID')
+    return df.groupby('Road_traffic_density',observed=True)['ID'].count().sort_index()
+
+def orders_by_traffic_city(df,cube=None):
+    """ Esta função conta os pedidos de cada cidade em cada tipo de tráfego.
+
+    Input: dataframe; cubo diário filtrado (opcional)
+    Output: dataframe com as colunas 'Road_traffic_density', 'City' e 'ID'
+    """
+    if cube is not None:
+        return cube_count(cube,['Road_traffic_density','City']).rename('ID').reset_index()
+    cols=['ID','Road_traffic_density','City']
+    return df.loc[:,cols].groupby(['Road_traffic_density','City'],observed=True).count().sort_index().reset_index()
+
+def orders_per_week(df,cube=None):
+    """ Esta função conta os pedidos de cada semana do ano (week_of_year).
+
+    Input: dataframe; cubo diário filtrado (opcional)
+    Output: Series 'ID' indexada por 'week_of_year'
+    """
+    if cube is not None:
+        return cube_count(cube,week_of_year(cube['cells'])).rename('ID')
+    return df['ID'].groupby(week_of_year(df)).count()
+
+def orders_per_courier_week(df,cube=None,sketches=None):
+    """ Esta função calcula o número de pedidos por entregador em cada semana do ano.
+    Quando o cubo diário (já filtrado) é informado, as contagens são feitas sobre as suas células; se o cubo
+    não tiver os bitsets de entregadores (muitos entregadores), os entregadores únicos são contados nas linhas,
+    com as partições agregadas em paralelo (ver utils/parallel.py).
+    No modo aproximado (sketches filtrados informados) os entregadores únicos são estimados pelo HyperLogLog.
+
+    Input: dataframe; cubo diário filtrado (opcional); sketches filtrados (opcional)
+    Output: dataframe com as colunas 'week_of_year', 'ID' (pedidos), 'Delivery_person_ID' (entregadores únicos)
+            e 'order_delivery' (pedidos por entregador)
+    """
+    if sketches is not None:
+        semana=week_of_year(sketches['cells'])
+        pedidos1=sketch_count(sketches,semana).rename('ID').reset_index()
+        pedidos2=sketch_nunique(sketches,semana).rename('Delivery_person_ID').reset_index()
+    else:
+        entregadores=None
+        if cube is not None:
+            semana=week_of_year(cube['cells'])
+            entregadores=cube_nunique_couriers(cube,semana)
+        if entregadores is not None:
+            pedidos1=cube_count(cube,semana).rename('ID').reset_index()
+            pedidos2=entregadores.rename('Delivery_person_ID').reset_index()
+        else:
+            pedidos1=group_count(df,'week_of_year').rename('ID').reset_index()
+            pedidos2=group_nunique(df,'week_of_year','Delivery_person_ID').reset_index()
+    pedidos=pd.merge(pedidos1,pedidos2,how='inner')
+    pedidos['order_delivery']=pedidos['ID']/pedidos['Delivery_person_ID']
+    return pedidos
+
+
+# =====================================================
+# FUNÇÕES: entregadores (Visão Entregadores)
+# =====================================================
+
+def rating_by (df,col):
+    """ Esta função tem como objetivo retornar a média e o desvio padrão das avaliações agrupadas por outro parâmetro (a ser escolhido pelo usuário).
+    As partições do dataframe são agregadas em paralelo quando ele é grande (ver utils/parallel.py).
+    Portanto:
+
+    Input: dataframe; coluna a ser agrupada
+    Output: dataframe com média e desvio padrão
+    """
+    rating=(group_stats(df,col,'Delivery_person_Ratings')
+            .loc[:,['mean','std']]
+            .reset_index())
+    rating.columns=[col,'Média da avaliação','Desvio Padrão da avaliação']
+    return rating
+
+
+# =====================================================
+# FUNÇÕES: tempos e distâncias (Visão Restaurantes)
+# =====================================================
+
+def dist_media(df,arg):
+    """
+    Esta função calcula a distância entre os restaurantes e os locais de entrega.
+    Esta função pode retornar 2 valores diferentes:
+        Input:
+            - df: dataframe
+            - arg: 'True' = retorna o valor do dataframe auxiliar; 'False' = retorna a distância média entre os pontos.
+        Output:
+            - aux: dataframe auxiliar contendo as colunas de distância para cada ponto
+            - dist_media: distância média entre os pontos em km
+    A distância de cada entrega (coluna 'distance_km') é calculada uma única vez na carga dos dados,
+    de forma vetorizada, a partir das latitudes e longitudes de cada restaurante e cada local de entrega (ver utils/geo.py).
+    Caso a coluna não exista, ela é calculada aqui com o mesmo motor.
+    Ao final, a função retorna um valor médio de todas as distâncias ou o dataframe auxiliar.
+    """
+    aux=df.loc[:,['ID',
+                  'City',
+                  'Restaurant_latitude',
+                  'Restaurant_longitude',
+                  'Delivery_location_latitude',
+                  'Delivery_location_longitude']]
+    #Distância em km entre os pontos
+    if 'distance_km' in df.columns:
+        aux['distance_km']=df['distance_km']
+    else:
+        aux['distance_km']=delivery_distance_km(aux)
+
+    if arg == 'False':
+        #Cálculo da média das distâncias com arredondamento de 2 casas decimais
+        dist_media=np.round(aux['distance_km'].mean(),2)
+        return dist_media
+    else:
+        return aux
+
+def distance_by_city(df):
+    """ Esta função calcula a distância média entre restaurante e local de entrega em cada cidade.
+
+    Input: dataframe
+    Output: dataframe com as colunas 'City' e 'distance_km'
+    """
+    aux=dist_media(df,'True')
+    return aux.loc[:,['distance_km','City']].groupby(['City'],observed=True).mean().sort_index().reset_index()
+
+def time_by_city(df):
+    """ Esta função calcula o tempo médio e o desvio padrão do tempo de entrega por cidade.
+
+    Input: dataframe
+    Output: dataframe com as colunas 'City', 'mean_time' e 'std_time'
+    """
+    tabela=group_stats(df,'City','Time_taken(min)').loc[:,['mean','std']].reset_index()
+    tabela.columns=['City','mean_time','std_time']
+    return tabela
+
+def time_by_city_traffic(df):
+    """ Esta função calcula o tempo médio e o desvio padrão do tempo de entrega por cidade e tipo de tráfego.
+
+    Input: dataframe
+    Output: dataframe com as colunas 'City', 'Road_traffic_density', 'mean_time' e 'std_time'
+    """
+    tabela=group_stats(df,['City','Road_traffic_density'],'Time_taken(min)').loc[:,['mean','std']].reset_index()
+    tabela.columns=['City','Road_traffic_density','mean_time','std_time']
+    return tabela
+
+def time_city_order(df):
+    """ Esta função calcula o tempo médio e o desvio padrão do tempo de entrega por cidade e tipo de pedido.
+
+    Input: dataframe
+    Output: dataframe com as colunas 'City', 'Type_of_order', 'mean_time' e 'std_time'
+    """
+    tabela=group_stats(df,['City','Type_of_order'],'Time_taken(min)').loc[:,['mean','std']]
+    tabela.columns=['mean_time','std_time']
+    return tabela.reset_index()
+
+def festival_stats(df):
+    """ Esta função calcula, em uma única passada, o tempo médio e o desvio padrão do tempo de entrega
+    dos pedidos com e sem festival (as quatro métricas de festival da página).
+
+    Input: dataframe
+    Output: dataframe indexado por 'Yes'/'No' com as colunas 'mean' e 'std' (arredondadas em 2 casas)
+    """
+    stats=group_stats(df,'Festival','Time_taken(min)').loc[:,['mean','std']]
+    return np.round(stats.reindex(['Yes','No']),2)
@@ -0,0 +1,423 @@
+# Importando as bibliotecas necessárias
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+# Número de processos do backend paralelo (1 = sempre serial)
+WORKERS=os.cpu_count() or 1
+
+# Abaixo desse número de linhas a agregação é feita no próprio processo (o custo de
+# distribuir as partições seria maior que o ganho)
+MIN_PARALLEL_ROWS=500_000
+
+# Pool de processos do backend, criado no primeiro uso e compartilhado por todas as sessões
+_pool=None
+_pool_workers=0
+
+# Número de agregações feitas no pool (as demais rodam no próprio processo)
+_pool_calls=0
+_lock=threading.Lock()
+
+# Dataframe carregado registrado por share_frame: colunas codificadas na memória compartilhada
+_shared=None
+
+# Chaves calculadas a partir das colunas (nome -> função que recebe o dataframe e retorna uma Series),
+# registradas com register_key e usadas nas agregações pelo nome, como uma coluna
+_keys={}
+
+
+# =====================================================
+# FUNÇÕES: agregação de uma partição
+# =====================================================
+
+def _combine(codes,tamanhos):
+    """ Esta função combina os códigos das colunas de agrupamento em uma única chave inteira (base mista).
+    As linhas com algum código -1 (valor nulo) ficam de fora, como no pandas (groupby com dropna=True).
+
+    Input: lista de arrays de códigos; número de valores de cada coluna
+    Output: tupla (chave de cada linha válida, máscara das linhas válidas ou None se todas são válidas)
+    """
+    chave=np.zeros(len(codes[0]) if codes else 0,dtype='int64')
+    invalidas=None
+    for c,tamanho in zip(codes,tamanhos):
+        nulos=c<0
+        if nulos.any():
+            invalidas=nulos if invalidas is None else invalidas|nulos
+        chave=chave*max(tamanho,1)+c
+    if invalidas is None:
+        return chave,None
+    validas=~invalidas
+    return chave[validas],validas
+
+def _stats_arrays(chave,valores,n_chaves):
+    """ Esta função calcula a contagem, a soma e a soma dos quadrados dos valores de cada chave.
+
+    Input: array com a chave de cada linha; array de valores (ou None, só contagem); número de chaves
+    Output: array (3 x n_chaves)
+    """
+    n=np.bincount(chave,minlength=n_chaves).astype('float64')
+    if valores is None:
+        return np.vstack([n,np.zeros(n_chaves),np.zeros(n_chaves)])
+    return np.vstack([n,
+                      np.bincount(chave,weights=valores,minlength=n_chaves),
+                      np.bincount(chave,weights=valores*valores,minlength=n_chaves)])
+
+def _aggregate(tarefa,codes,tamanhos,valores,parametro):
+    """ Esta função agrega uma partição: combina os códigos das colunas de agrupamento (descartando as linhas
+    com algum código nulo) e calcula os momentos dos valores ('stats') ou os pares distintos ('pairs': o
+    último array de códigos é o da coluna dos valores distintos, e cada par é a chave combinada).
+
+    Input: 'stats' ou 'pairs'; lista de arrays de códigos; número de valores de cada coluna; valores
+           (None = só contagem); número de chaves (usado em 'stats')
+    Output: agregado parcial da partição
+    """
+    chave,validas=_combine(codes,tamanhos)
+    if tarefa=='pairs':
+        return np.unique(chave)
+    if valores is not None:
+        valores=np.asarray(valores if validas is None else valores[validas],dtype='float64')
+    return _stats_arrays(chave,valores,parametro)
+
+def _partition_task(tarefa,descritores,tamanhos,inicio,fim,parametro):
+    """ Esta função é executada nos processos do pool: abre as colunas na memória compartilhada e agrega
+    a partição [inicio, fim) diretamente sobre os blocos (sem copiá-la).
+
+    Input: 'stats' ou 'pairs'; descritores (nome, tipo, tamanho) das colunas de códigos e da coluna de
+           valores (None = ausente); número de valores de cada coluna de códigos; início e fim da partição;
+           número de chaves ou de códigos
+    Output: agregado parcial da partição
+    """
+    blocos=[]
+    try:
+        arrays=[]
+        for descritor in descritores:
+            if descritor is None:
+                arrays.append(None)
+                continue
+            nome,dtype,tamanho=descritor
+            shm=shared_memory.SharedMemory(name=nome)
+            blocos.append(shm)
+            arrays.append(np.ndarray((tamanho,),dtype=dtype,buffer=shm.buf)[inicio:fim])
+        resultado=_aggregate(tarefa,arrays[:len(tamanhos)],tamanhos,arrays[len(tamanhos)],parametro)
+        del arrays
+        return resultado
+    finally:
+        for shm in blocos:
+            shm.close()
+
+
+# =====================================================
+# FUNÇÕES: backend
+# =====================================================
+
+def configure(workers=None,min_rows=None):
+    """ Esta função altera o número de processos e o número mínimo de linhas do backend paralelo.
+
+    Input: número de processos (1 = serial); número mínimo de linhas para usar o pool
+    Output: None
+    """
+    global WORKERS,MIN_PARALLEL_ROWS
+    if workers is not None:
+        WORKERS=max(int(workers),1)
+    if min_rows is not None:
+        MIN_PARALLEL_ROWS=int(min_rows)
+
+def backend_info():
+    """ Esta função retorna a configuração do backend: processos, linhas mínimas, se o pool está ativo
+    e quantas agregações foram feitas no pool.
+
+    Input: None
+    Output: dicionário
+    """
+    return {'workers':WORKERS,'min_parallel_rows':MIN_PARALLEL_ROWS,'pool_workers':_pool_workers,
+            'pool_calls':_pool_calls}
+
+def _get_pool(workers):
+    """ Esta função retorna o pool de processos, recriando-o se o número de processos mudou """
+    global _pool,_pool_workers
+    with _lock:
+        if _pool is None or _pool_workers!=workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # 'spawn': o processo do Streamlit tem várias threads, e um fork copiaria locks em uso
+            _pool=ProcessPoolExecutor(max_workers=workers,mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers=workers
+        return _pool
+
+@atexit.register
+def shutdown():
+    """ Esta função encerra o pool de processos (chamada também na saída do programa) """
+    global _pool,_pool_workers
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+        _pool=None
+        _pool_workers=0
+
+def _to_shared(array):
+    """ Esta função copia o array para um bloco de memória compartilhada.
+
+    Input: array
+    Output: tupla (bloco de memória compartilhada, descritor (nome, tipo, tamanho))
+    """
+    array=np.ascontiguousarray(array)
+    shm=shared_memory.SharedMemory(create=True,size=max(array.nbytes,1))
+    np.ndarray(array.shape,dtype=array.dtype,buffer=shm.buf)[:]=array
+    return shm,(shm.name,array.dtype.str,len(array))
+
+@atexit.register
+def release_shared():
+    """ Esta função libera os blocos de memória compartilhada do dataframe registrado (share_frame) """
+    global _shared
+    with _lock:
+        if _shared is not None:
+            for shm in _shared['blocks']:
+                shm.close()
+                try:
+                    shm.unlink()
+                except FileNotFoundError:
+                    pass
+        _shared=None
+
+def share_frame(df):
+    """ Esta função registra o dataframe carregado como base das agregações em paralelo, no lugar da base
+    anterior (cujos blocos são liberados). Cada coluna usada por uma agregação é codificada e copiada para
+    a memória compartilhada uma única vez, no primeiro uso (ver _shared_column), e reaproveitada por todas
+    as chamadas seguintes sobre a base ou um prefixo dela (o filtro de data da barra lateral é um prefixo).
+    Feita para ser uma estrutura derivada: load_derived('shared_frame',share_frame), uma vez por versão.
+
+    Input: dataframe carregado
+    Output: dicionário com o dataframe, as colunas já compartilhadas e os blocos
+    """
+    global _shared
+    release_shared()
+    with _lock:
+        _shared={'df':df,'columns':{},'blocks':[]}
+        return _shared
+
+def register_key(nome,func):
+    """ Esta função registra uma chave de agrupamento calculada linha a linha a partir das colunas (por
+    exemplo, a semana do ano de cada pedido). As agregações aceitam o nome da chave como uma coluna; na base
+    registrada por share_frame ela é calculada e copiada para a memória compartilhada uma única vez.
+
+    Input: nome da chave; função que recebe um dataframe e retorna uma Series alinhada com ele
+    Output: None
+    """
+    _keys[nome]=func
+
+def _column(df,nome):
+    """ Coluna do dataframe ou, se não existir, a chave registrada com esse nome (register_key) """
+    return df[nome] if nome in df.columns else _keys[nome](df)
+
+def _address(serie):
+    """ Endereço do primeiro elemento e passo dos dados da coluna (os códigos, se for categórica): um prefixo
+    tem os dois iguais aos da base, e uma view com passo (df.iloc[::2]) só o endereço """
+    valores=serie.cat.codes.to_numpy() if isinstance(serie.dtype,pd.CategoricalDtype) else serie.to_numpy()
+    return valores.__array_interface__['data'][0],valores.strides
+
+def _shared_prefix(df,by):
+    """ Esta função retorna a base registrada quando o dataframe é um prefixo dela (as colunas do dataframe
+    apontam para os mesmos dados, como em df.iloc[:fim]); caso contrário, None.
+
+    Input: dataframe; colunas de agrupamento
+    Output: base registrada (share_frame) ou None
+    """
+    shared=_shared
+    if shared is None or not all(isinstance(b,str) for b in by) or len(df)>len(shared['df']) or len(df)==0:
+        return None
+    if not all(b in shared['df'].columns or (b in _keys and b not in df.columns) for b in by):
+        return None
+    # As chaves registradas são calculadas das colunas: basta conferir uma coluna quando só há chaves
+    colunas=[b for b in by if b in df.columns] or [c for c in df.columns[:1] if c in shared['df'].columns]
+    if not colunas or any(_address(df[c])!=_address(shared['df'][c]) for c in colunas):
+        return None
+    return shared
+
+def _shared_column(shared,col,tipo):
+    """ Esta função retorna a coluna da base na memória compartilhada, copiando-a no primeiro uso.
+
+    Input: base registrada (share_frame); coluna ou chave registrada (register_key); 'codes' (códigos de
+           agrupamento) ou 'values' (float64)
+    Output: tupla (descritor (nome, tipo, tamanho), valores únicos dos códigos ou None)
+    """
+    with _lock:
+        if (col,tipo) not in shared['columns']:
+            valores=_column(shared['df'],col)
+            uniques=None
+            if tipo=='values':
+                array=valores.to_numpy(dtype='float64')
+            elif isinstance(valores.dtype,pd.CategoricalDtype):
+                array=valores.cat.codes.to_numpy()
+                uniques=pd.CategoricalIndex(valores.cat.categories,dtype=valores.dtype)
+            else:
+                array,uniques=pd.factorize(valores,sort=True)
+            shm,descritor=_to_shared(array)
+            shared['blocks'].append(shm)
+            shared['columns'][(col,tipo)]=(descritor,uniques)
+        return shared['columns'][(col,tipo)]
+
+def _run_shared(tarefa,descritores,tamanhos,n,parametro,workers):
+    """ Esta função divide as n primeiras linhas da base em partições e as agrega no pool de processos.
+    Os processos recebem só os nomes dos blocos e os limites da partição: nenhum array é copiado por chamada.
+
+    Input: 'stats' ou 'pairs'; descritores das colunas de códigos e da coluna de valores; número de valores
+           de cada coluna de códigos; número de linhas; número de chaves; número de processos
+    Output: lista com os agregados parciais, ou None se o pool não puder ser usado
+    """
+    try:
+        limites=np.linspace(0,n,workers+1).astype('int64')
+        pool=_get_pool(workers)
+        futuros=[pool.submit(_partition_task,tarefa,descritores,tamanhos,int(a),int(b),parametro)
+                 for a,b in zip(limites[:-1],limites[1:]) if b>a]
+        return [f.result() for f in futuros]
+    except (OSError,BrokenProcessPool,RuntimeError):
+        shutdown()
+        return None
+
+def _partials(tarefa,df,by,col,parametro_de,workers):
+    """ Esta função calcula os agregados parciais de uma agregação. Quando o dataframe é a base registrada por
+    share_frame (ou um prefixo dela), as colunas já codificadas na memória compartilhada são reaproveitadas:
+    no pool de processos, se o dataframe tem pelo menos MIN_PARALLEL_ROWS linhas, ou no próprio processo.
+    Nos demais casos (outros subconjuntos, como o filtro de tráfego, que exigiriam copiar as linhas a cada
+    chamada) as colunas são codificadas e agregadas no próprio processo.
+
+    Input: 'stats' ou 'pairs'; dataframe; colunas de agrupamento (nomes ou Series); coluna dos valores
+           (None = só contagem); função que recebe os níveis e retorna o parâmetro da tarefa; número de processos
+    Output: tupla (lista de agregados parciais, níveis das colunas de agrupamento)
+    """
+    global _pool_calls
+    workers=WORKERS if workers is None else max(int(workers),1)
+    colunas=by+([col] if tarefa=='pairs' else [])
+    shared=_shared_prefix(df,colunas)
+    if shared is not None:
+        compartilhadas=[_shared_column(shared,c,'codes') for c in colunas]
+        niveis=[(c,u) for c,(_,u) in zip(colunas,compartilhadas)]
+        valores=None if tarefa=='pairs' or col is None else _shared_column(shared,col,'values')[0]
+        argumentos=(tarefa,[d for d,_ in compartilhadas]+[valores],[len(u) for _,u in niveis])
+        if workers>1 and len(df)>=max(MIN_PARALLEL_ROWS,workers):
+            parciais=_run_shared(*argumentos,len(df),parametro_de(niveis),workers)
+            if parciais is not None:
+                _pool_calls+=1
+                return parciais,niveis
+        return [_partition_task(*argumentos,0,len(df),parametro_de(niveis))],niveis
+    codes,niveis=_encode(df,colunas)
+    valores=None if tarefa=='pairs' or col is None else df[col].to_numpy(dtype='float64')
+    return [_aggregate(tarefa,codes,[len(u) for _,u in niveis],valores,parametro_de(niveis))],niveis
+
+def map_tasks(func,argumentos,workers=None):
+    """ Esta função executa func(*args) para cada tupla de argumentos no pool de processos (por exemplo,
+    a leitura de vários arquivos, ver utils/partitions.py), na ordem dos argumentos.
+    A função precisa estar no nível de um módulo (os processos a importam pelo nome). Com um processo,
+    uma única tarefa ou se o pool não puder ser usado, as tarefas rodam no próprio processo.
+
+    Input: função; lista de tuplas de argumentos; número de processos (None = WORKERS)
+    Output: lista com os resultados
+    """
+    argumentos=list(argumentos)
+    workers=WORKERS if workers is None else max(int(workers),1)
+    if workers>1 and len(argumentos)>1:
+        try:
+            pool=_get_pool(workers)
+            futuros=[pool.submit(func,*args) for args in argumentos]
+            return [f.result() for f in futuros]
+        except (OSError,BrokenProcessPool,RuntimeError):
+            shutdown()
+    return [func(*args) for args in argumentos]
+
+
+# =====================================================
+# FUNÇÕES: agregações usadas pelas páginas
+# =====================================================
+
+def _encode(df,by):
+    """ Esta função codifica cada coluna de agrupamento em códigos inteiros (-1 = valor nulo).
+    'by' pode conter nomes de colunas, nomes de chaves registradas (register_key) ou Series alinhadas com o dataframe.
+
+    Input: dataframe; lista de colunas (ou Series)
+    Output: tupla (lista com os códigos de cada coluna, lista de (nome, valores únicos))
+    """
+    codes=[]
+    niveis=[]
+    for b in by:
+        valores=_column(df,b) if isinstance(b,str) else b
+        if isinstance(valores.dtype,pd.CategoricalDtype):
+            c,uniques=valores.cat.codes.to_numpy(),pd.CategoricalIndex(valores.cat.categories,dtype=valores.dtype)
+        else:
+            c,uniques=pd.factorize(valores,sort=True)
+        codes.append(c)
+        niveis.append((b if isinstance(b,str) else valores.name,uniques))
+    return codes,niveis
+
+def _decode(chaves,niveis):
+    """ Esta função transforma as chaves inteiras de volta no índice dos grupos.
+
+    Input: array de chaves; lista de (nome, valores únicos)
+    Output: Index (uma dimensão) ou MultiIndex
+    """
+    colunas=[]
+    resto=np.asarray(chaves,dtype='int64')
+    for nome,uniques in reversed(niveis):
+        resto,codes=np.divmod(resto,max(len(uniques),1))
+        colunas.append(pd.Index(uniques.take(codes),name=nome))
+    colunas=colunas[::-1]
+    if len(colunas)==1:
+        return colunas[0]
+    return pd.MultiIndex.from_arrays(colunas,names=[c.name for c in colunas])
+
+def _n_keys(niveis):
+    """ Número total de chaves possíveis (produto do número de valores de cada nível) """
+    return int(np.prod([max(len(u),1) for _,u in niveis],dtype='int64'))
+
+def group_stats(df,by,col=None,workers=None):
+    """ Esta função retorna a contagem, a média e o desvio padrão (amostral, como no pandas) de uma coluna
+    por grupo, a partir da contagem, da soma e da soma dos quadrados de cada partição (ver _partials).
+    Só os grupos com linhas aparecem, em ordem crescente, e as linhas com chave nula ficam de fora, como em
+    df.groupby(by,observed=True).agg(['count','mean','std']).sort_index().
+
+    Input: dataframe; coluna (ou lista de colunas / Series) de agrupamento; coluna de valores
+           (None = só contagem); número de processos (None = WORKERS)
+    Output: dataframe com as colunas 'count', 'mean' e 'std'
+    """
+    by=by if isinstance(by,list) else [by]
+    parciais,niveis=_partials('stats',df,by,col,_n_keys,workers)
+    n,soma,somasq=np.sum(parciais,axis=0)
+
+    observadas=np.flatnonzero(n)
+    n,soma,somasq=n[observadas],soma[observadas],somasq[observadas]
+    with np.errstate(divide='ignore',invalid='ignore'):
+        media=soma/n
+        variancia=np.where(n>1,(somasq-n*media**2)/(n-1),np.nan)
+    return pd.DataFrame({'count':n.astype('int64'),
+                         'mean':media,
+                         'std':np.sqrt(np.clip(variancia,0,None))},
+                        index=_decode(observadas,niveis))
+
+def group_count(df,by,workers=None):
+    """ Esta função retorna o número de linhas por grupo (ver group_stats).
+
+    Input: dataframe; coluna (ou lista de colunas / Series) de agrupamento; número de processos
+    Output: Series com a contagem
+    """
+    return group_stats(df,by,None,workers)['count']
+
+def group_nunique(df,by,col,workers=None):
+    """ Esta função retorna o número exato de valores distintos (não nulos) de uma coluna por grupo.
+    Cada partição retorna os seus pares distintos (grupo, valor); os pares são unidos no final.
+
+    Input: dataframe; coluna (ou lista de colunas / Series) de agrupamento; coluna dos valores; número de processos
+    Output: Series com o número de valores distintos
+    """
+    by=by if isinstance(by,list) else [by]
+    parciais,niveis=_partials('pairs',df,by,col,_n_keys,workers)
+    n_codes=max(len(niveis[-1][1]),1)
+    pares=np.unique(np.concatenate(parciais))
+    chaves,contagem=np.unique(pares//n_codes,return_counts=True)
+    return pd.Series(contagem,index=_decode(chaves,niveis[:-1]),name=col)
@@ -0,0 +1,272 @@
+""" Leitura de conjuntos de dados particionados: vários CSVs (por dia, por cidade...) em uma árvore de diretórios
+no formato Hive, por exemplo dataset/orders/year=2022/month=03/city=Urban/part-2022-03-11.csv.
+
+Os arquivos são encontrados a partir de um diretório ou de um padrão glob, e os valores das partições saem do
+próprio caminho (chave=valor). Um filtro de data limite ou de cidades descarta os arquivos que não podem ter
+linhas selecionadas antes de abri-los (partition pruning); os demais são lidos e limpos (clean_data) em paralelo,
+em grupos de arquivos no pool de processos (ver utils/parallel.py), e concatenados no final.
+
+A poda vale para as leituras avulsas (linha de comando, benchmarks, scripts). A carga do dashboard
+(utils/loader.py) lê todos os arquivos: o dataframe carregado é compartilhado por todas as sessões e estruturas
+derivadas, e os filtros da barra lateral mudam a cada interação, sendo aplicados em memória (utils/filters.py).
+
+Uso:
+    python -m utils.partitions dataset/orders [--date 2022-03-15] [--city Urban Metropolitian]
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import glob
+import gzip
+import hashlib
+import io
+import os
+import time
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+from utils.cleaning import clean_data, concat_cleaned
+from utils.filters import sort_by_date
+from utils.geo import delivery_distance_km
+from utils import parallel
+from utils.parallel import map_tasks
+
+
+# Extensões dos arquivos lidos
+FILE_EXTENSIONS=('.csv','.csv.gz')
+
+# Grupos de arquivos por processo na leitura paralela (mais de um, para equilibrar os processos)
+TASKS_PER_WORKER=2
+
+# Valor da partição dos nulos no formato Hive
+NULL_PARTITION='__HIVE_DEFAULT_PARTITION__'
+
+
+# =====================================================
+# FUNÇÕES: descoberta e poda
+# =====================================================
+
+def is_partitioned(source):
+    """ Esta função indica se a origem dos dados é um conjunto particionado (diretório ou padrão glob)
+    em vez de um único arquivo.
+
+    Input: caminho
+    Output: True ou False
+    """
+    return os.path.isdir(source) or glob.has_magic(source)
+
+def partition_values(path):
+    """ Esta função lê os valores das partições (chave=valor) dos diretórios de um caminho.
+
+    Input: caminho do arquivo
+    Output: dicionário chave -> valor (texto)
+    """
+    valores={}
+    for parte in os.path.normpath(os.path.dirname(path)).split(os.sep):
+        chave,sep,valor=parte.partition('=')
+        if sep and chave:
+            valores[chave.lower()]=unquote(valor)
+    return valores
+
+def discover_partitions(source):
+    """ Esta função lista os arquivos de um conjunto particionado, com os valores das partições,
+    o tamanho e o mtime de cada um.
+
+    Input: diretório ou padrão glob (por exemplo, 'dataset/orders/year=2022/**/*.csv')
+    Output: lista de dicionários ('path', 'size', 'mtime_ns' e as chaves das partições), em ordem de caminho
+    """
+    if glob.has_magic(source):
+        caminhos=[c for c in glob.glob(source,recursive=True) if os.path.isfile(c)]
+    else:
+        caminhos=[os.path.join(raiz,nome) for raiz,_,nomes in os.walk(source) for nome in nomes]
+    partes=[]
+    for caminho in sorted(caminhos):
+        if not caminho.endswith(FILE_EXTENSIONS) or os.path.basename(caminho).startswith(('.','_')):
+            continue
+        stat=os.stat(caminho)
+        parte={'path':caminho,'size':stat.st_size,'mtime_ns':stat.st_mtime_ns}
+        parte.update(partition_values(caminho))
+        partes.append(parte)
+    return partes
+
+def partitions_version(partes,source=''):
+    """ Esta função retorna a versão de um conjunto particionado: o maior mtime e o hash da lista de
+    arquivos (caminho relativo, tamanho e mtime). Os arquivos não são lidos, então a verificação feita a
+    cada execução da página custa só a listagem dos diretórios.
+
+    Input: lista de arquivos (discover_partitions); origem (para os caminhos relativos)
+    Output: tupla (maior mtime em ns, hash md5)
+    """
+    raiz=source if os.path.isdir(source) else ''
+    md5=hashlib.md5()
+    for parte in partes:
+        md5.update(f"{os.path.relpath(parte['path'],raiz or None)}|{parte['size']}|{parte['mtime_ns']}\n".encode())
+    return max((p['mtime_ns'] for p in partes),default=0),md5.hexdigest()
+
+def _first_date(parte):
+    """ Esta função retorna a primeira data possível dos pedidos de um arquivo, pelas partições
+    year / month / day (None quando o ano não está no caminho ou não é um número) """
+    try:
+        return pd.Timestamp(int(parte['year']),int(parte.get('month',1)),int(parte.get('day',1)))
+    except (KeyError,ValueError):
+        return None
+
+def normalize_city(nome):
+    """ Esta função normaliza o nome de uma cidade (sem espaços nas pontas e em minúsculas), a mesma
+    comparação usada na poda das partições (city=) e no filtro das linhas (coluna City).
+
+    Input: nome da cidade
+    Output: nome normalizado
+    """
+    return str(nome).strip().lower()
+
+def prune_partitions(partes,data_limite=None,cidades=None):
+    """ Esta função descarta os arquivos que não podem ter pedidos selecionados pelos filtros:
+    partições (year=, month= e, quando existe, day=) que começam depois da data limite e cidades (city=)
+    fora da lista (sem diferenciar maiúsculas, ver normalize_city). Arquivos sem a chave da partição
+    correspondente são sempre mantidos.
+
+    Input: lista de arquivos (discover_partitions); data limite (None = todas); lista de cidades (None = todas)
+    Output: lista com os arquivos mantidos
+    """
+    if data_limite is not None:
+        limite=pd.Timestamp(data_limite)
+        partes=[p for p in partes if _first_date(p) is None or _first_date(p)<=limite]
+    if cidades is not None:
+        nomes={normalize_city(c) for c in cidades}
+        partes=[p for p in partes if 'city' not in p or (p['city']!=NULL_PARTITION and normalize_city(p['city']) in nomes)]
+    return partes
+
+
+# =====================================================
+# FUNÇÕES: leitura
+# =====================================================
+
+def _group_files(partes,n_grupos):
+    """ Esta função divide os arquivos (em ordem de caminho) em grupos contíguos com tamanhos em bytes parecidos.
+
+    Input: lista de arquivos (discover_partitions); número de grupos
+    Output: lista de listas de caminhos
+    """
+    tamanhos=np.cumsum([max(p['size'],1) for p in partes])
+    limites=np.searchsorted(tamanhos,tamanhos[-1]*np.arange(1,n_grupos)/n_grupos,side='right')
+    grupos=np.split(np.array([p['path'] for p in partes],dtype=object),limites)
+    return [list(g) for g in grupos if len(g)]
+
+def _read_raw(paths,nrows=None):
+    """ Esta função lê os CSVs de um grupo em um único dataframe "cru". Quando todos têm o mesmo cabeçalho,
+    os bytes dos arquivos são unidos (sem os cabeçalhos repetidos) e lidos por uma única chamada do pd.read_csv,
+    que tem um custo fixo alto por arquivo; caso contrário, cada arquivo é lido separadamente e concatenado.
+
+    Input: lista de caminhos; número máximo de linhas por arquivo (None = todas)
+    Output: dataframe cru
+    """
+    if nrows is None:
+        cabecalho,corpos=None,[]
+        for path in paths:
+            with (gzip.open(path,'rb') if path.endswith('.gz') else open(path,'rb')) as f:
+                primeira,_,corpo=f.read().partition(b'\n')
+            if cabecalho is None:
+                cabecalho=primeira
+            elif primeira!=cabecalho:
+                break
+            corpos.append(corpo if not corpo or corpo.endswith(b'\n') else corpo+b'\n')
+        else:
+            return pd.read_csv(io.BytesIO(cabecalho+b'\n'+b''.join(corpos)))
+    frames=[pd.read_csv(path,nrows=nrows) for path in paths]
+    return frames[0] if len(frames)==1 else pd.concat(frames,ignore_index=True)
+
+def read_files(paths,data_limite=None,cidades=None,distance_mode='geodesic',nrows=None):
+    """ Esta função lê um grupo de arquivos de um conjunto particionado e o limpa de uma só vez, como
+    utils.loader.read_csv_dataset faria com um único arquivo com as mesmas linhas (a limpeza converte os valores
+    únicos de cada coluna, então limpar o grupo inteiro custa quase o mesmo que limpar um arquivo).
+    Os filtros também são aplicados nas linhas, já que um arquivo mantido na poda pode ter só uma parte delas.
+    É executada nos processos do pool (ver read_partitioned).
+
+    Input: lista de caminhos; data limite (None = todas); lista de cidades (None = todas); modo da distância;
+           número máximo de linhas por arquivo (None = todas)
+    Output: tupla (dataframe limpo, dicionário com os tempos em segundos)
+    """
+    t0=time.perf_counter()
+    df_raw=_read_raw(paths,nrows)
+    t1=time.perf_counter()
+    df=clean_data(df_raw)
+    linhas=np.ones(len(df),dtype=bool)
+    if data_limite is not None:
+        linhas&=(df['Order_Date']<=pd.Timestamp(data_limite)).to_numpy()
+    if cidades is not None:
+        # Mesma comparação da poda (normalize_city), feita nos valores distintos da coluna
+        nomes={normalize_city(c) for c in cidades}
+        valores=df['City'].cat.categories if isinstance(df['City'].dtype,pd.CategoricalDtype) else df['City'].dropna().unique()
+        linhas&=df['City'].isin([c for c in valores if normalize_city(c) in nomes]).to_numpy()
+    if not linhas.all():
+        df=df.loc[linhas].copy()
+    t2=time.perf_counter()
+    df['distance_km']=delivery_distance_km(df,mode=distance_mode)
+    t3=time.perf_counter()
+    return df,{'rows_raw':len(df_raw),'read_s':t1-t0,'clean_s':t2-t1,'distance_s':t3-t2}
+
+def read_partitioned(source,data_limite=None,cidades=None,workers=None,distance_mode='geodesic'):
+    """ Esta função lê um conjunto particionado: lista os arquivos, descarta os que ficam fora dos filtros
+    (prune_partitions), lê e limpa os demais em paralelo e concatena o resultado, ordenado por data e com um
+    índice contínuo (como o de um único arquivo com todas as linhas).
+    Os filtros são para leituras avulsas: a carga do dashboard (utils/loader.py) chama sem filtros e lê tudo.
+    Os arquivos são divididos em TASKS_PER_WORKER grupos por processo, com tamanhos parecidos; cada grupo é
+    lido e limpo de uma vez em um processo (read_files). Com um processo, todos os arquivos formam um único grupo.
+
+    Input:
+        - source: diretório ou padrão glob dos arquivos
+        - data_limite: data máxima dos pedidos (None = todas)
+        - cidades: lista de cidades (None = todas)
+        - workers: número de processos (None = utils.parallel.WORKERS)
+        - distance_mode: modo do cálculo da coluna 'distance_km' (ver utils/geo.py)
+    Output:
+        - tupla (dataframe limpo, dicionário com o número de arquivos, os arquivos lidos, as linhas lidas e os tempos:
+          'read_s' da leitura e limpeza em paralelo, 'clean_s' da concatenação e ordenação, e as somas dos
+          tempos de cada grupo em 'files_read_s', 'files_clean_s' e 'files_distance_s')
+    """
+    t0=time.perf_counter()
+    partes=discover_partitions(source)
+    if not partes:
+        raise ValueError(f'nenhum arquivo {FILE_EXTENSIONS} encontrado em {source}')
+    lidas=prune_partitions(partes,data_limite,cidades)
+    workers=parallel.WORKERS if workers is None else max(int(workers),1)
+    if lidas:
+        grupos=_group_files(lidas,1 if workers==1 else min(len(lidas),workers*TASKS_PER_WORKER))
+        resultados=map_tasks(read_files,[(g,data_limite,cidades,distance_mode) for g in grupos],workers)
+    else:
+        # Tudo ficou fora dos filtros: só o cabeçalho de um arquivo é lido, para manter as colunas
+        resultados=[read_files([partes[0]['path']],distance_mode=distance_mode,nrows=0)]
+    t1=time.perf_counter()
+
+    df=concat_cleaned([r[0] for r in resultados])
+    df.index=pd.RangeIndex(len(df))
+    df=sort_by_date(df)
+    t2=time.perf_counter()
+    return df,{'files':len(partes),
+               'files_read':len(lidas),
+               'rows_raw':sum(r[1]['rows_raw'] for r in resultados),
+               'read_s':t1-t0,
+               'clean_s':t2-t1,
+               'distance_s':0.0,
+               'files_read_s':sum(r[1]['read_s'] for r in resultados),
+               'files_clean_s':sum(r[1]['clean_s'] for r in resultados),
+               'files_distance_s':sum(r[1]['distance_s'] for r in resultados)}
+
+def main():
+    parser=argparse.ArgumentParser(description='Lê um conjunto de dados particionado (year=/month=/city=) e mostra o resumo da leitura.')
+    parser.add_argument('source',help='diretório ou padrão glob dos arquivos')
+    parser.add_argument('--date',help='data limite dos pedidos (AAAA-MM-DD)')
+    parser.add_argument('--city',nargs='+',help='cidades')
+    parser.add_argument('--workers',type=int)
+    args=parser.parse_args()
+
+    df,info=read_partitioned(args.source,args.date,args.city,args.workers)
+    print(f"{info['files_read']} de {info['files']} arquivos lidos ({info['files']-info['files_read']} descartados pelas partições)")
+    print(f"{info['rows_raw']:,} linhas lidas, {len(df):,} após a limpeza e os filtros, "
+          f"em {info['read_s']+info['clean_s']:.3f}s")
+
+
+if __name__=='__main__':
+    main()
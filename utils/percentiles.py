@@ -0,0 +1,129 @@
+# Importando as bibliotecas necessárias
+import numpy as np
+import pandas as pd
+
+from utils.cube import CUBE_DIMS
+
+
+# Coluna dos histogramas (minutos inteiros, ver utils.cleaning._time_taken)
+TIME_COL='Time_taken(min)'
+
+# Dimensões que podem ser combinadas nas consultas de percentis e SLA (além da data, usada nos filtros)
+SLA_DIMS=['City','Road_traffic_density','Type_of_order','Type_of_vehicle','Festival']
+
+# Percentis e limite de SLA (em minutos) padrão
+SLA_QUANTILES=[0.5,0.9,0.99]
+SLA_MINUTES=30
+
+
+# =====================================================
+# FUNÇÕES: histogramas por célula
+# =====================================================
+
+def build_time_histograms(df,col=TIME_COL):
+    """ Esta função monta o histograma dos minutos de entrega de cada célula do cubo
+    (data x cidade x tráfego x tipo de pedido x veículo x festival).
+    Como o tempo de entrega é um número inteiro de minutos, o histograma guarda os valores sem perda:
+    os quantis e as frações acima de um limite calculados a partir dele são exatos.
+
+    Input: dataframe limpo; coluna com os minutos
+    Output: dicionário com as células ('cells'), as contagens ('counts', células x minutos) e o menor minuto ('offset')
+    """
+    cell=df.groupby(CUBE_DIMS,observed=True,sort=True).ngroup().to_numpy()
+    # Valores das dimensões de cada célula, tirados da primeira linha da célula
+    _,primeira,n=np.unique(cell,return_index=True,return_counts=True)
+    cells=df[CUBE_DIMS].iloc[primeira].reset_index(drop=True)
+    cells['n']=n
+
+    minutos=df[col].to_numpy().astype('int64')
+    offset=int(minutos.min()) if len(minutos) else 0
+    n_minutos=int(minutos.max())-offset+1 if len(minutos) else 1
+    counts=np.bincount(cell*n_minutos+(minutos-offset),minlength=len(cells)*n_minutos)
+    return {'cells':cells,'counts':counts.reshape(len(cells),n_minutos).astype('int32'),'offset':offset}
+
+def filter_histograms(histograms,data_limite,categorias=None,col='Road_traffic_density'):
+    """ Esta função aplica os filtros da barra lateral sobre as células dos histogramas.
+
+    Input: histogramas; data limite; categorias selecionadas (None = todas); coluna das categorias
+    Output: histogramas filtrados (mesmo formato de build_time_histograms)
+    """
+    cells=histograms['cells']
+    linhas=(cells['Order_Date']<=pd.Timestamp(data_limite)).to_numpy()
+    if categorias is not None:
+        linhas&=cells[col].isin(categorias).to_numpy()
+    return {'cells':cells.loc[linhas].reset_index(drop=True),
+            'counts':histograms['counts'][linhas],
+            'offset':histograms['offset']}
+
+def group_histograms(histograms,by=None):
+    """ Esta função soma os histogramas das células de cada grupo.
+
+    Input: histogramas (filtrados); lista de dimensões (None ou [] = um único grupo com todas as células)
+    Output: tupla (índice dos grupos ou None, array grupos x minutos)
+    """
+    counts=histograms['counts']
+    if not by:
+        return None,counts.sum(axis=0,keepdims=True,dtype='int64')
+    cells=histograms['cells']
+    somas=pd.DataFrame(counts,dtype='int64').groupby([cells[b] for b in by],observed=True).sum().sort_index()
+    return somas.index,somas.to_numpy()
+
+
+# =====================================================
+# FUNÇÕES: consultas (custo proporcional ao número de minutos, e não de pedidos)
+# =====================================================
+
+def histogram_quantiles(counts,qs,offset=0):
+    """ Esta função calcula os quantis de cada histograma com interpolação linear entre as posições
+    vizinhas, como o pandas (Series.quantile).
+
+    Input: array grupos x minutos; lista de quantis entre 0 e 1; menor minuto dos histogramas
+    Output: array grupos x quantis (NaN nos grupos sem pedidos)
+    """
+    acumulado=np.cumsum(counts,axis=1)
+    n=acumulado[:,-1]
+    resultado=np.full((len(counts),len(qs)),np.nan)
+    validos=n>0
+    for j,q in enumerate(qs):
+        posicao=q*(n[validos]-1)
+        abaixo,acima=np.floor(posicao),np.ceil(posicao)
+        # Valor na posição r (0 = menor): primeiro minuto cujo acumulado passa de r
+        valor_abaixo=(acumulado[validos]<=abaixo[:,None]).sum(axis=1)+offset
+        valor_acima=(acumulado[validos]<=acima[:,None]).sum(axis=1)+offset
+        resultado[validos,j]=valor_abaixo+(valor_acima-valor_abaixo)*(posicao-abaixo)
+    return resultado
+
+def histogram_share_over(counts,limite,offset=0):
+    """ Esta função calcula a fração dos pedidos de cada histograma com tempo de entrega acima do limite.
+
+    Input: array grupos x minutos; limite em minutos; menor minuto dos histogramas
+    Output: array com a fração de cada grupo (NaN nos grupos sem pedidos)
+    """
+    n=counts.sum(axis=1)
+    primeiro=int(np.clip(np.floor(limite)+1-offset,0,counts.shape[1]))
+    with np.errstate(divide='ignore',invalid='ignore'):
+        return np.where(n>0,counts[:,primeiro:].sum(axis=1)/n,np.nan)
+
+def time_quantiles(histograms,by=None,qs=SLA_QUANTILES):
+    """ Esta função retorna os quantis do tempo de entrega por grupo.
+
+    Input: histogramas (filtrados); lista de dimensões (None = total); lista de quantis
+    Output: dataframe com uma coluna por quantil ('p50', 'p90'...)
+    """
+    index,counts=group_histograms(histograms,by)
+    colunas=[f'p{q*100:g}' for q in qs]
+    return pd.DataFrame(histogram_quantiles(counts,qs,histograms['offset']),index=index,columns=colunas)
+
+def sla_breakdown(histograms,by=None,limite=SLA_MINUTES,qs=SLA_QUANTILES):
+    """ Esta função monta o quadro de SLA por grupo: número de pedidos, quantis do tempo de entrega e
+    percentual dos pedidos acima do limite.
+
+    Input: histogramas (filtrados); lista de dimensões (None = total); limite em minutos; lista de quantis
+    Output: dataframe com as colunas 'orders', 'p50', 'p90'... e 'pct_over'
+    """
+    index,counts=group_histograms(histograms,by)
+    offset=histograms['offset']
+    quadro=pd.DataFrame(histogram_quantiles(counts,qs,offset),index=index,columns=[f'p{q*100:g}' for q in qs])
+    quadro.insert(0,'orders',counts.sum(axis=1))
+    quadro['pct_over']=100*histogram_share_over(counts,limite,offset)
+    return quadro
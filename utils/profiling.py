@@ -0,0 +1,320 @@
+""" Instrumentação das execuções das páginas: tempo e variação de memória de cada etapa.
+
+Cada execução de uma página (rerun do Streamlit) é um 'run' com a lista das etapas medidas
+(carga, leitura, limpeza, filtros, agregações, montagem das figuras e envio ao navegador).
+Os runs recentes ficam em memória no processo (percentis móveis no painel de diagnóstico) e cada
+run terminado é gravado como uma linha JSON no logger 'dashboard.profiling' e, se configurado,
+em um arquivo JSONL (LOG_PATH ou variável de ambiente DASHBOARD_PROFILE_LOG).
+
+A memória é o RSS do processo (/proc/self/statm); como o processo é compartilhado pelas sessões,
+a variação de uma etapa pode incluir alocações de outras sessões simultâneas. Fora do Linux a
+variação de memória fica vazia.
+
+O painel de diagnóstico fica escondido: aparece na barra lateral só com ?diagnostics=1 na URL
+ou com a variável de ambiente DASHBOARD_DIAGNOSTICS=1.
+"""
+# Importando as bibliotecas necessárias
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+
+# Etapas medidas, na ordem em que aparecem em uma execução
+STAGES=['load','read','clean','filter','aggregation','figure','render']
+
+# Número de runs mantidos em memória para os percentis móveis
+RUNS_KEPT=500
+
+# Percentis mostrados no painel
+PERCENTILES=[50,90,99]
+
+# Número de funções do relatório do cProfile
+PROFILE_LINES=30
+
+# Chave do st.session_state da opção "Capturar cProfile na próxima execução"
+PROFILE_KEY='diagnostics_cprofile'
+
+# Arquivo JSONL com os runs (None = só o logger)
+LOG_PATH=os.environ.get('DASHBOARD_PROFILE_LOG')
+
+logger=logging.getLogger('dashboard.profiling')
+
+# Runs terminados (compartilhados por todas as sessões) e o run em andamento de cada thread
+# (o Streamlit executa cada sessão em uma thread)
+_runs=deque(maxlen=RUNS_KEPT)
+_lock=threading.Lock()
+_local=threading.local()
+
+
+# =====================================================
+# FUNÇÕES: medição
+# =====================================================
+
+def _rss_bytes():
+    """ Esta função retorna a memória residente do processo em bytes (None fora do Linux) """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError,ValueError,AttributeError):
+        return None
+
+def configure(log_path=None,runs_kept=None):
+    """ Esta função altera o arquivo JSONL dos runs e o número de runs mantidos em memória.
+
+    Input: caminho do arquivo JSONL; número de runs
+    Output: None
+    """
+    global LOG_PATH,_runs
+    if log_path is not None:
+        LOG_PATH=log_path
+    if runs_kept is not None:
+        with _lock:
+            _runs=deque(_runs,maxlen=int(runs_kept))
+
+def start_run(page,profile=False):
+    """ Esta função inicia a medição de uma execução da página (substitui um run não terminado da thread).
+
+    Input: nome da página; se a execução deve ser capturada pelo cProfile
+    Output: None
+    """
+    run={'page':page,'started_at':time.time(),'t0':time.perf_counter(),'rss0':_rss_bytes(),
+         'sections':[],'depth':0,'profiler':None}
+    if profile:
+        profiler=cProfile.Profile()
+        try:
+            profiler.enable()
+            run['profiler']=profiler
+        except ValueError:
+            # Outro profiler já está ativo (outra sessão capturando ao mesmo tempo)
+            pass
+    _local.run=run
+
+def current_run():
+    """ Esta função retorna o run em andamento da thread (None se não houver) """
+    return getattr(_local,'run',None)
+
+def bind_run(run):
+    """ Esta função associa à thread atual o run de outra thread (por exemplo, o da página que iniciou
+    uma carga em segundo plano), para que as etapas medidas nela entrem no mesmo run.
+
+    Input: run (current_run de outra thread; None desfaz a associação)
+    Output: None
+    """
+    _local.run=run
+
+def record(name,stage,seconds,rss_delta=None):
+    """ Esta função registra no run em andamento uma etapa medida em outro lugar (por exemplo, os tempos
+    de leitura e limpeza guardados por utils/loader.py). Sem run em andamento, não faz nada.
+
+    Input: nome da etapa; tipo (ver STAGES); duração em segundos; variação de memória em bytes
+    Output: None
+    """
+    run=current_run()
+    if run is None:
+        return
+    run['sections'].append({'name':name,'stage':stage,'depth':run['depth'],
+                            'end_ms':round((time.perf_counter()-run['t0'])*1000,3),
+                            'ms':round(seconds*1000,3),
+                            'rss_delta_mb':None if rss_delta is None else round(rss_delta/2**20,3)})
+
+@contextmanager
+def section(name,stage):
+    """ Esta função mede o tempo e a variação de memória do bloco e registra a etapa no run em andamento.
+    Blocos podem ser aninhados: a profundidade fica registrada em cada etapa.
+
+    Input: nome da etapa; tipo (ver STAGES)
+    Output: gerenciador de contexto
+    """
+    run=current_run()
+    if run is None:
+        yield
+        return
+    rss0=_rss_bytes()
+    t0=time.perf_counter()
+    run['depth']+=1
+    try:
+        yield
+    finally:
+        run['depth']-=1
+        segundos=time.perf_counter()-t0
+        rss1=_rss_bytes()
+        record(name,stage,segundos,None if rss0 is None or rss1 is None else rss1-rss0)
+
+def timed(name,stage,func):
+    """ Esta função executa func dentro de section(name,stage) e retorna o seu resultado.
+
+    Input: nome da etapa; tipo (ver STAGES); função sem argumentos
+    Output: resultado da função
+    """
+    with section(name,stage):
+        return func()
+
+def _profile_report(profiler):
+    """ Esta função monta o relatório das funções com maior tempo acumulado no cProfile """
+    saida=io.StringIO()
+    pstats.Stats(profiler,stream=saida).sort_stats('cumulative').print_stats(PROFILE_LINES)
+    return saida.getvalue()
+
+def finish_run():
+    """ Esta função termina o run em andamento: guarda-o entre os runs recentes e grava a linha JSON no log.
+
+    Input: None
+    Output: dicionário do run (None se não houver run em andamento)
+    """
+    run=current_run()
+    if run is None:
+        return None
+    _local.run=None
+    profiler=run.pop('profiler')
+    profile=None
+    if profiler is not None:
+        profiler.disable()
+        profile=_profile_report(profiler)
+    rss1=_rss_bytes()
+    registro={'page':run['page'],
+              'started_at':run['started_at'],
+              'total_ms':round((time.perf_counter()-run['t0'])*1000,3),
+              'rss_mb':None if rss1 is None else round(rss1/2**20,3),
+              'rss_delta_mb':None if rss1 is None or run['rss0'] is None else round((rss1-run['rss0'])/2**20,3),
+              'sections':run['sections'],
+              'profile':profile}
+    with _lock:
+        _runs.append(registro)
+    linha=json.dumps({k:v for k,v in registro.items() if k!='profile'},ensure_ascii=False)
+    logger.info(linha)
+    if LOG_PATH:
+        try:
+            with open(LOG_PATH,'a',encoding='utf-8') as f:
+                f.write(linha+'\n')
+        except OSError as erro:
+            logger.warning('não foi possível gravar %s: %s',LOG_PATH,erro)
+    return registro
+
+
+# =====================================================
+# FUNÇÕES: consultas e exportação
+# =====================================================
+
+def recent_runs(page=None):
+    """ Esta função retorna os runs recentes (do mais antigo para o mais recente).
+
+    Input: nome da página (None = todas)
+    Output: lista de dicionários
+    """
+    with _lock:
+        runs=list(_runs)
+    return [r for r in runs if page is None or r['page']==page]
+
+def last_run(page=None):
+    """ Esta função retorna o último run terminado da página (None se não houver) """
+    runs=recent_runs(page)
+    return runs[-1] if runs else None
+
+def run_breakdown(run):
+    """ Esta função monta a tabela das etapas de um run, na ordem de início, com a fração do tempo total de cada etapa.
+
+    Input: dicionário do run
+    Output: dataframe com uma linha por etapa
+    """
+    etapas=pd.DataFrame(run['sections'],columns=['name','stage','depth','end_ms','ms','rss_delta_mb'])
+    etapas['share']=etapas['ms']/run['total_ms'] if run['total_ms'] else np.nan
+    # As etapas são registradas ao terminar: ordena pelo início (as externas antes das internas)
+    etapas=etapas.iloc[np.argsort((etapas['end_ms']-etapas['ms']).to_numpy(),kind='stable')].reset_index(drop=True)
+    etapas['name']=['  '*d+n for d,n in zip(etapas['depth'],etapas['name'])]
+    return etapas.drop(columns='depth')
+
+def rolling_percentiles(page=None,percentis=PERCENTILES):
+    """ Esta função calcula os percentis do tempo de cada etapa (e do run completo) nos runs recentes.
+
+    Input: nome da página (None = todas); lista de percentis
+    Output: dataframe indexado por (tipo, etapa) com o número de medições, os percentis (ms)
+            e a variação média de memória (MB)
+    """
+    runs=recent_runs(page)
+    linhas=[{'stage':'run','name':'total','ms':r['total_ms'],'rss_delta_mb':r['rss_delta_mb']} for r in runs]
+    linhas+=[s for r in runs for s in r['sections']]
+    colunas=['count']+[f'p{p}' for p in percentis]+['rss_delta_mb']
+    if not linhas:
+        return pd.DataFrame(columns=colunas)
+    medidas=pd.DataFrame(linhas)
+    grupos=medidas.groupby(['stage','name'],sort=False)
+    resultado=grupos['ms'].agg(['count']+[lambda s,p=p: np.percentile(s,p) for p in percentis])
+    resultado.columns=colunas[:-1]
+    resultado['rss_delta_mb']=grupos['rss_delta_mb'].mean()
+    ordem={etapa:i for i,etapa in enumerate(['run']+STAGES)}
+    return resultado.sort_index(key=lambda idx: idx.map(ordem) if idx.name=='stage' else idx)
+
+def export_jsonl(page=None):
+    """ Esta função exporta os runs recentes como logs estruturados (uma linha JSON por run).
+
+    Input: nome da página (None = todas)
+    Output: texto JSONL
+    """
+    return ''.join(json.dumps({k:v for k,v in r.items() if k!='profile'},ensure_ascii=False)+'\n'
+                   for r in recent_runs(page))
+
+
+# =====================================================
+# FUNÇÕES: painel de diagnóstico
+# =====================================================
+
+def diagnostics_enabled(query_params=None):
+    """ Esta função indica se o painel de diagnóstico deve aparecer (?diagnostics=1 ou DASHBOARD_DIAGNOSTICS=1).
+
+    Input: parâmetros da URL (dicionário nome -> lista de valores, como st.experimental_get_query_params)
+    Output: bool
+    """
+    if os.environ.get('DASHBOARD_DIAGNOSTICS')=='1':
+        return True
+    return (query_params or {}).get('diagnostics',['0'])[0]=='1'
+
+def take_profile_request(session_state):
+    """ Esta função indica se o cProfile foi pedido no painel de diagnóstico e desmarca a opção, para que só
+    a próxima execução seja capturada. Deve ser chamada antes de sidebar_panel na mesma execução (o
+    Streamlit só aceita alterar o valor de um widget antes de ele ser criado).
+
+    Input: st.session_state
+    Output: bool
+    """
+    pedido=bool(session_state.get(PROFILE_KEY,False))
+    if pedido:
+        session_state[PROFILE_KEY]=False
+    return pedido
+
+def sidebar_panel(container,page,run=None):
+    """ Esta função mostra o painel de diagnóstico: as etapas do run atual, os percentis móveis,
+    o relatório do cProfile (quando capturado), a opção de capturar o cProfile na próxima execução
+    e a exportação dos runs em JSONL.
+
+    Input: container do Streamlit (por exemplo, st.sidebar); nome da página; run (None = último run da página)
+    Output: None
+    """
+    run=run or last_run(page)
+    painel=container.expander('Diagnóstico',expanded=True)
+    # Desmarcada por take_profile_request quando a execução capturada começa
+    painel.checkbox('Capturar cProfile na próxima execução',key=PROFILE_KEY)
+    if run is None:
+        painel.caption('Nenhuma execução medida')
+        return
+    painel.metric('Tempo total (ms)',f"{run['total_ms']:.0f}",
+                  None if run['rss_delta_mb'] is None else f"{run['rss_delta_mb']:+.1f} MB",
+                  delta_color='off')
+    painel.markdown('**Execução atual**')
+    painel.dataframe(run_breakdown(run).round(2),use_container_width=True)
+    painel.markdown(f"**Percentis móveis ({len(recent_runs(page))} execuções)**")
+    painel.dataframe(rolling_percentiles(page).round(2),use_container_width=True)
+    if run['profile']:
+        painel.markdown('**cProfile**')
+        painel.code(run['profile'])
+    painel.download_button('Exportar logs (JSONL)',export_jsonl(page),
+                           file_name='profiling.jsonl',mime='application/json')
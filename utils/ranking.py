@@ -0,0 +1,108 @@
+# Importando as bibliotecas necessárias
+import numpy as np
+import pandas as pd
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def _sort_codes(values):
+    """ Esta função retorna códigos inteiros que respeitam a ordem de ordenação dos valores
+    (para 'category', a ordem das categorias; para texto, a ordem alfabética).
+
+    Input: Series
+    Output: tupla (array de códigos, número de códigos)
+    """
+    if isinstance(values.dtype,pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(),len(values.cat.categories)
+    codes,uniques=pd.factorize(values,sort=True)
+    return codes,len(uniques)
+
+def _select(v,k,maiores):
+    """ Esta função seleciona, por seleção parcial (np.partition), as posições dos k menores
+    (ou maiores) valores de um grupo. Os empates no limite são resolvidos pela posição
+    original, como numa ordenação estável seguida de head(k) / tail(k).
+
+    Input: array de valores do grupo; k; True para os maiores
+    Output: array booleano com as posições selecionadas
+    """
+    if len(v)<=k:
+        return np.ones(len(v),dtype=bool)
+    if maiores:
+        limite=np.partition(v,len(v)-k)[len(v)-k]
+        selecionados=v>limite
+        empates=np.flatnonzero(v==limite)
+        faltam=k-selecionados.sum()
+        selecionados[empates[len(empates)-faltam:]]=True
+    else:
+        limite=np.partition(v,k-1)[k-1]
+        selecionados=v<limite
+        empates=np.flatnonzero(v==limite)
+        faltam=k-selecionados.sum()
+        selecionados[empates[:faltam]]=True
+    return selecionados
+
+def smallest_k_positions(valores,k):
+    """ Esta função retorna as posições dos k menores valores, em ordem crescente, com seleção parcial:
+    só os k selecionados são ordenados. Os empates seguem a posição original, como em
+    np.argsort(valores,kind='stable')[:k].
+
+    Input: array de valores; k
+    Output: array de posições
+    """
+    k=min(max(int(k),0),len(valores))
+    if k==0:
+        return np.array([],dtype='int64')
+    posicoes=np.flatnonzero(_select(valores,k,False))
+    return posicoes[np.lexsort((posicoes,valores[posicoes]))]
+
+def top_k_by_group(df,group_col,value_col,k=10,cols=None):
+    """ Esta função retorna, em uma única passada, as k linhas de menor e de maior valor de cada grupo.
+    Em vez de ordenar o dataframe inteiro (O(n log n)), as linhas são separadas por grupo e cada
+    grupo usa seleção parcial (O(n)); só as linhas selecionadas são ordenadas no final.
+    O resultado é o mesmo de df.sort_values([value_col,group_col]).groupby(group_col).head(k) / .tail(k).
+
+    Input:
+        - df: dataframe
+        - group_col: coluna dos grupos (por exemplo, 'City')
+        - value_col: coluna usada no ranking (por exemplo, 'Time_taken(min)')
+        - k: número de linhas por grupo
+        - cols: colunas do resultado (padrão: todas)
+    Output:
+        - tupla (menores, maiores): dataframes ordenados por (value_col, group_col)
+    """
+    cols=list(df.columns) if cols is None else cols
+    grupos,n_grupos=_sort_codes(df[group_col])
+    valores=df[value_col].to_numpy()
+
+    # Separando as linhas por grupo: ordenação estável dos códigos (radix sort para inteiros pequenos)
+    ordem=np.argsort(grupos.astype('int16' if n_grupos<2**15 else 'int64'),kind='stable')
+    limites=np.searchsorted(grupos[ordem],np.arange(n_grupos+1))
+
+    resultado=[]
+    for maiores in (False,True):
+        posicoes=[]
+        for g in range(n_grupos):
+            linhas=ordem[limites[g]:limites[g+1]]
+            if len(linhas):
+                posicoes.append(linhas[_select(valores[linhas],k,maiores)])
+        posicoes=np.concatenate(posicoes) if posicoes else np.array([],dtype='int64')
+        # Ordem final: valor, grupo e posição original (como numa ordenação estável)
+        posicoes=posicoes[np.lexsort((posicoes,grupos[posicoes],valores[posicoes]))]
+        resultado.append(df.iloc[posicoes].loc[:,cols].reset_index(drop=True))
+    return tuple(resultado)
+
+def courier_means(df,group_col='City',courier_col='Delivery_person_ID',value_col='Time_taken(min)'):
+    """ Esta função calcula a média de uma coluna por entregador dentro de cada grupo, para
+    rankings por entregador em vez de por pedido.
+
+    Input: dataframe; coluna do grupo; coluna do entregador; coluna de valores
+    Output: dataframe com as colunas (group_col, value_col, courier_col) e uma linha por entregador e grupo
+    """
+    medias=(df.loc[:,[group_col,courier_col,value_col]]
+            .groupby([group_col,courier_col],observed=True)[value_col]
+            .mean()
+            .sort_index()
+            .reset_index())
+    return medias.loc[:,[group_col,value_col,courier_col]]
@@ -0,0 +1,145 @@
+# Importando as bibliotecas necessárias
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# Orçamento de memória do cache de resultados (em bytes)
+MAX_BYTES=256*2**20
+
+# Cache do processo, compartilhado por todas as sessões e páginas (ver utils/loader.py).
+# Cada entrada: chave -> {'value','bytes','hits','created_at','last_hit_at','compute_s'}
+_entries=OrderedDict()
+_stats={'hits':0,'misses':0,'evictions':0,'bytes':0,'max_bytes':MAX_BYTES}
+_lock=threading.Lock()
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def filter_key(version,data_limite,categorias):
+    """ Esta função monta a parte da chave que representa o estado dos filtros da barra lateral.
+
+    Input: versão do conjunto de dados; data limite; categorias selecionadas
+    Output: tupla (versão, data limite, categorias ordenadas)
+    """
+    return (version,pd.Timestamp(data_limite),tuple(sorted(categorias)))
+
+def estimate_size(value):
+    """ Esta função estima a memória ocupada por um resultado (dataframe, figura, número...).
+
+    Input: valor
+    Output: tamanho aproximado em bytes
+    """
+    if isinstance(value,(pd.DataFrame,pd.Series)):
+        uso=value.memory_usage(deep=True)
+        return int(uso.sum() if isinstance(value,pd.DataFrame) else uso)
+    if isinstance(value,np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value,(int,float,str,bytes,np.generic)):
+        return sys.getsizeof(value)
+    try:
+        return len(pickle.dumps(value,protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+def _evict(max_bytes):
+    """ Remove as entradas usadas há mais tempo até o cache caber no orçamento (chamada com o lock) """
+    while _entries and _stats['bytes']>max_bytes:
+        _,entrada=_entries.popitem(last=False)
+        _stats['bytes']-=entrada['bytes']
+        _stats['evictions']+=1
+
+def cached(name,key,compute):
+    """ Esta função retorna o resultado de 'compute' para a chave (nome da função, estado dos filtros),
+    calculando-o apenas na primeira vez. O cache é compartilhado entre sessões e páginas, tem um
+    orçamento de memória (MAX_BYTES) e remove as entradas usadas há mais tempo (LRU).
+    Os resultados são compartilhados e devem ser tratados como somente leitura.
+
+    Input:
+        - name: nome da função (ou do resultado)
+        - key: estado dos filtros (filter_key) e demais argumentos, que devem ser hashable
+        - compute: função sem argumentos que calcula o resultado
+    Output:
+        - resultado
+    """
+    chave=(name,key)
+    with _lock:
+        entrada=_entries.get(chave)
+        if entrada is not None:
+            _entries.move_to_end(chave)
+            entrada['hits']+=1
+            entrada['last_hit_at']=time.time()
+            _stats['hits']+=1
+            return entrada['value']
+        _stats['misses']+=1
+
+    # O cálculo é feito fora do lock, para não bloquear as outras sessões
+    t0=time.perf_counter()
+    valor=compute()
+    tempo=time.perf_counter()-t0
+    tamanho=estimate_size(valor)
+
+    with _lock:
+        if tamanho<=_stats['max_bytes'] and chave not in _entries:
+            _entries[chave]={'value':valor,
+                             'bytes':tamanho,
+                             'hits':0,
+                             'created_at':time.time(),
+                             'last_hit_at':None,
+                             'compute_s':tempo}
+            _stats['bytes']+=tamanho
+            _evict(_stats['max_bytes'])
+    return valor
+
+def configure(max_bytes):
+    """ Esta função altera o orçamento de memória do cache, removendo entradas se necessário.
+
+    Input: novo orçamento em bytes
+    Output: None
+    """
+    with _lock:
+        _stats['max_bytes']=int(max_bytes)
+        _evict(_stats['max_bytes'])
+
+def clear():
+    """ Esta função esvazia o cache (os contadores são mantidos) """
+    with _lock:
+        _entries.clear()
+        _stats['bytes']=0
+
+def cache_stats():
+    """ Esta função retorna os contadores do cache: acertos, faltas, remoções, memória usada e orçamento.
+
+    Input: None
+    Output: dicionário
+    """
+    with _lock:
+        stats=dict(_stats)
+        stats['entries']=len(_entries)
+    consultas=stats['hits']+stats['misses']
+    stats['hit_rate']=stats['hits']/consultas if consultas else 0.0
+    return stats
+
+def cache_entries():
+    """ Esta função lista as entradas do cache, da usada há mais tempo para a mais recente.
+
+    Input: None
+    Output: dataframe com o nome, a chave, o tamanho, os acertos e o tempo de cálculo de cada entrada
+    """
+    with _lock:
+        linhas=[{'função':nome,
+                 'chave':repr(chave),
+                 'bytes':entrada['bytes'],
+                 'acertos':entrada['hits'],
+                 'cálculo (s)':entrada['compute_s'],
+                 'criada em':pd.Timestamp(entrada['created_at'],unit='s'),
+                 'último acerto':pd.Timestamp(entrada['last_hit_at'],unit='s') if entrada['last_hit_at'] else pd.NaT}
+                for (nome,chave),entrada in _entries.items()]
+    return pd.DataFrame(linhas,columns=['função','chave','bytes','acertos','cálculo (s)','criada em','último acerto'])
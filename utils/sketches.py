@@ -0,0 +1,251 @@
+""" Sketches aproximados: HyperLogLog (valores distintos) e KLL (quantis).
+
+Os sketches são montados uma única vez por versão dos dados (utils.loader.load_derived), para cada
+data, tipo de tráfego e cidade, e combinados na consulta: os filtros da barra lateral só escolhem
+as células. O custo de uma consulta depende do número de células, e não do número de pedidos.
+
+Limites de erro (verificados em benchmarks/bench_sketches.py):
+- HyperLogLog (HLL_P=12, 4096 registros): erro relativo padrão de 1,04/sqrt(4096) ~ 1,6%;
+  abaixo de ~10 mil valores distintos a contagem linear deixa o erro bem menor
+- KLL (KLL_K=200): erro de posição (rank) de no máximo ~1,7% do número de itens
+  com 99% de confiança; com até KLL_K itens por célula o sketch guarda todos os valores
+"""
+# Importando as bibliotecas necessárias
+import numpy as np
+import pandas as pd
+
+
+# Dimensões das células dos sketches: os filtros da barra lateral e a cidade
+SKETCH_DIMS=['Order_Date','Road_traffic_density','City']
+
+# Colunas com sketches de quantis: nome -> coluna
+QUANTILE_COLS={'time':'Time_taken(min)',
+               'lat':'Restaurant_latitude',
+               'lon':'Restaurant_longitude'}
+
+# Coluna com sketch de valores distintos
+DISTINCT_COL='Delivery_person_ID'
+
+# Precisão do HyperLogLog: 2**HLL_P registros por sketch
+HLL_P=12
+
+# Parâmetro de precisão do KLL (capacidade do maior nível)
+KLL_K=200
+
+
+# =====================================================
+# FUNÇÕES: HyperLogLog
+# =====================================================
+
+def hll_registers(groups,values,n_groups,p=HLL_P):
+    """ Esta função monta os registros HyperLogLog dos valores de cada grupo.
+    Os valores passam por um hash de 64 bits: os p primeiros bits escolhem o registro e o
+    registro guarda a maior posição do primeiro bit 1 nos bits restantes.
+
+    Input: código do grupo de cada linha; valores; número de grupos; precisão
+    Output: array uint8 (n_groups x 2**p)
+    """
+    h=pd.util.hash_pandas_object(pd.Series(values),index=False).to_numpy()
+    registro=(h>>np.uint64(64-p)).astype('int64')
+    resto=h&np.uint64((1<<(64-p))-1)
+    # Número de bits de 'resto' (exato em float64, já que 64-p <= 53)
+    bits=np.frexp(resto.astype('float64'))[1]
+    posicao=(64-p-bits+1).astype('uint8')
+    registros=np.zeros((n_groups,1<<p),dtype='uint8')
+    np.maximum.at(registros,(np.asarray(groups,dtype='int64'),registro),posicao)
+    return registros
+
+def hll_estimate(registros):
+    """ Esta função estima o número de valores distintos a partir dos registros HyperLogLog
+    (com a correção de contagem linear para poucos valores).
+
+    Input: array uint8 com os registros de um grupo
+    Output: número estimado de valores distintos
+    """
+    m=len(registros)
+    alpha=0.7213/(1+1.079/m)
+    estimativa=alpha*m*m/np.sum(np.exp2(-registros.astype('float64')))
+    zeros=int((registros==0).sum())
+    if estimativa<=2.5*m and zeros:
+        estimativa=m*np.log(m/zeros)
+    return int(round(estimativa))
+
+
+# =====================================================
+# FUNÇÕES: KLL
+# =====================================================
+
+def _kll_capacity(k,nivel,n_niveis):
+    """ Capacidade de um nível do KLL: k no nível mais alto, decaindo 2/3 a cada nível abaixo """
+    return max(2,int(np.ceil(k*(2/3)**(n_niveis-1-nivel))))
+
+def _kll_compress(niveis,k):
+    """ Esta função compacta os níveis que passaram da capacidade: os itens do nível são ordenados e
+    metade deles (posições pares ou ímpares, alternadamente) sobe para o nível seguinte com o dobro do peso.
+
+    Input: lista de arrays (um por nível; o item do nível h pesa 2**h); k
+    Output: lista de arrays compactada
+    """
+    niveis=[np.asarray(n,dtype='float64') for n in niveis]
+    h=0
+    while h<len(niveis):
+        if len(niveis[h])>_kll_capacity(k,h,len(niveis)):
+            itens=np.sort(niveis[h])
+            par=len(itens)-len(itens)%2
+            deslocamento=(len(itens)+h)%2
+            if h+1==len(niveis):
+                niveis.append(np.array([],dtype='float64'))
+            niveis[h+1]=np.concatenate([niveis[h+1],itens[deslocamento:par:2]])
+            niveis[h]=itens[par:]
+            # As capacidades mudam quando um nível é criado: recomeça do primeiro nível
+            h=0
+            continue
+        h+=1
+    return niveis
+
+def kll_from_values(values,k=KLL_K):
+    """ Esta função monta o sketch KLL de um conjunto de valores.
+
+    Input: array de valores; k
+    Output: dicionário {'k', 'n', 'levels'}
+    """
+    values=np.asarray(values,dtype='float64')
+    return {'k':k,'n':len(values),'levels':_kll_compress([values],k)}
+
+def kll_merge(sketches):
+    """ Esta função combina sketches KLL (o resultado é o sketch da união dos valores).
+
+    Input: lista de sketches
+    Output: sketch
+    """
+    sketches=list(sketches)
+    k=min((s['k'] for s in sketches),default=KLL_K)
+    n_niveis=max((len(s['levels']) for s in sketches),default=0)
+    niveis=[np.concatenate([s['levels'][h] for s in sketches if h<len(s['levels'])]) for h in range(n_niveis)]
+    return {'k':k,'n':sum(s['n'] for s in sketches),'levels':_kll_compress(niveis,k) if niveis else []}
+
+def kll_quantiles(sketch,qs):
+    """ Esta função retorna os quantis aproximados: para cada q, o menor item cujo peso acumulado chega a q x n.
+
+    Input: sketch; lista de quantis entre 0 e 1
+    Output: array com os quantis (NaN se o sketch estiver vazio)
+    """
+    qs=np.asarray(qs,dtype='float64')
+    if sketch['n']==0:
+        return np.full(len(qs),np.nan)
+    itens=np.concatenate(sketch['levels'])
+    pesos=np.concatenate([np.full(len(n),2.0**h) for h,n in enumerate(sketch['levels'])])
+    ordem=np.argsort(itens,kind='stable')
+    itens,acumulado=itens[ordem],np.cumsum(pesos[ordem])
+    posicao=np.searchsorted(acumulado,np.maximum(qs*acumulado[-1],1e-12),side='left')
+    return itens[np.minimum(posicao,len(itens)-1)]
+
+
+# =====================================================
+# FUNÇÕES: sketches por célula
+# =====================================================
+
+def build_sketches(df,k=KLL_K):
+    """ Esta função monta os sketches de cada célula (data x tráfego x cidade):
+    o número de pedidos, o HyperLogLog dos entregadores e os KLL do tempo de entrega e das
+    coordenadas dos restaurantes.
+
+    Input: dataframe limpo; k do KLL
+    Output: dicionário com as células ('cells'), os registros HyperLogLog ('hll') e os KLL ('kll')
+    """
+    grupos=df.groupby(SKETCH_DIMS,observed=True,sort=True)
+    linhas=grupos.indices
+    chaves=list(linhas.keys())
+    cells=pd.DataFrame(chaves,columns=SKETCH_DIMS)
+    cells['n']=[len(linhas[c]) for c in chaves]
+
+    codigo=np.empty(len(df),dtype='int64')
+    for i,c in enumerate(chaves):
+        codigo[linhas[c]]=i
+    hll=hll_registers(codigo,df[DISTINCT_COL],len(chaves))
+
+    kll={}
+    for nome,col in QUANTILE_COLS.items():
+        valores=df[col].to_numpy(dtype='float64')
+        kll[nome]=[kll_from_values(valores[linhas[c]],k) for c in chaves]
+    return {'cells':cells,'hll':hll,'kll':kll}
+
+def filter_sketches(sketches,data_limite,categorias=None,col='Road_traffic_density'):
+    """ Esta função aplica os filtros da barra lateral sobre as células dos sketches.
+
+    Input: sketches; data limite; categorias selecionadas (None = todas); coluna das categorias
+    Output: sketches filtrados (mesmo formato de build_sketches)
+    """
+    cells=sketches['cells']
+    linhas=(cells['Order_Date']<=pd.Timestamp(data_limite)).to_numpy()
+    if categorias is not None:
+        linhas&=cells[col].isin(categorias).to_numpy()
+    posicoes=np.flatnonzero(linhas)
+    return {'cells':cells.iloc[posicoes].reset_index(drop=True),
+            'hll':sketches['hll'][posicoes],
+            'kll':{nome:[s[i] for i in posicoes] for nome,s in sketches['kll'].items()}}
+
+def _groups(sketches,by):
+    """ Esta função retorna as posições das células de cada grupo ({None: todas} quando by=None) """
+    if by is None:
+        return {None:np.arange(len(sketches['cells']))}
+    by=by if isinstance(by,list) else [by]
+    by=[sketches['cells'][b] if isinstance(b,str) else b for b in by]
+    return sketches['cells'].groupby(by,observed=True,sort=True).indices
+
+def _result(resultado,by):
+    """ Esta função monta o resultado por grupo (ou o valor único quando by=None) """
+    if by is None:
+        return resultado[None]
+    by=by if isinstance(by,list) else [by]
+    nomes=[b if isinstance(b,str) else b.name for b in by]
+    if isinstance(next(iter(resultado.values()),None),np.ndarray):
+        resultado=pd.DataFrame(resultado).T
+    else:
+        resultado=pd.Series(resultado,dtype='int64')
+    resultado.index.names=nomes
+    return resultado.sort_index()
+
+def sketch_count(sketches,by=None):
+    """ Esta função retorna o número exato de pedidos (total ou por grupo de células).
+
+    Input: sketches (filtrados); dimensões (ou Series) dos grupos
+    Output: número ou Series
+    """
+    n=sketches['cells']['n'].to_numpy()
+    return _result({g:int(n[linhas].sum()) for g,linhas in _groups(sketches,by).items()},by)
+
+def sketch_nunique(sketches,by=None):
+    """ Esta função estima o número de entregadores únicos unindo os HyperLogLog das células de cada grupo.
+
+    Input: sketches (filtrados); dimensões (ou Series) dos grupos
+    Output: número estimado ou Series com a estimativa de cada grupo
+    """
+    registros=sketches['hll']
+    resultado={g:hll_estimate(np.maximum.reduce(registros[linhas])) if len(linhas) else 0
+               for g,linhas in _groups(sketches,by).items()}
+    return _result(resultado,by)
+
+def sketch_quantiles(sketches,nome,qs,by=None):
+    """ Esta função estima os quantis de uma coluna combinando os KLL das células de cada grupo.
+
+    Input: sketches (filtrados); nome da coluna em QUANTILE_COLS; lista de quantis; dimensões (ou Series) dos grupos
+    Output: array com os quantis ou dataframe (uma coluna por quantil) com os quantis de cada grupo
+    """
+    kll=sketches['kll'][nome]
+    resultado={g:kll_quantiles(kll_merge(kll[i] for i in linhas),qs) for g,linhas in _groups(sketches,by).items()}
+    resultado=_result(resultado,by)
+    if isinstance(resultado,pd.DataFrame):
+        resultado.columns=list(qs)
+    return resultado
+
+def approx_median_locations(sketches,by=None):
+    """ Esta função estima a mediana da latitude e da longitude dos restaurantes por grupo
+    (mesmo formato de utils.clusters.median_locations).
+
+    Input: sketches (filtrados); colunas dos grupos (padrão: cidade e tipo de tráfego)
+    Output: dataframe com as colunas dos grupos e as medianas das coordenadas
+    """
+    by=['City','Road_traffic_density'] if by is None else by
+    medianas=pd.DataFrame({QUANTILE_COLS[nome]:sketch_quantiles(sketches,nome,[0.5],by)[0.5] for nome in ['lat','lon']})
+    return medianas.reset_index()
@@ -0,0 +1,89 @@
+""" Snapshot colunar do conjunto de dados limpo (formato Feather v2 / Arrow IPC, sem compressão).
+
+O snapshot guarda o resultado de clean_data já tipado: colunas de texto com poucos valores
+são gravadas com codificação de dicionário e as datas como timestamps nativos. Como o arquivo
+não é comprimido, ele pode ser lido com memory mapping, sem o parse de texto do CSV.
+
+O pyarrow só é importado ao gravar ou ler um snapshot: as páginas que carregam o CSV não pagam a sua importação.
+
+Conversão (CSV -> snapshot):
+    python -m utils.snapshot
+    python -m utils.snapshot dataset/train.csv dataset/train.feather
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import time
+
+import pandas as pd
+
+from utils.cleaning import CATEGORY_COLS, clean_data
+from utils.filters import sort_by_date
+from utils.geo import delivery_distance_km
+
+
+# Colunas de texto gravadas com codificação de dicionário (as mesmas guardadas como 'category' pela limpeza)
+DICTIONARY_COLS=CATEGORY_COLS
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def write_snapshot(df,path):
+    """ Esta função grava o dataframe limpo como snapshot colunar.
+
+    Input: dataframe limpo; caminho do snapshot
+    Output: None
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    aux=df.copy()
+    for col in DICTIONARY_COLS:
+        if col in aux.columns and aux[col].dtype==object:
+            aux[col]=aux[col].astype('category')
+    table=pa.Table.from_pandas(aux,preserve_index=True)
+    # Sem compressão, para que o arquivo possa ser lido com memory mapping
+    feather.write_feather(table,path,compression='uncompressed')
+
+def read_snapshot(path):
+    """ Esta função lê o snapshot com memory mapping.
+    As colunas de dicionário voltam como 'category', com os mesmos tipos do caminho via CSV.
+
+    Input: caminho do snapshot
+    Output: dataframe limpo
+    """
+    import pyarrow.feather as feather
+    table=feather.read_table(path,memory_map=True)
+    return table.to_pandas()
+
+def convert(csv_path,snapshot_path,distance_mode='geodesic'):
+    """ Esta função lê o CSV, executa clean_data uma única vez, calcula a coluna 'distance_km',
+    ordena os pedidos por data e grava o snapshot.
+
+    Input: caminho do CSV; caminho do snapshot; modo do cálculo das distâncias
+    Output: dicionário com os tempos de cada etapa (em segundos) e o número de linhas
+    """
+    t0=time.perf_counter()
+    df_raw=pd.read_csv(csv_path)
+    t1=time.perf_counter()
+    df=clean_data(df_raw)
+    df['distance_km']=delivery_distance_km(df,mode=distance_mode)
+    df=sort_by_date(df)
+    t2=time.perf_counter()
+    write_snapshot(df,snapshot_path)
+    t3=time.perf_counter()
+    return {'rows':len(df),'read_s':t1-t0,'clean_s':t2-t1,'write_s':t3-t2}
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('csv',nargs='?',default='dataset/train.csv')
+    parser.add_argument('snapshot',nargs='?',default='dataset/train.feather')
+    parser.add_argument('--distance-mode',default='geodesic',choices=['geodesic','haversine'])
+    args=parser.parse_args()
+
+    info=convert(args.csv,args.snapshot,distance_mode=args.distance_mode)
+    print(f"{args.csv} -> {args.snapshot}: {info['rows']:,} linhas "
+          f"(leitura {info['read_s']:.2f} s, limpeza {info['clean_s']:.2f} s, gravação {info['write_s']:.2f} s)")
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,164 @@
+# Importando as bibliotecas necessárias
+import numpy as np
+import pandas as pd
+
+from utils.geo import DELIVERY_COLS, EARTH_RADIUS_KM, RESTAURANT_COLS, haversine_km
+
+
+# Tamanho das células da grade, em graus (~5,5 km de latitude)
+CELL_DEG=0.05
+
+# Camadas do índice espacial: nome -> colunas de coordenadas
+SPATIAL_LAYERS={'restaurant':RESTAURANT_COLS,
+                'delivery':DELIVERY_COLS}
+
+# Quilômetros por grau de latitude
+KM_PER_DEG=np.pi*EARTH_RADIUS_KM/180
+
+
+# =====================================================
+# FUNÇÕES
+# =====================================================
+
+def _cell(lat,lon,cell_deg):
+    """ Esta função retorna a linha e a coluna da grade de cada ponto """
+    linha=np.floor((np.asarray(lat,dtype='float64')+90)/cell_deg).astype('int64')
+    coluna=np.floor((np.asarray(lon,dtype='float64')+180)/cell_deg).astype('int64')
+    return linha,coluna
+
+def build_grid(lat,lon,cell_deg=CELL_DEG):
+    """ Esta função monta o índice de grade uniforme (buckets) de um conjunto de pontos.
+    As posições dos pontos são ordenadas pela chave da célula (linha x largura + coluna), de forma
+    que os pontos de uma célula, e de células vizinhas na mesma linha, ficam contíguos.
+    - keys / starts / ends: chaves das células ocupadas e o intervalo de cada uma em 'order'
+    - order: posições dos pontos ordenadas por célula
+    - lat / lon: coordenadas originais, para o filtro exato das consultas
+
+    Input: arrays de latitude e longitude (em graus); tamanho da célula em graus
+    Output: dicionário com o índice
+    """
+    lat=np.asarray(lat,dtype='float64')
+    lon=np.asarray(lon,dtype='float64')
+    largura=int(np.ceil(360/cell_deg))+1
+    linha,coluna=_cell(lat,lon,cell_deg)
+    chave=linha*largura+coluna
+    order=np.argsort(chave,kind='stable')
+    if len(order)<2**31:
+        order=order.astype('int32')
+    keys,starts=np.unique(chave[order],return_index=True)
+    ends=np.append(starts[1:],len(order))
+    return {'cell_deg':cell_deg,'width':largura,'keys':keys,'starts':starts,'ends':ends,
+            'order':order,'lat':lat,'lon':lon}
+
+def build_spatial_index(df,cell_deg=CELL_DEG):
+    """ Esta função monta um índice de grade para os restaurantes e outro para os locais de entrega.
+    As posições retornadas pelas consultas são posições de linha (iloc) do dataframe.
+
+    Input: dataframe limpo; tamanho da célula em graus
+    Output: dicionário camada -> índice (build_grid)
+    """
+    return {nome:build_grid(df[cols[0]].to_numpy(),df[cols[1]].to_numpy(),cell_deg)
+            for nome,cols in SPATIAL_LAYERS.items()}
+
+def _candidates(grid,lat_min,lat_max,lon_min,lon_max):
+    """ Esta função retorna as posições dos pontos das células que tocam o retângulo.
+    Em cada linha da grade as células do retângulo têm chaves consecutivas, então cada
+    linha custa duas buscas binárias.
+
+    Input: índice; limites do retângulo (em graus)
+    Output: array com as posições candidatas
+    """
+    # Limitando o retângulo ao globo, para que as colunas não avancem sobre a linha seguinte da grade
+    lat_min,lat_max=max(lat_min,-90.0),min(lat_max,90.0)
+    lon_min,lon_max=max(lon_min,-180.0),min(lon_max,180.0)
+    if lat_min>lat_max or lon_min>lon_max:
+        return np.array([],dtype='int64')
+    (l0,l1),(c0,c1)=_cell([lat_min,lat_max],[lon_min,lon_max],grid['cell_deg'])
+    linhas=np.arange(l0,l1+1,dtype='int64')*grid['width']
+    inicio=np.searchsorted(grid['keys'],linhas+c0,side='left')
+    fim=np.searchsorted(grid['keys'],linhas+c1,side='right')
+    trechos=[grid['order'][grid['starts'][i]:grid['ends'][j-1]] for i,j in zip(inicio,fim) if j>i]
+    return np.concatenate(trechos) if trechos else np.array([],dtype='int64')
+
+def bbox_query(grid,lat_min,lat_max,lon_min,lon_max):
+    """ Esta função retorna os pontos dentro do retângulo (limites incluídos).
+    Só os pontos das células que tocam o retângulo são verificados.
+
+    Input: índice; limites do retângulo (em graus)
+    Output: array ordenado com as posições dos pontos
+    """
+    posicoes=_candidates(grid,lat_min,lat_max,lon_min,lon_max)
+    lat,lon=grid['lat'][posicoes],grid['lon'][posicoes]
+    dentro=(lat>=lat_min)&(lat<=lat_max)&(lon>=lon_min)&(lon<=lon_max)
+    return np.sort(posicoes[dentro])
+
+def _radius_bbox(lat,lon,radius_km):
+    """ Esta função retorna o retângulo que contém o círculo de raio radius_km em volta do ponto """
+    dlat=radius_km/KM_PER_DEG
+    cos=np.cos(np.radians(min(abs(lat)+dlat,90.0)))
+    dlon=180.0 if cos<1e-9 else min(dlat/cos,180.0)
+    return lat-dlat,lat+dlat,lon-dlon,lon+dlon
+
+def radius_query(grid,lat,lon,radius_km):
+    """ Esta função retorna os pontos a até radius_km do ponto (lat, lon), pela distância haversine.
+
+    Input: índice; latitude e longitude do centro (em graus); raio em km
+    Output: tupla (posições ordenadas, distâncias em km)
+    """
+    posicoes=_candidates(grid,*_radius_bbox(lat,lon,radius_km))
+    distancias=haversine_km(lat,lon,grid['lat'][posicoes],grid['lon'][posicoes])
+    dentro=distancias<=radius_km
+    posicoes,distancias=posicoes[dentro],distancias[dentro]
+    ordem=np.argsort(posicoes)
+    return posicoes[ordem],distancias[ordem]
+
+def _distinct_locations(grid,posicoes,distancias):
+    """ Esta função agrupa os pontos com as mesmas coordenadas (vários pedidos do mesmo restaurante).
+    As coordenadas (0, 0), usadas no conjunto de dados quando o local não foi informado, ficam de fora.
+
+    Input: índice; posições; distâncias até o centro
+    Output: dataframe com as colunas 'lat', 'lon', 'distance_km' e 'orders', ordenado pela distância
+    """
+    lat,lon=grid['lat'][posicoes],grid['lon'][posicoes]
+    validos=~((lat==0)&(lon==0))
+    if not validos.all():
+        lat,lon,distancias=lat[validos],lon[validos],np.asarray(distancias)[validos]
+    ordem=np.lexsort((lon,lat))
+    lat,lon,distancias=lat[ordem],lon[ordem],distancias[ordem]
+    inicio=np.flatnonzero(np.r_[True,(lat[1:]!=lat[:-1])|(lon[1:]!=lon[:-1])]) if len(ordem) else np.array([],dtype='int64')
+    locais=pd.DataFrame({'lat':lat[inicio],
+                         'lon':lon[inicio],
+                         'distance_km':distancias[inicio],
+                         'orders':np.diff(np.append(inicio,len(ordem)))})
+    return locais.sort_values(['distance_km','lat','lon'],kind='mergesort').reset_index(drop=True)
+
+def nearest(grid,lat,lon,k=5,filtro=None):
+    """ Esta função retorna os k locais distintos (coordenadas) mais próximos do ponto, com o número de pedidos de cada um.
+    A busca começa na célula do ponto e aumenta o retângulo até encontrar k locais; a distância do
+    k-ésimo local limita o raio da consulta final, que garante o resultado exato.
+    Com um filtro (por exemplo, os filtros da barra lateral, utils.filters.filter_positions), só os pedidos
+    mantidos contam, e só as posições candidatas de cada passo são verificadas.
+
+    Input: índice; latitude e longitude do ponto (em graus); número de locais;
+           função que recebe posições e retorna as mantidas (None = todas)
+    Output: dataframe com as colunas 'lat', 'lon', 'distance_km' e 'orders' (k linhas, no máximo)
+    """
+    def candidatos(lat_min,lat_max,lon_min,lon_max):
+        posicoes=_candidates(grid,lat_min,lat_max,lon_min,lon_max)
+        posicoes=posicoes if filtro is None else filtro(posicoes)
+        return posicoes,haversine_km(lat,lon,grid['lat'][posicoes],grid['lon'][posicoes])
+
+    passo=grid['cell_deg']
+    anel=1
+    while True:
+        posicoes,distancias=candidatos(lat-anel*passo,lat+anel*passo,lon-anel*passo,lon+anel*passo)
+        locais=_distinct_locations(grid,posicoes,distancias)
+        if len(locais)>=k or anel*passo>=180:
+            break
+        anel*=2
+    if len(locais)==0:
+        return locais
+    raio=locais['distance_km'].iloc[min(k,len(locais))-1]
+    posicoes,distancias=candidatos(*_radius_bbox(lat,lon,raio))
+    dentro=distancias<=raio
+    return _distinct_locations(grid,posicoes[dentro],distancias[dentro]).head(k)
@@ -0,0 +1,370 @@
+""" Modo de agregação em streaming, para conjuntos de dados maiores que a memória.
+
+Uso só pela linha de comando (ou por scripts): as páginas e a API não importam este módulo e continuam
+carregando o dataframe inteiro (utils/loader.py).
+
+O CSV é lido em blocos (pd.read_csv(chunksize=...)) e cada bloco é limpo com clean_data e resumido
+em agregados parciais que podem ser somados entre blocos. A memória usada depende do tamanho do bloco
+e do número de grupos, e não do número de pedidos. Todos os agregados têm a data como dimensão (para o
+filtro de data), então crescem com o número de dias do histórico:
+- cells e hll: dias x tráfego x categorias (pequenos)
+- couriers: dias x tráfego x cidade x entregadores ativos em cada dia
+- coords: dias x tráfego x cidade x faixas de coordenadas com pedidos em cada dia
+Os dois últimos são os maiores; stream_partials interrompe a leitura com ValueError quando os dois juntos
+passam de MAX_PARTIAL_ROWS linhas (um bloco menor não reduz esse tamanho; use um período menor).
+
+Agregados parciais (todos com as dimensões dos filtros da barra lateral, 'Order_Date' e
+'Road_traffic_density', para que os filtros possam ser aplicados depois):
+- cells: contagem, soma e soma dos quadrados (tempo, avaliação, distância) e mínimo/máximo
+  (idade, condição do veículo) por data, tráfego, cidade, festival, tipo de pedido e clima
+- couriers: contagem e somas do tempo e da avaliação por data, tráfego, cidade e entregador
+- hll: registros HyperLogLog dos entregadores por data e tráfego (entregadores únicos)
+- coords: histograma das coordenadas dos restaurantes em faixas de COORD_BIN graus (medianas)
+- top: para cada data, tráfego e cidade, os TOP_K_MAX pedidos mais rápidos e mais lentos
+
+Tolerâncias em relação ao caminho em memória (ver benchmarks/bench_streaming.py):
+- contagens, mínimos, máximos e rankings (top k): exatos
+- médias e desvios padrão: erro relativo menor que 1e-9 (somas em float64)
+- medianas das coordenadas: erro absoluto de no máximo COORD_BIN/2 graus
+- entregadores únicos: erro relativo típico de 1,04/sqrt(2**HLL_P) (~1,6%, ver utils/sketches.py);
+  abaixo de 2,5 x 2**HLL_P entregadores a estimativa usa contagem linear e o erro é bem menor
+
+Uso:
+    python -m utils.streaming [dataset/train.csv] [--chunksize 100000]
+"""
+# Importando as bibliotecas necessárias
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.cleaning import clean_data
+from utils.cube import cube_count, cube_stats
+from utils.geo import RESTAURANT_COLS, delivery_distance_km
+from utils.ranking import top_k_by_group
+from utils.sketches import hll_estimate, hll_registers
+
+
+DATA_PATH='dataset/train.csv'
+CHUNKSIZE=100_000
+
+# Dimensões dos filtros da barra lateral
+FILTER_DIMS=['Order_Date','Road_traffic_density']
+
+# Dimensões das células dos agregados (além das dos filtros)
+CELL_DIMS=FILTER_DIMS+['City','Festival','Type_of_order','Weatherconditions']
+
+# Medidas com contagem, soma e soma dos quadrados: nome -> coluna
+MOMENT_COLS={'time':'Time_taken(min)',
+             'rating':'Delivery_person_Ratings',
+             'distance':'distance_km'}
+
+# Medidas com mínimo e máximo: nome -> coluna
+RANGE_COLS={'age':'Delivery_person_Age',
+            'vehicle':'Vehicle_condition'}
+
+# Largura das faixas do histograma das coordenadas, em graus (~110 m de latitude)
+COORD_BIN=0.001
+
+# Maior k dos rankings de entregadores que pode ser respondido
+TOP_K_MAX=50
+
+# Número de blocos resumidos que esperam para ser combinados de uma vez
+MERGE_EVERY=8
+
+# Limite de linhas dos agregados 'couriers' e 'coords' juntos (None = sem limite): crescem com o número de dias
+MAX_PARTIAL_ROWS=5_000_000
+
+
+# =====================================================
+# FUNÇÕES: HyperLogLog
+# =====================================================
+
+def _merge_hll(keys,registros):
+    """ Esta função une os registros HyperLogLog com as mesmas chaves (máximo de cada registro).
+
+    Input: dataframe com as chaves; array com os registros (uma linha por linha de 'keys')
+    Output: dicionário {'keys': chaves únicas, 'registers': registros}
+    """
+    keys=keys.reset_index(drop=True)
+    grupos=keys.groupby(list(keys.columns),sort=True).ngroup().to_numpy()
+    ordem=np.argsort(grupos,kind='stable')
+    inicio=np.flatnonzero(np.r_[True,grupos[ordem][1:]!=grupos[ordem][:-1]]) if len(ordem) else np.array([],dtype='int64')
+    saida=np.maximum.reduceat(registros[ordem],inicio,axis=0) if len(ordem) else registros[:0]
+    chaves=keys.iloc[ordem[inicio]].reset_index(drop=True)
+    return {'keys':chaves,'registers':saida}
+
+
+# =====================================================
+# FUNÇÕES: agregados parciais
+# =====================================================
+
+# Como cada coluna dos agregados é combinada entre blocos
+CELL_AGG={'n':'sum',
+          **{f'{nome}_{sufixo}':'sum' for nome in MOMENT_COLS for sufixo in ('sum','sumsq')},
+          **{f'{nome}_{sufixo}':sufixo for nome in RANGE_COLS for sufixo in ('min','max')}}
+COURIER_DIMS=FILTER_DIMS+['City','Delivery_person_ID']
+COURIER_AGG={'n':'sum','time_sum':'sum','rating_sum':'sum'}
+COORD_DIMS=FILTER_DIMS+['City','axis','bin']
+TOP_DIMS=FILTER_DIMS+['City']
+TOP_COLS=TOP_DIMS+['Time_taken(min)','Delivery_person_ID','row']
+
+
+def _keys(df,cols):
+    """ Esta função retorna as colunas de chave com os valores das categorias (e não os códigos),
+    para que os agregados de blocos com categorias diferentes possam ser combinados.
+
+    Input: dataframe; colunas
+    Output: dataframe
+    """
+    return pd.DataFrame({col:df[col].astype(object) if isinstance(df[col].dtype,pd.CategoricalDtype) else df[col]
+                         for col in cols})
+
+def _combine(frames,dims,agg):
+    """ Esta função combina agregados parciais com as mesmas dimensões """
+    return pd.concat(frames,ignore_index=True).groupby(dims,sort=False).agg(agg).reset_index()
+
+def _top_candidates(df,k):
+    """ Esta função mantém, para cada data, tráfego e cidade, os k pedidos mais rápidos e os k mais lentos.
+    Os empates são resolvidos pela linha do arquivo ('row'), como no caminho em memória.
+
+    Input: dataframe com as colunas TOP_COLS; k
+    Output: dataframe com os candidatos
+    """
+    ordenado=df.sort_values(TOP_DIMS+['Time_taken(min)','row'],kind='mergesort')
+    grupos=ordenado.groupby(TOP_DIMS,sort=False)
+    return pd.concat([grupos.head(k),grupos.tail(k)]).drop_duplicates('row').reset_index(drop=True)
+
+def chunk_partials(df,k_max=TOP_K_MAX):
+    """ Esta função resume um bloco já limpo (com a coluna 'distance_km') nos agregados parciais.
+
+    Input: bloco limpo; maior k dos rankings
+    Output: dicionário com os agregados parciais ('cells', 'couriers', 'hll', 'coords', 'top', 'rows')
+    """
+    valores=_keys(df,CELL_DIMS)
+    valores['n']=1
+    for nome,col in MOMENT_COLS.items():
+        v=df[col].to_numpy(dtype='float64')
+        valores[f'{nome}_sum']=v
+        valores[f'{nome}_sumsq']=v**2
+    for nome,col in RANGE_COLS.items():
+        valores[f'{nome}_min']=df[col].to_numpy()
+        valores[f'{nome}_max']=df[col].to_numpy()
+    cells=valores.groupby(CELL_DIMS,sort=False).agg(CELL_AGG).reset_index()
+
+    valores=_keys(df,COURIER_DIMS)
+    valores['n']=1
+    valores['time_sum']=df['Time_taken(min)'].to_numpy(dtype='float64')
+    valores['rating_sum']=df['Delivery_person_Ratings'].to_numpy(dtype='float64')
+    couriers=valores.groupby(COURIER_DIMS,sort=False).agg(COURIER_AGG).reset_index()
+
+    chaves=_keys(df,FILTER_DIMS)
+    grupos=chaves.groupby(FILTER_DIMS,sort=True).ngroup().to_numpy()
+    registros=hll_registers(grupos,df['Delivery_person_ID'],int(grupos.max())+1 if len(grupos) else 0)
+    primeira=np.unique(grupos,return_index=True)[1]
+    hll={'keys':chaves.iloc[primeira].reset_index(drop=True),'registers':registros}
+
+    coords=[]
+    for eixo,col in zip(['lat','lon'],RESTAURANT_COLS):
+        valores=_keys(df,FILTER_DIMS+['City'])
+        valores['axis']=eixo
+        valores['bin']=np.floor(df[col].to_numpy(dtype='float64')/COORD_BIN).astype('int64')
+        valores['n']=1
+        coords.append(valores)
+    coords=_combine(coords,COORD_DIMS,{'n':'sum'})
+
+    valores=_keys(df,TOP_DIMS+['Delivery_person_ID'])
+    valores['Time_taken(min)']=df['Time_taken(min)'].to_numpy()
+    valores['row']=df.index.to_numpy()
+    top=_top_candidates(valores.loc[:,TOP_COLS],k_max)
+
+    return {'cells':cells,'couriers':couriers,'hll':hll,'coords':coords,'top':top,'rows':len(df),'k_max':k_max}
+
+def merge_partials(partes):
+    """ Esta função combina agregados parciais de vários blocos como se fossem de um único bloco.
+
+    Input: lista de agregados parciais (chunk_partials)
+    Output: agregados parciais combinados
+    """
+    partes=[p for p in partes if p is not None]
+    if len(partes)==1:
+        return partes[0]
+    k_max=min(p['k_max'] for p in partes)
+    return {'cells':_combine([p['cells'] for p in partes],CELL_DIMS,CELL_AGG),
+            'couriers':_combine([p['couriers'] for p in partes],COURIER_DIMS,COURIER_AGG),
+            'hll':_merge_hll(pd.concat([p['hll']['keys'] for p in partes],ignore_index=True),
+                             np.concatenate([p['hll']['registers'] for p in partes])),
+            'coords':_combine([p['coords'] for p in partes],COORD_DIMS,{'n':'sum'}),
+            'top':_top_candidates(pd.concat([p['top'] for p in partes],ignore_index=True),k_max),
+            'rows':sum(p['rows'] for p in partes),
+            'k_max':k_max}
+
+def partial_rows(parciais):
+    """ Esta função retorna o número de linhas dos agregados que crescem com o histórico ('couriers' e 'coords').
+
+    Input: agregados parciais
+    Output: número de linhas
+    """
+    return len(parciais['couriers'])+len(parciais['coords'])
+
+def stream_partials(path=DATA_PATH,chunksize=CHUNKSIZE,k_max=TOP_K_MAX,distance_mode='geodesic',max_rows=MAX_PARTIAL_ROWS):
+    """ Esta função lê o CSV em blocos, limpa cada bloco e acumula os agregados parciais.
+    Só um bloco (e os resumos de até MERGE_EVERY blocos) fica em memória de cada vez.
+    A cada combinação, o tamanho dos agregados 'couriers' e 'coords' é conferido com max_rows.
+
+    Input: caminho do CSV; número de linhas por bloco; maior k dos rankings; modo do cálculo das distâncias;
+           limite de linhas de 'couriers' e 'coords' (None = sem limite)
+    Output: agregados parciais de todo o arquivo (com o número de linhas lidas em 'rows_raw')
+    """
+    pendentes=[]
+    linhas=0
+    for bloco in pd.read_csv(path,chunksize=chunksize):
+        linhas+=len(bloco)
+        df=clean_data(bloco)
+        df['distance_km']=delivery_distance_km(df,mode=distance_mode)
+        pendentes.append(chunk_partials(df,k_max))
+        # Os resumos são combinados em grupos de MERGE_EVERY, e não a cada bloco
+        if len(pendentes)>=MERGE_EVERY:
+            pendentes=[merge_partials(pendentes)]
+            _check_rows(pendentes[0],max_rows,linhas)
+    parciais=merge_partials(pendentes)
+    _check_rows(parciais,max_rows,linhas)
+    parciais['rows_raw']=linhas
+    return parciais
+
+def _check_rows(parciais,max_rows,linhas):
+    """ Esta função interrompe a leitura quando os agregados 'couriers' e 'coords' passam do limite """
+    if max_rows is not None and partial_rows(parciais)>max_rows:
+        raise ValueError(f'agregados com {partial_rows(parciais):,} linhas após {linhas:,} linhas lidas, acima do limite '
+                         f'de {max_rows:,} (couriers e coords crescem com o número de dias; use um período menor)')
+
+def filter_partials(parciais,data_limite,categorias=None):
+    """ Esta função aplica os filtros da barra lateral (data limite e tipos de tráfego) aos agregados.
+
+    Input: agregados parciais; data limite; tipos de tráfego selecionados (None = todos)
+    Output: agregados parciais filtrados
+    """
+    def linhas(df):
+        selecionadas=(df['Order_Date']<=pd.Timestamp(data_limite)).to_numpy()
+        if categorias is not None:
+            selecionadas&=df['Road_traffic_density'].isin(categorias).to_numpy()
+        return selecionadas
+
+    filtrados=dict(parciais)
+    for nome in ['cells','couriers','coords','top']:
+        filtrados[nome]=parciais[nome].loc[linhas(parciais[nome])].reset_index(drop=True)
+    hll=parciais['hll']
+    selecionadas=linhas(hll['keys'])
+    filtrados['hll']={'keys':hll['keys'].loc[selecionadas].reset_index(drop=True),
+                      'registers':hll['registers'][selecionadas]}
+    return filtrados
+
+
+# =====================================================
+# FUNÇÕES: métricas das páginas
+# =====================================================
+
+def _nunique(hll,by=None):
+    """ Esta função estima os entregadores únicos de cada grupo unindo os registros das suas células.
+
+    Input: registros HyperLogLog filtrados; Series com o grupo de cada célula (None = total)
+    Output: número estimado (by=None) ou Series com o número estimado por grupo
+    """
+    if by is None:
+        return hll_estimate(np.maximum.reduce(hll['registers'])) if len(hll['registers']) else 0
+    grupos=pd.Series(np.arange(len(by))).groupby(by.to_numpy()).indices
+    resultado=pd.Series({chave:hll_estimate(np.maximum.reduce(hll['registers'][linhas]))
+                         for chave,linhas in grupos.items()},dtype='int64')
+    resultado.index.name=by.name
+    return resultado.sort_index()
+
+def _medians(coords,by):
+    """ Esta função calcula as medianas aproximadas das coordenadas a partir dos histogramas.
+    Como no pandas, com um número par de pedidos a mediana é a média dos dois valores centrais;
+    cada valor é o centro da sua faixa, então o erro é de no máximo COORD_BIN/2.
+
+    Input: histogramas filtrados; dimensões dos grupos
+    Output: dataframe com as dimensões e as medianas de latitude e longitude
+    """
+    contagens=coords.groupby(by+['axis','bin'],sort=True)['n'].sum()
+    resultado={}
+    for chave,grupo in contagens.groupby(level=list(range(len(by)+1)),sort=True):
+        acumulado=grupo.to_numpy().cumsum()
+        faixas=grupo.index.get_level_values('bin').to_numpy()
+        total=acumulado[-1]
+        centrais=faixas[np.searchsorted(acumulado,[(total-1)//2,total//2],side='right')]
+        resultado[chave]=((centrais+0.5)*COORD_BIN).mean()
+    medianas=pd.Series(resultado).unstack(-1).rename(columns={'lat':RESTAURANT_COLS[0],'lon':RESTAURANT_COLS[1]})
+    medianas.index.names=by
+    return medianas.loc[:,RESTAURANT_COLS].sort_index().reset_index()
+
+def streaming_metrics(parciais,k=10):
+    """ Esta função calcula, a partir dos agregados (já filtrados), todas as métricas exibidas nas páginas.
+
+    Input: agregados parciais filtrados (filter_partials); número de entregadores por cidade nos rankings
+    Output: dicionário métrica -> Series, dataframe ou número
+    """
+    if k>parciais['k_max']:
+        raise ValueError(f"k={k} é maior que o k máximo dos agregados ({parciais['k_max']})")
+    cubo={'cells':parciais['cells']}
+    cells=parciais['cells']
+    semana_cells=cells['Order_Date'].dt.strftime('%U').rename('week_of_year')
+    semana_hll=parciais['hll']['keys']['Order_Date'].dt.strftime('%U').rename('week_of_year')
+    metricas={}
+
+    # Visão Empresa
+    metricas['order_day']=cube_count(cubo,'Order_Date')
+    metricas['order_traffic']=cube_count(cubo,'Road_traffic_density')
+    metricas['order_traf_city']=cube_count(cubo,['Road_traffic_density','City'])
+    metricas['order_week']=cube_count(cubo,semana_cells)
+    metricas['couriers_week']=_nunique(parciais['hll'],semana_hll)
+    metricas['central_spot']=_medians(parciais['coords'],['City','Road_traffic_density'])
+
+    # Visão Entregadores
+    for nome,col in RANGE_COLS.items():
+        metricas[f'{nome}_min']=cells[f'{nome}_min'].min()
+        metricas[f'{nome}_max']=cells[f'{nome}_max'].max()
+    entregadores=parciais['couriers'].groupby('Delivery_person_ID',sort=True)[['n','rating_sum']].sum()
+    metricas['rating_courier']=(entregadores['rating_sum']/entregadores['n']).rename('Delivery_person_Ratings')
+    metricas['rating_traffic']=cube_stats(cubo,'Road_traffic_density','rating')
+    metricas['rating_weather']=cube_stats(cubo,'Weatherconditions','rating')
+    # Ranking por pedido: os candidatos ficam na ordem do caminho em memória (data e linha do arquivo)
+    candidatos=parciais['top'].sort_values(['Order_Date','row'],kind='mergesort')
+    cols=['City','Time_taken(min)','Delivery_person_ID']
+    metricas['top_fast'],metricas['top_slow']=top_k_by_group(candidatos,'City','Time_taken(min)',k=k,cols=cols)
+    # Ranking por entregador: tempo médio de cada entregador em cada cidade
+    medias=parciais['couriers'].groupby(['City','Delivery_person_ID'],sort=True)[['n','time_sum']].sum()
+    medias=(medias['time_sum']/medias['n']).rename('Time_taken(min)').reset_index().loc[:,cols]
+    metricas['top_fast_courier'],metricas['top_slow_courier']=top_k_by_group(medias,'City','Time_taken(min)',k=k,cols=cols)
+
+    # Visão Restaurantes
+    metricas['couriers_unique']=_nunique(parciais['hll'])
+    metricas['distance_mean']=cells['distance_sum'].sum()/cells['n'].sum()
+    metricas['time_festival']=cube_stats(cubo,'Festival','time')
+    metricas['distance_city']=cube_stats(cubo,'City','distance')
+    metricas['time_city']=cube_stats(cubo,'City','time')
+    metricas['time_city_order']=cube_stats(cubo,['City','Type_of_order'],'time')
+    metricas['time_city_traffic']=cube_stats(cubo,['City','Road_traffic_density'],'time')
+    return metricas
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('csv',nargs='?',default=DATA_PATH)
+    parser.add_argument('--chunksize',type=int,default=CHUNKSIZE)
+    parser.add_argument('--max-rows',type=int,default=MAX_PARTIAL_ROWS,help='limite de linhas de couriers e coords')
+    args=parser.parse_args()
+
+    t0=time.perf_counter()
+    parciais=stream_partials(args.csv,args.chunksize,max_rows=args.max_rows)
+    metricas=streaming_metrics(parciais)
+    print(f"{parciais['rows_raw']:,} linhas lidas, {parciais['rows']:,} pedidos válidos em {time.perf_counter()-t0:.1f}s")
+    print(f"Agregados: {len(parciais['couriers']):,} linhas em couriers, {len(parciais['coords']):,} em coords")
+    print(f"Entregadores únicos (aprox.): {metricas['couriers_unique']:,}")
+    print(f"Distância média: {metricas['distance_mean']:.2f} km")
+    print('Tempo de entrega por cidade:')
+    print(metricas['time_city'].round(2).to_string())
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,301 @@
+# Importando as bibliotecas necessárias
+import numpy as np
+import pandas as pd
+
+from utils.cube import courier_bitsets
+from utils.filters import date_offset
+
+
+# Dimensões das somas acumuladas (além do dia): uma posição por valor observado
+WINDOW_DIMS=['City','Road_traffic_density','Festival']
+
+# Medidas acumuladas: nome -> coluna do dataframe (a soma dos quadrados só para o tempo de entrega)
+WINDOW_MEASURES={'time':'Time_taken(min)',
+                 'rating':'Delivery_person_Ratings',
+                 'distance':'distance_km'}
+
+# Memória máxima da tabela esparsa de bitsets dos entregadores (acima dela os entregadores
+# únicos da janela são contados nas linhas do período)
+MAX_BITSET_BYTES=256*2**20
+
+# Modos de comparação: chave -> rótulo mostrado na barra lateral
+COMPARISONS={'periodo':'Período anterior (mesma duração)',
+             'semana':'Mesmo período, uma semana antes'}
+
+# Métricas do resumo de uma janela, na ordem das colunas das páginas
+SUMMARY_METRICS=['orders','couriers','orders_per_courier','time_mean','time_std','rating_mean','distance_mean']
+
+
+# =====================================================
+# FUNÇÕES: montagem
+# =====================================================
+
+def _sparse_table(bitsets):
+    """ Esta função monta a tabela esparsa (sparse table) dos bitsets diários: o nível j guarda, para cada
+    dia d, o OU dos bitsets dos dias [d, d+2^j). Qualquer janela [s, e] é o OU de dois blocos do mesmo
+    nível que se sobrepõem, e o OU não é afetado pela sobreposição.
+
+    Input: array uint64 (dias x tráfego x palavras)
+    Output: lista de arrays, um por nível
+    """
+    niveis=[bitsets]
+    passo=1
+    while 2*passo<=len(bitsets):
+        anterior=niveis[-1]
+        niveis.append(anterior[:-passo]|anterior[passo:])
+        passo*=2
+    return niveis
+
+def build_window_index(df,max_bytes=MAX_BITSET_BYTES):
+    """ Esta função monta as somas acumuladas (prefix sums) diárias usadas pelas janelas de comparação.
+    Os pedidos são somados por dia x cidade x tráfego x festival com np.bincount e acumulados ao longo
+    dos dias: a soma de qualquer janela [s, e] é P[e+1]-P[s], com custo independente do tamanho da janela
+    e do número de pedidos. Os entregadores únicos vêm de uma tabela esparsa de bitsets por dia e tráfego
+    (ver _sparse_table), montada quando cabe em max_bytes.
+
+    Input: dataframe limpo; memória máxima da tabela de bitsets (em bytes)
+    Output: dicionário com o primeiro dia ('start'), o número de dias ('days'), os valores de cada dimensão
+            ('levels'), as somas acumuladas ('prefix') e a tabela de bitsets ('couriers', ou None)
+    """
+    datas=df['Order_Date'].to_numpy(dtype='datetime64[D]')
+    if len(datas)==0:
+        raise ValueError('o dataframe não possui pedidos')
+    inicio=datas.min()
+    dia=(datas-inicio).astype('int64')
+    n_dias=int(dia.max())+1
+
+    chave=dia
+    formato=[n_dias]
+    niveis={}
+    for col in WINDOW_DIMS:
+        codes,uniques=pd.factorize(df[col],sort=True)
+        if codes.min()<0:
+            raise ValueError(f'a coluna {col} possui valores nulos')
+        chave=chave*max(len(uniques),1)+codes
+        formato.append(max(len(uniques),1))
+        niveis[col]=pd.Index(uniques,name=col)
+    n_celulas=int(np.prod(formato))
+
+    def acumula(pesos):
+        diario=np.bincount(chave,weights=pesos,minlength=n_celulas).reshape(formato)
+        return np.concatenate([np.zeros((1,)+tuple(formato[1:])),np.cumsum(diario,axis=0)])
+
+    prefix={'n':acumula(None)}
+    for nome,col in WINDOW_MEASURES.items():
+        if col not in df.columns:
+            continue
+        valores=df[col].to_numpy(dtype='float64')
+        prefix[f'{nome}_sum']=acumula(valores)
+        if nome=='time':
+            prefix[f'{nome}_sumsq']=acumula(valores*valores)
+
+    entregadores=df['Delivery_person_ID'].astype('category')
+    n_couriers=len(entregadores.cat.categories)
+    n_trafego=formato[2]
+    n_words=max((n_couriers+63)//64,1)
+    n_niveis=int(np.log2(n_dias))+1
+    couriers=None
+    if n_dias*n_niveis*n_trafego*n_words*8<=max_bytes:
+        codes_trafego=niveis['Road_traffic_density'].get_indexer(df['Road_traffic_density'])
+        bitsets=courier_bitsets(dia*n_trafego+codes_trafego,
+                                entregadores.cat.codes.to_numpy().astype('int64'),
+                                n_dias*n_trafego,
+                                n_couriers)
+        couriers=_sparse_table(bitsets.reshape(n_dias,n_trafego,n_words))
+    return {'start':pd.Timestamp(inicio),'days':n_dias,'levels':niveis,'prefix':prefix,'couriers':couriers}
+
+
+# =====================================================
+# FUNÇÕES: consultas
+# =====================================================
+
+def window_days(index,inicio,fim):
+    """ Esta função converte as datas de uma janela nas posições dos dias, limitadas aos dias com dados.
+
+    Input: índice das janelas; data inicial e data final (inclusivas)
+    Output: tupla (primeiro dia, último dia); a janela é vazia se o primeiro for maior que o último
+    """
+    s=(pd.Timestamp(inicio).normalize()-index['start']).days
+    e=(pd.Timestamp(fim).normalize()-index['start']).days
+    return max(s,0),min(e,index['days']-1)
+
+def _traffic_positions(index,categorias):
+    """ Esta função retorna as posições dos tipos de tráfego selecionados (None = todos) """
+    niveis=index['levels']['Road_traffic_density']
+    if categorias is None:
+        return np.arange(len(niveis))
+    posicoes=niveis.get_indexer(list(categorias))
+    return posicoes[posicoes>=0]
+
+def _window_sums(index,s,e,trafego):
+    """ Esta função retorna as somas da janela [s, e] de cada medida por cidade x festival,
+    com os tipos de tráfego selecionados somados.
+
+    Input: índice das janelas; primeiro e último dia; posições dos tipos de tráfego
+    Output: dicionário medida -> array (cidades x festival)
+    """
+    somas={}
+    for nome,P in index['prefix'].items():
+        if s>e:
+            somas[nome]=np.zeros((P.shape[1],P.shape[3]))
+        else:
+            somas[nome]=(P[e+1]-P[s])[:,trafego,:].sum(axis=1)
+    return somas
+
+def _moments(n,soma,somasq=None):
+    """ Esta função retorna a média e o desvio padrão amostral (como no pandas) a partir das somas """
+    with np.errstate(divide='ignore',invalid='ignore'):
+        media=np.where(n>0,soma/n,np.nan)
+        if somasq is None:
+            return media,None
+        variancia=np.where(n>1,(somasq-n*media**2)/(n-1),np.nan)
+    return media,np.sqrt(np.clip(variancia,0,None))
+
+def _window_couriers(index,s,e,trafego,df=None,filter_index=None,inicio=None,fim=None,categorias=None):
+    """ Esta função retorna o número exato de entregadores únicos da janela [s, e].
+    Com a tabela esparsa, é o OU de dois blocos de 2^j dias (j = log2 do tamanho da janela) seguido da
+    contagem de bits. Sem ela, os entregadores são contados nas linhas do período (fatia por data e
+    bitmaps de tráfego do índice de filtros), se o dataframe for informado.
+
+    Input: índice das janelas; primeiro e último dia; posições dos tipos de tráfego; dataframe, índice
+           de filtros, datas e categorias da janela (usados sem a tabela esparsa)
+    Output: número de entregadores únicos (None se não puder ser calculado)
+    """
+    if s>e or len(trafego)==0:
+        return 0
+    tabela=index['couriers']
+    if tabela is not None:
+        j=int(np.log2(e-s+1))
+        bits=np.bitwise_or.reduce(np.concatenate([tabela[j][s][trafego],tabela[j][e-2**j+1][trafego]]),axis=0)
+        return int(np.unpackbits(bits.view('uint8')).sum())
+    if df is None or filter_index is None:
+        return None
+    ini=date_offset(filter_index,pd.Timestamp(inicio).normalize()-pd.Timedelta(days=1))
+    fim=date_offset(filter_index,fim)
+    ids=df['Delivery_person_ID'].iloc[ini:fim]
+    if categorias is not None:
+        bitmaps=filter_index['bitmaps']['Road_traffic_density']
+        linhas=np.zeros(fim-ini,dtype=bool)
+        for cat in categorias:
+            if cat in bitmaps:
+                linhas|=bitmaps[cat][ini:fim]
+        ids=ids[linhas]
+    return int(ids.nunique())
+
+def window_stats(index,inicio,fim,categorias=None,df=None,filter_index=None):
+    """ Esta função calcula as métricas de uma janela [inicio, fim] (datas inclusivas) a partir das somas
+    acumuladas: o custo é o de algumas subtrações por cidade, tráfego e festival, qualquer que seja o
+    tamanho da janela.
+
+    Input: índice das janelas; data inicial e data final; tipos de tráfego selecionados (None = todos);
+           dataframe e índice de filtros (opcionais, para os entregadores únicos sem a tabela de bitsets)
+    Output: dicionário com as métricas gerais (SUMMARY_METRICS), as datas da janela e os dataframes
+            'by_city' e 'by_festival' (colunas 'orders', 'time_mean' e 'time_std')
+    """
+    inicio,fim=pd.Timestamp(inicio).normalize(),pd.Timestamp(fim).normalize()
+    if inicio>fim:
+        raise ValueError('a data inicial da janela é posterior à data final')
+    s,e=window_days(index,inicio,fim)
+    trafego=_traffic_positions(index,categorias)
+    somas=_window_sums(index,s,e,trafego)
+
+    def quadro(eixo,nivel):
+        n=somas['n'].sum(axis=eixo)
+        media,desvio=_moments(n,somas['time_sum'].sum(axis=eixo),somas['time_sumsq'].sum(axis=eixo))
+        return pd.DataFrame({'orders':n.astype('int64'),'time_mean':media,'time_std':desvio},index=index['levels'][nivel])
+
+    n=somas['n'].sum()
+    time_mean,time_std=_moments(n,somas['time_sum'].sum(),somas['time_sumsq'].sum())
+    couriers=_window_couriers(index,s,e,trafego,df,filter_index,inicio,fim,categorias)
+    stats={'start':inicio,
+           'end':fim,
+           'orders':int(n),
+           'couriers':couriers,
+           'orders_per_courier':float(n/couriers) if couriers else np.nan,
+           'time_mean':float(time_mean),
+           'time_std':float(time_std),
+           'rating_mean':float(_moments(n,somas['rating_sum'].sum())[0]),
+           'distance_mean':float(_moments(n,somas['distance_sum'].sum())[0]) if 'distance_sum' in somas else np.nan,
+           'by_city':quadro(1,'City'),
+           'by_festival':quadro(0,'Festival')}
+    return stats
+
+def window_daily(index,inicio,fim,categorias=None):
+    """ Esta função retorna o número de pedidos de cada dia da janela (diferenças consecutivas das somas
+    acumuladas). Os dias sem dados aparecem com zero, de modo que janelas de mesma duração se alinham.
+
+    Input: índice das janelas; data inicial e data final; tipos de tráfego selecionados (None = todos)
+    Output: Series indexada pela data
+    """
+    inicio,fim=pd.Timestamp(inicio).normalize(),pd.Timestamp(fim).normalize()
+    datas=pd.date_range(inicio,fim,freq='D',name='Order_Date')
+    dias=(datas-index['start']).days.to_numpy()
+    dentro=(dias>=0)&(dias<index['days'])
+    P=index['prefix']['n'][:,:,_traffic_positions(index,categorias),:].sum(axis=(1,2,3))
+    pedidos=np.zeros(len(datas),dtype='int64')
+    pedidos[dentro]=np.rint(P[dias[dentro]+1]-P[dias[dentro]]).astype('int64')
+    return pd.Series(pedidos,index=datas,name='ID')
+
+def previous_window(inicio,fim,modo='periodo'):
+    """ Esta função retorna a janela de comparação: o período imediatamente anterior com a mesma duração
+    ('periodo') ou o mesmo período uma semana antes ('semana').
+
+    Input: data inicial e data final; modo de comparação (ver COMPARISONS)
+    Output: tupla (data inicial, data final)
+    """
+    if modo not in COMPARISONS:
+        raise ValueError(f'modo de comparação inválido: {modo}')
+    inicio,fim=pd.Timestamp(inicio).normalize(),pd.Timestamp(fim).normalize()
+    deslocamento=pd.Timedelta(days=(fim-inicio).days+1 if modo=='periodo' else 7)
+    return inicio-deslocamento,fim-deslocamento
+
+def _deltas(atual,anterior):
+    """ Esta função retorna a diferença absoluta e a percentual entre dois arrays (NaN quando o anterior é zero) """
+    atual=np.asarray(atual,dtype='float64')
+    anterior=np.asarray(anterior,dtype='float64')
+    with np.errstate(divide='ignore',invalid='ignore'):
+        return atual-anterior,np.where(anterior!=0,(atual-anterior)/anterior*100,np.nan)
+
+def format_delta(delta,delta_pct=None,casas=2):
+    """ Esta função formata a diferença de uma métrica para o parâmetro delta do st.metric, com o sinal
+    e, opcionalmente, a variação percentual. Sem valor de comparação (janela anterior sem pedidos),
+    retorna None e o st.metric não mostra a diferença.
+
+    Input: diferença absoluta; diferença percentual (opcional); casas decimais
+    Output: texto ou None
+    """
+    if pd.isna(delta):
+        return None
+    texto=f'{delta:+,.{casas}f}'
+    if delta_pct is not None and not pd.isna(delta_pct):
+        texto+=f' ({delta_pct:+.1f}%)'
+    return texto
+
+def compare_windows(index,inicio,fim,modo='periodo',categorias=None,df=None,filter_index=None):
+    """ Esta função compara a janela [inicio, fim] com a janela anterior (ver previous_window).
+
+    Input: índice das janelas; data inicial e data final; modo de comparação; tipos de tráfego
+           selecionados; dataframe e índice de filtros (opcionais, ver window_stats)
+    Output: dicionário com as métricas das duas janelas ('current' e 'previous'), o resumo com as colunas
+            'current', 'previous', 'delta' e 'delta_pct' ('summary') e os quadros 'by_city' e 'by_festival'
+            (colunas <métrica>, <métrica>_prev e <métrica>_delta)
+    """
+    atual=window_stats(index,inicio,fim,categorias,df,filter_index)
+    anterior=window_stats(index,*previous_window(inicio,fim,modo),categorias,df,filter_index)
+
+    # Os quadros são montados de uma vez a partir dos arrays (sem inserir coluna por coluna)
+    correntes=np.array([atual[m] if atual[m] is not None else np.nan for m in SUMMARY_METRICS],dtype='float64')
+    anteriores=np.array([anterior[m] if anterior[m] is not None else np.nan for m in SUMMARY_METRICS],dtype='float64')
+    delta,delta_pct=_deltas(correntes,anteriores)
+    resumo=pd.DataFrame({'current':correntes,'previous':anteriores,'delta':delta,'delta_pct':delta_pct},
+                        index=SUMMARY_METRICS)
+
+    comparacao={'current':atual,'previous':anterior,'summary':resumo}
+    for chave in ['by_city','by_festival']:
+        colunas={}
+        for col in atual[chave].columns:
+            colunas[col]=atual[chave][col].to_numpy()
+            colunas[f'{col}_prev']=anterior[chave][col].to_numpy()
+            colunas[f'{col}_delta']=_deltas(colunas[col],colunas[f'{col}_prev'])[0]
+        comparacao[chave]=pd.DataFrame(colunas,index=atual[chave].index)
+    return comparacao